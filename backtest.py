@@ -0,0 +1,76 @@
+# Offline replay of recorded books.
+# Record with --record on any of the CLIs or the quote service, then replay the file here.
+# Every recorded book re-prices the quantities against the latest book of every venue at that
+# time, without touching the exchanges:
+#
+#   python3 ratelimiter_async.py --qty 10 --loop --record books.bin
+#   python3 backtest.py books.bin --qty 1 10 --summary
+
+
+import argparse
+import time
+from datetime import datetime, timezone
+from decimal import Decimal
+
+from utils.snapshot_store import replay_quotes
+from utils.venues import VENUES
+
+
+def format_time(timestamp_ns):
+    return datetime.fromtimestamp(timestamp_ns / 1e9, timezone.utc).isoformat(timespec='milliseconds')
+
+
+def summarize(rows, quantities):
+    # min / mean / max cost per quantity over the whole recording
+    lines = [f"{'qty':>12} {'quotes':>7} {'buy min':>16} {'buy mean':>16} {'buy max':>16} {'sell min':>16} {'sell mean':>16} {'sell max':>16}"]
+    for quantity in quantities:
+        selected = [row for row in rows if row['quantity'] == quantity]
+        if not selected:
+            continue
+        buys = [row['buy'] for row in selected]
+        sells = [row['sell'] for row in selected]
+        stats = [min(buys), sum(buys) / len(buys), max(buys), min(sells), sum(sells) / len(sells), max(sells)]
+        lines.append(f"{str(quantity):>12} {len(selected):>7} " + " ".join(f"{f'${value:,.2f}':>16}" for value in stats))
+    return "\n".join(lines)
+
+
+def main(path, quantities, venue_names=None, product=None, summary=False):
+    start = time.perf_counter()
+    rows = list(replay_quotes(path, quantities, venue_names, product))
+    elapsed = time.perf_counter() - start
+
+    if summary:
+        print(summarize(rows, quantities))
+    else:
+        print(f"{'time':<29} {'qty':>12} {'buy':>20} {'sell':>20}")
+        for row in rows:
+            buy = f"${row['buy']:,.2f}"
+            sell = f"${row['sell']:,.2f}"
+            print(f"{format_time(row['time']):<29} {str(row['quantity']):>12} {buy:>20} {sell:>20}")
+
+    print(f"\n{len(rows)} quotes in {elapsed:.3f} s ({len(rows) / elapsed if elapsed else 0:,.0f} quotes/s)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+                    prog='Orderbook Backtest',
+                    formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+                    description='Replays a snapshot file recorded with --record and prices every recorded book')
+
+    parser.add_argument('file', help='Snapshot file written with --record')
+    parser.add_argument('--qty', type=Decimal, nargs='+', default=[Decimal(10)], help='Quantities to price at every book')
+    parser.add_argument('--product', help='Only replay the books of this product (BASE-QUOTE), needed when the file holds several')
+    parser.add_argument('--venues', nargs='+', choices=sorted(VENUES), help='Venues to aggregate, every venue in the file by default')
+    parser.add_argument('--summary', action='store_true', help='Print min / mean / max per quantity instead of every quote')
+
+    args = parser.parse_args()
+
+    if any(quantity <= 0 for quantity in args.qty):
+        print("Error: Quantity must be positive")
+        exit(1)
+
+    try:
+        main(args.file, args.qty, args.venues, args.product, args.summary)
+    except (OSError, ValueError) as e:
+        print("Error: ", e)
+        exit(1)
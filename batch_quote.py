@@ -0,0 +1,79 @@
+# Prices many quantities against one fetch of the books.
+# Instead of one ratelimiter.py run per quantity (interpreter start, imports, fetch and merge each time),
+# the books are fetched and merged once and every quantity is priced in a single sorted sweep
+# of the merged levels (utils/batch.py):
+#
+#   python3 batch_quote.py --qty 0.5 1 10 100 --format csv
+#   printf 'buy 1\nsell 2.5\n10\n' | python3 batch_quote.py --format json
+#
+# Startup matters when this runs from cron or a shell loop, so the imports here are the light ones.
+# requests is imported by the fetch itself, and numpy / asyncio / http.server / multiprocessing
+# are never imported by this path (benchmarks/bench_startup.py checks it).
+
+
+from dotenv import load_dotenv
+import argparse
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.batch import SIDES, parse_requests, price_requests, format_rows
+from utils.engines import get_engine
+from utils.venues import VENUES, DEFAULT_VENUES, get_venues
+
+
+# loads the environment variables from the .env file
+load_dotenv()
+
+
+def read_lines(quantities, path):
+    # --qty values first, then the file ('-' for stdin). stdin is read on its own when something is piped in
+    lines = list(quantities or [])
+    if path == '-' or (path is None and not lines and not sys.stdin.isatty()):
+        lines.extend(sys.stdin)
+    elif path is not None:
+        with open(path) as f:
+            lines.extend(f)
+    return lines
+
+
+def fetch_books(venues, product=None):
+    # every venue at once, the batch waits for the slowest one instead of the sum
+    with ThreadPoolExecutor(max_workers=len(venues)) as executor:
+        futures = [executor.submit(venue.fetch, venue.api_url(product)) for venue in venues]
+        books = [(venue, future.result()) for venue, future in zip(venues, futures)]
+
+    for venue, data in books:
+        venue.validate(data)
+    return books
+
+
+def main(lines, side='both', output_format='table', venue_names=DEFAULT_VENUES, product=None):
+    requests = parse_requests(lines, SIDES if side == 'both' else (side,))
+    if not requests:
+        raise ValueError("no quantities given, use --qty, --file or pipe them on stdin")
+
+    books = fetch_books(get_venues(venue_names), product)
+    rows = price_requests(get_engine('decimal'), books, requests)
+    print(format_rows(rows, output_format))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+                    prog='Orderbook Batch Quote',
+                    formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+                    description='Fetches the books once and prices every quantity against them')
+
+    parser.add_argument('--qty', nargs='+', help='Quantities to price, each on --side')
+    parser.add_argument('--file', help="File with one quantity per line, optionally prefixed with buy or sell. '-' reads stdin")
+    parser.add_argument('--side', choices=['buy', 'sell', 'both'], default='both', help='Side of the quantities without one')
+    parser.add_argument('--format', choices=['table', 'csv', 'json'], default='table', help='Output format, csv and json keep the full precision')
+    parser.add_argument('--product', help='Product as BASE-QUOTE (e.g. ETH-USD) fetched from the venue url templates, instead of the COINBASE_API / GEMINI_API urls')
+    parser.add_argument('--venues', nargs='+', choices=sorted(VENUES), default=DEFAULT_VENUES, help='Venues to aggregate')
+
+    args = parser.parse_args()
+
+    try:
+        main(read_lines(args.qty, args.file), args.side, args.format, args.venues, args.product)
+    except Exception as e:
+        print("Error: ", e, file=sys.stderr)
+        exit(1)
@@ -0,0 +1,69 @@
+# Fetch latency of the current loaders against the pooled async pipeline, offline.
+# A local stub server serves the json fixtures and sleeps --connect-delay on every new connection,
+# standing in for the TCP + TLS handshake that bare requests.get pays on each call.
+#
+# python3 -m benchmarks.bench_async_fetch --rounds 20 --connect-delay 0.05
+
+import argparse
+import asyncio
+import time
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from utils.data_loader import get_coinbase_data, get_gemini_data
+from utils.async_loader import create_session, fetch_json
+from tests.stub_server import StubServer
+
+# the rate limited loaders would refuse back to back calls, the benchmark measures the fetch itself
+fetch_coinbase = get_coinbase_data.__wrapped__
+fetch_gemini = get_gemini_data.__wrapped__
+
+
+def sequential(coinbase_api, gemini_api, rounds):
+    for _ in range(rounds):
+        fetch_coinbase(coinbase_api)
+        fetch_gemini(gemini_api)
+
+
+def threaded(coinbase_api, gemini_api, rounds):
+    # what ratelimiter_mt.py does, a fresh pool per run
+    for _ in range(rounds):
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            futures = [executor.submit(fetch_coinbase, coinbase_api), executor.submit(fetch_gemini, gemini_api)]
+            for future in futures:
+                future.result()
+
+
+def pooled_async(coinbase_api, gemini_api, rounds):
+    async def run():
+        async with create_session() as session:
+            for _ in range(rounds):
+                await asyncio.gather(fetch_json(session, coinbase_api, 5.0), fetch_json(session, gemini_api, 5.0))
+
+    asyncio.run(run())
+
+
+def main(rounds, connect_delay):
+    print(f"{rounds} rounds, {connect_delay * 1000:.0f} ms per new connection")
+    print(f"{'mode':>14} {'total (s)':>10} {'per round (ms)':>16} {'connections':>12}")
+
+    for name, func in (('sequential', sequential), ('threads', threaded), ('async pooled', pooled_async)):
+        with StubServer(connect_delay=connect_delay) as server:
+            start = time.perf_counter()
+            func(server.url + '/coinbase', server.url + '/gemini', rounds)
+            elapsed = time.perf_counter() - start
+            connections = server.connections
+
+        print(f"{name:>14} {elapsed:>10.3f} {elapsed / rounds * 1000:>16.1f} {connections:>12}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark fetch latency against a local stub server')
+    parser.add_argument('--rounds', type=int, default=20, help='Number of fetches per venue')
+    parser.add_argument('--connect-delay', type=float, default=0.05, help='Seconds the stub server waits on each new connection')
+    args = parser.parse_args()
+
+    main(args.rounds, args.connect_delay)
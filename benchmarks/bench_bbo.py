@@ -0,0 +1,129 @@
+# Consolidated best bid and offer over a stream of book updates from several venues.
+# Every tick is one l2update applied to one venue's OrderBook, then the BBO is brought up to date:
+# book is the update alone, merge takes the first level of merge_bids / merge_asks over every book
+# (how the BBO is read today), tracker is BBOTracker.update_book (utils/bbo.py).
+# read is the cost of one spread read between ticks, a merge against the tracker's published tuple.
+# The stream is synthetic (utils/synthetic.py) unless replayed feeds are given, one file per venue.
+#
+# python3 -m benchmarks.bench_bbo --venues 4 --levels 5000 --ticks 50000
+
+import argparse
+import time
+import timeit
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from utils.bbo import BBOTracker
+from utils.helper import merge_asks, merge_bids
+from utils.orderbook import OrderBook
+from utils.replay import ReplayFeed, apply_message
+from utils.synthetic import generate_levels, generate_l2_updates
+
+
+def synthetic_streams(venues, levels, ticks):
+    # (snapshot levels, updates) per venue, venues quoting a few cents apart
+    streams = []
+    for index in range(venues):
+        bids, asks = generate_levels(levels, mid=110000.0 + index * 0.05, seed=index)
+        updates = generate_l2_updates(ticks // venues, mid=110000.0 + index * 0.05, seed=index + 100)
+        streams.append(([{'type': 'snapshot', 'bids': bids, 'asks': asks, 'sequence': 1}], updates))
+    return streams
+
+
+def feed_streams(paths):
+    # the first message of a feed starts the book, the rest are ticks
+    streams = []
+    for path in paths:
+        messages = list(ReplayFeed(path).messages())
+        streams.append((messages[:1], messages[1:]))
+    return streams
+
+
+def fresh_books(streams):
+    books = []
+    for index, (start, _) in enumerate(streams):
+        book = OrderBook(f"venue{index}")
+        for message in start:
+            apply_message(book, message)
+        books.append(book)
+    return books
+
+
+def interleaved(streams, books):
+    # (book, message) in venue round robin, like the feeds arriving together
+    ticks = []
+    for step in range(max(len(updates) for _, updates in streams)):
+        for book, (_, updates) in zip(books, streams):
+            if step < len(updates):
+                ticks.append((book, updates[step]))
+    return ticks
+
+
+def merged_bbo(books):
+    return next(merge_bids(*(book.bids() for book in books)), None), \
+        next(merge_asks(*(book.asks() for book in books)), None)
+
+
+def run(streams, mode):
+    # ticks/s and the tracker, which is checked against a merge of the final books
+    books = fresh_books(streams)
+    ticks = interleaved(streams, books)
+    tracker = BBOTracker()
+    for book in books:
+        tracker.update_book(book)
+
+    start = time.perf_counter()
+    if mode == 'book':
+        for book, message in ticks:
+            apply_message(book, message)
+    elif mode == 'merge':
+        for book, message in ticks:
+            apply_message(book, message)
+            merged_bbo(books)
+    else:
+        for book, message in ticks:
+            apply_message(book, message)
+            tracker.update_book(book)
+    elapsed = time.perf_counter() - start
+
+    bid, ask = merged_bbo(books)
+    if mode == 'tracker':
+        assert (tracker.bbo.bid.price, tracker.bbo.ask.price) == (bid[0], ask[0])
+    return len(ticks) / elapsed, tracker
+
+
+def main(venues, levels, ticks, feeds, reads):
+    streams = feed_streams(feeds) if feeds else synthetic_streams(venues, levels, ticks)
+    total = sum(len(updates) for _, updates in streams)
+    print(f"{len(streams)} venues, {total} ticks")
+    print(f"{'mode':<8} {'ticks/s':>10} {'us/tick':>8}")
+    for mode in ('book', 'merge', 'tracker'):
+        rate, tracker = run(streams, mode)
+        print(f"{mode:<8} {rate:>10,.0f} {1e6 / rate:>8.2f}")
+    print(f"BBO changed on {tracker.changes} of {tracker.updates} tracker updates")
+
+    books = fresh_books(streams)
+    for book in books:
+        tracker.update_book(book)
+
+    def merge_spread():
+        bid, ask = merged_bbo(books)
+        return ask[0] - bid[0]
+
+    merge_read = timeit.timeit(merge_spread, number=reads) / reads * 1e6
+    tracker_read = timeit.timeit(lambda: tracker.bbo.spread, number=reads) / reads * 1e6
+    print(f"spread read us: merge {merge_read:.2f}, tracker {tracker_read:.3f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark the incremental BBO tracker against merging every book')
+    parser.add_argument('--venues', type=int, default=4, help='Synthetic venues')
+    parser.add_argument('--levels', type=int, default=5000, help='Levels per side of each synthetic book')
+    parser.add_argument('--ticks', type=int, default=50000, help='Synthetic updates over all venues')
+    parser.add_argument('--feeds', nargs='*', default=[], help='Replay feeds (json lines) used instead, one per venue')
+    parser.add_argument('--reads', type=int, default=100000, help='Spread reads timed')
+    args = parser.parse_args()
+
+    main(args.venues, args.levels, args.ticks, args.feeds, args.reads)
@@ -0,0 +1,126 @@
+# Reader latency while the book refreshes, and the cost of publishing a new snapshot.
+# Reader threads quote in a loop from publisher.current while a writer keeps publishing new books.
+# The locked baseline is the same book behind a lock the writer holds for the whole rebuild,
+# which is what sharing one mutable book between pricing threads and the refresher would need.
+# Reads are lock free, but this is still one interpreter, so readers share the GIL with the writer.
+#
+# python3 -m benchmarks.bench_book_snapshot --levels 20000 --readers 4
+
+import argparse
+import threading
+import time
+import sys
+from decimal import Decimal
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from utils.book_snapshot import SnapshotPublisher
+from utils.synthetic import generate_coinbase_book, generate_gemini_book
+from utils.venues import COINBASE, GEMINI
+
+
+def books_for(step, levels):
+    return {
+        COINBASE: generate_coinbase_book(levels, mid=110000.0 + step, seed=step, sequence=step + 1),
+        GEMINI: generate_gemini_book(max(levels // 20, 1), mid=110000.0 + step, seed=step + 1000),
+    }
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(int(len(values) * fraction), len(values) - 1)]
+
+
+def run_readers(readers, duration, read, writer=None):
+    # per quote latencies of every reader, with the writer running next to them when given
+    done = threading.Event()
+    latencies = [[] for _ in range(readers)]
+
+    def reader(samples):
+        quantity = Decimal('3.5')
+        while not done.is_set():
+            start = time.perf_counter()
+            read(quantity)
+            samples.append(time.perf_counter() - start)
+
+    threads = [threading.Thread(target=reader, args=(samples,)) for samples in latencies]
+    if writer is not None:
+        threads.append(threading.Thread(target=writer, args=(done,)))
+    for thread in threads:
+        thread.start()
+    time.sleep(duration)
+    done.set()
+    for thread in threads:
+        thread.join()
+    return [latency for samples in latencies for latency in samples]
+
+
+def main(levels, readers, duration, versions):
+    rounds = [books_for(step, levels) for step in range(versions)]
+    publisher = SnapshotPublisher()
+    publisher.publish(rounds[0])
+    publishes = [0]
+
+    def snapshot_read(quantity):
+        book = publisher.current
+        book.quote('buy', quantity)
+        book.quote('sell', quantity)
+
+    def snapshot_writer(done):
+        step = 0
+        while not done.is_set():
+            step += 1
+            publisher.publish(rounds[step % versions])
+            publishes[0] += 1
+
+    # the baseline publishes the same way, but readers and the rebuild take turns on one lock
+    lock = threading.Lock()
+    locked = SnapshotPublisher()
+    locked.publish(rounds[0])
+
+    def locked_read(quantity):
+        with lock:
+            book = locked.current
+            book.quote('buy', quantity)
+            book.quote('sell', quantity)
+
+    def locked_writer(done):
+        step = 0
+        while not done.is_set():
+            step += 1
+            with lock:
+                locked.publish(rounds[step % versions])
+
+    print(f"{levels} coinbase levels per side, {readers} readers, {duration:.1f} s per run")
+    print(f"{'run':<26} {'quotes/s':>10} {'p50 us':>8} {'p99 us':>9} {'max ms':>8}")
+    for label, read, writer in (('snapshot, no refresh', snapshot_read, None),
+                                ('snapshot, refreshing', snapshot_read, snapshot_writer),
+                                ('locked, refreshing', locked_read, locked_writer)):
+        latencies = run_readers(readers, duration, read, writer)
+        print(f"{label:<26} {len(latencies) / duration:>10,.0f} {percentile(latencies, 0.5) * 1e6:>8.1f} "
+              f"{percentile(latencies, 0.99) * 1e6:>9.1f} {max(latencies) * 1e3:>8.2f}")
+    print(f"{publishes[0]} snapshots published during the refreshing run")
+
+    # publish cost: every venue new, only the small venue new (the big one is reused), nothing new
+    print(f"\n{'publish':<26} {'ms':>8}")
+    for label, books in (('both venues changed', lambda step: rounds[step % versions]),
+                         ('gemini changed', lambda step: {COINBASE: rounds[0][COINBASE], GEMINI: rounds[step % versions][GEMINI]}),
+                         ('nothing changed', lambda step: rounds[0])):
+        publisher = SnapshotPublisher()
+        publisher.publish(rounds[0])
+        start = time.perf_counter()
+        for step in range(1, versions + 1):
+            publisher.publish(books(step))
+        print(f"{label:<26} {(time.perf_counter() - start) / versions * 1e3:>8.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark reader latency while snapshots are published')
+    parser.add_argument('--levels', type=int, default=20000, help='Coinbase levels per side, gemini gets 1/20 of it')
+    parser.add_argument('--readers', type=int, default=4, help='Number of reader threads')
+    parser.add_argument('--duration', type=float, default=2.0, help='Seconds per run')
+    parser.add_argument('--versions', type=int, default=6, help='Distinct books the writer cycles through')
+    args = parser.parse_args()
+
+    main(args.levels, args.readers, args.duration, args.versions)
@@ -0,0 +1,63 @@
+# Bounded vs unbounded merge for a range of quantities.
+# A bounded merge stops once the quantity is covered, so its time and peak memory should
+# follow the depth the quantity reaches, not the size of the books.
+# The decimal and fixed engines are lazy and their pricing already stops at the quantity,
+# so the gap shows up on the numpy engine, which reads every venue into arrays up front.
+#
+# python3 -m benchmarks.bench_depth_bounded --levels 50000
+
+import argparse
+import time
+import tracemalloc
+import sys
+from decimal import Decimal
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from utils.engines import ENGINES
+from utils.synthetic import generate_levels
+
+
+def run(engine, venues, quantity, max_quantity):
+    start = time.perf_counter()
+    merged = engine.merge_asks(*venues, max_quantity=max_quantity)
+    price = engine.calculate_sell_price(merged, quantity)
+    return time.perf_counter() - start, price
+
+
+def peak_memory(engine, venues, quantity, max_quantity):
+    tracemalloc.start()
+    run(engine, venues, quantity, max_quantity)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+
+def main(levels, venue_count, quantities, engines, repeat):
+    venues = [generate_levels(levels, seed=seed)[1] for seed in range(venue_count)]
+    print(f"{venue_count} venues x {levels} ask levels, best of {repeat}")
+    print(f"{'engine':>8} {'qty':>8} {'unbounded ms':>13} {'bounded ms':>11} {'unbounded KiB':>14} {'bounded KiB':>12}")
+
+    for name in engines:
+        engine = ENGINES[name]
+        for quantity in quantities:
+            unbounded = min(run(engine, venues, quantity, None)[0] for _ in range(repeat))
+            bounded = min(run(engine, venues, quantity, quantity)[0] for _ in range(repeat))
+            assert run(engine, venues, quantity, None)[1] == run(engine, venues, quantity, quantity)[1]
+
+            print(f"{name:>8} {quantity:>8} {unbounded * 1e3:>13.2f} {bounded * 1e3:>11.2f} "
+                  f"{peak_memory(engine, venues, quantity, None) / 1024:>14.1f} "
+                  f"{peak_memory(engine, venues, quantity, quantity) / 1024:>12.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark the depth bounded merge against the full merge')
+    parser.add_argument('--levels', type=int, default=50000, help='Number of ask levels per venue')
+    parser.add_argument('--venues', type=int, default=2, help='Number of synthetic venues')
+    parser.add_argument('--qty', type=Decimal, nargs='+', default=[Decimal('0.1'), Decimal('1'), Decimal('10'), Decimal('100')], help='Quantities to price')
+    parser.add_argument('--engines', nargs='+', choices=sorted(ENGINES), default=sorted(ENGINES), help='Engines to benchmark')
+    parser.add_argument('--repeat', type=int, default=5, help='Number of runs, the best one is reported')
+    args = parser.parse_args()
+
+    main(args.levels, args.venues, args.qty, args.engines, args.repeat)
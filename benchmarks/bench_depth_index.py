@@ -0,0 +1,68 @@
+# Compares the cumulative depth index against the current linear walk.
+# The linear walk has to re-merge the books for every quantity because merge_sorted_* is a one-shot generator.
+#
+# python3 -m benchmarks.bench_depth_index --levels 50000
+
+import argparse
+import time
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from utils.depth_index import DepthIndex
+from utils.helper import merge_sorted_bids, calculate_buy_price
+from utils.synthetic import generate_coinbase_book, generate_gemini_book, random_quantities
+
+
+def linear_walk(coinbase_data, gemini_data, quantities):
+    results = []
+    for quantity in quantities:
+        merged_bids = merge_sorted_bids(coinbase_data['bids'], gemini_data['bids'])
+        results.append(calculate_buy_price(merged_bids, quantity))
+    return results
+
+
+def indexed(coinbase_data, gemini_data, quantities):
+    index = DepthIndex(merge_sorted_bids(coinbase_data['bids'], gemini_data['bids']))
+    return index.costs_to_fill(quantities)
+
+
+def main(levels, counts, linear_sample):
+    coinbase_data = generate_coinbase_book(levels)
+    gemini_data = generate_gemini_book(max(levels // 20, 1))
+    total_size = float(DepthIndex(merge_sorted_bids(coinbase_data['bids'], gemini_data['bids'])).total_size)
+
+    print(f"Book: {len(coinbase_data['bids'])} coinbase bids, {len(gemini_data['bids'])} gemini bids")
+    print(f"{'quantities':>10} {'linear (s)':>12} {'index (s)':>12} {'speedup':>10}")
+
+    for count in counts:
+        quantities = random_quantities(count, total_size)
+
+        # the linear walk is too slow to run in full for large counts,
+        # so it is timed on a sample and scaled up.
+        sample = quantities[:linear_sample]
+        start = time.perf_counter()
+        linear_results = linear_walk(coinbase_data, gemini_data, sample)
+        linear_time = (time.perf_counter() - start) * count / len(sample)
+
+        start = time.perf_counter()
+        index_results = indexed(coinbase_data, gemini_data, quantities)
+        index_time = time.perf_counter() - start
+
+        assert index_results[:len(sample)] == linear_results
+
+        estimated = "*" if len(sample) < count else " "
+        print(f"{count:>10} {linear_time:>11.4f}{estimated} {index_time:>12.4f} {linear_time / index_time:>9.1f}x")
+
+    print("* estimated from a sample of", linear_sample, "quantities")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark the cumulative depth index against the linear walk')
+    parser.add_argument('--levels', type=int, default=50000, help='Number of coinbase levels per side')
+    parser.add_argument('--counts', type=int, nargs='+', default=[1, 100, 10000], help='Number of quantities to price')
+    parser.add_argument('--linear-sample', type=int, default=50, help='Max quantities to run through the linear walk')
+    args = parser.parse_args()
+
+    main(args.levels, args.counts, args.linear_sample)
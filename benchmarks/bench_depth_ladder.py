@@ -0,0 +1,67 @@
+# Pricing and serialization of the merged asks collapsed into price buckets of several widths.
+# tick is the merged book as it is today: calculate_sell_price walks every level up to the fill,
+# and the depth chart serializes every level. A ladder collapses the levels once (build), then prices
+# whole buckets from its running notional and serializes one row per bucket.
+# DepthIndex is there for reference, it prices with a bisect over every level.
+#
+# python3 -m benchmarks.bench_depth_ladder --levels 100000 --quotes 200
+
+import argparse
+import json
+import time
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from utils.depth_index import DepthIndex
+from utils.depth_ladder import DepthLadder
+from utils.helper import merge_sorted_asks, calculate_sell_price
+from utils.synthetic import generate_coinbase_book, generate_gemini_book, random_quantities
+
+
+def timed(function, repeat=3):
+    # best of repeat runs, seconds
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        best = min(best, time.perf_counter() - start)
+    return result, best
+
+
+def main(levels, quotes, widths):
+    coinbase_data = generate_coinbase_book(levels, seed=1)
+    gemini_data = generate_gemini_book(levels, seed=2)
+    merged = list(merge_sorted_asks(coinbase_data['asks'], gemini_data['asks']))
+    index = DepthIndex(merged)
+    quantities = random_quantities(quotes, float(index.total_size), seed=3)
+
+    print(f"{len(merged)} merged ask levels, ${merged[-1][0] - merged[0][0]:,.2f} deep, {quotes} quotes")
+    print(f"{'width':<10} {'buckets':>9} {'build ms':>9} {'quote us':>9} {'json ms':>8} {'json KB':>8}")
+
+    _, linear = timed(lambda: [calculate_sell_price(iter(merged), quantity) for quantity in quantities], repeat=1)
+    body, dump = timed(lambda: json.dumps([{'price': str(price), 'size': str(size)} for price, size in merged]))
+    print(f"{'tick':<10} {len(merged):>9} {'':>9} {linear / quotes * 1e6:>9.1f} {dump * 1e3:>8.1f} {len(body) / 1e3:>8.0f}")
+    _, indexed = timed(lambda: index.costs_to_fill(quantities))
+    print(f"{'DepthIndex':<10} {len(index):>9} {'':>9} {indexed / quotes * 1e6:>9.1f}")
+
+    for width in widths:
+        ladder, build = timed(lambda: DepthLadder(merged, width))
+        costs, priced = timed(lambda: ladder.costs_to_fill(quantities))
+        assert costs == index.costs_to_fill(quantities)
+        body, dump = timed(lambda: json.dumps(ladder.rows()))
+        label = f"{width} ({ladder.width})" if width.endswith('bp') else width
+        print(f"{label:<10} {len(ladder):>9} {build * 1e3:>9.1f} {priced / quotes * 1e6:>9.1f} "
+              f"{dump * 1e3:>8.1f} {len(body) / 1e3:>8.0f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark pricing and serialization of bucketed depth ladders')
+    parser.add_argument('--levels', type=int, default=100000, help='Levels per venue side')
+    parser.add_argument('--quotes', type=int, default=200, help='Random quantities priced per layout')
+    parser.add_argument('--widths', nargs='+', default=['0.01', '0.1', '1', '10', '100', '1bp', '10bp'],
+                        help='Bucket widths, in dollars or basis points of the touch (1bp)')
+    args = parser.parse_args()
+
+    main(args.levels, args.quotes, args.widths)
@@ -0,0 +1,60 @@
+# End to end merge and pricing time of every available engine on the same synthetic book.
+# The merge stage includes turning the venue strings into the engine's representation.
+#
+# python3 -m benchmarks.bench_engines --levels 50000
+
+import argparse
+import time
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from utils.engines import ENGINES
+from utils.venues import COINBASE, GEMINI
+from utils.synthetic import generate_coinbase_book, generate_gemini_book, random_quantities
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - start, result
+
+
+def main(levels, quantities):
+    coinbase_data = generate_coinbase_book(levels)
+    gemini_data = generate_gemini_book(max(levels // 20, 1))
+    quantities = random_quantities(quantities, levels / 2)
+
+    print(f"Book: {len(coinbase_data['bids'])} + {len(gemini_data['bids'])} levels per side, {len(quantities)} quantities")
+    print(f"{'engine':>8} {'merge (ms)':>12} {'price (ms)':>12}")
+
+    reference = None
+    for name, engine in ENGINES.items():
+        merge_time, merged = timed(engine.merge_bids, COINBASE.parse_levels(coinbase_data['bids']), GEMINI.parse_levels(gemini_data['bids']))
+
+        price_time = 0.0
+        results = []
+        for quantity in quantities:
+            # the generator engines can only be walked once, so they have to be merged again.
+            # only the pricing is timed.
+            if name != 'numpy':
+                merged = engine.merge_bids(COINBASE.parse_levels(coinbase_data['bids']), GEMINI.parse_levels(gemini_data['bids']))
+            elapsed, result = timed(engine.calculate_buy_price, merged, quantity)
+            price_time += elapsed
+            results.append(result)
+
+        if reference is None:
+            reference = results
+        assert results == reference, f"{name} does not match the decimal engine"
+
+        print(f"{name:>8} {merge_time * 1000:>12.2f} {price_time * 1000:>12.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark merge and pricing for every engine')
+    parser.add_argument('--levels', type=int, default=50000, help='Number of coinbase levels per side')
+    parser.add_argument('--quantities', type=int, default=10, help='Number of quantities to price')
+    args = parser.parse_args()
+
+    main(args.levels, args.quantities)
@@ -0,0 +1,54 @@
+# Per-level cost of the Decimal path against the scaled integer path, for merge and fill.
+#
+# python3 -m benchmarks.bench_fixed_point --levels 50000
+
+import argparse
+import time
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from utils.engines import ENGINES
+from utils.venues import COINBASE, GEMINI
+from utils.synthetic import generate_coinbase_book, generate_gemini_book
+
+
+def best_of(repeat, func, *args):
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main(levels, repeat):
+    coinbase_data = generate_coinbase_book(levels)
+    gemini_data = generate_gemini_book(max(levels // 20, 1))
+    total_levels = len(coinbase_data['bids']) + len(gemini_data['bids'])
+
+    # a quantity deeper than the book, so every level is walked
+    quantity = sum(size for _, size in ENGINES['decimal'].merge_bids(COINBASE.parse_levels(coinbase_data['bids']), GEMINI.parse_levels(gemini_data['bids']))) * 2
+
+    print(f"Book: {total_levels} bid levels, best of {repeat}")
+    print(f"{'engine':>8} {'merge ns/level':>16} {'fill ns/level':>16} {'result':>22}")
+
+    for name in ('decimal', 'fixed'):
+        engine = ENGINES[name]
+
+        merge_time, merged = best_of(repeat, lambda: list(engine.merge_bids(COINBASE.parse_levels(coinbase_data['bids']), GEMINI.parse_levels(gemini_data['bids']))))
+        fill_time, result = best_of(repeat, engine.calculate_buy_price, merged, quantity)
+
+        print(f"{name:>8} {merge_time / total_levels * 1e9:>16.1f} {fill_time / total_levels * 1e9:>16.1f} {result:>22,.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark the Decimal and scaled integer engines per level')
+    parser.add_argument('--levels', type=int, default=50000, help='Number of coinbase levels per side')
+    parser.add_argument('--repeat', type=int, default=5, help='Number of runs, the best one is reported')
+    args = parser.parse_args()
+
+    main(args.levels, args.repeat)
@@ -0,0 +1,70 @@
+# Quote fetch latency with a slow tail, plain against budgeted and hedged fetches.
+# The stub server holds a fraction of its responses for --slow seconds, independently per request.
+# Plain waits for both venues every round. Budget gives up on a venue after --budget seconds and
+# prices it from its last good book. Hedged also sends a second request after --hedge-after seconds,
+# on a spare token of the venue's own rate budget (capacity 2).
+#
+# python3 -m benchmarks.bench_hedging --rounds 200 --slow-fraction 0.05
+
+import argparse
+import random
+import threading
+import time
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from tests.stub_server import StubServer
+from tests.test_hedging import stub_venues, urls
+from utils.hedging import LastGoodBooks, fetch_books
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(int(len(values) * fraction), len(values) - 1)]
+
+
+def main(rounds, slow_fraction, slow, fast, budget, hedge_after, seed):
+    rng = random.Random(seed)
+    lock = threading.Lock()
+
+    def latency(path):
+        with lock:
+            return slow if rng.random() < slow_fraction else fast
+
+    print(f"{rounds} rounds, {slow_fraction:.0%} of responses held {slow * 1e3:.0f} ms, the rest {fast * 1e3:.0f} ms")
+    print(f"{'mode':<8} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8} {'stale':>6} {'requests':>9}")
+    for label, budgets, hedge in (('plain', None, None), ('budget', {None: budget}, None), ('hedged', {None: budget}, hedge_after)):
+        with StubServer(latency=latency) as server:
+            # plenty of rate budget, so the only limit on hedges is the spare token
+            venues = stub_venues(capacity=2, tokens_per_minute=60000.0)
+            last_good = LastGoodBooks()
+            fetch_books(venues, urls(server), last_good=last_good)
+            server.requests = 0
+
+            times = []
+            stale = 0
+            for _ in range(rounds):
+                start = time.perf_counter()
+                results = fetch_books(venues, urls(server), budgets, hedge, last_good)
+                times.append(time.perf_counter() - start)
+                stale += sum(result.stale for result in results.values())
+            requests = server.requests
+
+        print(f"{label:<8} {percentile(times, 0.5) * 1e3:>8.1f} {percentile(times, 0.99) * 1e3:>8.1f} "
+              f"{max(times) * 1e3:>8.1f} {stale:>6} {requests:>9}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark fetch latency with budgets and hedged requests')
+    parser.add_argument('--rounds', type=int, default=200, help='Quote rounds, each fetching both venues')
+    parser.add_argument('--slow-fraction', type=float, default=0.05, help='Fraction of responses that are slow')
+    parser.add_argument('--slow', type=float, default=0.5, help='Seconds a slow response is held')
+    parser.add_argument('--fast', type=float, default=0.005, help='Seconds any other response is held')
+    parser.add_argument('--budget', type=float, default=0.3, help='Latency budget per venue in seconds')
+    parser.add_argument('--hedge-after', type=float, default=0.03, help='Seconds before the hedged request')
+    parser.add_argument('--seed', type=int, default=1, help='Seed of the slow responses')
+    args = parser.parse_args()
+
+    main(args.rounds, args.slow_fraction, args.slow, args.fast, args.budget, args.hedge_after, args.seed)
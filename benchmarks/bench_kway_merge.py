@@ -0,0 +1,44 @@
+# k-way merge cost for k = 2..16 synthetic venues with the same total number of levels.
+# With heapq.merge (and the balanced pairwise merge of the numpy engine) the cost per level
+# should grow with log k, not with k.
+#
+# python3 -m benchmarks.bench_kway_merge --levels 100000
+
+import argparse
+import math
+import time
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from utils.engines import ENGINES
+from utils.synthetic import generate_levels
+
+
+def main(total_levels, ks, engines):
+    print(f"{total_levels} ask levels split across k venues, merge fully consumed")
+    print(f"{'engine':>8} {'k':>4} {'log2 k':>7} {'ns/level':>10}")
+
+    for name in engines:
+        engine = ENGINES[name]
+        for k in ks:
+            venues = [generate_levels(total_levels // k, seed=seed)[1] for seed in range(k)]
+
+            start = time.perf_counter()
+            merged = engine.merge_asks(*venues)
+            # the generator engines are lazy, walking the result is part of the merge
+            count = sum(1 for _ in merged) if name != 'numpy' else len(merged)
+            elapsed = time.perf_counter() - start
+
+            print(f"{name:>8} {k:>4} {math.log2(k):>7.2f} {elapsed / count * 1e9:>10.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark the k-way merge over synthetic venues')
+    parser.add_argument('--levels', type=int, default=100000, help='Total number of ask levels across all venues')
+    parser.add_argument('--k', type=int, nargs='+', default=[2, 4, 8, 16], help='Number of venues')
+    parser.add_argument('--engines', nargs='+', choices=sorted(ENGINES), default=sorted(ENGINES), help='Engines to benchmark')
+    args = parser.parse_args()
+
+    main(args.levels, args.k, args.engines)
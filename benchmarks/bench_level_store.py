@@ -0,0 +1,90 @@
+# Memory held per book level, Decimal levels against the compact int64 store.
+# decimal is what SnapshotPublisher keeps by default: each venue side as a tuple of (Decimal, Decimal)
+# and each merged side as a DepthIndex. compact is LevelBuffer and CompactDepth (utils/level_store.py).
+# tracemalloc counts what a built book holds on to and the peak while building it, then the same over
+# a run of refreshes, holding only the current snapshot like the quote service.
+# Times are measured separately, without tracemalloc.
+#
+# python3 -m benchmarks.bench_level_store --levels 20000 --refreshes 10
+
+import argparse
+import gc
+import time
+import timeit
+import tracemalloc
+import sys
+from decimal import Decimal
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from utils.book_snapshot import SnapshotPublisher
+from utils.synthetic import generate_coinbase_book, generate_gemini_book
+from utils.venues import COINBASE, GEMINI
+
+
+def books_for(step, levels):
+    return {
+        COINBASE: generate_coinbase_book(levels, mid=110000.0 + step, seed=step, sequence=step + 1),
+        GEMINI: generate_gemini_book(levels, mid=110000.0 + step, seed=step + 1000),
+    }
+
+
+def traced(build):
+    # (bytes still held by the result, peak bytes while building it)
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    held, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, held, peak
+
+
+def refresh_run(compact, all_books):
+    # publishes every book in turn, holding only the current snapshot like the quote service
+    publisher = SnapshotPublisher(compact)
+    publisher.publish(all_books[0])
+    gc.collect()
+    tracemalloc.start()
+    for books in all_books[1:]:
+        publisher.publish(books)
+    held, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return publisher, held, peak
+
+
+def main(levels, refreshes, quotes):
+    books = books_for(0, levels)
+    all_books = [books_for(step, levels) for step in range(refreshes + 1)]
+    quantity = Decimal('3.5')
+
+    print(f"two venues of {levels} levels a side, {refreshes} refreshes")
+    print(f"{'layout':<8} {'held MB':>8} {'B/level':>8} {'peak MB':>8} {'refresh peak MB':>16} "
+          f"{'publish ms':>11} {'quote us':>9}")
+    for compact in (False, True):
+        snapshot, held, peak = traced(lambda: SnapshotPublisher(compact).publish(books))
+        # venue levels and merged levels, both sides
+        stored = sum(len(venue.bids) + len(venue.asks) for venue in snapshot.venues)
+        _, _, refresh_peak = refresh_run(compact, all_books)
+
+        publisher = SnapshotPublisher(compact)
+        start = time.perf_counter()
+        for step_books in all_books:
+            publisher.publish(step_books)
+        publish_ms = (time.perf_counter() - start) / len(all_books) * 1e3
+        current = publisher.current
+        quote_us = timeit.timeit(lambda: current.quote('buy', quantity), number=quotes) / quotes * 1e6
+
+        print(f"{'compact' if compact else 'decimal':<8} {held / 1e6:>8.2f} {held / stored:>8.1f} {peak / 1e6:>8.2f} "
+              f"{refresh_peak / 1e6:>16.2f} {publish_ms:>11.1f} {quote_us:>9.2f}")
+    print("B/level: bytes held per venue level, merged sides included")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark the memory of Decimal levels against the compact level store')
+    parser.add_argument('--levels', type=int, default=20000, help='Levels per side of each venue')
+    parser.add_argument('--refreshes', type=int, default=10, help='Books published in the refresh run')
+    parser.add_argument('--quotes', type=int, default=20000, help='Quotes timed on the last book')
+    args = parser.parse_args()
+
+    main(args.levels, args.refreshes, args.quotes)
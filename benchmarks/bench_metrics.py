@@ -0,0 +1,121 @@
+# Cost of the stage timings.
+# First the span itself: disabled, enabled, and enabled inside a quote trace.
+# Then a whole quote, fetched from a local stub server, merged and priced like ratelimiter.py,
+# with metrics off and on (one json line per quote, written to /dev/null).
+#
+# python3 -m benchmarks.bench_metrics --levels 10000
+
+import argparse
+import json
+import os
+import statistics
+import time
+import sys
+from decimal import Decimal
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from utils.data_loader import get_coinbase_data, get_gemini_data
+from utils.engines import ENGINES
+from utils.metrics import Metrics, METRICS
+from utils.synthetic import generate_coinbase_book, generate_gemini_book
+from utils.venues import COINBASE, GEMINI
+from tests.stub_server import StubServer
+
+# the rate limited loaders would refuse back to back calls
+fetch_coinbase = get_coinbase_data.__wrapped__
+fetch_gemini = get_gemini_data.__wrapped__
+
+
+def span_cost(metrics, calls, traced):
+    # ns per span, the empty loop subtracted
+    def loop(body):
+        start = time.perf_counter_ns()
+        for _ in range(calls):
+            body()
+        return time.perf_counter_ns() - start
+
+    def empty():
+        pass
+
+    def span():
+        with metrics.span('merge', side='bids'):
+            pass
+
+    baseline = loop(empty)
+    if traced:
+        with metrics.trace():
+            elapsed = loop(span)
+    else:
+        elapsed = loop(span)
+    return (elapsed - baseline) / calls
+
+
+def quote(engine, server, quantity):
+    with METRICS.trace(quantity=quantity):
+        books = {COINBASE: fetch_coinbase(server.url + '/coinbase'), GEMINI: fetch_gemini(server.url + '/gemini')}
+        with METRICS.span('merge', side='bids'):
+            merged_bids = engine.merge_bids(*(venue.levels(data, 'bids') for venue, data in books.items()), max_quantity=quantity)
+        with METRICS.span('merge', side='asks'):
+            merged_asks = engine.merge_asks(*(venue.levels(data, 'asks') for venue, data in books.items()), max_quantity=quantity)
+        with METRICS.span('fill', side='buy'):
+            buy_price = engine.calculate_buy_price(merged_bids, quantity)
+        with METRICS.span('fill', side='sell'):
+            sell_price = engine.calculate_sell_price(merged_asks, quantity)
+        METRICS.annotate(buy=buy_price, sell=sell_price)
+    return buy_price, sell_price
+
+
+def quote_times(engine, server, quantity, rounds):
+    times = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        quote(engine, server, quantity)
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def main(levels, quantity, engine_name, rounds, calls):
+    print(f"span cost over {calls} spans")
+    print(f"{'mode':>18} {'ns/span':>9}")
+    print(f"{'disabled':>18} {span_cost(Metrics(), calls, False):>9.0f}")
+    with open(os.devnull, 'w') as devnull:
+        print(f"{'enabled':>18} {span_cost(Metrics().enable(devnull), calls, False):>9.0f}")
+        print(f"{'enabled + trace':>18} {span_cost(Metrics().enable(devnull), calls, True):>9.0f}")
+
+    engine = ENGINES[engine_name]
+    coinbase_body = json.dumps(generate_coinbase_book(levels)).encode()
+    gemini_body = json.dumps(generate_gemini_book(max(levels // 20, 1))).encode()
+
+    with StubServer({'/coinbase': coinbase_body, '/gemini': gemini_body}) as server, open(os.devnull, 'w') as devnull:
+        # warm up the connection and the caches
+        quote(engine, server, quantity)
+
+        # interleaved, so drift on the machine hits both modes alike
+        off, on = [], []
+        for _ in range(rounds):
+            METRICS.disable()
+            off.extend(quote_times(engine, server, quantity, 1))
+            METRICS.enable(devnull)
+            on.extend(quote_times(engine, server, quantity, 1))
+        METRICS.disable()
+        METRICS.log_stream = sys.stderr
+
+    print(f"\nquote of {quantity} on {levels} coinbase levels, {engine_name} engine, {rounds} rounds")
+    print(f"{'metrics':>8} {'best ms':>9} {'median ms':>10}")
+    print(f"{'off':>8} {min(off) * 1e3:>9.2f} {statistics.median(off) * 1e3:>10.2f}")
+    print(f"{'on':>8} {min(on) * 1e3:>9.2f} {statistics.median(on) * 1e3:>10.2f}")
+    print(f"overhead on the median: {(statistics.median(on) / statistics.median(off) - 1) * 100:+.2f}%")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark the overhead of the stage timings')
+    parser.add_argument('--levels', type=int, default=10000, help='Coinbase levels per side, gemini gets 1/20 of it')
+    parser.add_argument('--qty', type=Decimal, default=Decimal('10'), help='Quantity to price')
+    parser.add_argument('--engine', choices=sorted(ENGINES), default='decimal', help='Merge and pricing engine')
+    parser.add_argument('--rounds', type=int, default=30, help='Quotes per mode')
+    parser.add_argument('--calls', type=int, default=200000, help='Spans timed for the per span cost')
+    args = parser.parse_args()
+
+    main(args.levels, args.qty, args.engine, args.rounds, args.calls)
@@ -0,0 +1,96 @@
+# Wall-clock time to merge and price several large books at many quantities with 1..N workers,
+# threads against processes. threads is the thread path of multi_symbol.py: one depth bounded merge
+# per side into a DepthIndex and a binary search per quantity. processes is ProcessPricer, which
+# ships the level strings, cut at the largest quantity, through shared memory and runs the same merge
+# and DepthIndex per side in a worker. The threads share the GIL, so their time stays flat, processes
+# can only win with spare cores. The last line splits the processes' work into what the parent does
+# serially and the slowest side, which is about their time with a core per side.
+#
+# python3 -m benchmarks.bench_process_pricer --levels 50000 --books 4
+
+import argparse
+import os
+import time
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from utils.depth_index import DepthIndex
+from utils.helper import merge_asks, merge_bids
+from utils.process_pricer import ProcessPricer, pack_books, price_side, SIDES
+from utils.synthetic import generate_coinbase_book, generate_gemini_book, random_quantities
+from utils.venues import COINBASE, GEMINI
+
+
+def price_side_in_thread(books, side, quantities):
+    merge = merge_bids if side == 'bids' else merge_asks
+    index = DepthIndex(merge(COINBASE.levels(books['coinbase'], side), GEMINI.levels(books['gemini'], side),
+                             max_quantity=max(quantities)))
+    return index.costs_to_fill(quantities)
+
+
+def run_threads(many, quantities, workers):
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(price_side_in_thread, books, side, quantities) for books in many for side in ('bids', 'asks')]
+        return [future.result() for future in futures]
+
+
+def main(levels, book_count, worker_counts, quotes, repeat):
+    many = [{'coinbase': generate_coinbase_book(levels, seed=seed), 'gemini': generate_gemini_book(max(levels // 20, 1), seed=seed)}
+            for seed in range(book_count)]
+    # up to the whole book, so every level is merged
+    quantities = random_quantities(quotes, levels * 1.0, seed=1)
+
+    print(f"{book_count} books of ~{levels} levels per side, {quotes} quantities, {os.cpu_count()} cores, best of {repeat}")
+    print(f"{'workers':>8} {'threads s':>10} {'processes s':>12} {'speedup':>8}")
+
+    for workers in worker_counts:
+        threads = min(timed(run_threads, many, quantities, workers) for _ in range(repeat))
+
+        with ProcessPricer(workers) as pricer:
+            # starting the processes is not part of the measurement
+            pricer.warm_up()
+            results = pricer.price_many(many, quantities)
+            processes = min(timed(pricer.price_many, many, quantities) for _ in range(repeat))
+        assert [side for result in results for side in result] == run_threads(many, quantities, workers)
+
+        print(f"{workers:>8} {threads:>10.3f} {processes:>12.3f} {threads / processes:>7.2f}x")
+
+    pack = min(timed(pack_only, many, max(quantities)) for _ in range(repeat))
+    shm, layout = pack_books(many, max(quantities))
+    try:
+        slowest = max(timed(price_side, shm.name, book_layout[side], side, quantities) for book_layout in layout for side in SIDES)
+    finally:
+        release(shm)
+    print(f"parent packs in {pack:.3f} s, the slowest side prices in {slowest:.3f} s: "
+          f"about {pack + slowest:.3f} s with {2 * book_count} cores")
+
+
+def pack_only(many, max_quantity):
+    shm, _ = pack_books(many, max_quantity)
+    release(shm)
+
+
+def release(shm):
+    shm.close()
+    shm.unlink()
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark process backed merge and pricing against threads')
+    parser.add_argument('--levels', type=int, default=50000, help='Number of Coinbase levels per side of each book')
+    parser.add_argument('--books', type=int, default=4, help='Number of independent books (products)')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8], help='Worker counts')
+    parser.add_argument('--quotes', type=int, default=100, help='Quantities priced on every book')
+    parser.add_argument('--repeat', type=int, default=3, help='Number of runs, the best one is reported')
+    args = parser.parse_args()
+
+    main(args.levels, args.books, args.workers, args.quotes, args.repeat)
@@ -0,0 +1,88 @@
+# Quote latency of the resident service against a one-shot CLI run, offline.
+# The venues are served by the local stub server with a synthetic book.
+#
+# python3 -m benchmarks.bench_quote_service --levels 50000
+
+import argparse
+import http.client
+import json
+import os
+import subprocess
+import threading
+import time
+import sys
+from decimal import Decimal
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from utils.quote_service import QuoteService, create_server
+from utils.synthetic import generate_coinbase_book, generate_gemini_book
+from utils.venues import get_venues, DEFAULT_VENUES
+from tests.stub_server import StubServer
+
+ROOT = Path(__file__).parent.parent
+
+
+def percentiles(samples):
+    samples = sorted(samples)
+    return samples[len(samples) // 2], samples[int(len(samples) * 0.99)]
+
+
+def main(levels, count):
+    routes = {
+        '/coinbase': json.dumps(generate_coinbase_book(levels)).encode(),
+        '/gemini': json.dumps(generate_gemini_book(max(levels // 20, 1))).encode(),
+    }
+    quantities = [Decimal(i % 100 + 1) / 10 for i in range(count)]
+
+    with StubServer(routes=routes) as stub:
+        apis = {'coinbase': stub.url + '/coinbase', 'gemini': stub.url + '/gemini'}
+
+        # one-shot CLI, what every quote costs today
+        env = dict(os.environ, COINBASE_API=apis['coinbase'], GEMINI_API=apis['gemini'])
+        start = time.perf_counter()
+        subprocess.run([sys.executable, 'ratelimiter.py', '--qty', '10'], cwd=ROOT, env=env, capture_output=True, check=True)
+        cli_time = time.perf_counter() - start
+
+        service = QuoteService(get_venues(DEFAULT_VENUES), apis)
+        start = time.perf_counter()
+        service.refresh()
+        refresh_time = time.perf_counter() - start
+
+    in_process = []
+    for i, quantity in enumerate(quantities):
+        start = time.perf_counter()
+        service.quote('buy' if i % 2 else 'sell', quantity)
+        in_process.append(time.perf_counter() - start)
+
+    server = create_server(service, port=0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host, port = server.server_address
+
+    over_http = []
+    connection = http.client.HTTPConnection(host, port)
+    for i, quantity in enumerate(quantities):
+        start = time.perf_counter()
+        connection.request('GET', f"/quote?side={'buy' if i % 2 else 'sell'}&qty={quantity}")
+        connection.getresponse().read()
+        over_http.append(time.perf_counter() - start)
+    connection.close()
+    server.shutdown()
+
+    print(f"Book: {levels} coinbase levels per side, {count} quotes")
+    print(f"one-shot cli:            {cli_time * 1000:10.1f} ms per quote")
+    print(f"service refresh:         {refresh_time * 1000:10.1f} ms (background, every --interval)")
+    p50, p99 = percentiles(in_process)
+    print(f"in-process quote:        {p50 * 1e6:10.1f} us p50 {p99 * 1e6:10.1f} us p99")
+    p50, p99 = percentiles(over_http)
+    print(f"http quote (keep-alive): {p50 * 1e6:10.1f} us p50 {p99 * 1e6:10.1f} us p99")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark quote latency of the resident service')
+    parser.add_argument('--levels', type=int, default=50000, help='Number of coinbase levels per side')
+    parser.add_argument('--count', type=int, default=2000, help='Number of quotes')
+    args = parser.parse_args()
+
+    main(args.levels, args.count)
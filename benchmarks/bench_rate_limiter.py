@@ -0,0 +1,98 @@
+# Calls per second through the rate limiter from 1 to 32 threads.
+# The budget is large enough that no call is ever limited, so this is the pure overhead of
+# taking a token. legacy is the Decimal + lock implementation this module used to have.
+#
+# python3 -m benchmarks.bench_rate_limiter --calls 200000
+
+import argparse
+import threading
+import time
+import sys
+from decimal import Decimal
+from functools import wraps
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from utils.rate_limiter_dec import rate_limiter, TokenBucketTooEarly
+
+
+def legacy_rate_limiter(capacity: int, tokens_per_minute: float):
+    # the previous utils/rate_limiter_dec.rate_limiter, kept here as the baseline
+    tokens_per_second = Decimal(tokens_per_minute / 60.0)
+
+    def decorator(func):
+        curr_capacity = Decimal(capacity)
+        last_time = None
+        lock = threading.Lock()
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            nonlocal last_time, curr_capacity
+
+            with lock:
+                now = time.monotonic()
+                if last_time is not None:
+                    time_elapsed = Decimal(now - last_time)
+                    curr_capacity = min(Decimal(capacity), curr_capacity + tokens_per_second * time_elapsed)
+
+                if curr_capacity < Decimal(1):
+                    raise TokenBucketTooEarly("Insufficient tokens. Rate limit exceeded.")
+
+                curr_capacity -= Decimal(1)
+                last_time = now
+
+            return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+LIMITERS = {
+    'legacy': lambda capacity, rate: legacy_rate_limiter(capacity, rate),
+    'int ns': lambda capacity, rate: rate_limiter(capacity, rate),
+    'batch 64': lambda capacity, rate: rate_limiter(capacity, rate, batch=64),
+}
+
+
+def run(limiter, threads, calls):
+    # 10**9 tokens a second, nothing is ever limited
+    @limiter(10**9, 60e9)
+    def noop():
+        pass
+
+    per_thread = calls // threads
+    barrier = threading.Barrier(threads + 1)
+
+    def worker():
+        barrier.wait()
+        for _ in range(per_thread):
+            noop()
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    for worker_thread in workers:
+        worker_thread.start()
+
+    barrier.wait()
+    start = time.perf_counter()
+    for worker_thread in workers:
+        worker_thread.join()
+    return per_thread * threads / (time.perf_counter() - start)
+
+
+def main(calls, thread_counts, repeat):
+    print(f"{calls} calls split across the threads, best of {repeat}, calls/sec")
+    print(f"{'threads':>8}" + "".join(f"{name:>14}" for name in LIMITERS))
+
+    for threads in thread_counts:
+        row = [max(run(limiter, threads, calls) for _ in range(repeat)) for limiter in LIMITERS.values()]
+        print(f"{threads:>8}" + "".join(f"{rate:>14,.0f}" for rate in row))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark rate limiter overhead under thread contention')
+    parser.add_argument('--calls', type=int, default=200000, help='Total calls per run')
+    parser.add_argument('--threads', type=int, nargs='+', default=[1, 2, 4, 8, 16, 32], help='Thread counts')
+    parser.add_argument('--repeat', type=int, default=3, help='Number of runs, the best one is reported')
+    args = parser.parse_args()
+
+    main(args.calls, args.threads, args.repeat)
@@ -0,0 +1,50 @@
+# Fill plan with venue tags and fees against the plain merge and fill, on the same books.
+# Both are bounded by the quantity like the CLIs, so the deep quantities are the ones to watch.
+#
+# python3 -m benchmarks.bench_routing --levels 100000
+
+import argparse
+import time
+import sys
+from decimal import Decimal
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from utils.helper import merge_asks, calculate_sell_price
+from utils.routing import route_sell
+from utils.synthetic import generate_levels
+
+
+def best_of(func, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main(levels, venue_count, quantities, repeat):
+    asks = {f'venue{seed}': generate_levels(levels, seed=seed)[1] for seed in range(venue_count)}
+    fees = {name: Decimal('0.001') * (index + 1) for index, name in enumerate(asks)}
+
+    print(f"{venue_count} venues x {levels} ask levels, best of {repeat}")
+    print(f"{'qty':>8} {'plain ms':>9} {'plan ms':>8} {'plan+fees ms':>13} {'plan/plain':>11}")
+    for quantity in quantities:
+        plain = best_of(lambda: calculate_sell_price(merge_asks(*asks.values(), max_quantity=quantity), quantity), repeat)
+        plan = best_of(lambda: route_sell(asks, quantity), repeat)
+        with_fees = best_of(lambda: route_sell(asks, quantity, fees), repeat)
+        assert route_sell(asks, quantity).notional == calculate_sell_price(merge_asks(*asks.values()), quantity)
+        print(f"{quantity:>8} {plain * 1e3:>9.2f} {plan * 1e3:>8.2f} {with_fees * 1e3:>13.2f} {plan / plain:>10.2f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark the venue fill plan against the plain fill')
+    parser.add_argument('--levels', type=int, default=100000, help='Number of ask levels per venue')
+    parser.add_argument('--venues', type=int, default=3, help='Number of synthetic venues')
+    parser.add_argument('--qty', type=Decimal, nargs='+', default=[Decimal('1'), Decimal('100'), Decimal('10000'), Decimal('100000')], help='Quantities to price')
+    parser.add_argument('--repeat', type=int, default=5, help='Number of runs, the best one is reported')
+    args = parser.parse_args()
+
+    main(args.levels, args.venues, args.qty, args.repeat)
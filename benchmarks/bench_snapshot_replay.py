@@ -0,0 +1,102 @@
+# Recording size and replay speed of the binary snapshot file against json lines of the same books.
+# The json replay decodes every book and runs the decimal and fixed engines, like a live quote would.
+# The binary replay maps the file and merges the stored ints directly (utils/snapshot_store.py).
+#
+# python3 -m benchmarks.bench_snapshot_replay --snapshots 200 --levels 5000
+
+import argparse
+import json
+import os
+import tempfile
+import time
+import sys
+from decimal import Decimal
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from utils.engines import ENGINES
+from utils.snapshot_store import SnapshotRecorder, replay_quotes
+from utils.synthetic import generate_coinbase_book, generate_gemini_book
+from utils.venues import get_venue
+
+
+def recorded_books(snapshots, levels):
+    # alternating venues, the mid drifting a little between rounds like a live recording
+    books = []
+    for step in range(snapshots):
+        mid = 110000.0 + (step % 50) * 10
+        if step % 2 == 0:
+            books.append(('coinbase', generate_coinbase_book(levels, mid=mid, seed=step, sequence=step)))
+        else:
+            books.append(('gemini', generate_gemini_book(max(levels // 20, 1), mid=mid, seed=step)))
+    return books
+
+
+def replay_json(path, quantities, engine):
+    # same as replay_quotes, from json lines
+    latest = {}
+    rows = []
+    with open(path) as f:
+        for line in f:
+            message = json.loads(line)
+            latest[message['venue']] = message['data']
+            if len(latest) < 2:
+                continue
+            books = [(get_venue(name), data) for name, data in latest.items()]
+            for quantity in quantities:
+                bids = engine.merge_bids(*(venue.levels(data, 'bids') for venue, data in books), max_quantity=quantity)
+                asks = engine.merge_asks(*(venue.levels(data, 'asks') for venue, data in books), max_quantity=quantity)
+                rows.append((engine.calculate_buy_price(bids, quantity), engine.calculate_sell_price(asks, quantity)))
+    return rows
+
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return time.perf_counter() - start, result
+
+
+def main(snapshots, levels, quantities):
+    books = recorded_books(snapshots, levels)
+
+    with tempfile.TemporaryDirectory() as directory:
+        binary_path = os.path.join(directory, 'books.bin')
+        json_path = os.path.join(directory, 'books.jsonl')
+
+        def write_binary():
+            with SnapshotRecorder(binary_path) as recorder:
+                for name, data in books:
+                    recorder.record(name, data, 'BTC-USD')
+
+        def write_json():
+            with open(json_path, 'w') as f:
+                for name, data in books:
+                    f.write(json.dumps({'venue': name, 'product': 'BTC-USD', 'time': time.time_ns(), 'data': data}))
+                    f.write('\n')
+
+        binary_write, _ = timed(write_binary)
+        json_write, _ = timed(write_json)
+
+        print(f"{snapshots} snapshots, {levels} coinbase levels per side, quantities {', '.join(map(str, quantities))}")
+        print(f"{'format':>8} {'MiB':>8} {'write s':>8}")
+        print(f"{'json':>8} {os.path.getsize(json_path) / 2**20:>8.1f} {json_write:>8.2f}")
+        print(f"{'binary':>8} {os.path.getsize(binary_path) / 2**20:>8.1f} {binary_write:>8.2f}")
+
+        binary_time, binary_rows = timed(lambda: list(replay_quotes(binary_path, quantities)))
+        print(f"\n{'replay':>14} {'s':>8} {'quotes/s':>10}")
+        for name in ('decimal', 'fixed'):
+            json_time, json_rows = timed(lambda: replay_json(json_path, quantities, ENGINES[name]))
+            assert json_rows == [(row['buy'], row['sell']) for row in binary_rows]
+            print(f"{'json ' + name:>14} {json_time:>8.2f} {len(json_rows) / json_time:>10,.0f}")
+        print(f"{'binary mmap':>14} {binary_time:>8.2f} {len(binary_rows) / binary_time:>10,.0f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark the binary snapshot file against json lines')
+    parser.add_argument('--snapshots', type=int, default=200, help='Number of recorded books, alternating coinbase and gemini')
+    parser.add_argument('--levels', type=int, default=5000, help='Coinbase levels per side, gemini gets 1/20 of it')
+    parser.add_argument('--qty', type=Decimal, nargs='+', default=[Decimal('1'), Decimal('10'), Decimal('100')], help='Quantities priced at every book')
+    args = parser.parse_args()
+
+    main(args.snapshots, args.levels, args.qty)
@@ -0,0 +1,55 @@
+# Cost of adding and removing a price level deep in a book, at several depths.
+# list is the sorted price list OrderBook used before (bisect, then list insert / del, which shifts
+# every later entry), chunked is SortedPrices (utils/sorted_prices.py). Every change adds a new price
+# at a random depth and removes it again, so the depth stays the same.
+#
+# python3 -m benchmarks.bench_sorted_prices --depths 1000 10000 100000 1000000
+
+import argparse
+import random
+import time
+import sys
+from bisect import bisect_left
+from decimal import Decimal
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from utils.sorted_prices import SortedPrices
+
+
+def sorted_list(prices, changes):
+    for price in changes:
+        prices.insert(bisect_left(prices, price), price)
+        del prices[bisect_left(prices, price)]
+
+
+def chunked(prices, changes):
+    for price in changes:
+        prices.add(price)
+        prices.remove(price)
+
+
+def main(depths, changes):
+    print(f"{'depth':>9} {'list us':>8} {'chunked us':>11}")
+    for depth in depths:
+        # whole cents, the changes land on the half cents in between
+        levels = [Decimal(index) / 100 for index in range(depth)]
+        rng = random.Random(depth)
+        moves = [Decimal(rng.randrange(depth) * 2 + 1) / 200 for _ in range(changes)]
+
+        timings = []
+        for func, prices in ((sorted_list, list(levels)), (chunked, SortedPrices(levels))):
+            start = time.perf_counter()
+            func(prices, moves)
+            timings.append((time.perf_counter() - start) / (2 * changes) * 1e6)
+        print(f"{depth:>9,} {timings[0]:>8.2f} {timings[1]:>11.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark adding and removing price levels in a deep book')
+    parser.add_argument('--depths', type=int, nargs='+', default=[1000, 10000, 100000, 1000000], help='Levels on the side')
+    parser.add_argument('--changes', type=int, default=20000, help='Prices added and removed again at each depth')
+    args = parser.parse_args()
+
+    main(args.depths, args.changes)
@@ -0,0 +1,92 @@
+# Startup cost of the CLIs, and N quotes as N ratelimiter.py runs against one batch_quote.py run.
+# Import times are measured in fresh interpreters, best of --repeat. The heavy modules column lists
+# what the CLI import pulled in that the fetch / quote path does not need up front.
+# The quote runs go against the local stub server, so the network is out of the picture.
+#
+# python3 -m benchmarks.bench_startup --quotes 20
+
+import argparse
+import os
+import subprocess
+import time
+import sys
+from decimal import Decimal
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from tests.stub_server import StubServer
+from utils.batch import sweep
+from utils.helper import merge_asks, calculate_sell_price
+from utils.synthetic import generate_levels
+
+ROOT = Path(__file__).parent.parent
+CLIS = ['ratelimiter', 'ratelimiter_mt', 'ratelimiter_async', 'multi_symbol', 'quote_service', 'backtest', 'batch_quote']
+HEAVY = ['requests', 'numpy', 'asyncio', 'aiohttp', 'http.server', 'multiprocessing']
+
+IMPORT_SCRIPT = """
+import sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(elapsed, ','.join(name for name in {heavy!r} if name in sys.modules))
+"""
+
+
+def import_time(module, repeat):
+    best, heavy = None, ''
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, '-c', IMPORT_SCRIPT.format(module=module, heavy=HEAVY)],
+                                cwd=ROOT, capture_output=True, text=True, check=True).stdout.split()
+        elapsed = float(output[0])
+        heavy = output[1] if len(output) > 1 else '-'
+        best = elapsed if best is None else min(best, elapsed)
+    return best, heavy
+
+
+def wall_time(args, env, stdin=None):
+    start = time.perf_counter()
+    subprocess.run([sys.executable, *args], cwd=ROOT, env=env, input=stdin, capture_output=True, text=True, check=True)
+    return time.perf_counter() - start
+
+
+def main(quotes, repeat, levels):
+    print(f"{'cli':<18} {'import ms':>10}  heavy modules loaded")
+    for module in CLIS:
+        elapsed, heavy = import_time(module, repeat)
+        print(f"{module:<18} {elapsed * 1e3:>10.1f}  {heavy}")
+
+    quantities = [str(Decimal(index + 1) / 4) for index in range(quotes)]
+    with StubServer() as server:
+        env = dict(os.environ, COINBASE_API=server.url + '/coinbase', GEMINI_API=server.url + '/gemini')
+        one_by_one = sum(wall_time(['ratelimiter.py', '--qty', quantity], env) for quantity in quantities)
+        batch = wall_time(['batch_quote.py', '--format', 'csv'], env, stdin="\n".join(quantities))
+
+    print(f"\n{quotes} quantities, both sides, against the stub server")
+    print(f"{'runs':<28} {'s':>8} {'quotes/s':>10}")
+    print(f"{f'{quotes} x ratelimiter.py':<28} {one_by_one:>8.2f} {2 * quotes / one_by_one:>10,.0f}")
+    print(f"{'1 x batch_quote.py':<28} {batch:>8.2f} {2 * quotes / batch:>10,.0f}")
+
+    # in process, the sweep against one calculate call per quantity on a deep book
+    _, asks = generate_levels(levels, seed=1)
+    deep = [Decimal(index + 1) * 10 for index in range(quotes)]
+    start = time.perf_counter()
+    separate = [calculate_sell_price(merge_asks(asks, max_quantity=quantity), quantity) for quantity in deep]
+    separate_time = time.perf_counter() - start
+    start = time.perf_counter()
+    swept = sweep(merge_asks(asks, max_quantity=max(deep)), deep)
+    sweep_time = time.perf_counter() - start
+    assert separate == [swept[quantity][0] for quantity in deep]
+    print(f"\n{levels} ask levels, {quotes} quantities up to {max(deep)}")
+    print(f"{'separate merge + fill':<28} {separate_time * 1e3:>8.2f} ms")
+    print(f"{'one merge + sweep':<28} {sweep_time * 1e3:>8.2f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark CLI startup and batch quoting against one run per quantity')
+    parser.add_argument('--quotes', type=int, default=20, help='Number of quantities to price')
+    parser.add_argument('--repeat', type=int, default=3, help='Fresh interpreters per import time, the best one is reported')
+    parser.add_argument('--levels', type=int, default=100000, help='Ask levels of the synthetic book for the in process comparison')
+    args = parser.parse_args()
+
+    main(args.quotes, args.repeat, args.levels)
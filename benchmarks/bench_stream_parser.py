@@ -0,0 +1,77 @@
+# Time and peak memory to first quote: response.json() against the streaming parser,
+# with and without stopping once the quantity is covered.
+#
+# python3 -m benchmarks.bench_stream_parser --levels 200000
+
+import argparse
+import json
+import time
+import tracemalloc
+import sys
+from decimal import Decimal
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from utils.helper import merge_sorted_bids, calculate_buy_price
+from utils.stream_parser import parse_coinbase_stream, CHUNK_SIZE
+from utils.synthetic import generate_coinbase_book, generate_gemini_book
+
+
+def chunked(body, chunk_size=CHUNK_SIZE):
+    for start in range(0, len(body), chunk_size):
+        yield body[start:start + chunk_size]
+
+
+def quote_full_json(body, gemini_data, quantity):
+    # what get_coinbase_data does today, the body is decoded in one go
+    coinbase_data = json.loads(body)
+    return calculate_buy_price(merge_sorted_bids(coinbase_data['bids'], gemini_data['bids']), quantity)
+
+
+def quote_stream(body, gemini_data, quantity, max_quantity):
+    coinbase_data = parse_coinbase_stream(chunked(body), max_quantity)
+    return calculate_buy_price(merge_sorted_bids(coinbase_data['bids'], gemini_data['bids']), quantity)
+
+
+def measure(func, *args):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func(*args)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak, result
+
+
+def main(levels, quantities):
+    body = json.dumps(generate_coinbase_book(levels), indent=2).encode()
+    gemini_data = generate_gemini_book(max(levels // 20, 1))
+
+    print(f"Snapshot: {levels} levels per side, {len(body) / 1e6:.1f} MB")
+    print(f"{'quantity':>10} {'mode':>16} {'time (ms)':>12} {'peak (MB)':>12}")
+
+    for quantity in quantities:
+        runs = [
+            ('response.json', quote_full_json, (body, gemini_data, quantity)),
+            ('stream', quote_stream, (body, gemini_data, quantity, None)),
+            ('stream + stop', quote_stream, (body, gemini_data, quantity, quantity)),
+        ]
+
+        reference = None
+        for name, func, args in runs:
+            elapsed, peak, result = measure(func, *args)
+            if reference is None:
+                reference = result
+            assert result == reference
+
+            print(f"{quantity:>10} {name:>16} {elapsed * 1000:>12.1f} {peak / 1e6:>12.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark the streaming coinbase parser')
+    parser.add_argument('--levels', type=int, default=200000, help='Number of coinbase levels per side')
+    parser.add_argument('--qty', type=Decimal, nargs='+', default=[Decimal(1), Decimal(10), Decimal(100)], help='Quantities to quote')
+    args = parser.parse_args()
+
+    main(args.levels, args.qty)
@@ -0,0 +1,220 @@
+# Stage by stage benchmark of the quote pipeline on synthetic Coinbase / Gemini shaped books,
+# from 100 to 500k levels per side, with machine readable output to compare across commits.
+#
+# Stages, for every book size:
+#   fetch    both books over http from a local stub server, json decode included
+#   decode   json.loads of both payloads
+#   convert  every (price, size) string of both venues to Decimal
+#   merge    merge_bids + merge_asks of the engine, conversion to its representation included
+#   fill     calculate_buy_price + calculate_sell_price for half of each side
+#
+# Times are the best and the median of --repeat runs. The memory peak is measured on one more run
+# under tracemalloc, kept apart so tracing does not slow down the timed runs.
+#
+# python3 -m benchmarks.harness --json results.json
+# python3 -m benchmarks.harness --json new.json --compare results.json
+
+import argparse
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from decimal import Decimal
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from utils.data_loader import get_coinbase_data, get_gemini_data
+from utils.engines import ENGINES
+from utils.helper import to_decimal_levels
+from utils.synthetic import generate_coinbase_book, generate_gemini_book
+from utils.venues import COINBASE, GEMINI
+from tests.stub_server import StubServer
+
+ROOT = Path(__file__).parent.parent
+DEFAULT_LEVELS = [100, 1000, 10000, 100000, 500000]
+STAGES = ('fetch', 'decode', 'convert', 'merge', 'fill')
+
+# the rate limited loaders would refuse back to back calls, the benchmark measures the fetch itself
+fetch_coinbase = get_coinbase_data.__wrapped__
+fetch_gemini = get_gemini_data.__wrapped__
+
+
+def build_payloads(levels):
+    # gemini books are much shallower than coinbase ones, like the live apis
+    coinbase_body = json.dumps(generate_coinbase_book(levels)).encode()
+    gemini_body = json.dumps(generate_gemini_book(max(levels // 20, 1))).encode()
+    return coinbase_body, gemini_body
+
+
+def materialize(merged):
+    # the generator engines are lazy, walking the result is part of the merge
+    return merged if hasattr(merged, 'cost_to_fill') else list(merged)
+
+
+def half_depth(levels):
+    return sum(Decimal(size) for _, size in levels) / 2
+
+
+def stage_functions(coinbase_body, gemini_body, engine, server):
+    # every stage gets its input ready made, so only the stage itself is measured
+    coinbase_data = json.loads(coinbase_body)
+    gemini_data = json.loads(gemini_body)
+
+    def levels(side):
+        return COINBASE.levels(coinbase_data, side), GEMINI.levels(gemini_data, side)
+
+    bid_quantity = half_depth(COINBASE.levels(coinbase_data, 'bids'))
+    ask_quantity = half_depth(COINBASE.levels(coinbase_data, 'asks'))
+    merged_bids = materialize(engine.merge_bids(*levels('bids')))
+    merged_asks = materialize(engine.merge_asks(*levels('asks')))
+
+    def fetch():
+        fetch_coinbase(server.url + '/coinbase')
+        fetch_gemini(server.url + '/gemini')
+
+    def decode():
+        json.loads(coinbase_body)
+        json.loads(gemini_body)
+
+    def convert():
+        for side in ('bids', 'asks'):
+            for venue_levels in levels(side):
+                list(to_decimal_levels(venue_levels))
+
+    def merge():
+        materialize(engine.merge_bids(*levels('bids')))
+        materialize(engine.merge_asks(*levels('asks')))
+
+    def fill():
+        # same convention as the CLIs, buying is priced off the bids and selling off the asks
+        engine.calculate_buy_price(merged_bids if hasattr(merged_bids, 'cost_to_fill') else iter(merged_bids), bid_quantity)
+        engine.calculate_sell_price(merged_asks if hasattr(merged_asks, 'cost_to_fill') else iter(merged_asks), ask_quantity)
+
+    return {'fetch': fetch, 'decode': decode, 'convert': convert, 'merge': merge, 'fill': fill}
+
+
+def measure(func, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return min(times), statistics.median(times), peak
+
+
+def git_revision():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=ROOT, capture_output=True, text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=ROOT, capture_output=True, text=True).stdout.strip())
+        return commit, dirty
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+
+
+def run(levels_list, engines, stages, repeat):
+    commit, dirty = git_revision()
+    report = {
+        'meta': {
+            'commit': commit,
+            'dirty': dirty,
+            'time': datetime.now(timezone.utc).isoformat(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'repeat': repeat,
+        },
+        'results': [],
+    }
+
+    for levels in levels_list:
+        coinbase_body, gemini_body = build_payloads(levels)
+        with StubServer({'/coinbase': coinbase_body, '/gemini': gemini_body}) as server:
+            for engine_name in engines:
+                functions = stage_functions(coinbase_body, gemini_body, ENGINES[engine_name], server)
+                for stage in stages:
+                    # fetch, decode and convert do not depend on the engine, they are measured once
+                    if stage in ('fetch', 'decode', 'convert') and engine_name != engines[0]:
+                        continue
+                    best, median, peak = measure(functions[stage], repeat)
+                    report['results'].append({
+                        'levels': levels,
+                        'engine': engine_name if stage in ('merge', 'fill') else '-',
+                        'stage': stage,
+                        'best_s': best,
+                        'median_s': median,
+                        'peak_bytes': peak,
+                    })
+    return report
+
+
+def result_key(result):
+    return result['levels'], result['engine'], result['stage']
+
+
+def compare(report, baseline, threshold):
+    # (key, baseline best, new best, ratio) for every result in both, and the keys that got slower
+    old = {result_key(result): result for result in baseline['results']}
+    rows = []
+    regressions = []
+    for result in report['results']:
+        key = result_key(result)
+        if key not in old:
+            continue
+        ratio = result['best_s'] / old[key]['best_s'] if old[key]['best_s'] else float('inf')
+        rows.append((key, old[key]['best_s'], result['best_s'], ratio))
+        if ratio > 1 + threshold:
+            regressions.append(key)
+    return rows, regressions
+
+
+def print_report(report):
+    print(f"{'levels':>8} {'engine':>8} {'stage':>8} {'best ms':>10} {'median ms':>10} {'peak KiB':>10}")
+    for result in report['results']:
+        print(f"{result['levels']:>8} {result['engine']:>8} {result['stage']:>8} {result['best_s'] * 1e3:>10.2f} "
+              f"{result['median_s'] * 1e3:>10.2f} {result['peak_bytes'] / 1024:>10.1f}")
+
+
+def print_comparison(rows, threshold):
+    print(f"{'levels':>8} {'engine':>8} {'stage':>8} {'old ms':>10} {'new ms':>10} {'ratio':>7}")
+    for (levels, engine, stage), old, new, ratio in rows:
+        flag = '  slower' if ratio > 1 + threshold else ''
+        print(f"{levels:>8} {engine:>8} {stage:>8} {old * 1e3:>10.2f} {new * 1e3:>10.2f} {ratio:>6.2f}x{flag}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark every stage of the quote pipeline on synthetic books')
+    parser.add_argument('--levels', type=int, nargs='+', default=DEFAULT_LEVELS, help='Coinbase levels per side, gemini gets 1/20 of it')
+    parser.add_argument('--engines', nargs='+', choices=sorted(ENGINES), default=['decimal'], help='Engines for the merge and fill stages')
+    parser.add_argument('--stages', nargs='+', choices=STAGES, default=list(STAGES), help='Stages to run')
+    parser.add_argument('--repeat', type=int, default=5, help='Timed runs per stage')
+    parser.add_argument('--json', help='Write the results to this file')
+    parser.add_argument('--compare', help='Results file of an earlier run to compare against')
+    parser.add_argument('--threshold', type=float, default=0.10, help='Slowdown ratio reported as a regression')
+    parser.add_argument('--fail-on-regression', action='store_true', help='Exit with 1 when a stage got slower than the threshold')
+    args = parser.parse_args()
+
+    report = run(args.levels, args.engines, args.stages, args.repeat)
+    print_report(report)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        print(f"\ncompared with {baseline['meta'].get('commit')}")
+        rows, regressions = compare(report, baseline, args.threshold)
+        print_comparison(rows, args.threshold)
+        if regressions and args.fail_on_regression:
+            exit(1)
@@ -0,0 +1,55 @@
+# Multi-symbol quotes.
+# Fetches every product from every venue within each venue's rate budget, merges and prices
+# each product as soon as its books are in, and prints buy/sell costs per product and quantity:
+#
+#   python3 multi_symbol.py --products BTC-USD ETH-USD SOL-USD --qty 1 10
+
+
+from dotenv import load_dotenv
+import argparse
+from decimal import Decimal
+
+from utils.multi_symbol import quote_products, format_table
+from utils.venues import VENUES, DEFAULT_VENUES, DEFAULT_PRODUCT, get_venues
+
+
+# loads the environment variables from the .env file
+load_dotenv()
+
+
+def main(products, quantities, venue_names=DEFAULT_VENUES, workers=4, processes=0):
+    venues = get_venues(venue_names)
+
+    print("Fetching", ", ".join(products), "from", " and ".join(venue.display_name for venue in venues))
+    if processes:
+        # multiprocessing is only imported when it is used
+        from utils.process_pricer import ProcessPricer
+        with ProcessPricer(processes) as pricer:
+            rows = quote_products(venues, products, quantities, max_workers=workers, pricer=pricer)
+    else:
+        rows = quote_products(venues, products, quantities, max_workers=workers)
+    print(format_table(rows))
+
+    if any(row['error'] is not None for row in rows):
+        exit(1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+                    prog='Orderbook Multi-Symbol Analyzer',
+                    formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+                    description='Prints the cost to buy/sell each quantity of several products across the venues')
+
+    parser.add_argument('--products', nargs='+', default=[DEFAULT_PRODUCT], help='Products as BASE-QUOTE, e.g. BTC-USD ETH-USD')
+    parser.add_argument('--qty', type=Decimal, nargs='+', default=[Decimal(10)], help='Quantities of each product to buy/sell')
+    parser.add_argument('--venues', nargs='+', choices=sorted(VENUES), default=DEFAULT_VENUES, help='Venues to aggregate')
+    parser.add_argument('--workers', type=int, default=4, help='Threads merging and pricing the products')
+    parser.add_argument('--processes', type=int, default=0, help='Merge and price in this many worker processes instead of the threads')
+
+    args = parser.parse_args()
+
+    if any(quantity <= Decimal(0) for quantity in args.qty):
+        print("Error: Quantity must be positive")
+        exit(1)
+
+    main(args.products, args.qty, args.venues, args.workers, args.processes)
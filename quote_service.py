@@ -0,0 +1,72 @@
+# Resident quote service.
+# Keeps the aggregated book in memory, refreshes it every --interval seconds within the
+# venue rate limits, and answers quotes over a local http endpoint:
+#
+#   curl 'http://127.0.0.1:8080/quote?side=buy&qty=10'
+#   curl 'http://127.0.0.1:8080/status'
+#   curl 'http://127.0.0.1:8080/metrics'    (with --metrics)
+
+
+from dotenv import load_dotenv
+import os
+import argparse
+
+from utils.metrics import METRICS
+from utils.quote_service import QuoteService, create_server
+from utils.snapshot_store import SnapshotRecorder
+from utils.venues import VENUES, DEFAULT_VENUES, get_venues
+
+
+# loads the environment variables from the .env file
+load_dotenv()
+
+
+def main(host, port, interval, venue_names=DEFAULT_VENUES, record=None, compact=False):
+    venues = get_venues(venue_names)
+    apis = {venue.name: os.getenv(venue.api_env) for venue in venues}
+
+    recorder = SnapshotRecorder(record) if record else None
+    service = QuoteService(venues, apis, interval=interval, recorder=recorder, compact=compact)
+
+    print("Loading the first book")
+    try:
+        service.refresh()
+    except Exception as e:
+        print("Error: ", e)
+        exit(1)
+
+    service.start()
+    server = create_server(service, host, port)
+    print(f"Serving quotes on http://{host}:{port}/quote?side=buy&qty=10")
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.stop()
+        if recorder is not None:
+            recorder.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+                    prog='Orderbook Quote Service',
+                    formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+                    description='Keeps the aggregated orderbook in memory and serves buy/sell quotes over http')
+
+    parser.add_argument('--host', default='127.0.0.1', help='Address to listen on')
+    parser.add_argument('--port', type=int, default=8080, help='Port to listen on')
+    parser.add_argument('--interval', type=float, default=2.0, help='Seconds between book refreshes')
+    parser.add_argument('--venues', nargs='+', choices=sorted(VENUES), default=DEFAULT_VENUES, help='Venues to aggregate')
+    parser.add_argument('--metrics', action='store_true', help='Time the fetches, merges, quotes and rate limit waits, served on /metrics')
+    parser.add_argument('--record', help='Append every refreshed book to this snapshot file (replay it with backtest.py)')
+    parser.add_argument('--compact', action='store_true', help='Hold the book in int64 arrays, a fraction of the memory at a lower quote rate')
+
+    args = parser.parse_args()
+
+    if args.metrics:
+        METRICS.enable()
+
+    main(args.host, args.port, args.interval, args.venues, args.record, args.compact)
@@ -7,90 +7,87 @@
 
 
 from dotenv import load_dotenv
-import os
 import argparse
 from decimal import Decimal
 
-from utils.data_loader import get_coinbase_data, get_gemini_data
-from utils.helper import merge_sorted_asks, merge_sorted_bids, calculate_buy_price, calculate_sell_price
+from utils.engines import ENGINES, get_engine
+from utils.metrics import METRICS
+from utils.routing import route_buy, route_sell, venue_fees, format_plan
+from utils.snapshot_store import SnapshotRecorder
+from utils.venues import VENUES, DEFAULT_VENUES, DEFAULT_PRODUCT, base_asset, get_venues
 
 
 # loads the environment variables from the .env file
 load_dotenv()
 
-COINBASE_API = os.getenv("COINBASE_API")
-GEMINI_API = os.getenv("GEMINI_API")
 
-
-def main(quantity):
-
-    # getting the data from coinbase and gemini
-    print("Fetching data from Coinbase data")
-    coinbase_data = get_coinbase_data(COINBASE_API)
-    
-    if coinbase_data is None:
-        print("Error: Failed to fetch data from Coinbase")
-        exit(1)
-    
-    if 'bids' not in coinbase_data or 'asks' not in coinbase_data:
-        print("Error: No bids or asks found in Coinbase")
-        exit(1)
-
-    if len(coinbase_data['bids']) == 0 or len(coinbase_data['asks']) == 0:
-        print("Error: No bids or asks found in Coinbase")
-        exit(1)
-    
-    print("Fetching data from Gemini data")
-    gemini_data = get_gemini_data(GEMINI_API)
-    if gemini_data is None:
-        print("Error: Failed to fetch data from Gemini")
-        exit(1)
-
-    if 'bids' not in gemini_data or 'asks' not in gemini_data:
-        print("Error: No bids or asks found in Gemini")
-        exit(1)
-
-    if len(gemini_data['bids']) == 0 or len(gemini_data['asks']) == 0:
-        print("Error: No bids or asks found in Gemini")
-        exit(1)
-    
-    # print(gemini_data)
-    print("Loaded the data successfully from Coinbase and Gemini")
+def main(quantity, engine_name='decimal', stream=False, venue_names=DEFAULT_VENUES, product=None, recorder=None, route=False):
+    engine = get_engine(engine_name)
+    venues = get_venues(venue_names)
+    # without a product the COINBASE_API / GEMINI_API urls are used, and those are BTC-USD
+    asset = base_asset(product or DEFAULT_PRODUCT)
+    # when streaming, coinbase levels past the requested quantity are never parsed
+    max_quantity = quantity if stream else None
+
+    # getting the data from every venue
+    books = {}
+    for venue in venues:
+        print(f"Fetching data from {venue.display_name} data")
+        data = venue.fetch(venue.api_url(product), stream=stream, max_quantity=max_quantity)
+
+        try:
+            venue.validate(data)
+        except ValueError as e:
+            print(f"Error: {e}")
+            exit(1)
+
+        books[venue] = data
+        if recorder is not None:
+            recorder.record(venue.name, data, product or DEFAULT_PRODUCT)
+        METRICS.annotate(**{f'{venue.name}_levels': len(data['bids']) + len(data['asks'])})
+
+    print("Loaded the data successfully from", " and ".join(venue.display_name for venue in venues))
     print("Some status about the data")
-    print("Coinbase bids: ", len(coinbase_data['bids']))
-    print("Coinbase asks: ", len(coinbase_data['asks']))
-    print("Gemini bids: ", len(gemini_data['bids']))
-    print("Gemini asks: ", len(gemini_data['asks']))
+    for venue, data in books.items():
+        print(f"{venue.display_name} bids: ", len(data['bids']))
+        print(f"{venue.display_name} asks: ", len(data['asks']))
     print("--------------------------------")
 
-    # print("Some sample data from the data")
-    # print("--------------------------------")
-    # print("Coinbase")
-    # print("Coinbase bids: ", coinbase_data['bids'][0:5])
-    # print("Coinbase asks: ", coinbase_data['asks'][0:5])
-    # print("--------------------------------")
-    # print("Gemini")
-    # print("Gemini bids: ", gemini_data['bids'][0:5])
-    # print("Gemini asks: ", gemini_data['asks'][0:5])
-
     print("Matching the bids and asks for quantity: ", quantity)
-    merged_asks = merge_sorted_asks(coinbase_data['asks'], gemini_data['asks'])
-    # print("Merged asks: ", merged_asks)
-    merged_bids = merge_sorted_bids(coinbase_data['bids'], gemini_data['bids'])
-    # print("Merged bids: ", merged_bids)
+
+    if route:
+        # per venue breakdown, with the taker fees in the ranking
+        fees = venue_fees(venues)
+        for label, route_side, side in (('buy', route_buy, 'bids'), ('sell', route_sell, 'asks')):
+            with METRICS.span('fill', side=label):
+                plan = route_side({venue.name: venue.levels(data, side) for venue, data in books.items()}, quantity, fees)
+            METRICS.annotate(**{label: plan.total})
+            print(f"To {label} {quantity} {asset}: ${plan.total:,.2f} (${plan.notional:,.2f} before ${plan.fees:,.2f} fees)")
+            print(format_plan(plan))
+        return
+    # levels deeper than the quantity are never converted or merged.
+    # the decimal and fixed merges are lazy, most of their work shows up in the fill spans
+    with METRICS.span('merge', side='asks'):
+        merged_asks = engine.merge_asks(*(venue.levels(data, 'asks') for venue, data in books.items()), max_quantity=quantity)
+    with METRICS.span('merge', side='bids'):
+        merged_bids = engine.merge_bids(*(venue.levels(data, 'bids') for venue, data in books.items()), max_quantity=quantity)
 
     # buy caculation
     try:
-        buy_price = calculate_buy_price(merged_bids, quantity)
-        print(f"To buy {quantity} BTC: ${buy_price:,.2f}")
+        with METRICS.span('fill', side='buy'):
+            buy_price = engine.calculate_buy_price(merged_bids, quantity)
+        METRICS.annotate(buy=buy_price)
+        print(f"To buy {quantity} {asset}: ${buy_price:,.2f}")
     except Exception as e:
         print("Error: ", e)
         exit(1)
 
     # sell calculation
     try:
-        sell_price = calculate_sell_price(merged_asks, quantity)
-        print(f"To sell {quantity} BTC: ${sell_price:,.2f}")
+        with METRICS.span('fill', side='sell'):
+            sell_price = engine.calculate_sell_price(merged_asks, quantity)
+        METRICS.annotate(sell=sell_price)
+        print(f"To sell {quantity} {asset}: ${sell_price:,.2f}")
     except Exception as e:
         print("Error: ", e)
         exit(1)
@@ -103,7 +100,14 @@ if __name__ == "__main__":
                     description='This program analyzes the orderbook price and prints the best bid and ask price',
                     epilog='This is a simple program to analyze the orderbook price and print the best bid and ask price')
 
-    parser.add_argument('--qty',type=Decimal, default=Decimal(10.0),help='Quantity of BTC to buy/sell')
+    parser.add_argument('--qty',type=Decimal, default=Decimal(10.0),help='Quantity of the product to buy/sell')
+    parser.add_argument('--product', help='Product as BASE-QUOTE (e.g. ETH-USD) fetched from the venue url templates, instead of the COINBASE_API / GEMINI_API urls')
+    parser.add_argument('--engine', choices=sorted(ENGINES), default='decimal', help='Merge and pricing engine')
+    parser.add_argument('--stream', action='store_true', help='Parse the Coinbase book from the response stream and stop once --qty is covered')
+    parser.add_argument('--venues', nargs='+', choices=sorted(VENUES), default=DEFAULT_VENUES, help='Venues to aggregate')
+    parser.add_argument('--metrics', action='store_true', help='Time every stage and write one json line per quote to stderr')
+    parser.add_argument('--record', help='Append every fetched book to this snapshot file (replay it with backtest.py)')
+    parser.add_argument('--route', action='store_true', help='Print the fill per venue, ranked after the COINBASE_TAKER_FEE / GEMINI_TAKER_FEE taker fees')
 
     args = parser.parse_args()
 
@@ -111,4 +115,8 @@ if __name__ == "__main__":
         print("Error: Quantity must be positive")
         exit(1)
 
-    main(args.qty)
+    if args.metrics:
+        METRICS.enable()
+    recorder = SnapshotRecorder(args.record) if args.record else None
+    with METRICS.trace(product=args.product or DEFAULT_PRODUCT, quantity=args.qty, engine=args.engine):
+        main(args.qty, args.engine, args.stream, args.venues, args.product, recorder, args.route)
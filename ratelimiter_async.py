@@ -0,0 +1,108 @@
+# Async version of ratelimiter_mt.py.
+# Both venues are fetched concurrently over one pooled aiohttp session, and merge/pricing run
+# right after on the event loop, no thread hops. With --loop it keeps quoting on the same
+# connections every --interval seconds.
+
+
+from dotenv import load_dotenv
+import argparse
+import asyncio
+from decimal import Decimal
+
+from utils.async_loader import create_session, fetch_all
+from utils.engines import ENGINES, get_engine
+from utils.metrics import METRICS, serve_metrics
+from utils.rate_limiter_dec import TokenBucketTooEarly
+from utils.snapshot_store import SnapshotRecorder
+from utils.venues import VENUES, DEFAULT_VENUES, DEFAULT_PRODUCT, base_asset, get_venues
+
+
+# loads the environment variables from the .env file
+load_dotenv()
+
+
+async def quote(session, quantity, engine, venues, apis, timeouts=None, recorder=None, product=None):
+    books = await fetch_all(session, venues, apis, timeouts)
+    for venue in venues:
+        venue.validate(books[venue.name])
+        if recorder is not None:
+            recorder.record(venue.name, books[venue.name], product or DEFAULT_PRODUCT)
+
+    # the decimal and fixed merges are lazy, most of their work shows up in the fill spans
+    with METRICS.span('merge', side='bids'):
+        merged_bids = engine.merge_bids(*(venue.levels(books[venue.name], 'bids') for venue in venues), max_quantity=quantity)
+    with METRICS.span('merge', side='asks'):
+        merged_asks = engine.merge_asks(*(venue.levels(books[venue.name], 'asks') for venue in venues), max_quantity=quantity)
+
+    with METRICS.span('fill', side='buy'):
+        buy_price = engine.calculate_buy_price(merged_bids, quantity)
+    with METRICS.span('fill', side='sell'):
+        sell_price = engine.calculate_sell_price(merged_asks, quantity)
+    METRICS.annotate(buy=buy_price, sell=sell_price)
+    return buy_price, sell_price
+
+
+async def main(quantity, engine_name='decimal', loop=False, interval=2.0, timeout=5.0, venue_names=DEFAULT_VENUES, product=None,
+               recorder=None):
+    engine = get_engine(engine_name)
+    venues = get_venues(venue_names)
+    # without a product the COINBASE_API / GEMINI_API urls are used, and those are BTC-USD
+    asset = base_asset(product or DEFAULT_PRODUCT)
+    apis = {venue.name: venue.api_url(product) for venue in venues}
+    timeouts = {venue.name: timeout for venue in venues}
+
+    async with create_session() as session:
+        while True:
+            try:
+                # one json line per round with --metrics, the rejected and failed ones included
+                with METRICS.trace(product=product or DEFAULT_PRODUCT, quantity=quantity, engine=engine_name):
+                    buy_price, sell_price = await quote(session, quantity, engine, venues, apis, timeouts, recorder, product)
+                print(f"To buy {quantity} {asset}: ${buy_price:,.2f}")
+                print(f"To sell {quantity} {asset}: ${sell_price:,.2f}")
+            except TokenBucketTooEarly as e:
+                # the interval is shorter than the rate limit allows, skip this round
+                if not loop:
+                    print("Error: ", e)
+                    exit(1)
+                print("Skipped: ", e)
+            except Exception as e:
+                print("Error: ", e)
+                if not loop:
+                    exit(1)
+
+            if not loop:
+                break
+            await asyncio.sleep(interval)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+                    prog='Orderbook Price Analyzer',
+                    formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+                    description='This program analyzes the orderbook price and prints the best bid and ask price',
+                    epilog='This is a simple program to analyze the orderbook price and print the best bid and ask price')
+
+    parser.add_argument('--qty',type=Decimal, default=Decimal(10.0),help='Quantity of the product to buy/sell')
+    parser.add_argument('--product', help='Product as BASE-QUOTE (e.g. ETH-USD) fetched from the venue url templates, instead of the COINBASE_API / GEMINI_API urls')
+    parser.add_argument('--engine', choices=sorted(ENGINES), default='decimal', help='Merge and pricing engine')
+    parser.add_argument('--loop', action='store_true', help='Keep quoting every --interval seconds')
+    parser.add_argument('--interval', type=float, default=2.0, help='Seconds between quotes with --loop')
+    parser.add_argument('--timeout', type=float, default=5.0, help='Seconds each venue gets to respond')
+    parser.add_argument('--venues', nargs='+', choices=sorted(VENUES), default=DEFAULT_VENUES, help='Venues to aggregate')
+    parser.add_argument('--metrics', action='store_true', help='Time every stage and write one json line per quote to stderr')
+    parser.add_argument('--metrics-port', type=int, help='Serve the stage histograms on http://127.0.0.1:PORT/metrics (implies --metrics)')
+    parser.add_argument('--record', help='Append every fetched book to this snapshot file (replay it with backtest.py)')
+
+    args = parser.parse_args()
+
+    if args.qty <= Decimal(0):
+        print("Error: Quantity must be positive")
+        exit(1)
+
+    if args.metrics or args.metrics_port:
+        METRICS.enable()
+    if args.metrics_port:
+        serve_metrics(args.metrics_port)
+
+    recorder = SnapshotRecorder(args.record) if args.record else None
+    asyncio.run(main(args.qty, args.engine, args.loop, args.interval, args.timeout, args.venues, args.product, recorder))
@@ -7,86 +7,103 @@
 
 
 from dotenv import load_dotenv
-import os
 import argparse
 from decimal import Decimal
 from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextvars import copy_context
 
-from utils.data_loader import get_coinbase_data, get_gemini_data
-from utils.helper import merge_sorted_asks, merge_sorted_bids, calculate_buy_price, calculate_sell_price
+from utils.engines import ENGINES, get_engine
+from utils.hedging import LastGoodBooks, fetch_books, parse_budgets
+from utils.metrics import METRICS
+from utils.snapshot_store import SnapshotRecorder
+from utils.venues import VENUES, DEFAULT_VENUES, DEFAULT_PRODUCT, base_asset, get_venues
 
 
 # loads the environment variables from the .env file
 load_dotenv()
 
-COINBASE_API = os.getenv("COINBASE_API")
-GEMINI_API = os.getenv("GEMINI_API")
 
-
-def main(quantity):
-    print("Fetching Coinbase and Gemini Data")
-    coinbase_data = None
-    gemini_data = None
-
-    with ThreadPoolExecutor(max_workers=2) as executor:
-        coinbase_future = executor.submit(get_coinbase_data, COINBASE_API)
-        gemini_future = executor.submit(get_gemini_data, GEMINI_API)
-
-
-        for future in as_completed([coinbase_future, gemini_future]):
-            try:
-                data = future.result()
-
-                if future is coinbase_future:
-                    print("Coinbase data fetched successfully")
-                    coinbase_data = data
-                else:
-                    print("Gemini data fetched successfully")
-                    gemini_data = data
-            except Exception as e:
-                print("Error : ", e)
-                exit(1)
-    
-    if coinbase_data is None:
-        print("Error: Failed to fetch data from Coinbase")
-        exit(1)
-    
-    if 'bids' not in coinbase_data or 'asks' not in coinbase_data:
-        print("Error: No bids or asks found in Coinbase")
-        exit(1)
-
-    if len(coinbase_data['bids']) == 0 or len(coinbase_data['asks']) == 0:
-        print("Error: No bids or asks found in Coinbase")
-        exit(1)
-    
-    if gemini_data is None:
-        print("Error: Failed to fetch data from Gemini")
+def timed(stage, side, func, *args, **kwargs):
+    with METRICS.span(stage, side=side):
+        return func(*args, **kwargs)
+
+
+def submit(executor, func, *args, **kwargs):
+    # every task runs in a copy of this context, so its spans land in the quote's trace
+    return executor.submit(copy_context().run, func, *args, **kwargs)
+
+
+def main(quantity, engine_name='decimal', stream=False, venue_names=DEFAULT_VENUES, product=None, processes=0, recorder=None,
+         budgets=None, hedge_after=None, last_good=None, max_age=None):
+    engine = get_engine(engine_name)
+    venues = get_venues(venue_names)
+    # without a product the COINBASE_API / GEMINI_API urls are used, and those are BTC-USD
+    asset = base_asset(product or DEFAULT_PRODUCT)
+    # when streaming, coinbase levels past the requested quantity are never parsed
+    max_quantity = quantity if stream else None
+
+    print("Fetching", " and ".join(venue.display_name for venue in venues), "Data")
+
+    # every venue within its latency budget, hedged when it is slow. a venue that still misses
+    # is priced from its last good book, or left out, instead of failing the whole quote
+    results = fetch_books(venues, {venue.name: venue.api_url(product) for venue in venues}, budgets, hedge_after,
+                          last_good, max_age, stream=stream, max_quantity=max_quantity)
+
+    # keeping the venue order stable for the merge and the stats below
+    books = {}
+    for venue in venues:
+        result = results[venue]
+        if result.data is None:
+            print(f"Warning: {venue.display_name} left out of the quote: {result.error}")
+            continue
+        if result.stale:
+            print(f"Warning: {venue.display_name} priced from its last good book, {result.age:.1f} seconds old: {result.error}")
+            METRICS.annotate(**{f'{venue.name}_age': result.age})
+        else:
+            hedged = f" ({result.attempts} requests)" if result.attempts > 1 else ""
+            print(f"{venue.display_name} data fetched successfully{hedged}")
+        books[venue] = result.data
+
+    if not books:
+        print("Error: no venue could be priced")
         exit(1)
 
-    if 'bids' not in gemini_data or 'asks' not in gemini_data:
-        print("Error: No bids or asks found in Gemini")
-        exit(1)
+    if recorder is not None:
+        for venue, data in books.items():
+            # stale books are in the file already
+            if not results[venue].stale:
+                recorder.record(venue.name, data, product or DEFAULT_PRODUCT)
 
-    if len(gemini_data['bids']) == 0 or len(gemini_data['asks']) == 0:
-        print("Error: No bids or asks found in Gemini")
-        exit(1)
-    
-    # print(gemini_data)
-    print("Loaded the data successfully from Coinbase and Gemini")
+    print("Loaded the data successfully from", " and ".join(venue.display_name for venue in books))
     print("Some status about the data")
-    print("Coinbase bids: ", len(coinbase_data['bids']))
-    print("Coinbase asks: ", len(coinbase_data['asks']))
-    print("Gemini bids: ", len(gemini_data['bids']))
-    print("Gemini asks: ", len(gemini_data['asks']))
+    for venue, data in books.items():
+        print(f"{venue.display_name} bids: ", len(data['bids']))
+        print(f"{venue.display_name} asks: ", len(data['asks']))
     print("--------------------------------")
 
+    if processes:
+        # the merge and pricing are CPU bound, worker processes run the two sides truly in parallel.
+        # they price exactly, the same totals as every engine
+        print("Merging and pricing in", processes, "processes")
+        # multiprocessing is only imported when it is used
+        from utils.process_pricer import ProcessPricer
+        with ProcessPricer(processes) as pricer:
+            # merge and fill run in the workers, timed here as one stage
+            with METRICS.span('price', mode='processes'):
+                (buy_price,), (sell_price,) = pricer.price({venue.name: data for venue, data in books.items()}, [quantity])
+        METRICS.annotate(buy=buy_price, sell=sell_price)
+        print(f"To buy {quantity} {asset}: ${buy_price:,.2f}")
+        print(f"To sell {quantity} {asset}: ${sell_price:,.2f}")
+        return
+
     print("Merging the dataset")
     merged_asks = None
     merged_bids = None
 
     with ThreadPoolExecutor(max_workers=2) as executor:
-        merged_asks_future = executor.submit(merge_sorted_asks, coinbase_data['asks'], gemini_data['asks'])
-        merged_bids_future = executor.submit(merge_sorted_bids, coinbase_data['bids'], gemini_data['bids'])
+        # the decimal and fixed merges are lazy, most of their work shows up in the fill spans
+        merged_asks_future = submit(executor, timed, 'merge', 'asks', engine.merge_asks, *(venue.levels(data, 'asks') for venue, data in books.items()), max_quantity=quantity)
+        merged_bids_future = submit(executor, timed, 'merge', 'bids', engine.merge_bids, *(venue.levels(data, 'bids') for venue, data in books.items()), max_quantity=quantity)
 
 
         for future in as_completed([merged_asks_future, merged_bids_future]):
@@ -101,16 +118,18 @@ def main(quantity):
 
     # buy caculation
     with ThreadPoolExecutor(max_workers=2) as executor:
-        calculate_bids_future = executor.submit(calculate_buy_price, merged_bids, quantity)
-        calculate_asks_future = executor.submit(calculate_sell_price, merged_asks, quantity)
+        calculate_bids_future = submit(executor, timed, 'fill', 'buy', engine.calculate_buy_price, merged_bids, quantity)
+        calculate_asks_future = submit(executor, timed, 'fill', 'sell', engine.calculate_sell_price, merged_asks, quantity)
 
         for future in as_completed([calculate_bids_future, calculate_asks_future]):
             data = future.result()
 
             if future is calculate_bids_future:
-                print(f"To buy {quantity} BTC: ${data:,.2f}")
+                METRICS.annotate(buy=data)
+                print(f"To buy {quantity} {asset}: ${data:,.2f}")
             else:
-                print(f"To sell {quantity} BTC: ${data:,.2f}")        
+                METRICS.annotate(sell=data)
+                print(f"To sell {quantity} {asset}: ${data:,.2f}")        
     
 
 if __name__ == "__main__":
@@ -120,7 +139,18 @@ if __name__ == "__main__":
                     description='This program analyzes the orderbook price and prints the best bid and ask price',
                     epilog='This is a simple program to analyze the orderbook price and print the best bid and ask price')
 
-    parser.add_argument('--qty',type=Decimal, default=Decimal(10.0),help='Quantity of BTC to buy/sell')
+    parser.add_argument('--qty',type=Decimal, default=Decimal(10.0),help='Quantity of the product to buy/sell')
+    parser.add_argument('--product', help='Product as BASE-QUOTE (e.g. ETH-USD) fetched from the venue url templates, instead of the COINBASE_API / GEMINI_API urls')
+    parser.add_argument('--engine', choices=sorted(ENGINES), default='decimal', help='Merge and pricing engine')
+    parser.add_argument('--stream', action='store_true', help='Parse the Coinbase book from the response stream and stop once --qty is covered')
+    parser.add_argument('--venues', nargs='+', choices=sorted(VENUES), default=DEFAULT_VENUES, help='Venues to aggregate')
+    parser.add_argument('--processes', type=int, default=0, help='Merge and price the bids and asks in this many worker processes instead of threads')
+    parser.add_argument('--metrics', action='store_true', help='Time every stage and write one json line per quote to stderr')
+    parser.add_argument('--record', help='Append every fetched book to this snapshot file (replay it with backtest.py)')
+    parser.add_argument('--budget', nargs='+', help='Seconds a venue gets before the quote goes on without it, for every venue (1.5) or one of them (gemini=0.5)')
+    parser.add_argument('--hedge-after', type=float, help='Seconds before a slow venue gets a second request, sent only on a spare rate limit token (RATE_LIMIT_BURST)')
+    parser.add_argument('--fallback', help='Snapshot file (see --record) whose latest book prices a venue that misses its budget or fails')
+    parser.add_argument('--max-age', type=float, default=60.0, help='Seconds after which a fallback book is too old to use')
 
     args = parser.parse_args()
 
@@ -128,4 +158,16 @@ if __name__ == "__main__":
         print("Error: Quantity must be positive")
         exit(1)
 
-    main(args.qty)
+    try:
+        budgets = parse_budgets(args.budget)
+        last_good = LastGoodBooks.from_snapshot_file(args.fallback, args.product or DEFAULT_PRODUCT) if args.fallback else None
+    except (OSError, ValueError) as e:
+        print("Error: ", e)
+        exit(1)
+
+    if args.metrics:
+        METRICS.enable()
+    recorder = SnapshotRecorder(args.record) if args.record else None
+    with METRICS.trace(product=args.product or DEFAULT_PRODUCT, quantity=args.qty, engine=args.engine):
+        main(args.qty, args.engine, args.stream, args.venues, args.product, args.processes, recorder,
+             budgets, args.hedge_after, last_good, args.max_age)
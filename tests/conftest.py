@@ -0,0 +1,26 @@
+import pytest
+import json
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from tests.stub_server import StubServer
+
+ROOT = Path(__file__).parent.parent
+
+
+@pytest.fixture
+def stub_server():
+    # serves coinbase.json at /coinbase and gemini.json at /gemini
+    with StubServer() as server:
+        yield server
+
+
+@pytest.fixture(scope='session')
+def load_fixture():
+    # reads one of the json books at the repo root, e.g. load_fixture('coinbase.json')
+    def load(name):
+        with open(ROOT / name) as f:
+            return json.load(f)
+    return load
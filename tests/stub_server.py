@@ -0,0 +1,117 @@
+import socket
+import threading
+import time
+from collections import deque
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from pathlib import Path
+
+# Local stand-in for the exchange apis, serving the bundled json fixtures.
+# It speaks HTTP/1.1 with keep-alive so connection reuse can be measured offline.
+# connect_delay is paid once per new connection, as a stand-in for the TCP + TLS handshake.
+# latency(path) returns the seconds to hold each response (tail latency), and inject() queues
+# delays and error statuses for the next requests to a path.
+
+ROOT = Path(__file__).parent.parent
+
+
+class StubServer:
+
+    def __init__(self, routes=None, connect_delay: float = 0.0, latency=None):
+        # path -> response body (bytes)
+        if routes is None:
+            routes = {
+                '/coinbase': (ROOT / 'coinbase.json').read_bytes(),
+                '/gemini': (ROOT / 'gemini.json').read_bytes(),
+            }
+        self.routes = routes
+        self.connect_delay = connect_delay
+        self.latency = latency
+        # path -> (delay, status) of its next requests
+        self.faults = {}
+        self.connections = 0
+        self.requests = 0
+        self._lock = threading.Lock()
+
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def setup(self):
+                with server._lock:
+                    server.connections += 1
+                if server.connect_delay:
+                    time.sleep(server.connect_delay)
+                super().setup()
+                # headers and body go out in separate writes, without this nagle + delayed ack adds ~40 ms
+                self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+            def do_GET(self):
+                with server._lock:
+                    server.requests += 1
+
+                path = self.path.split('?', 1)[0]
+                delay, status = server.next_fault(path)
+                if delay:
+                    time.sleep(delay)
+                if status != 200:
+                    self.send_response(status)
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+
+                body = server.routes.get(path)
+                if body is None:
+                    self.send_response(404)
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+
+                try:
+                    self.send_response(200)
+                    self.send_header('Content-Type', 'application/json')
+                    self.send_header('Content-Length', str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                except (BrokenPipeError, ConnectionResetError):
+                    # the client gave up on a delayed response
+                    pass
+
+            def log_message(self, format, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    def inject(self, path: str, delay: float = 0.0, status: int = 200, count: int = 1) -> None:
+        # the next count requests to path are held for delay seconds and answered with status
+        with self._lock:
+            self.faults.setdefault(path, deque()).extend([(delay, status)] * count)
+
+    def next_fault(self, path: str):
+        with self._lock:
+            faults = self.faults.get(path)
+            if faults:
+                return faults.popleft()
+        return (self.latency(path) if self.latency else 0.0), 200
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address
+        return f"http://{host}:{port}"
+
+    def start(self) -> 'StubServer':
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self) -> 'StubServer':
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
@@ -0,0 +1,71 @@
+import pytest
+import asyncio
+from decimal import Decimal
+import sys
+from pathlib import Path
+
+# Add parent directory to path to import from utils -
+# Docs: https://docs.pytest.org/en/latest/explanation/pythonpath.html
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from utils.async_loader import create_session, fetch_json
+from utils.engines import ENGINES
+from utils.venues import DEFAULT_VENUES, get_venues
+from utils.helper import merge_sorted_asks, merge_sorted_bids, calculate_buy_price, calculate_sell_price
+from tests.stub_server import StubServer
+from ratelimiter_async import quote
+
+
+class TestAsyncLoader:
+    def test_fetch_json(self, stub_server, load_fixture):
+        async def run():
+            async with create_session() as session:
+                return await fetch_json(session, stub_server.url + '/coinbase', timeout=5.0)
+
+        assert asyncio.run(run()) == load_fixture('coinbase.json')
+
+    def test_connections_are_reused(self, stub_server):
+        # Test that repeated fetches go over the same pooled connection
+        async def run():
+            async with create_session() as session:
+                for _ in range(5):
+                    await fetch_json(session, stub_server.url + '/coinbase', timeout=5.0)
+                    await fetch_json(session, stub_server.url + '/gemini', timeout=5.0)
+
+        asyncio.run(run())
+
+        assert stub_server.requests == 10
+        assert stub_server.connections == 1
+
+    def test_timeout(self):
+        with StubServer(connect_delay=1.0) as server:
+            async def run():
+                async with create_session() as session:
+                    await fetch_json(session, server.url + '/coinbase', timeout=0.2)
+
+            with pytest.raises(Exception, match="timed out after 0.2 seconds"):
+                asyncio.run(run())
+
+    def test_http_error(self, stub_server):
+        async def run():
+            async with create_session() as session:
+                await fetch_json(session, stub_server.url + '/missing', timeout=5.0)
+
+        with pytest.raises(Exception, match="404"):
+            asyncio.run(run())
+
+    def test_quote_pipeline(self, stub_server, load_fixture):
+        # Test the full async quote against the sync helpers on the same fixtures
+        coinbase_data = load_fixture('coinbase.json')
+        gemini_data = load_fixture('gemini.json')
+        quantity = Decimal("0.5")
+
+        async def run():
+            async with create_session() as session:
+                apis = {'coinbase': stub_server.url + '/coinbase', 'gemini': stub_server.url + '/gemini'}
+                return await quote(session, quantity, ENGINES['decimal'], get_venues(DEFAULT_VENUES), apis)
+
+        buy_price, sell_price = asyncio.run(run())
+
+        assert buy_price == calculate_buy_price(merge_sorted_bids(coinbase_data['bids'], gemini_data['bids']), quantity)
+        assert sell_price == calculate_sell_price(merge_sorted_asks(coinbase_data['asks'], gemini_data['asks']), quantity)
@@ -0,0 +1,124 @@
+import pytest
+import csv
+import io
+import json
+from decimal import Decimal
+import sys
+from pathlib import Path
+
+# Add parent directory to path to import from utils -
+# Docs: https://docs.pytest.org/en/latest/explanation/pythonpath.html
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from utils.batch import parse_requests, sweep, price_requests, format_rows
+from utils.engines import ENGINES
+from utils.helper import merge_asks, merge_bids, calculate_buy_price, calculate_sell_price
+from utils.synthetic import generate_levels
+from utils.venues import COINBASE, GEMINI, get_venues
+from batch_quote import fetch_books, read_lines
+
+
+class TestParseRequests:
+    def test_bare_quantities_go_on_both_sides(self):
+        assert parse_requests(['1', '2.5']) == [
+            ('buy', Decimal('1')), ('sell', Decimal('1')), ('buy', Decimal('2.5')), ('sell', Decimal('2.5'))]
+
+    def test_sides_separators_and_comments(self):
+        lines = ['# quantities\n', 'buy 1\n', '\n', 'SELL,2.5\n', '  3  \n']
+
+        assert parse_requests(lines, ('sell',)) == [('buy', Decimal('1')), ('sell', Decimal('2.5')), ('sell', Decimal('3'))]
+
+    @pytest.mark.parametrize("line", ['abc', '0', '-1', 'NaN', 'hold 1', 'buy 1 2'])
+    def test_invalid_lines(self, line):
+        with pytest.raises(ValueError, match="line 2"):
+            parse_requests(['1', line])
+
+
+class TestSweep:
+    def test_matches_the_calculators(self):
+        bids, asks = generate_levels(3000, seed=7)
+        quantities = [Decimal('0.001'), Decimal('1'), Decimal('1'), Decimal('37.25'), Decimal('500'), Decimal('12')]
+
+        buys = sweep(merge_bids(bids), quantities)
+        sells = sweep(merge_asks(asks), quantities)
+
+        for quantity in quantities:
+            assert buys[quantity] == (calculate_buy_price(merge_bids(bids), quantity), quantity)
+            assert sells[quantity] == (calculate_sell_price(merge_asks(asks), quantity), quantity)
+
+    def test_exact_level_boundary(self):
+        levels = [(Decimal('100'), Decimal('1')), (Decimal('101'), Decimal('2'))]
+
+        assert sweep(iter(levels), [Decimal('1'), Decimal('3')]) == {
+            Decimal('1'): (Decimal('100'), Decimal('1')),
+            Decimal('3'): (Decimal('302'), Decimal('3')),
+        }
+
+    def test_short_book(self):
+        levels = [(Decimal('100'), Decimal('1')), (Decimal('101'), Decimal('0.5'))]
+
+        result = sweep(iter(levels), [Decimal('1.2'), Decimal('2'), Decimal('5')])
+
+        assert result[Decimal('1.2')] == (Decimal('120.2'), Decimal('1.2'))
+        assert result[Decimal('2')] == result[Decimal('5')] == (Decimal('150.5'), Decimal('1.5'))
+        assert calculate_sell_price(iter(levels), Decimal('2')) == Decimal('150.5')
+
+
+class TestPriceRequests:
+    def test_rows_in_request_order(self, load_fixture):
+        coinbase_data = load_fixture('coinbase.json')
+        gemini_data = load_fixture('gemini.json')
+        books = [(COINBASE, coinbase_data), (GEMINI, gemini_data)]
+        requests = [('sell', Decimal('2')), ('buy', Decimal('0.5')), ('sell', Decimal('0.1'))]
+
+        rows = price_requests(ENGINES['decimal'], books, requests)
+
+        assert [(row['side'], row['quantity']) for row in rows] == requests
+        for row in rows:
+            if row['side'] == 'buy':
+                expected = calculate_buy_price(merge_bids(COINBASE.levels(coinbase_data, 'bids'), GEMINI.levels(gemini_data, 'bids')), row['quantity'])
+            else:
+                expected = calculate_sell_price(merge_asks(COINBASE.levels(coinbase_data, 'asks'), GEMINI.levels(gemini_data, 'asks')), row['quantity'])
+            assert row['price'] == expected
+
+    def test_one_side_only(self, load_fixture):
+        books = [(COINBASE, load_fixture('coinbase.json'))]
+
+        rows = price_requests(ENGINES['decimal'], books, [('buy', Decimal('0.1'))])
+
+        assert len(rows) == 1 and rows[0]['side'] == 'buy'
+
+
+class TestFormatRows:
+    rows = [{'side': 'buy', 'quantity': Decimal('1'), 'price': Decimal('110100.5493524960'), 'filled': Decimal('1')}]
+
+    def test_csv_keeps_the_precision(self):
+        parsed = list(csv.DictReader(io.StringIO(format_rows(self.rows, 'csv'))))
+
+        assert parsed == [{'side': 'buy', 'quantity': '1', 'price': '110100.5493524960', 'filled': '1'}]
+
+    def test_json(self):
+        assert json.loads(format_rows(self.rows, 'json')) == [
+            {'side': 'buy', 'quantity': '1', 'price': '110100.5493524960', 'filled': '1'}]
+
+    def test_table_rounds_to_cents(self):
+        assert '$110,100.55' in format_rows(self.rows, 'table')
+
+
+class TestBatchQuote:
+    def test_fetch_once_and_price_everything(self, stub_server, monkeypatch):
+        monkeypatch.setenv('COINBASE_API', stub_server.url + '/coinbase')
+        monkeypatch.setenv('GEMINI_API', stub_server.url + '/gemini')
+
+        books = fetch_books(get_venues(['coinbase', 'gemini']))
+        rows = price_requests(ENGINES['decimal'], books, parse_requests(['0.5', '1', '10']))
+
+        assert stub_server.requests == 2
+        assert len(rows) == 6
+        assert [venue.name for venue, _ in books] == ['coinbase', 'gemini']
+
+    def test_read_lines_from_a_file(self, tmp_path):
+        path = tmp_path / 'quantities.txt'
+        path.write_text('buy 1\n2\n')
+
+        assert read_lines(['0.5'], str(path)) == ['0.5', 'buy 1\n', '2\n']
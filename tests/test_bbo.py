@@ -0,0 +1,199 @@
+import pytest
+import random
+from decimal import Decimal
+import sys
+from pathlib import Path
+
+# Add parent directory to path to import from utils -
+# Docs: https://docs.pytest.org/en/latest/explanation/pythonpath.html
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from utils.bbo import BBOTracker, BBO, EMPTY, SLACK, Top
+from utils.orderbook import OrderBook
+from utils.replay import ReplayFeed, apply_message, write_feed, snapshot_message
+from utils.helper import merge_bids, merge_asks
+from utils.synthetic import generate_levels, generate_l2_updates
+from utils.venues import COINBASE, GEMINI
+
+
+def level(price, size):
+    return Decimal(price), Decimal(size)
+
+
+class TestBBO:
+    def test_spread_mid_crossed_locked(self):
+        bbo = BBO(Top(Decimal('100.00'), Decimal('1'), 'a'), Top(Decimal('100.50'), Decimal('2'), 'b'))
+        assert bbo.spread == Decimal('0.50')
+        assert bbo.mid == Decimal('100.25')
+        assert not bbo.crossed and not bbo.locked
+
+        locked = BBO(Top(Decimal('100.50'), Decimal('1'), 'a'), bbo.ask)
+        assert locked.locked and not locked.crossed
+        assert locked.spread == 0
+
+        crossed = BBO(Top(Decimal('101.00'), Decimal('1'), 'a'), bbo.ask)
+        assert crossed.crossed and not crossed.locked
+        assert crossed.spread == Decimal('-0.50')
+
+    def test_one_sided(self):
+        bbo = BBO(Top(Decimal('100.00'), Decimal('1'), 'a'), None)
+        assert bbo.spread is None and bbo.mid is None
+        assert not bbo.crossed and not bbo.locked
+        assert EMPTY.spread is None and not EMPTY.crossed
+
+
+class TestBBOTracker:
+    def test_empty(self):
+        tracker = BBOTracker()
+        assert tracker.bbo == EMPTY
+        assert tracker.bbo.bid is None and tracker.bbo.ask is None
+
+    def test_best_across_venues(self):
+        tracker = BBOTracker()
+        assert tracker.update('a', level('100.00', '1'), level('101.00', '1'))
+        assert tracker.update('b', level('100.50', '2'), level('101.50', '2'))
+
+        bbo = tracker.bbo
+        assert bbo.bid == Top(Decimal('100.50'), Decimal('2'), 'b')
+        assert bbo.ask == Top(Decimal('101.00'), Decimal('1'), 'a')
+        assert bbo.spread == Decimal('0.50')
+
+    def test_unchanged_update_returns_false(self):
+        tracker = BBOTracker()
+        tracker.update('a', level('100.00', '1'), level('101.00', '1'))
+        tracker.update('b', level('99.00', '1'), level('102.00', '1'))
+        before = tracker.bbo
+
+        # same levels again, and a venue moving behind the touch
+        assert not tracker.update('a', level('100.00', '1'), level('101.00', '1'))
+        assert not tracker.update('b', level('99.50', '3'), level('101.50', '1'))
+        assert tracker.bbo is before
+        assert tracker.updates == 4
+        assert tracker.changes == 1
+
+    def test_size_change_at_the_touch(self):
+        tracker = BBOTracker()
+        tracker.update('a', level('100.00', '1'), level('101.00', '1'))
+        assert tracker.update('a', level('100.00', '0.5'), level('101.00', '1'))
+        assert tracker.bbo.bid.size == Decimal('0.5')
+
+    def test_falls_back_when_the_best_venue_moves_away(self):
+        tracker = BBOTracker()
+        tracker.update('a', level('100.00', '1'), level('101.00', '1'))
+        tracker.update('b', level('100.50', '1'), level('101.50', '1'))
+        tracker.update('c', level('99.00', '1'), level('100.90', '1'))
+        assert tracker.bbo.bid.venue == 'b'
+        assert tracker.bbo.ask.venue == 'c'
+
+        tracker.update('b', level('98.00', '1'), level('101.50', '1'))
+        assert tracker.bbo.bid == Top(Decimal('100.00'), Decimal('1'), 'a')
+
+        tracker.remove('c')
+        assert tracker.bbo.ask == Top(Decimal('101.00'), Decimal('1'), 'a')
+        tracker.remove('a')
+        assert tracker.bbo == BBO(Top(Decimal('98.00'), Decimal('1'), 'b'), Top(Decimal('101.50'), Decimal('1'), 'b'))
+        tracker.remove('b')
+        assert tracker.bbo == EMPTY
+
+    def test_empty_side(self):
+        tracker = BBOTracker()
+        tracker.update('a', level('100.00', '1'), None)
+        assert tracker.bbo.ask is None
+        assert tracker.bbo.spread is None
+
+        tracker.update('b', None, level('101.00', '1'))
+        assert tracker.bbo.bid.venue == 'a'
+        assert tracker.bbo.ask.venue == 'b'
+
+    def test_ties_prefer_size_then_first(self):
+        tracker = BBOTracker()
+        tracker.update('a', level('100.00', '1'), level('101.00', '1'))
+        tracker.update('b', level('100.00', '2'), level('101.00', '1'))
+        # same price, the larger size shows first
+        assert tracker.bbo.bid.venue == 'b'
+        # same price and size, the venue that was there first
+        assert tracker.bbo.ask.venue == 'a'
+
+        # a venue that comes back to the same level goes behind the others
+        tracker.update('a', level('100.00', '1'), level('101.50', '1'))
+        tracker.update('a', level('100.00', '1'), level('101.00', '1'))
+        assert tracker.bbo.ask.venue == 'b'
+
+    def test_crossed_market(self):
+        tracker = BBOTracker()
+        tracker.update('a', level('100.00', '1'), level('101.00', '1'))
+        tracker.update('b', level('101.50', '1'), level('102.00', '1'))
+        assert tracker.bbo.crossed
+        assert tracker.bbo.spread == Decimal('-0.50')
+
+        tracker.update('b', level('101.00', '1'), level('102.00', '1'))
+        assert tracker.bbo.locked and not tracker.bbo.crossed
+
+    def test_heap_stays_bounded(self):
+        tracker = BBOTracker()
+        rng = random.Random(5)
+        for _ in range(5000):
+            venue = rng.choice('abc')
+            bid = Decimal(rng.randint(9000, 10000)) / 100
+            tracker.update(venue, (bid, Decimal(rng.randint(1, 9))), (bid + 1, Decimal(rng.randint(1, 9))))
+
+        for side in ('bids', 'asks'):
+            assert len(tracker._heaps[side]) <= 3 + SLACK + 1
+
+    def test_update_payload(self, load_fixture):
+        coinbase_data = load_fixture('coinbase.json')
+        gemini_data = load_fixture('gemini.json')
+        tracker = BBOTracker()
+        tracker.update_payload(COINBASE, coinbase_data)
+        tracker.update_payload(GEMINI, gemini_data)
+
+        best_bid = next(merge_bids(COINBASE.levels(coinbase_data, 'bids'), GEMINI.levels(gemini_data, 'bids')))
+        best_ask = next(merge_asks(COINBASE.levels(coinbase_data, 'asks'), GEMINI.levels(gemini_data, 'asks')))
+        assert (tracker.bbo.bid.price, tracker.bbo.bid.size) == best_bid
+        assert (tracker.bbo.ask.price, tracker.bbo.ask.size) == best_ask
+        assert tracker.bbo.bid.venue == 'coinbase'
+
+    def test_update_book(self, load_fixture):
+        book = OrderBook.from_gemini(load_fixture('gemini.json'))
+        tracker = BBOTracker()
+        assert tracker.update_book(book)
+        assert tracker.bbo.bid == Top(Decimal('110007.69'), Decimal('0.00362'), 'gemini')
+        assert tracker.bbo.ask == Top(Decimal('110025.98'), Decimal('0.016117'), 'gemini')
+
+        # a change deep in the book leaves the BBO alone
+        book.apply_update('buy', '100000.00', '1')
+        assert not tracker.update_book(book)
+        book.apply_update('sell', '110025.98', '0')
+        assert tracker.update_book(book)
+        assert tracker.bbo.ask.price > Decimal('110025.98')
+
+    @pytest.mark.parametrize("venues", [1, 3])
+    def test_matches_merge_over_replayed_feeds(self, tmp_path, venues):
+        # the tracker after every message against the first level of a full merge of the books
+        books = []
+        feeds = []
+        for index in range(venues):
+            bids, asks = generate_levels(20, mid=110000.0 + index, seed=index)
+            path = tmp_path / f"venue{index}.jsonl"
+            write_feed(path, [snapshot_message(bids, asks, sequence=1)] +
+                       generate_l2_updates(400, mid=110000.0 + index, seed=index + 10, spread=100, near_touch=0.5))
+            books.append(OrderBook(f"venue{index}"))
+            feeds.append(ReplayFeed(path).messages())
+
+        tracker = BBOTracker()
+        for step in range(401):
+            for book, feed in zip(books, feeds):
+                apply_message(book, next(feed))
+                tracker.update_book(book)
+
+                bbo = tracker.bbo
+                best_bid = next(merge_bids(*(book.bids() for book in books)), None)
+                best_ask = next(merge_asks(*(book.asks() for book in books)), None)
+                assert (bbo.bid and bbo.bid.price) == (best_bid and best_bid[0])
+                assert (bbo.ask and bbo.ask.price) == (best_ask and best_ask[0])
+                if bbo.bid is not None:
+                    venue_book = books[int(bbo.bid.venue[len('venue'):])]
+                    assert venue_book.best_bid() == (bbo.bid.price, bbo.bid.size)
+                if bbo.ask is not None:
+                    venue_book = books[int(bbo.ask.venue[len('venue'):])]
+                    assert venue_book.best_ask() == (bbo.ask.price, bbo.ask.size)
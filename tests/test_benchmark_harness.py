@@ -0,0 +1,58 @@
+import pytest
+import json
+import sys
+from pathlib import Path
+
+# Add parent directory to path to import from utils -
+# Docs: https://docs.pytest.org/en/latest/explanation/pythonpath.html
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from benchmarks.harness import run, compare, build_payloads, STAGES
+
+
+class TestHarness:
+
+    def test_payloads_have_the_venue_shapes(self):
+        coinbase_body, gemini_body = build_payloads(100)
+        coinbase_data = json.loads(coinbase_body)
+        gemini_data = json.loads(gemini_body)
+
+        assert len(coinbase_data['bids']) == 100
+        assert len(coinbase_data['bids'][0]) == 3
+        assert set(gemini_data['asks'][0]) == {'price', 'amount', 'timestamp'}
+
+    def test_report_covers_every_stage(self):
+        report = run([100], ['decimal', 'fixed'], list(STAGES), repeat=1)
+
+        keys = {(result['levels'], result['engine'], result['stage']) for result in report['results']}
+        assert keys == {
+            (100, '-', 'fetch'), (100, '-', 'decode'), (100, '-', 'convert'),
+            (100, 'decimal', 'merge'), (100, 'decimal', 'fill'),
+            (100, 'fixed', 'merge'), (100, 'fixed', 'fill'),
+        }
+        for result in report['results']:
+            assert 0 < result['best_s'] <= result['median_s']
+            assert result['peak_bytes'] > 0
+
+        # the report is what gets written with --json
+        assert json.loads(json.dumps(report)) == report
+        assert 'python' in report['meta']
+
+    def test_compare_flags_slower_stages(self):
+        baseline = {'meta': {}, 'results': [
+            {'levels': 100, 'engine': '-', 'stage': 'decode', 'best_s': 1.0},
+            {'levels': 100, 'engine': 'decimal', 'stage': 'merge', 'best_s': 1.0},
+            {'levels': 1000, 'engine': 'decimal', 'stage': 'merge', 'best_s': 1.0},
+        ]}
+        report = {'meta': {}, 'results': [
+            {'levels': 100, 'engine': '-', 'stage': 'decode', 'best_s': 1.05},
+            {'levels': 100, 'engine': 'decimal', 'stage': 'merge', 'best_s': 1.5},
+            {'levels': 100, 'engine': 'decimal', 'stage': 'fill', 'best_s': 1.0},
+        ]}
+
+        rows, regressions = compare(report, baseline, threshold=0.1)
+
+        # only the results present in both are compared
+        assert [key for key, _, _, _ in rows] == [(100, '-', 'decode'), (100, 'decimal', 'merge')]
+        assert regressions == [(100, 'decimal', 'merge')]
+        assert rows[1][3] == pytest.approx(1.5)
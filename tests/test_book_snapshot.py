@@ -0,0 +1,187 @@
+import pytest
+import threading
+from decimal import Decimal
+import sys
+from pathlib import Path
+
+# Add parent directory to path to import from utils -
+# Docs: https://docs.pytest.org/en/latest/explanation/pythonpath.html
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from utils.book_snapshot import SnapshotPublisher
+from utils.level_store import LevelBuffer
+from utils.helper import merge_bids, merge_asks, calculate_buy_price, calculate_sell_price
+from utils.venues import COINBASE, GEMINI
+
+QUANTITY = Decimal('7.5')
+
+
+def versioned_books(version, levels=200):
+    # both venues move with the version: coinbase carries it as the sequence, gemini in its prices.
+    # a snapshot mixing two versions prices differently from either one
+    coinbase = {
+        'bids': [[f"{100000 + version - i}.00", "0.5", 1] for i in range(levels)],
+        'asks': [[f"{100100 + version + i}.00", "0.5", 1] for i in range(levels)],
+        'sequence': version,
+    }
+    gemini = {
+        'bids': [{'price': f"{100000 + version - i}.50", 'amount': "0.25"} for i in range(levels)],
+        'asks': [{'price': f"{100100 + version + i}.50", 'amount': "0.25"} for i in range(levels)],
+    }
+    return {COINBASE: coinbase, GEMINI: gemini}
+
+
+def expected_prices(books):
+    bids = merge_bids(*(venue.levels(data, 'bids') for venue, data in books.items()))
+    asks = merge_asks(*(venue.levels(data, 'asks') for venue, data in books.items()))
+    return calculate_buy_price(bids, QUANTITY), calculate_sell_price(asks, QUANTITY)
+
+
+class TestSnapshotPublisher:
+    def test_quotes_match_the_calculators(self, load_fixture):
+        books = {COINBASE: load_fixture('coinbase.json'), GEMINI: load_fixture('gemini.json')}
+        publisher = SnapshotPublisher()
+
+        snapshot = publisher.publish(books)
+
+        for quantity in [Decimal('0.1'), Decimal('1'), Decimal('10')]:
+            assert snapshot.quote('buy', quantity) == calculate_buy_price(merge_bids(*(venue.levels(data, 'bids') for venue, data in books.items())), quantity)
+            assert snapshot.quote('sell', quantity) == calculate_sell_price(merge_asks(*(venue.levels(data, 'asks') for venue, data in books.items())), quantity)
+        assert publisher.current is snapshot
+
+    def test_snapshots_are_immutable(self):
+        snapshot = SnapshotPublisher().publish(versioned_books(1))
+
+        with pytest.raises(AttributeError):
+            snapshot.version = 2
+        with pytest.raises(AttributeError):
+            snapshot.venues[0].bids = ()
+        assert isinstance(snapshot.venues[0].bids, tuple)
+
+    def test_unchanged_venues_are_shared(self):
+        publisher = SnapshotPublisher()
+        books = versioned_books(1)
+        first = publisher.publish(books)
+
+        # nothing changed, the whole book is shared
+        second = publisher.publish(books)
+        assert second.version == 2
+        assert second.venues[0] is first.venues[0] and second.venues[1] is first.venues[1]
+        assert second.bids is first.bids and second.asks is first.asks
+
+        # only coinbase moved, gemini keeps its converted levels
+        third = publisher.publish({COINBASE: {**books[COINBASE], 'sequence': 2}, GEMINI: books[GEMINI]})
+        assert third.venues[0] is not second.venues[0]
+        assert third.venues[1] is second.venues[1]
+        assert third.bids is not second.bids
+        assert (publisher.converted, publisher.reused) == (3, 3)
+
+    def test_old_snapshot_stays_consistent(self):
+        publisher = SnapshotPublisher()
+        old = publisher.publish(versioned_books(1))
+        expected = expected_prices(versioned_books(1))
+
+        for version in range(2, 6):
+            publisher.publish(versioned_books(version))
+
+        assert (old.quote('buy', QUANTITY), old.quote('sell', QUANTITY)) == expected
+        assert publisher.current.version == 5
+
+    @pytest.mark.parametrize('compact', [False, True])
+    def test_concurrent_readers_never_see_a_mixed_book(self, compact):
+        # readers price from whatever is published while a writer keeps publishing new versions.
+        # every snapshot has to price exactly like the version its coinbase sequence says.
+        versions = 150
+        books = [versioned_books(version) for version in range(versions + 1)]
+        expected = [expected_prices(book) for book in books]
+
+        publisher = SnapshotPublisher(compact)
+        publisher.publish(books[0])
+        done = threading.Event()
+        errors = []
+        reads = []
+
+        def reader():
+            count = 0
+            seen = set()
+            while not done.is_set():
+                snapshot = publisher.current
+                version = snapshot.venues[0].sequence
+                prices = (snapshot.quote('buy', QUANTITY), snapshot.quote('sell', QUANTITY))
+                gemini_top = snapshot.venues[1].bids[0][0]
+                if prices != expected[version] or gemini_top != Decimal(f"{100000 + version}.50") or snapshot.version != version + 1:
+                    errors.append((version, snapshot.version, prices))
+                seen.add(version)
+                count += 1
+            reads.append((count, len(seen)))
+
+        def writer():
+            for version in range(1, versions + 1):
+                publisher.publish(books[version])
+            done.set()
+
+        threads = [threading.Thread(target=reader) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        writer_thread = threading.Thread(target=writer)
+        writer_thread.start()
+        writer_thread.join(timeout=60)
+        done.set()
+        for thread in threads:
+            thread.join(timeout=10)
+
+        assert errors == []
+        assert publisher.current.version == versions + 1
+        # readers kept going while the writer published, and saw several versions go by
+        assert all(count > 0 for count, _ in reads)
+        assert sum(seen for _, seen in reads) > 4
+
+    def test_concurrent_writers_publish_in_turn(self):
+        publisher = SnapshotPublisher()
+        threads = [threading.Thread(target=publisher.publish, args=(versioned_books(version, levels=20),)) for version in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert publisher.current.version == 8
+
+
+class TestCompactSnapshots:
+    def test_quotes_match_the_decimal_book(self, load_fixture):
+        books = {COINBASE: load_fixture('coinbase.json'), GEMINI: load_fixture('gemini.json')}
+        decimal = SnapshotPublisher().publish(books)
+        compact = SnapshotPublisher(compact=True).publish(books)
+
+        assert isinstance(compact.venues[0].bids, LevelBuffer)
+        assert compact.venues[1].asks[0] == decimal.venues[1].asks[0]
+        assert len(compact.bids) == len(decimal.bids) and len(compact.asks) == len(decimal.asks)
+        for quantity in [Decimal('0.1'), Decimal('1'), Decimal('10')]:
+            assert compact.quote('buy', quantity) == decimal.quote('buy', quantity)
+            assert compact.quote('sell', quantity) == decimal.quote('sell', quantity)
+
+    def test_retired_snapshots_are_left_alone(self):
+        # a refresh never writes over the arrays of an older snapshot, held or not
+        publisher = SnapshotPublisher(compact=True)
+        first = publisher.publish(versioned_books(1))
+        arrays = [first.bids.prices, first.venues[0].bids.prices]
+        before = arrays[0].tolist()
+        expected = (first.quote('buy', QUANTITY), first.quote('sell', QUANTITY))
+
+        publisher.publish(versioned_books(2))
+        third = publisher.publish(versioned_books(3))
+
+        assert third.bids.prices is not arrays[0]
+        assert all(book.bids.prices is not arrays[1] and book.asks.prices is not arrays[1] for book in third.venues)
+        assert arrays[0].tolist() == before
+        assert (first.quote('buy', QUANTITY), first.quote('sell', QUANTITY)) == expected
+
+    def test_held_snapshot_is_not_written_over(self):
+        publisher = SnapshotPublisher(compact=True)
+        old = publisher.publish(versioned_books(1))
+
+        for version in range(2, 6):
+            publisher.publish(versioned_books(version))
+
+        assert (old.quote('buy', QUANTITY), old.quote('sell', QUANTITY)) == expected_prices(versioned_books(1))
+        assert publisher.current.bids is not old.bids
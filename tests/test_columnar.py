@@ -0,0 +1,84 @@
+import pytest
+from decimal import Decimal
+import sys
+from pathlib import Path
+
+# Add parent directory to path to import from utils -
+# Docs: https://docs.pytest.org/en/latest/explanation/pythonpath.html
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+np = pytest.importorskip("numpy")
+
+from utils.columnar import ColumnarBook, ColumnarSide
+from utils.engines import ENGINES
+from utils.venues import COINBASE, GEMINI
+from utils.helper import merge_sorted_asks, merge_sorted_bids
+from utils.synthetic import generate_coinbase_book, generate_gemini_book, random_quantities
+from tests.test_fixed_point import sub_cent_books
+
+
+def price_with(engine_name, coinbase_data, gemini_data, quantity):
+    engine = ENGINES[engine_name]
+    merged_bids = engine.merge_bids(COINBASE.parse_levels(coinbase_data['bids']), GEMINI.parse_levels(gemini_data['bids']))
+    merged_asks = engine.merge_asks(COINBASE.parse_levels(coinbase_data['asks']), GEMINI.parse_levels(gemini_data['asks']))
+    return engine.calculate_buy_price(merged_bids, quantity), engine.calculate_sell_price(merged_asks, quantity)
+
+
+class TestColumnarEngine:
+    def test_fixture_parity(self, load_fixture):
+        # Test identical results with the decimal engine on the bundled fixtures
+        coinbase_data = load_fixture('coinbase.json')
+        gemini_data = load_fixture('gemini.json')
+
+        for quantity in [Decimal("0.00000001"), Decimal("0.01"), Decimal("0.5"), Decimal("1"), Decimal("10"), Decimal("101898.2"), Decimal("0.123456789123")]:
+            assert price_with('numpy', coinbase_data, gemini_data, quantity) == price_with('decimal', coinbase_data, gemini_data, quantity)
+
+    def test_synthetic_parity(self):
+        coinbase_data = generate_coinbase_book(5000, seed=8)
+        gemini_data = generate_gemini_book(700, seed=9)
+
+        for quantity in random_quantities(40, 3000.0, seed=10):
+            assert price_with('numpy', coinbase_data, gemini_data, quantity) == price_with('decimal', coinbase_data, gemini_data, quantity)
+
+    def test_merge_order(self, load_fixture):
+        # Test that the vectorized merge yields the same levels as heapq.merge
+        coinbase_data = load_fixture('coinbase.json')
+        gemini_data = load_fixture('gemini.json')
+
+        merged_asks = ENGINES['numpy'].merge_asks(COINBASE.parse_levels(coinbase_data['asks']), GEMINI.parse_levels(gemini_data['asks']))
+        merged_bids = ENGINES['numpy'].merge_bids(COINBASE.parse_levels(coinbase_data['bids']), GEMINI.parse_levels(gemini_data['bids']))
+
+        assert list(merged_asks) == list(merge_sorted_asks(coinbase_data['asks'], gemini_data['asks']))
+        assert list(merged_bids) == list(merge_sorted_bids(coinbase_data['bids'], gemini_data['bids']))
+
+    def test_book_per_venue(self, load_fixture):
+        book = ColumnarBook.from_gemini(load_fixture('gemini.json'))
+
+        assert book.bids.prices.tolist() == [11000769, 11000324, 11000218, 11000217, 10999667]
+        assert book.asks.sizes.tolist() == [1611700, 300000000, 181000, 2530000]
+
+    def test_large_notional_stays_exact(self):
+        # Test the fallback when the notional does not fit in int64
+        prices = np.array([10**12, 10**12 + 1], dtype=np.int64)
+        sizes = np.array([10**10, 10**10], dtype=np.int64)
+        side = ColumnarSide(prices, sizes, descending=False)
+
+        expected = Decimal(10**12) * Decimal(10**10) + Decimal(10**12 + 1) * Decimal(5 * 10**9)
+        assert side.cost_to_fill(Decimal(150)) == expected.scaleb(-10)
+
+    def test_merge_rejects_mixed_sides(self):
+        bids = ColumnarSide.from_levels([("1.00", "1")], descending=True)
+        asks = ColumnarSide.from_levels([("2.00", "1")], descending=False)
+
+        with pytest.raises(ValueError, match="Cannot merge bids with asks"):
+            bids.merge(asks)
+
+    def test_sub_cent_parity(self):
+        # Test venues at different scales, both finer than cents and satoshis, meeting at the finer one
+        coinbase_data, gemini_data = sub_cent_books()
+        for quantity in [Decimal("0.1"), Decimal("1"), Decimal("2.2"), Decimal("5.123456789"), Decimal("100")]:
+            assert price_with('numpy', coinbase_data, gemini_data, quantity) == price_with('decimal', coinbase_data, gemini_data, quantity)
+
+        book = ColumnarBook.from_gemini(gemini_data)
+        assert (book.asks.price_decimals, book.asks.size_decimals) == (6, 9)
+        assert book.asks.prices.tolist() == [36215, 36231]
@@ -0,0 +1,87 @@
+import pytest
+from decimal import Decimal
+import sys
+from pathlib import Path
+
+# Add parent directory to path to import from utils -
+# Docs: https://docs.pytest.org/en/latest/explanation/pythonpath.html
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from utils.engines import ENGINES
+from utils.helper import take_depth, merge_asks, merge_bids
+from utils.synthetic import generate_levels, random_quantities
+
+
+class CountingLevels:
+    # wraps a venue side and counts how many levels the merge pulled from it
+
+    def __init__(self, levels):
+        self.levels = levels
+        self.pulled = 0
+
+    def __iter__(self):
+        for level in self.levels:
+            self.pulled += 1
+            yield level
+
+
+class TestTakeDepth:
+
+    def test_none_returns_levels_unchanged(self):
+        levels = [(Decimal('1'), Decimal('1'))]
+        assert take_depth(levels, None) is levels
+
+    def test_includes_the_level_that_covers_the_quantity(self):
+        levels = [(Decimal('1'), Decimal('1')), (Decimal('2'), Decimal('1')), (Decimal('3'), Decimal('1'))]
+        assert list(take_depth(iter(levels), Decimal('1.5'))) == levels[:2]
+
+    def test_exact_cover_stops_at_that_level(self):
+        levels = [(Decimal('1'), Decimal('1')), (Decimal('2'), Decimal('1')), (Decimal('3'), Decimal('1'))]
+        assert list(take_depth(iter(levels), Decimal('2'))) == levels[:2]
+
+    def test_shallow_book_returns_everything(self):
+        levels = [(Decimal('1'), Decimal('1')), (Decimal('2'), Decimal('1'))]
+        assert list(take_depth(iter(levels), Decimal('100'))) == levels
+
+
+class TestDepthBoundedMerge:
+
+    @pytest.fixture
+    def venues(self):
+        return [generate_levels(2000, seed=seed) for seed in range(3)]
+
+    @pytest.mark.parametrize('engine_name', sorted(ENGINES))
+    def test_bounded_prices_match_unbounded(self, engine_name, venues):
+        engine = ENGINES[engine_name]
+        for quantity in random_quantities(25, max_quantity=Decimal('50'), seed=7) + [Decimal('100000')]:
+            bounded_bids = engine.merge_bids(*(bids for bids, _ in venues), max_quantity=quantity)
+            bounded_asks = engine.merge_asks(*(asks for _, asks in venues), max_quantity=quantity)
+            bids = engine.merge_bids(*(bids for bids, _ in venues))
+            asks = engine.merge_asks(*(asks for _, asks in venues))
+
+            assert engine.calculate_buy_price(bounded_bids, quantity) == engine.calculate_buy_price(bids, quantity)
+            assert engine.calculate_sell_price(bounded_asks, quantity) == engine.calculate_sell_price(asks, quantity)
+
+    @pytest.mark.parametrize('merge', [merge_asks, merge_bids])
+    def test_bounded_merge_stops_pulling_levels(self, merge, venues):
+        side = 1 if merge is merge_asks else 0
+        counted = [CountingLevels(venue[side]) for venue in venues]
+
+        merged = list(merge(*counted, max_quantity=Decimal('1')))
+
+        assert sum(size for _, size in merged) >= Decimal('1')
+        # one level over the cover per venue at most, the heap holds the next level of each
+        assert sum(venue.pulled for venue in counted) <= len(merged) + len(counted)
+        assert sum(venue.pulled for venue in counted) < 100
+
+    @pytest.mark.parametrize('engine_name', sorted(ENGINES))
+    def test_bounded_merge_keeps_fewer_levels(self, engine_name, venues):
+        engine = ENGINES[engine_name]
+        bounded = list(engine.merge_asks(*(asks for _, asks in venues), max_quantity=Decimal('1')))
+        unbounded = list(engine.merge_asks(*(asks for _, asks in venues)))
+
+        assert len(bounded) < len(unbounded) // 10
+        # the numpy engine bounds each venue before merging, so it may keep a few extra levels,
+        # but every level a fill of the quantity touches comes first in both
+        needed = list(take_depth(iter(unbounded), Decimal('1')))
+        assert bounded[:len(needed)] == needed
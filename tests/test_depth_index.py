@@ -0,0 +1,66 @@
+import pytest
+from decimal import Decimal
+import sys
+from pathlib import Path
+
+# Add parent directory to path to import from utils -
+# Docs: https://docs.pytest.org/en/latest/explanation/pythonpath.html
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from utils.depth_index import DepthIndex
+from utils.helper import merge_sorted_asks, merge_sorted_bids, calculate_buy_price, calculate_sell_price
+from utils.synthetic import generate_coinbase_book, generate_gemini_book, random_quantities
+
+
+@pytest.fixture(scope="module")
+def books():
+    return generate_coinbase_book(2000, seed=10), generate_gemini_book(300, seed=11)
+
+
+class TestDepthIndex:
+    def test_matches_linear_walk(self, books):
+        # Test that the index gives exactly the same cost as the linear calculators
+        coinbase_data, gemini_data = books
+        bid_index = DepthIndex(merge_sorted_bids(coinbase_data['bids'], gemini_data['bids']))
+        ask_index = DepthIndex(merge_sorted_asks(coinbase_data['asks'], gemini_data['asks']))
+
+        quantities = random_quantities(200, float(bid_index.total_size), seed=3)
+        # exact level boundaries and a quantity deeper than the book
+        quantities += [bid_index.cum_size[0], bid_index.cum_size[10], bid_index.total_size, bid_index.total_size * 2]
+
+        for quantity in quantities:
+            merged_bids = merge_sorted_bids(coinbase_data['bids'], gemini_data['bids'])
+            merged_asks = merge_sorted_asks(coinbase_data['asks'], gemini_data['asks'])
+            assert bid_index.cost_to_fill(quantity) == calculate_buy_price(merged_bids, quantity)
+            assert ask_index.cost_to_fill(quantity) == calculate_sell_price(merged_asks, quantity)
+
+    def test_small_book(self):
+        index = DepthIndex([(Decimal('100'), Decimal('1')), (Decimal('101'), Decimal('2'))])
+
+        assert index.cost_to_fill(Decimal('0.5')) == Decimal('50')
+        assert index.cost_to_fill(Decimal('1')) == Decimal('100')
+        assert index.cost_to_fill(Decimal('2')) == Decimal('201')
+        assert index.costs_to_fill([Decimal('3'), Decimal('10')]) == [Decimal('302'), Decimal('302')]
+
+    def test_max_quantity_for_budget(self):
+        index = DepthIndex([(Decimal('100'), Decimal('1')), (Decimal('101'), Decimal('2'))])
+
+        assert index.max_quantity_for_budget(Decimal('50')) == Decimal('0.5')
+        assert index.max_quantity_for_budget(Decimal('100')) == Decimal('1')
+        assert index.max_quantity_for_budget(Decimal('201')) == Decimal('2')
+        # budget larger than the book
+        assert index.max_quantity_for_budget(Decimal('1000')) == Decimal('3')
+
+    def test_budget_round_trip(self, books):
+        coinbase_data, gemini_data = books
+        index = DepthIndex(merge_sorted_asks(coinbase_data['asks'], gemini_data['asks']))
+
+        for quantity in random_quantities(20, float(index.total_size), seed=4):
+            assert index.max_quantity_for_budget(index.cost_to_fill(quantity)) == pytest.approx(quantity)
+
+    def test_empty_book(self):
+        index = DepthIndex([])
+
+        assert len(index) == 0
+        assert index.cost_to_fill(Decimal('1')) == Decimal(0)
+        assert index.max_quantity_for_budget(Decimal('1')) == Decimal(0)
@@ -0,0 +1,75 @@
+import pytest
+from decimal import Decimal
+import sys
+from pathlib import Path
+
+# Add parent directory to path to import from utils -
+# Docs: https://docs.pytest.org/en/latest/explanation/pythonpath.html
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from utils.depth_index import DepthIndex
+from utils.depth_ladder import DepthLadder, parse_width
+from utils.helper import merge_sorted_asks, merge_sorted_bids, calculate_buy_price, calculate_sell_price
+from utils.synthetic import generate_coinbase_book, generate_gemini_book, random_quantities
+
+
+@pytest.fixture(scope="module")
+def books():
+    return generate_coinbase_book(2000, seed=10), generate_gemini_book(300, seed=11)
+
+
+class TestDepthLadder:
+    @pytest.mark.parametrize('width', ['0.01', '1', '25', '1bp', '10bps'])
+    def test_matches_the_calculators(self, books, width):
+        coinbase_data, gemini_data = books
+        bids = DepthLadder(merge_sorted_bids(coinbase_data['bids'], gemini_data['bids']), width, descending=True)
+        asks = DepthLadder(merge_sorted_asks(coinbase_data['asks'], gemini_data['asks']), width)
+        index = DepthIndex(merge_sorted_bids(coinbase_data['bids'], gemini_data['bids']))
+
+        quantities = random_quantities(100, float(index.total_size), seed=3)
+        # exact level and bucket boundaries and a quantity deeper than the book
+        quantities += [index.cum_size[0], index.cum_size[10], bids.cum_size[0], bids.cum_size[len(bids) // 2],
+                       index.total_size, index.total_size * 2]
+
+        assert bids.total_size == index.total_size and bids.total_notional == index.total_notional
+        for quantity in quantities:
+            merged_bids = merge_sorted_bids(coinbase_data['bids'], gemini_data['bids'])
+            merged_asks = merge_sorted_asks(coinbase_data['asks'], gemini_data['asks'])
+            assert bids.cost_to_fill(quantity) == calculate_buy_price(merged_bids, quantity)
+            assert asks.cost_to_fill(quantity) == calculate_sell_price(merged_asks, quantity)
+
+    def test_buckets(self):
+        asks = DepthLadder([(Decimal('100.5'), Decimal('1')), (Decimal('101'), Decimal('2')),
+                            (Decimal('101.01'), Decimal('1')), (Decimal('104'), Decimal('0.5'))], '1')
+
+        # the bucket price is the worst price in it
+        assert [(bucket.price, bucket.size, bucket.levels) for bucket in asks.buckets()] == \
+               [(Decimal('101'), Decimal('3'), 2), (Decimal('102'), Decimal('1'), 1), (Decimal('104'), Decimal('0.5'), 1)]
+        assert asks.buckets()[0].notional == Decimal('302.5')
+        assert asks.buckets()[-1].cum_notional == Decimal('455.51')
+        assert asks.rows(depth=1) == [{'price': '101', 'size': '3', 'notional': '302.5', 'cum_size': '3',
+                                       'cum_notional': '302.5', 'levels': 2}]
+
+        bids = DepthLadder([(Decimal('101'), Decimal('1')), (Decimal('100.99'), Decimal('1')),
+                            (Decimal('100'), Decimal('1'))], Decimal('1'), descending=True)
+        assert [bucket.price for bucket in bids.buckets()] == [Decimal('101'), Decimal('100')]
+        assert [bucket.levels for bucket in bids.buckets()] == [1, 2]
+
+    def test_widths(self):
+        assert parse_width('5') == (Decimal('5'), False)
+        assert parse_width('2.5bp') == (Decimal('2.5'), True)
+        assert parse_width('10bps') == (Decimal('10'), True)
+        for invalid in ['0', '-1', 'wide', 'bp', 'NaN']:
+            with pytest.raises(ValueError):
+                parse_width(invalid)
+
+        # a basis point of the touch, on the touch price's tick and never narrower than one tick
+        assert DepthLadder([(Decimal('110000.00'), Decimal('1'))], '1bp').width == Decimal('11.00')
+        assert DepthLadder([(Decimal('1.00'), Decimal('1'))], '1bp').width == Decimal('0.01')
+
+    def test_empty_book(self):
+        ladder = DepthLadder([], '1bp')
+
+        assert len(ladder) == 0
+        assert ladder.cost_to_fill(Decimal('1')) == Decimal(0)
+        assert ladder.rows() == []
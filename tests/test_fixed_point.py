@@ -0,0 +1,132 @@
+import pytest
+from decimal import Decimal
+import sys
+from pathlib import Path
+
+# Add parent directory to path to import from utils -
+# Docs: https://docs.pytest.org/en/latest/explanation/pythonpath.html
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from utils.fixed_point import (to_scaled, from_scaled, merge_sorted_asks_fixed, merge_sorted_bids_fixed,
+                               calculate_buy_price_fixed, calculate_sell_price_fixed, merge_asks_fixed, scaled_levels)
+from utils.engines import ENGINES
+from utils.venues import COINBASE, GEMINI
+from utils.helper import merge_sorted_asks, merge_sorted_bids, calculate_buy_price, calculate_sell_price
+from utils.synthetic import generate_coinbase_book, generate_gemini_book, random_quantities
+
+
+def sub_cent_books():
+    # an ETH-BTC like book, priced below a cent: coinbase at 5 decimals, gemini at 6 with sizes finer than a satoshi
+    coinbase_data = {
+        'bids': [['0.03621', '1.25', 1], ['0.0362', '3', 2], ['0.03618', '0.5', 1]],
+        'asks': [['0.03622', '0.75', 1], ['0.03624', '2.5', 3], ['0.0363', '10', 4]],
+        'sequence': 1,
+    }
+    gemini_data = {
+        'bids': [{'price': '0.036212', 'amount': '0.4'}, {'price': '0.036195', 'amount': '0.123456789'}],
+        'asks': [{'price': '0.036215', 'amount': '0.3'}, {'price': '0.036231', 'amount': '1.000000001'}],
+    }
+    return coinbase_data, gemini_data
+
+
+class TestScaling:
+    def test_to_scaled(self):
+        assert to_scaled("110100.78", 2) == 11010078
+        assert to_scaled("110100", 2) == 11010000
+        assert to_scaled("110028.0", 2) == 11002800
+        assert to_scaled("0.00000856", 8) == 856
+        assert to_scaled("1.50000000000", 2) == 150
+
+    def test_too_many_decimals(self):
+        with pytest.raises(ValueError, match="more than 2 decimal places"):
+            to_scaled("110100.785", 2)
+
+    def test_from_scaled(self):
+        assert from_scaled(11010078, 2) == Decimal("110100.78")
+        assert from_scaled(856, 8) == Decimal("0.00000856")
+
+
+class TestFixedPointParity:
+    def check_parity(self, coinbase_data, gemini_data, quantities):
+        for quantity in quantities:
+            buy = calculate_buy_price(merge_sorted_bids(coinbase_data['bids'], gemini_data['bids']), quantity)
+            sell = calculate_sell_price(merge_sorted_asks(coinbase_data['asks'], gemini_data['asks']), quantity)
+
+            buy_fixed = calculate_buy_price_fixed(merge_sorted_bids_fixed(coinbase_data['bids'], gemini_data['bids']), quantity)
+            sell_fixed = calculate_sell_price_fixed(merge_sorted_asks_fixed(coinbase_data['asks'], gemini_data['asks']), quantity)
+
+            assert buy_fixed == buy
+            assert sell_fixed == sell
+            # what the CLIs print must be identical too
+            assert f"{buy_fixed:,.2f}" == f"{buy:,.2f}"
+            assert f"{sell_fixed:,.2f}" == f"{sell:,.2f}"
+
+    def test_fixtures(self, load_fixture):
+        # Test parity with the Decimal path on the bundled fixtures
+        quantities = [Decimal("0.00000001"), Decimal("0.5"), Decimal("1"), Decimal("10"), Decimal("101898.2")]
+        self.check_parity(load_fixture('coinbase.json'), load_fixture('gemini.json'), quantities)
+
+    def test_synthetic_book(self):
+        coinbase_data = generate_coinbase_book(3000, seed=5)
+        gemini_data = generate_gemini_book(500, seed=6)
+        self.check_parity(coinbase_data, gemini_data, random_quantities(50, 2000.0, seed=7))
+
+    def test_quantity_finer_than_sizes(self, load_fixture):
+        # Test a quantity with more decimals than the size scale
+        quantity = Decimal("0.123456789123")
+        self.check_parity(load_fixture('coinbase.json'), load_fixture('gemini.json'), [quantity])
+
+    def test_merge_order(self, load_fixture):
+        coinbase_data = load_fixture('coinbase.json')
+        gemini_data = load_fixture('gemini.json')
+
+        asks = list(merge_sorted_asks_fixed(coinbase_data['asks'], gemini_data['asks']))
+        bids = list(merge_sorted_bids_fixed(coinbase_data['bids'], gemini_data['bids']))
+
+        assert [from_scaled(price, 2) for price, _ in asks] == [price for price, _ in merge_sorted_asks(coinbase_data['asks'], gemini_data['asks'])]
+        assert [from_scaled(price, 2) for price, _ in bids] == [price for price, _ in merge_sorted_bids(coinbase_data['bids'], gemini_data['bids'])]
+
+
+class TestSubCentPrices:
+    QUANTITIES = [Decimal("0.1"), Decimal("1"), Decimal("2.2"), Decimal("5.123456789"), Decimal("100")]
+
+    def test_parity(self):
+        # Test that the scale widens for prices below a cent and sizes below a satoshi
+        coinbase_data, gemini_data = sub_cent_books()
+        TestFixedPointParity().check_parity(coinbase_data, gemini_data, self.QUANTITIES)
+
+    def test_bounded_merge_parity(self):
+        coinbase_data, gemini_data = sub_cent_books()
+        for quantity in self.QUANTITIES:
+            merged = merge_asks_fixed(COINBASE.levels(coinbase_data, 'asks'), GEMINI.levels(gemini_data, 'asks'), max_quantity=quantity)
+            expected = calculate_sell_price(merge_sorted_asks(coinbase_data['asks'], gemini_data['asks']), quantity)
+            assert calculate_sell_price_fixed(merged, quantity) == expected
+
+    def test_scale_of_the_merge(self):
+        coinbase_data, gemini_data = sub_cent_books()
+        merged = merge_sorted_asks_fixed(coinbase_data['asks'], gemini_data['asks'])
+        levels = scaled_levels(merged)
+
+        assert (merged.price_decimals, merged.size_decimals) == (6, 9)
+        assert [from_scaled(price, 6) for price, _ in levels] == [price for price, _ in merge_sorted_asks(coinbase_data['asks'], gemini_data['asks'])]
+        assert from_scaled(levels[-1][1], 9) == Decimal('10')
+
+    def test_invalid_level(self):
+        merged = merge_asks_fixed([('0.0362x', '1')])
+        with pytest.raises(ValueError, match="invalid literal"):
+            calculate_sell_price_fixed(merged, Decimal(1))
+
+    @pytest.mark.parametrize("engine_name", sorted(ENGINES))
+    def test_every_engine_like_the_clis(self, engine_name):
+        # Test --product ETH-BTC with every --engine, merged and priced the way the CLIs do it
+        coinbase_data, gemini_data = sub_cent_books()
+        engine = ENGINES[engine_name]
+        books = {COINBASE: coinbase_data, GEMINI: gemini_data}
+        for quantity in self.QUANTITIES:
+            merged_bids = engine.merge_bids(*(venue.levels(data, 'bids') for venue, data in books.items()), max_quantity=quantity)
+            merged_asks = engine.merge_asks(*(venue.levels(data, 'asks') for venue, data in books.items()), max_quantity=quantity)
+
+            assert engine.calculate_buy_price(merged_bids, quantity) == \
+                calculate_buy_price(merge_sorted_bids(coinbase_data['bids'], gemini_data['bids']), quantity)
+            assert engine.calculate_sell_price(merged_asks, quantity) == \
+                calculate_sell_price(merge_sorted_asks(coinbase_data['asks'], gemini_data['asks']), quantity)
@@ -0,0 +1,184 @@
+import pytest
+import time
+from decimal import Decimal
+import sys
+from pathlib import Path
+
+# Add parent directory to path to import from utils -
+# Docs: https://docs.pytest.org/en/latest/explanation/pythonpath.html
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from utils.data_loader import get_coinbase_data, get_gemini_data
+from utils.hedging import LastGoodBooks, VenueTimeout, fetch_books, hedged_fetch, parse_budgets
+from utils.helper import merge_asks, calculate_sell_price
+from utils.rate_limiter_dec import rate_limiter, TokenBucketTooEarly
+from utils.snapshot_store import SnapshotRecorder, latest_books
+from utils.venues import VenueAdapter, COINBASE, GEMINI, call_loader
+
+
+class StubVenue(VenueAdapter):
+    # a real venue's loader and payload shape behind its own rate budget, so tests and
+    # benchmarks do not share (or wait for) the 2 second budget of the real loaders
+    def __init__(self, adapter, loader, capacity=4, tokens_per_minute=6000.0):
+        self.name = adapter.name
+        self.display_name = adapter.display_name
+        self.adapter = adapter
+        self.loader = rate_limiter(capacity, tokens_per_minute, name=adapter.name)(loader.__wrapped__)
+
+    def fetch(self, API, wait=False, hedge=False, timeout=None, **kwargs):
+        return call_loader(self.loader, wait, API, hedge=hedge, timeout=timeout)
+
+    def parse_levels(self, levels):
+        return self.adapter.parse_levels(levels)
+
+    def from_levels(self, bids, asks, sequence=None):
+        return self.adapter.from_levels(bids, asks, sequence)
+
+
+def stub_venues(capacity=4, tokens_per_minute=6000.0):
+    return [StubVenue(COINBASE, get_coinbase_data, capacity, tokens_per_minute),
+            StubVenue(GEMINI, get_gemini_data, capacity, tokens_per_minute)]
+
+
+def urls(server):
+    return {'coinbase': server.url + '/coinbase', 'gemini': server.url + '/gemini'}
+
+
+class TestHedgedFetch:
+    def test_fast_venue_sends_one_request(self, stub_server, load_fixture):
+        venue = stub_venues()[0]
+
+        data, attempts = hedged_fetch(venue, stub_server.url + '/coinbase', budget=2.0, hedge_after=0.5)
+
+        assert data == load_fixture('coinbase.json')
+        assert attempts == 1
+        assert stub_server.requests == 1
+
+    def test_slow_request_is_hedged(self, stub_server, load_fixture):
+        venue = stub_venues()[0]
+        stub_server.inject('/coinbase', delay=2.0)
+
+        start = time.monotonic()
+        data, attempts = hedged_fetch(venue, stub_server.url + '/coinbase', budget=3.0, hedge_after=0.1)
+
+        assert time.monotonic() - start < 1.0
+        assert data == load_fixture('coinbase.json')
+        assert attempts == 2
+
+    def test_failed_request_is_retried_at_once(self, stub_server):
+        venue = stub_venues()[0]
+        stub_server.inject('/coinbase', status=503)
+
+        start = time.monotonic()
+        data, attempts = hedged_fetch(venue, stub_server.url + '/coinbase', budget=3.0, hedge_after=1.0)
+
+        assert time.monotonic() - start < 0.5
+        assert attempts == 2
+
+    def test_hedge_stays_inside_the_rate_budget(self, stub_server):
+        # one token every 2 seconds like the real loaders: the hedge is refused instead of waiting, and the budget decides
+        venue = stub_venues(capacity=1, tokens_per_minute=30.0)[0]
+        stub_server.inject('/coinbase', delay=1.0)
+
+        with pytest.raises(VenueTimeout, match="within 0.3 seconds"):
+            hedged_fetch(venue, stub_server.url + '/coinbase', budget=0.3, hedge_after=0.05)
+
+        assert stub_server.requests == 1
+        with pytest.raises(TokenBucketTooEarly):
+            venue.fetch(stub_server.url + '/coinbase')
+
+    def test_every_request_failing_raises_the_error(self, stub_server):
+        venue = stub_venues()[0]
+        stub_server.inject('/coinbase', status=500, count=2)
+
+        with pytest.raises(Exception, match="500"):
+            hedged_fetch(venue, stub_server.url + '/coinbase', budget=2.0, hedge_after=0.1)
+
+    def test_invalid_payload_counts_as_a_failure(self, stub_server):
+        stub_server.routes['/empty'] = b'{"bids": [], "asks": []}'
+
+        with pytest.raises(ValueError, match="No bids or asks found in Coinbase"):
+            hedged_fetch(stub_venues()[0], stub_server.url + '/empty', budget=1.0)
+
+    def test_loader_timeout(self, stub_server):
+        stub_server.inject('/gemini', delay=1.0)
+
+        start = time.monotonic()
+        with pytest.raises(Exception, match="timed out"):
+            get_gemini_data.__wrapped__(stub_server.url + '/gemini', timeout=0.2)
+        assert time.monotonic() - start < 0.9
+
+
+class TestFetchBooks:
+    def test_stale_book_with_its_age(self, stub_server, load_fixture):
+        venues = stub_venues()
+        last_good = LastGoodBooks()
+        fetch_books(venues, urls(stub_server), {None: 2.0}, last_good=last_good)
+        time.sleep(0.1)
+        stub_server.inject('/gemini', delay=2.0)
+
+        start = time.monotonic()
+        results = fetch_books(venues, urls(stub_server), {None: 2.0, 'gemini': 0.3}, last_good=last_good)
+
+        assert time.monotonic() - start < 1.0
+        coinbase, gemini = results[venues[0]], results[venues[1]]
+        assert not coinbase.stale and coinbase.age == 0.0
+        assert gemini.stale and gemini.age >= 0.1
+        assert gemini.data == load_fixture('gemini.json')
+        assert "within 0.3 seconds" in gemini.error
+
+    def test_too_old_book_is_left_out(self, stub_server, load_fixture):
+        venues = stub_venues()
+        last_good = LastGoodBooks()
+        last_good.store('gemini', load_fixture('gemini.json'), time.time_ns() - 120 * 10**9)
+        stub_server.inject('/gemini', status=500, count=2)
+
+        results = fetch_books(venues, urls(stub_server), {None: 1.0}, last_good=last_good, max_age=60.0)
+
+        assert results[venues[1]].data is None
+        assert "500" in results[venues[1]].error
+        assert results[venues[0]].data == load_fixture('coinbase.json')
+
+    def test_fallback_from_the_snapshot_file(self, tmp_path, load_fixture):
+        path = tmp_path / 'books.bin'
+        coinbase_data = load_fixture('coinbase.json')
+        gemini_data = load_fixture('gemini.json')
+        with SnapshotRecorder(path) as recorder:
+            recorder.record('gemini', {'bids': [{'price': '1.00', 'amount': '1'}], 'asks': [{'price': '2.00', 'amount': '1'}]}, 'BTC-USD')
+            recorder.record('coinbase', coinbase_data, 'BTC-USD', timestamp_ns=time.time_ns() - 5 * 10**9)
+            recorder.record('gemini', gemini_data, 'BTC-USD')
+            recorder.record('gemini', gemini_data, 'ETH-USD')
+
+        books = latest_books(path, 'BTC-USD')
+        last_good = LastGoodBooks.from_snapshot_file(path, 'BTC-USD')
+
+        # the newest book of each venue, back in the venue's shape, prices like the fetched one
+        for venue, data in ((COINBASE, coinbase_data), (GEMINI, gemini_data)):
+            restored = books[venue.name][0]
+            for side in ('bids', 'asks'):
+                assert [tuple(map(Decimal, level)) for level in venue.levels(restored, side)] == \
+                       [tuple(map(Decimal, level)) for level in venue.levels(data, side)]
+        assert books['coinbase'][0]['sequence'] == coinbase_data['sequence']
+        restored = [venue.levels(books[venue.name][0], 'asks') for venue in (COINBASE, GEMINI)]
+        assert calculate_sell_price(merge_asks(*restored), Decimal(1)) == \
+               calculate_sell_price(merge_asks(COINBASE.levels(coinbase_data, 'asks'), GEMINI.levels(gemini_data, 'asks')), Decimal(1))
+        assert 5.0 <= last_good.get('coinbase')[1] < 60.0
+
+    def test_late_answer_does_not_replace_a_newer_book(self):
+        last_good = LastGoodBooks()
+        last_good.store('gemini', {'new': True}, 2000)
+        last_good.store('gemini', {'new': False}, 1000)
+
+        assert last_good.get('gemini')[0] == {'new': True}
+
+
+class TestParseBudgets:
+    def test_default_and_per_venue(self):
+        assert parse_budgets(['1.5', 'gemini=0.4']) == {None: 1.5, 'gemini': 0.4}
+        assert parse_budgets(None) == {}
+
+    def test_invalid(self):
+        with pytest.raises(ValueError):
+            parse_budgets(['gemini=0'])
+        with pytest.raises(ValueError):
+            parse_budgets(['fast'])
@@ -0,0 +1,109 @@
+import pytest
+from decimal import Decimal
+import sys
+from pathlib import Path
+
+# Add parent directory to path to import from utils -
+# Docs: https://docs.pytest.org/en/latest/explanation/pythonpath.html
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from utils.depth_index import DepthIndex
+from utils.helper import merge_sorted_asks, merge_sorted_bids, calculate_buy_price, calculate_sell_price
+from utils.level_store import LevelBuffer, CompactDepth
+from utils.synthetic import generate_coinbase_book, generate_gemini_book, random_quantities
+from utils.venues import COINBASE, GEMINI
+
+
+@pytest.fixture(scope="module")
+def books():
+    return generate_coinbase_book(2000, seed=10), generate_gemini_book(300, seed=11)
+
+
+def compact_sides(coinbase_data, gemini_data):
+    bids = [LevelBuffer(COINBASE.levels(coinbase_data, 'bids')), LevelBuffer(GEMINI.levels(gemini_data, 'bids'))]
+    asks = [LevelBuffer(COINBASE.levels(coinbase_data, 'asks')), LevelBuffer(GEMINI.levels(gemini_data, 'asks'))]
+    return CompactDepth.merge(bids, reverse=True), CompactDepth.merge(asks)
+
+
+class TestLevelBuffer:
+    def test_scaled_levels(self):
+        buffer = LevelBuffer([("110100.78", "0.5"), ("110101", "3")])
+
+        assert (buffer.price_decimals, buffer.size_decimals) == (2, 8)
+        assert buffer.prices.tolist() == [11010078, 11010100]
+        assert buffer.sizes.tolist() == [50000000, 300000000]
+        assert buffer[0] == (Decimal("110100.78"), Decimal("0.5"))
+        assert buffer[-1] == (Decimal("110101"), Decimal("3"))
+        assert list(buffer.levels()) == [(Decimal("110100.78"), Decimal("0.5")), (Decimal("110101"), Decimal("3"))]
+        with pytest.raises(IndexError):
+            buffer[2]
+
+    def test_more_decimals_than_the_default_scale(self):
+        buffer = LevelBuffer([("0.00012345", "1.123456789"), ("0.0002", "2")])
+
+        assert (buffer.price_decimals, buffer.size_decimals) == (8, 9)
+        assert list(buffer.levels()) == [(Decimal("0.00012345"), Decimal("1.123456789")), (Decimal("0.0002"), Decimal("2"))]
+
+    def test_indexing(self):
+        buffer = LevelBuffer([("100.00", "1"), ("101.50", "0.5")])
+
+        assert buffer[-1] == (Decimal("101.5"), Decimal("0.5"))
+        with pytest.raises(IndexError):
+            buffer[2]
+
+
+class TestCompactDepth:
+    def test_matches_the_calculators(self, books):
+        coinbase_data, gemini_data = books
+        bids, asks = compact_sides(coinbase_data, gemini_data)
+        index = DepthIndex(merge_sorted_bids(coinbase_data['bids'], gemini_data['bids']))
+
+        quantities = random_quantities(200, float(index.total_size), seed=3)
+        # exact level boundaries, more decimals than the sizes and a quantity deeper than the book
+        quantities += [index.cum_size[0], index.cum_size[10], index.total_size, index.total_size * 2,
+                       Decimal('1.0000000001'), Decimal('0.123456789123')]
+
+        assert len(bids) == len(index)
+        assert bids.total_size == index.total_size and bids.total_notional == index.total_notional
+        for quantity in quantities:
+            merged_bids = merge_sorted_bids(coinbase_data['bids'], gemini_data['bids'])
+            merged_asks = merge_sorted_asks(coinbase_data['asks'], gemini_data['asks'])
+            assert bids.cost_to_fill(quantity) == calculate_buy_price(merged_bids, quantity)
+            assert asks.cost_to_fill(quantity) == calculate_sell_price(merged_asks, quantity)
+
+    def test_max_quantity_for_budget_matches_the_depth_index(self, books):
+        coinbase_data, gemini_data = books
+        _, asks = compact_sides(coinbase_data, gemini_data)
+        index = DepthIndex(merge_sorted_asks(coinbase_data['asks'], gemini_data['asks']))
+
+        budgets = [index.cost_to_fill(quantity) for quantity in random_quantities(50, float(index.total_size), seed=4)]
+        budgets += [Decimal('1'), index.cum_notional[5], index.total_notional, index.total_notional * 2]
+        for budget in budgets:
+            assert asks.max_quantity_for_budget(budget) == index.max_quantity_for_budget(budget)
+
+    def test_notional_beyond_int64(self):
+        # 10^7 ticks times 10^13 base units per level, far past 2^63 once summed
+        levels = [(10_000_000 + i, 10 ** 13) for i in range(10)]
+        depth = CompactDepth(levels)
+        index = DepthIndex((Decimal(price) / 100, Decimal(size) / 10 ** 8) for price, size in levels)
+
+        for quantity in [Decimal('150000.5'), Decimal('999999'), Decimal('10000000')]:
+            assert depth.cost_to_fill(quantity) == index.cost_to_fill(quantity)
+        assert depth.total_notional == index.total_notional
+
+    def test_venues_on_different_scales(self):
+        coarse = LevelBuffer([("100.5", "1"), ("102", "1")])
+        fine = LevelBuffer([("101.125", "0.000000001")])
+
+        depth = CompactDepth.merge([coarse, fine])
+
+        assert (depth.price_decimals, depth.size_decimals) == (3, 9)
+        merged = [(Decimal("100.5"), Decimal(1)), (Decimal("101.125"), Decimal("0.000000001")), (Decimal("102"), Decimal(1))]
+        assert depth.cost_to_fill(Decimal('1.5')) == calculate_sell_price(iter(merged), Decimal('1.5'))
+
+    def test_empty_book(self):
+        depth = CompactDepth()
+
+        assert len(depth) == 0
+        assert depth.cost_to_fill(Decimal('1')) == Decimal(0)
+        assert depth.max_quantity_for_budget(Decimal('1')) == Decimal(0)
@@ -0,0 +1,246 @@
+import pytest
+import asyncio
+import io
+import json
+import threading
+import urllib.request
+from decimal import Decimal
+import sys
+from pathlib import Path
+
+# Add parent directory to path to import from utils -
+# Docs: https://docs.pytest.org/en/latest/explanation/pythonpath.html
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from utils.metrics import Metrics, Histogram, METRICS, NULL_SPAN, serve_metrics
+from utils.rate_limiter_dec import rate_limiter, TokenBucketTooEarly
+from utils.data_loader import get_coinbase_data
+from utils.quote_service import QuoteService, create_server
+from tests.test_quote_service import StaticVenue
+from utils.venues import COINBASE, GEMINI
+
+
+@pytest.fixture
+def metrics():
+    # the global registry, enabled for one test and left clean for the others
+    stream = io.StringIO()
+    METRICS.reset()
+    METRICS.enable(stream)
+    yield METRICS
+    METRICS.disable()
+    METRICS.reset()
+    METRICS.log_stream = sys.stderr
+
+
+def log_lines(metrics):
+    return [json.loads(line) for line in metrics.log_stream.getvalue().splitlines()]
+
+
+class TestHistogram:
+    def test_bucket_bounds_are_inclusive(self):
+        histogram = Histogram((0.1, 1.0))
+        for value in (0.05, 0.1, 0.5, 1.0, 3.0):
+            histogram.observe(value)
+
+        assert histogram.counts == [2, 2, 1]
+        assert histogram.cumulative() == [2, 4, 5]
+        assert histogram.count == 5
+        assert histogram.sum == pytest.approx(4.65)
+
+
+class TestMetrics:
+    def test_disabled_spans_record_nothing(self):
+        metrics = Metrics()
+
+        with metrics.span('fetch', venue='coinbase') as span:
+            pass
+        metrics.increment('rate_limit_rejections', limiter='coinbase')
+
+        assert span is NULL_SPAN
+        assert metrics.histogram('fetch', venue='coinbase') is None
+        assert metrics.counter('rate_limit_rejections', limiter='coinbase') == 0
+        assert metrics.render_prometheus() == '\n'
+
+    def test_span_observes_per_labels(self):
+        metrics = Metrics(enabled=True)
+
+        for _ in range(3):
+            with metrics.span('merge', side='bids'):
+                pass
+        with metrics.span('merge', side='asks'):
+            pass
+
+        assert metrics.histogram('merge', side='bids').count == 3
+        assert metrics.histogram('merge', side='asks').count == 1
+
+    def test_span_records_when_the_stage_raises(self):
+        metrics = Metrics(enabled=True)
+
+        with pytest.raises(ValueError):
+            with metrics.span('parse', venue='gemini'):
+                raise ValueError("bad json")
+
+        assert metrics.histogram('parse', venue='gemini').count == 1
+
+    def test_prometheus_format(self):
+        metrics = Metrics(enabled=True, buckets=(0.1, 1.0))
+        metrics.observe('fetch', 0.5, (('venue', 'coinbase'),))
+        metrics.observe('fetch', 2.0, (('venue', 'coinbase'),))
+        metrics.increment('rate_limit_rejections', limiter='gemini')
+        metrics.increment('rate_limit_rejections', limiter='gemini')
+
+        lines = metrics.render_prometheus().splitlines()
+
+        assert '# TYPE orderbook_stage_seconds histogram' in lines
+        assert 'orderbook_stage_seconds_bucket{stage="fetch",venue="coinbase",le="0.1"} 0' in lines
+        assert 'orderbook_stage_seconds_bucket{stage="fetch",venue="coinbase",le="1.0"} 1' in lines
+        assert 'orderbook_stage_seconds_bucket{stage="fetch",venue="coinbase",le="+Inf"} 2' in lines
+        assert 'orderbook_stage_seconds_sum{stage="fetch",venue="coinbase"} 2.5' in lines
+        assert 'orderbook_stage_seconds_count{stage="fetch",venue="coinbase"} 2' in lines
+        assert '# TYPE orderbook_rate_limit_rejections_total counter' in lines
+        assert 'orderbook_rate_limit_rejections_total{limiter="gemini"} 2' in lines
+
+    def test_label_values_are_escaped(self):
+        metrics = Metrics(enabled=True)
+        metrics.increment('errors', venue='a"b')
+
+        assert 'orderbook_errors_total{venue="a\\"b"} 1' in metrics.render_prometheus()
+
+
+class TestTrace:
+    def test_one_json_line_per_quote(self, metrics):
+        with metrics.trace(product='BTC-USD', quantity=Decimal('10')):
+            with metrics.span('fetch', venue='coinbase'):
+                pass
+            with metrics.span('fill', side='buy'):
+                pass
+            with metrics.span('fill', side='buy'):
+                pass
+            metrics.annotate(buy=Decimal('1.5'))
+
+        with metrics.span('fetch', venue='coinbase'):
+            pass
+
+        [line] = log_lines(metrics)
+        assert line['event'] == 'quote'
+        assert line['product'] == 'BTC-USD'
+        assert line['quantity'] == '10'
+        assert line['buy'] == '1.5'
+        assert set(line['stages_ms']) == {'fetch.coinbase', 'fill.buy'}
+        assert 'error' not in line
+        # the span outside the trace is still in the histogram
+        assert metrics.histogram('fetch', venue='coinbase').count == 2
+
+    def test_failed_quote_logs_the_error(self, metrics):
+        with pytest.raises(RuntimeError):
+            with metrics.trace(product='BTC-USD'):
+                raise RuntimeError("venue down")
+
+        [line] = log_lines(metrics)
+        assert line['error'] == "venue down"
+
+    def test_async_tasks_report_to_the_trace(self, metrics):
+        async def stage(venue):
+            with metrics.span('fetch', venue=venue):
+                await asyncio.sleep(0)
+
+        async def quote():
+            with metrics.trace():
+                await asyncio.gather(stage('coinbase'), stage('gemini'))
+
+        asyncio.run(quote())
+
+        [line] = log_lines(metrics)
+        assert set(line['stages_ms']) == {'fetch.coinbase', 'fetch.gemini'}
+
+    def test_disabled_trace_writes_nothing(self):
+        stream = io.StringIO()
+        metrics = Metrics()
+        metrics.log_stream = stream
+
+        with metrics.trace(product='BTC-USD'):
+            metrics.annotate(buy=1)
+
+        assert stream.getvalue() == ''
+
+
+class TestInstrumentation:
+    def test_rate_limit_rejections_are_counted(self, metrics):
+        @rate_limiter(capacity=1, tokens_per_minute=1.0, name='venue')
+        def call():
+            return True
+
+        call()
+        with pytest.raises(TokenBucketTooEarly):
+            call()
+
+        assert metrics.counter('rate_limit_rejections', limiter='venue') == 1
+        assert metrics.histogram('rate_limit_wait', limiter='venue').count == 1
+
+    def test_async_rate_limit_rejections_are_counted(self, metrics):
+        @rate_limiter(capacity=1, tokens_per_minute=1.0)
+        async def call():
+            return True
+
+        async def run():
+            await call()
+            with pytest.raises(TokenBucketTooEarly):
+                await call()
+
+        asyncio.run(run())
+
+        # the function name is the label by default
+        assert metrics.counter('rate_limit_rejections', limiter='call') == 1
+
+    def test_loader_times_fetch_and_parse(self, metrics, stub_server):
+        get_coinbase_data.__wrapped__(stub_server.url + '/coinbase')
+
+        assert metrics.histogram('fetch', venue='coinbase').count == 1
+        assert metrics.histogram('parse', venue='coinbase').count == 1
+
+    def test_quote_service_serves_metrics(self, metrics, load_fixture):
+        venues = [StaticVenue(COINBASE, load_fixture('coinbase.json')), StaticVenue(GEMINI, load_fixture('gemini.json'))]
+        service = QuoteService(venues, {})
+        service.refresh()
+        service.quote('buy', Decimal('1'))
+
+        server = create_server(service, port=0)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        try:
+            with urllib.request.urlopen(f'http://127.0.0.1:{server.server_port}/metrics') as response:
+                content_type = response.headers['Content-Type']
+                body = response.read().decode()
+        finally:
+            server.shutdown()
+            server.server_close()
+            service.stop()
+
+        assert content_type.startswith('text/plain')
+        assert 'orderbook_stage_seconds_count{stage="merge",side="bids"} 1' in body
+        assert 'orderbook_stage_seconds_count{stage="fill",side="buy"} 1' in body
+
+    def test_unknown_sides_add_no_series(self, metrics, load_fixture):
+        venues = [StaticVenue(COINBASE, load_fixture('coinbase.json')), StaticVenue(GEMINI, load_fixture('gemini.json'))]
+        service = QuoteService(venues, {})
+        service.refresh()
+        service.stop()
+        series = len(metrics._histograms)
+
+        for index in range(100):
+            with pytest.raises(ValueError, match="Unknown side"):
+                service.quote(f'side{index}', Decimal('1'))
+
+        assert len(metrics._histograms) == series
+        assert metrics.histogram('fill', side='side0') is None
+
+    def test_serve_metrics(self, metrics):
+        metrics.increment('rate_limit_rejections', limiter='coinbase')
+        server = serve_metrics(0)
+        try:
+            with urllib.request.urlopen(f'http://127.0.0.1:{server.server_port}/metrics') as response:
+                body = response.read().decode()
+        finally:
+            server.shutdown()
+            server.server_close()
+
+        assert 'orderbook_rate_limit_rejections_total{limiter="coinbase"} 1' in body
@@ -0,0 +1,167 @@
+import pytest
+import time
+from decimal import Decimal
+import sys
+from pathlib import Path
+
+# Add parent directory to path to import from utils -
+# Docs: https://docs.pytest.org/en/latest/explanation/pythonpath.html
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from utils.helper import merge_sorted_asks, merge_sorted_bids, calculate_buy_price, calculate_sell_price
+from utils.multi_symbol import quote_products, format_table
+from utils.process_pricer import ProcessPricer
+from utils.rate_limiter_dec import rate_limiter, TokenBucketTooEarly
+from utils.venues import VenueAdapter, COINBASE, GEMINI, base_asset, call_loader
+
+
+class ProductVenue(VenueAdapter):
+    # serves one payload per url with the venue's rate budget (one call every 0.1 seconds)
+
+    def __init__(self, adapter, books):
+        self.name = adapter.name
+        self.display_name = adapter.display_name
+        self.adapter = adapter
+        self.books = books
+        self.calls = []
+
+        @rate_limiter(capacity=1, tokens_per_minute=600.0)
+        def load(API):
+            self.calls.append(time.monotonic())
+            if API not in self.books:
+                raise Exception(f"Error: 404 Client Error: Not Found for url: {API}")
+            return self.books[API]
+
+        self.load = load
+
+    def fetch(self, API, wait=False, **kwargs):
+        return call_loader(self.load, wait, API)
+
+    def parse_levels(self, levels):
+        return self.adapter.parse_levels(levels)
+
+
+@pytest.fixture
+def venues(load_fixture):
+    coinbase_data = load_fixture('coinbase.json')
+    gemini_data = load_fixture('gemini.json')
+    return [
+        ProductVenue(COINBASE, {f'coinbase/{base}-USD': coinbase_data for base in ('BTC', 'ETH', 'LTC')}),
+        ProductVenue(GEMINI, {f'gemini/{base}USD': gemini_data for base in ('BTC', 'ETH', 'LTC')}),
+    ]
+
+
+def apis_for(venues, products):
+    return {venue.name: {product: f"{venue.name}/{venue.adapter.symbol(product)}" for product in products} for venue in venues}
+
+
+class TestProductUrls:
+
+    def test_venue_symbols(self):
+        assert COINBASE.symbol('eth-usd') == 'ETH-USD'
+        assert GEMINI.symbol('eth-usd') == 'ETHUSD'
+        assert base_asset('SOL-USD') == 'SOL'
+
+    def test_default_templates(self, monkeypatch):
+        monkeypatch.delenv('COINBASE_API_TEMPLATE', raising=False)
+        monkeypatch.delenv('GEMINI_API_TEMPLATE', raising=False)
+        assert COINBASE.api_url('ETH-USD') == 'https://api.exchange.coinbase.com/products/ETH-USD/book?level=2'
+        assert GEMINI.api_url('ETH-USD') == 'https://api.gemini.com/v1/book/ETHUSD'
+
+    def test_template_from_environment(self, monkeypatch):
+        monkeypatch.setenv('GEMINI_API_TEMPLATE', 'http://127.0.0.1:9000/book/{symbol}')
+        assert GEMINI.api_url('SOL-USD') == 'http://127.0.0.1:9000/book/SOLUSD'
+
+    def test_no_product_uses_the_single_book_url(self, monkeypatch):
+        monkeypatch.setenv('COINBASE_API', 'http://127.0.0.1:9000/coinbase')
+        assert COINBASE.api_url() == 'http://127.0.0.1:9000/coinbase'
+
+
+class TestCallLoader:
+
+    def test_wait_shares_the_budget(self):
+        @rate_limiter(capacity=1, tokens_per_minute=600.0)
+        def load():
+            return time.monotonic()
+
+        first = call_loader(load, False)
+        with pytest.raises(TokenBucketTooEarly):
+            call_loader(load, False)
+
+        second = call_loader(load, True)
+        assert second - first >= 0.09
+
+
+class TestQuoteProducts:
+
+    def test_prices_match_the_single_product_path(self, venues, load_fixture):
+        coinbase_data = load_fixture('coinbase.json')
+        gemini_data = load_fixture('gemini.json')
+        products = ['BTC-USD', 'ETH-USD']
+        quantities = [Decimal('0.5'), Decimal('1'), Decimal('10')]
+
+        rows = quote_products(venues, products, quantities, apis=apis_for(venues, products))
+
+        assert [(row['product'], row['quantity']) for row in rows] == [(product, quantity) for product in products for quantity in quantities]
+        for row in rows:
+            assert row['error'] is None
+            assert row['buy'] == calculate_buy_price(merge_sorted_bids(coinbase_data['bids'], gemini_data['bids']), row['quantity'])
+            assert row['sell'] == calculate_sell_price(merge_sorted_asks(coinbase_data['asks'], gemini_data['asks']), row['quantity'])
+
+    def test_process_pricer_gives_the_same_rows(self, venues):
+        products = ['BTC-USD', 'ETH-USD', 'SOL-USD']
+        quantities = [Decimal('0.5'), Decimal('10')]
+        rows = quote_products(venues, products, quantities, apis=apis_for(venues, products))
+
+        # the second run waits for the venue budgets, the fetches wait instead of failing
+        with ProcessPricer(2) as pricer:
+            process_rows = quote_products(venues, products, quantities, apis=apis_for(venues, products), pricer=pricer)
+
+        assert process_rows == rows
+
+    def test_fetches_stay_within_each_venue_budget(self, venues):
+        products = ['BTC-USD', 'ETH-USD', 'LTC-USD']
+
+        start = time.monotonic()
+        rows = quote_products(venues, products, [Decimal('1')], apis=apis_for(venues, products))
+        elapsed = time.monotonic() - start
+
+        assert all(row['error'] is None for row in rows)
+        for venue in venues:
+            assert len(venue.calls) == 3
+            for earlier, later in zip(venue.calls, venue.calls[1:]):
+                assert later - earlier >= 0.09
+        # the venues are fetched side by side, not one after the other
+        assert elapsed < 0.35
+
+    def test_failed_product_does_not_stop_the_others(self, venues):
+        products = ['BTC-USD', 'SOL-USD', 'ETH-USD']
+
+        rows = quote_products(venues, products, [Decimal('1'), Decimal('2')], apis=apis_for(venues, products))
+
+        errors = {row['product'] for row in rows if row['error'] is not None}
+        assert errors == {'SOL-USD'}
+        assert all('404' in row['error'] for row in rows if row['product'] == 'SOL-USD')
+        assert len(rows) == 6
+
+    def test_duplicate_products_are_fetched_once(self, venues):
+        rows = quote_products(venues, ['BTC-USD', 'BTC-USD'], [Decimal('1')], apis=apis_for(venues, ['BTC-USD']))
+
+        assert len(rows) == 1
+        assert all(len(venue.calls) == 1 for venue in venues)
+
+    def test_invalid_book_is_reported(self, venues):
+        venues[1].books['gemini/BTCUSD'] = {'bids': [], 'asks': []}
+
+        rows = quote_products(venues, ['BTC-USD'], [Decimal('1')], apis=apis_for(venues, ['BTC-USD']))
+
+        assert rows[0]['error'] == "No bids or asks found in Gemini"
+
+    def test_format_table(self, venues):
+        rows = quote_products(venues, ['BTC-USD', 'SOL-USD'], [Decimal('1')], apis=apis_for(venues, ['BTC-USD', 'SOL-USD']))
+        table = format_table(rows).splitlines()
+
+        assert table[0].split() == ['product', 'qty', 'buy', 'sell']
+        assert table[1].split()[:2] == ['BTC-USD', '1']
+        assert table[1].split()[2].startswith('$')
+        assert 'Error:' in table[2]
@@ -0,0 +1,106 @@
+import pytest
+from decimal import Decimal
+import sys
+from pathlib import Path
+
+# Add parent directory to path to import from utils -
+# Docs: https://docs.pytest.org/en/latest/explanation/pythonpath.html
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from utils.orderbook import OrderBook
+from utils.replay import ReplayFeed, write_feed, snapshot_message, update_message
+from utils.helper import merge_sorted_asks, merge_sorted_bids, calculate_buy_price, calculate_sell_price
+
+
+class TestOrderBook:
+    def test_snapshot_matches_merge_order(self, load_fixture):
+        # Test that a book built from a snapshot iterates in the same order as the merge helpers
+        coinbase_data = load_fixture('coinbase.json')
+        book = OrderBook.from_coinbase(coinbase_data)
+
+        assert list(book.asks()) == list(merge_sorted_asks(coinbase_data['asks'], []))
+        assert list(book.bids()) == list(merge_sorted_bids(coinbase_data['bids'], []))
+        assert book.sequence == coinbase_data['sequence']
+
+    def test_gemini_snapshot(self, load_fixture):
+        gemini_data = load_fixture('gemini.json')
+        book = OrderBook.from_gemini(gemini_data)
+
+        assert book.best_bid() == (Decimal('110007.69'), Decimal('0.00362'))
+        assert book.best_ask() == (Decimal('110025.98'), Decimal('0.016117'))
+        assert book.depth('bids') == 5
+        assert book.depth('asks') == 4
+
+    def test_incremental_updates(self):
+        # Test insert, resize and delete of price levels
+        book = OrderBook('test')
+        book.load_snapshot([('100', '1'), ('99', '2')], [('101', '1'), ('102', '2')])
+
+        book.apply_update('bids', '100.5', '3')
+        assert book.best_bid() == (Decimal('100.5'), Decimal('3'))
+
+        book.apply_update('sell', '102', '5')
+        assert book.size_at('asks', '102') == Decimal('5')
+
+        # zero size removes the level
+        book.apply_update('asks', '101', '0')
+        assert book.best_ask() == (Decimal('102'), Decimal('5'))
+        assert book.depth('asks') == 1
+
+        # removing a level that does not exist is a no-op
+        book.apply_update('bids', '50', '0')
+        assert list(book.bids()) == [
+            (Decimal('100.5'), Decimal('3')),
+            (Decimal('100'), Decimal('1')),
+            (Decimal('99'), Decimal('2')),
+        ]
+
+    def test_stale_sequence_is_ignored(self):
+        book = OrderBook('test')
+        book.load_snapshot([('100', '1')], [('101', '1')], sequence=10)
+
+        assert book.apply_update('bids', '100', '5', sequence=9) is False
+        assert book.size_at('bids', '100') == Decimal('1')
+
+        assert book.apply_changes([['buy', '100', '5']], sequence=11) is True
+        assert book.size_at('bids', '100') == Decimal('5')
+        assert book.sequence == 11
+
+    def test_pricing_from_book(self):
+        # Test that the calculators work directly on the book iterators
+        book = OrderBook('test')
+        book.load_snapshot([('100', '1'), ('99', '2')], [('101', '1'), ('102', '2')])
+
+        assert calculate_buy_price(book.bids(), Decimal('2')) == Decimal('199')
+        assert calculate_sell_price(book.asks(), Decimal('2')) == Decimal('203')
+
+
+class TestReplayFeed:
+    def test_replay_matches_full_snapshot(self, tmp_path, load_fixture):
+        # Test that replaying updates ends in the same book as a fresh snapshot of the final state
+        coinbase_data = load_fixture('coinbase.json')
+        bids = [[price, size] for price, size, _ in coinbase_data['bids']]
+        asks = [[price, size] for price, size, _ in coinbase_data['asks']]
+
+        path = tmp_path / 'feed.jsonl'
+        write_feed(path, [
+            snapshot_message(bids, asks, sequence=1),
+            update_message([['buy', '110100.78', '0'], ['buy', '110100.80', '0.5']], sequence=2),
+            update_message([['sell', '110100.79', '0.1']], sequence=3),
+            # out of order message, should be dropped
+            update_message([['sell', '110100.79', '9']], sequence=2),
+        ])
+
+        book = ReplayFeed(path).build('coinbase')
+
+        assert book.sequence == 3
+        assert book.best_bid() == (Decimal('110100.80'), Decimal('0.5'))
+        assert book.best_ask() == (Decimal('110100.79'), Decimal('0.1'))
+        assert book.size_at('bids', '110100.78') == Decimal(0)
+
+    def test_unknown_message(self, tmp_path):
+        path = tmp_path / 'feed.jsonl'
+        write_feed(path, [{'type': 'heartbeat'}])
+
+        with pytest.raises(ValueError, match="Unknown message type"):
+            ReplayFeed(path).build('coinbase')
@@ -0,0 +1,140 @@
+import pytest
+from decimal import Decimal, InvalidOperation
+from multiprocessing import shared_memory
+import sys
+from pathlib import Path
+
+# Add parent directory to path to import from utils -
+# Docs: https://docs.pytest.org/en/latest/explanation/pythonpath.html
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import utils.process_pricer as process_pricer
+from utils.engines import ENGINES
+from utils.process_pricer import ProcessPricer, pack_books, FIRST_CHUNK
+from utils.synthetic import generate_coinbase_book, generate_gemini_book
+from utils.venues import COINBASE, GEMINI
+
+QUANTITIES = [Decimal('0.1'), Decimal('0.5'), Decimal('1'), Decimal('10'), Decimal('1000')]
+
+
+def expected_prices(engine, books, quantities):
+    buys = [engine.calculate_buy_price(engine.merge_bids(COINBASE.levels(books['coinbase'], 'bids'), GEMINI.levels(books['gemini'], 'bids')), quantity)
+            for quantity in quantities]
+    sells = [engine.calculate_sell_price(engine.merge_asks(COINBASE.levels(books['coinbase'], 'asks'), GEMINI.levels(books['gemini'], 'asks')), quantity)
+             for quantity in quantities]
+    return buys, sells
+
+
+@pytest.fixture(scope='module')
+def pricer():
+    # the workers are started once for the whole module
+    with ProcessPricer(2) as pricer:
+        yield pricer
+
+
+@pytest.fixture
+def books(load_fixture):
+    return {'coinbase': load_fixture('coinbase.json'), 'gemini': load_fixture('gemini.json')}
+
+
+class TestPackBooks:
+
+    def test_layout_points_at_each_side(self, books):
+        shm, layout = pack_books([books, books])
+        try:
+            assert len(layout) == 2
+            for book_layout in layout:
+                for side in ('bids', 'asks'):
+                    assert [entry[0] for entry in book_layout[side]] == ['coinbase', 'gemini']
+                    for name, prices, sizes, end in book_layout[side]:
+                        venue = COINBASE if name == 'coinbase' else GEMINI
+                        levels = list(venue.levels(books[name], side))
+                        assert bytes(shm.buf[prices:sizes]).decode().split('\n') == [price for price, _ in levels]
+                        assert bytes(shm.buf[sizes:end]).decode().split('\n') == [size for _, size in levels]
+        finally:
+            shm.close()
+            shm.unlink()
+
+    def test_sides_are_cut_at_the_largest_quantity(self, books):
+        shm, layout = pack_books([books], Decimal('0.1'))
+        try:
+            for side in ('bids', 'asks'):
+                for name, _, sizes, end in layout[0][side]:
+                    venue = COINBASE if name == 'coinbase' else GEMINI
+                    levels = [Decimal(size) for _, size in venue.levels(books[name], side)]
+                    count = len(bytes(shm.buf[sizes:end]).decode().split('\n'))
+                    # enough levels for 0.1 from this venue alone, and not one more
+                    assert sum(levels[:count]) >= Decimal('0.1') or count == len(levels)
+                    assert sum(levels[:count - 1]) < Decimal('0.1')
+        finally:
+            shm.close()
+            shm.unlink()
+
+    def test_levels_past_the_cut_are_never_read(self):
+        # the cut happens before anything is converted, a small quantity only reads the first chunk
+        good = [[str(100 + step), '0.01', 1] for step in range(FIRST_CHUNK)]
+        books = {'coinbase': {'bids': good + [['bad', 'bad', 1]] * 1000, 'asks': good + [['bad', 'bad', 1]] * 1000}}
+        shm, layout = pack_books([books], Decimal('0.05'))
+        try:
+            [(_, prices, sizes, _)] = layout[0]['asks']
+            packed = bytes(shm.buf[prices:sizes]).decode().split('\n')
+            # the float cut may keep one level past the exact one
+            assert packed[:5] == ['100', '101', '102', '103', '104'] and len(packed) <= 6
+        finally:
+            shm.close()
+            shm.unlink()
+
+
+class TestProcessPricer:
+
+    def test_matches_the_decimal_engine(self, pricer, books):
+        assert pricer.price(books, QUANTITIES) == expected_prices(ENGINES['decimal'], books, QUANTITIES)
+
+    @pytest.mark.parametrize('engine_name', sorted(ENGINES))
+    def test_every_engine_agrees(self, pricer, engine_name, books):
+        assert pricer.price(books, QUANTITIES) == expected_prices(ENGINES[engine_name], books, QUANTITIES)
+
+    def test_sub_cent_books(self, pricer):
+        # venues with different price and size scales in one merge
+        books = {
+            'coinbase': {'bids': [['0.03621', '1.25', 1], ['0.0362', '3', 2]], 'asks': [['0.03622', '0.75', 1], ['0.03624', '2.5', 3]]},
+            'gemini': {'bids': [{'price': '0.036212', 'amount': '0.4'}, {'price': '0.036195', 'amount': '0.123456789'}],
+                       'asks': [{'price': '0.036215', 'amount': '0.3'}, {'price': '0.036231', 'amount': '1.000000001'}]},
+        }
+        quantities = [Decimal('0.5'), Decimal('2'), Decimal('100')]
+        assert pricer.price(books, quantities) == expected_prices(ENGINES['decimal'], books, quantities)
+
+    def test_large_synthetic_books(self, pricer):
+        books = {'coinbase': generate_coinbase_book(5000, seed=3), 'gemini': generate_gemini_book(500, seed=4)}
+        assert pricer.price(books, QUANTITIES) == expected_prices(ENGINES['decimal'], books, QUANTITIES)
+
+    def test_price_many_keeps_the_book_order(self, pricer):
+        many = [{'coinbase': generate_coinbase_book(200, seed=seed), 'gemini': generate_gemini_book(50, seed=seed)} for seed in range(4)]
+
+        results = pricer.price_many(many, [Decimal('1')])
+
+        assert results == [expected_prices(ENGINES['decimal'], books, [Decimal('1')]) for books in many]
+
+    def test_shared_memory_is_released(self, pricer, books, monkeypatch):
+        names = []
+
+        def recording_pack_books(books, max_quantity=None):
+            shm, layout = pack_books(books, max_quantity)
+            names.append(shm.name)
+            return shm, layout
+
+        monkeypatch.setattr(process_pricer, 'pack_books', recording_pack_books)
+        pricer.price(books, [Decimal('1')])
+
+        with pytest.raises(FileNotFoundError):
+            shared_memory.SharedMemory(name=names[0])
+
+    def test_worker_errors_reach_the_caller(self, pricer):
+        # the strings are only converted in the workers
+        books = {'coinbase': {'bids': [['not a price', '1', 1]], 'asks': [['2', '1', 1]]}}
+        with pytest.raises(InvalidOperation):
+            pricer.price(books, [Decimal('1')])
+
+    def test_deep_quantities_past_the_book(self, pricer, books):
+        quantities = [Decimal('1'), Decimal('1000000')]
+        assert pricer.price(books, quantities) == expected_prices(ENGINES['decimal'], books, quantities)
@@ -0,0 +1,122 @@
+import pytest
+from decimal import Decimal
+import sys
+from pathlib import Path
+
+# Add parent directory to path to import from utils -
+# Docs: https://docs.pytest.org/en/latest/explanation/pythonpath.html
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from utils.quote_cache import QuoteCache
+from utils.quote_service import QuoteService
+from utils.venues import COINBASE, GEMINI
+from tests.test_quote_service import StaticVenue
+
+
+class Counter:
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, side, quantity):
+        self.calls += 1
+        return quantity * 2
+
+
+class TestQuoteCache:
+    def test_validation(self):
+        with pytest.raises(ValueError, match="Value must be greater than 0"):
+            QuoteCache(0)
+
+    def test_hits_and_misses(self):
+        cache = QuoteCache(8)
+        cache.invalidate(1)
+        compute = Counter()
+
+        assert cache.get_or_compute(1, 'buy', Decimal(10), compute) == Decimal(20)
+        assert cache.get_or_compute(1, 'buy', Decimal("10.0"), compute) == Decimal(20)
+        assert cache.get_or_compute(1, 'sell', Decimal(10), compute) == Decimal(20)
+
+        assert compute.calls == 2
+        assert cache.stats()['hits'] == 1
+        assert cache.stats()['misses'] == 2
+
+    def test_new_version_invalidates(self):
+        cache = QuoteCache(8)
+        cache.invalidate(1)
+        compute = Counter()
+
+        cache.get_or_compute(1, 'buy', Decimal(1), compute)
+        cache.invalidate(2)
+        assert len(cache) == 0
+
+        cache.get_or_compute(2, 'buy', Decimal(1), compute)
+        assert compute.calls == 2
+        assert cache.stats()['invalidations'] == 1
+
+    def test_stale_version_is_not_stored(self):
+        # Test that a reader still holding an older book does not pollute the cache
+        cache = QuoteCache(8)
+        cache.invalidate(2)
+        compute = Counter()
+
+        cache.get_or_compute(1, 'buy', Decimal(1), compute)
+        cache.get_or_compute(1, 'buy', Decimal(1), compute)
+
+        assert compute.calls == 2
+        assert len(cache) == 0
+        assert cache.version == 2
+
+    def test_lru_eviction(self):
+        cache = QuoteCache(2)
+        cache.invalidate(1)
+        compute = Counter()
+
+        cache.get_or_compute(1, 'buy', Decimal(1), compute)
+        cache.get_or_compute(1, 'buy', Decimal(2), compute)
+        # touch 1 so 2 is the least recently used
+        cache.get_or_compute(1, 'buy', Decimal(1), compute)
+        cache.get_or_compute(1, 'buy', Decimal(3), compute)
+
+        assert len(cache) == 2
+        assert cache.stats()['evictions'] == 1
+
+        cache.get_or_compute(1, 'buy', Decimal(1), compute)
+        assert compute.calls == 3
+        cache.get_or_compute(1, 'buy', Decimal(2), compute)
+        assert compute.calls == 4
+
+
+class TestServiceCache:
+    def test_service_uses_cache(self, load_fixture):
+        venues = [StaticVenue(COINBASE, load_fixture('coinbase.json')), StaticVenue(GEMINI, load_fixture('gemini.json'))]
+        service = QuoteService(venues, {})
+        service.refresh()
+
+        first = service.quote('buy', Decimal(1))
+        second = service.quote('buy', Decimal(1))
+
+        assert first['price'] == second['price']
+        assert service.status()['cache']['hits'] == 1
+
+        # gemini sends no sequence, so every refresh is a new book
+        service.refresh()
+        service.quote('buy', Decimal(1))
+        assert service.status()['cache']['misses'] == 2
+
+    def test_unchanged_sequences_keep_cache(self, load_fixture):
+        # Test that a refresh with the same sequence on every venue keeps the cached quotes
+        gemini_data = {**load_fixture('gemini.json'), 'sequence': 7}
+        venues = [StaticVenue(COINBASE, load_fixture('coinbase.json')), StaticVenue(GEMINI, gemini_data)]
+        service = QuoteService(venues, {})
+
+        service.refresh()
+        service.quote('sell', Decimal(1))
+        service.refresh()
+        service.quote('sell', Decimal(1))
+        assert service.status()['cache']['hits'] == 1
+
+        venues[1].data = {**gemini_data, 'sequence': 8}
+        service.refresh()
+        service.quote('sell', Decimal(1))
+        assert service.status()['cache']['hits'] == 1
+        assert service.status()['cache']['invalidations'] == 1
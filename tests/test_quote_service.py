@@ -0,0 +1,201 @@
+import pytest
+import json
+import time
+import threading
+import urllib.request
+import urllib.error
+from decimal import Decimal
+import sys
+from pathlib import Path
+
+# Add parent directory to path to import from utils -
+# Docs: https://docs.pytest.org/en/latest/explanation/pythonpath.html
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from utils.quote_service import QuoteService, create_server
+from utils.venues import VenueAdapter, COINBASE, GEMINI
+from utils.helper import merge_sorted_asks, merge_sorted_bids, calculate_buy_price, calculate_sell_price
+
+
+class StaticVenue(VenueAdapter):
+    # serves a payload from memory in the shape of another venue, no rate limit
+    def __init__(self, adapter, data):
+        self.name = adapter.name
+        self.display_name = adapter.display_name
+        self.adapter = adapter
+        self.data = data
+        self.calls = 0
+
+    def fetch(self, API, **kwargs):
+        self.calls += 1
+        return self.data
+
+    def parse_levels(self, levels):
+        return self.adapter.parse_levels(levels)
+
+
+@pytest.fixture
+def venues(load_fixture):
+    return [StaticVenue(COINBASE, load_fixture('coinbase.json')), StaticVenue(GEMINI, load_fixture('gemini.json'))]
+
+
+class TestQuoteService:
+    @pytest.mark.parametrize('compact', [False, True])
+    def test_quote_from_cached_book(self, venues, compact, load_fixture):
+        coinbase_data = load_fixture('coinbase.json')
+        gemini_data = load_fixture('gemini.json')
+        service = QuoteService(venues, {}, compact=compact)
+
+        with pytest.raises(LookupError):
+            service.quote('buy', Decimal(1))
+
+        service.refresh()
+
+        for quantity in [Decimal("0.1"), Decimal("1"), Decimal("10")]:
+            buy = service.quote('buy', quantity)
+            sell = service.quote('sell', quantity)
+            assert Decimal(buy['price']) == calculate_buy_price(merge_sorted_bids(coinbase_data['bids'], gemini_data['bids']), quantity)
+            assert Decimal(sell['price']) == calculate_sell_price(merge_sorted_asks(coinbase_data['asks'], gemini_data['asks']), quantity)
+            assert buy['version'] == 1
+            assert buy['sequences'] == {'coinbase': coinbase_data['sequence'], 'gemini': None}
+
+        # quotes do not fetch again
+        assert venues[0].calls == 1
+
+    def test_refresh_bumps_version(self, venues):
+        service = QuoteService(venues, {})
+        service.refresh()
+        before = service.quote('buy', Decimal("0.01"))
+
+        venues[0].data = {**venues[0].data, 'bids': [["120000.00", "5", 1]], 'sequence': 2}
+        service.refresh()
+        after = service.quote('buy', Decimal("0.01"))
+
+        assert after['version'] == before['version'] + 1
+        assert Decimal(after['price']) == Decimal("1200")
+
+    def test_failed_refresh_keeps_last_book(self, venues):
+        service = QuoteService(venues, {}, interval=0.05)
+        service.refresh()
+
+        venues[1].data = {'bids': [], 'asks': []}
+        service.start()
+        time.sleep(0.2)
+        service.stop()
+
+        assert "No bids or asks found in Gemini" in service.status()['last_error']
+        assert service.quote('sell', Decimal(1))['version'] == 1
+
+    def test_background_refresh(self, venues):
+        service = QuoteService(venues, {}, interval=0.05).start()
+        time.sleep(0.3)
+        service.stop()
+
+        assert service.book.version >= 3
+
+    def test_quote_latency(self, venues):
+        # Test that quotes from the cached book stay well under a millisecond
+        service = QuoteService(venues, {})
+        service.refresh()
+
+        count = 2000
+        start = time.perf_counter()
+        for i in range(count):
+            service.quote('buy' if i % 2 else 'sell', Decimal(i % 50 + 1) / 10)
+        assert (time.perf_counter() - start) / count < 0.001
+
+
+class TestQuoteServer:
+    @pytest.fixture
+    def server(self, venues):
+        service = QuoteService(venues, {})
+        service.refresh()
+        server = create_server(service, port=0)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        host, port = server.server_address
+        yield f"http://{host}:{port}"
+        server.shutdown()
+        server.server_close()
+
+    def get(self, url):
+        try:
+            with urllib.request.urlopen(url) as response:
+                return response.status, json.loads(response.read())
+        except urllib.error.HTTPError as e:
+            return e.code, json.loads(e.read())
+
+    def test_quote_endpoint(self, server):
+        status, body = self.get(server + '/quote?side=sell&qty=0.5')
+
+        assert status == 200
+        assert body['side'] == 'sell'
+        assert body['version'] == 1
+        assert f"{Decimal(body['price']):,.2f}" == "55,013.97"
+
+    def test_status_endpoint(self, server):
+        status, body = self.get(server + '/status')
+
+        assert status == 200
+        assert body['bids'] == 10
+        assert body['asks'] == 8
+
+    def test_bad_requests(self, server):
+        assert self.get(server + '/quote?side=hold&qty=1')[0] == 400
+        assert self.get(server + '/quote?side=buy&qty=abc')[0] == 400
+        assert self.get(server + '/quote?side=buy&qty=-1')[0] == 400
+        assert self.get(server + '/missing')[0] == 404
+
+    @pytest.mark.parametrize('compact', [False, True])
+    @pytest.mark.parametrize('qty', ['Infinity', '-Infinity', 'NaN', 'sNaN'])
+    def test_non_finite_quantities(self, venues, compact, qty):
+        service = QuoteService(venues, {}, compact=compact)
+        service.refresh()
+        server = create_server(service, port=0)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        try:
+            status, body = self.get(f"http://127.0.0.1:{server.server_port}/quote?side=buy&qty={qty}")
+        finally:
+            server.shutdown()
+            server.server_close()
+            service.stop()
+
+        assert status == 400
+        assert body['error'] == "Quantity must be positive"
+
+    def test_unexpected_errors_answer_500(self, venues, monkeypatch):
+        service = QuoteService(venues, {})
+        service.refresh()
+
+        def broken(side, quantity):
+            raise OverflowError("int too big to convert")
+
+        monkeypatch.setattr(service, 'quote', broken)
+        server = create_server(service, port=0)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        url = f"http://127.0.0.1:{server.server_port}"
+        try:
+            status, body = self.get(url + '/quote?side=buy&qty=1')
+            # the server is still up
+            assert self.get(url + '/status')[0] == 200
+        finally:
+            server.shutdown()
+            server.server_close()
+            service.stop()
+
+        assert status == 500
+        assert body['error'] == "OverflowError: int too big to convert"
+
+    def test_ladder_endpoint(self, server):
+        status, body = self.get(server + '/ladder?side=asks&width=10&depth=2')
+
+        assert status == 200
+        assert body['width'] == '10'
+        assert len(body['buckets']) == 2
+        assert Decimal(body['buckets'][0]['price']) % 10 == 0
+        assert body['buckets'][1]['cum_size'] == str(Decimal(body['buckets'][0]['size']) + Decimal(body['buckets'][1]['size']))
+
+        assert self.get(server + '/ladder?side=buy')[0] == 400
+        assert self.get(server + '/ladder?width=0')[0] == 400
+        assert self.get(server + '/ladder?width=wide')[0] == 400
+        assert self.get(server + '/ladder?depth=0')[0] == 400
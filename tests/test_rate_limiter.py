@@ -1,5 +1,9 @@
 import pytest
+import asyncio
+import multiprocessing
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from decimal import Decimal
 import sys
 from pathlib import Path
@@ -8,7 +12,28 @@ from pathlib import Path
 # Docs: https://docs.pytest.org/en/latest/explanation/pythonpath.html
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from utils.rate_limiter_dec import rate_limiter, TokenBucketTooEarly
+from utils.rate_limiter_dec import rate_limiter, TokenBucketTooEarly, TokenBucket, FileTokenBucket
+
+
+def assert_within_rate(grant_times, capacity, tokens_per_second, tolerance=0.02):
+    # the n-th grant can not come earlier than the refill of the n - capacity tokens after the burst
+    grant_times = sorted(grant_times)
+    for n, grant_time in enumerate(grant_times):
+        earliest = (n + 1 - capacity) / tokens_per_second
+        assert grant_time - grant_times[0] >= earliest - tolerance, f"grant {n + 1} came too early"
+
+
+def acquire_from_file(path, count, block):
+    # runs in a worker process, returns the monotonic time of every granted token
+    bucket = FileTokenBucket(path, capacity=4, tokens_per_minute=1200.0)
+    grants = []
+    for _ in range(count):
+        try:
+            bucket.acquire(block=block)
+            grants.append(time.monotonic())
+        except TokenBucketTooEarly:
+            pass
+    return grants
 
 
 class TestRateLimiter:
@@ -150,6 +175,292 @@ class TestRateLimiter:
         assert func2() == 2
     
 
+class TestBlockingAcquire:
+
+    def test_block_waits_for_the_token(self):
+        @rate_limiter(capacity=1, tokens_per_minute=600.0, block=True)  # one token every 0.1 seconds
+        def test_func():
+            return time.monotonic()
+
+        first = test_func()
+        second = test_func()
+        assert second - first >= 0.09
+
+    def test_deadline_raises_without_waiting(self):
+        @rate_limiter(capacity=1, tokens_per_minute=30.0, block=True, timeout=0.1)
+        def test_func():
+            return "success"
+
+        assert test_func() == "success"
+
+        start = time.monotonic()
+        with pytest.raises(TokenBucketTooEarly, match="Insufficient tokens"):
+            test_func()
+        # the 2 second wait is over the deadline, so it is not slept first
+        assert time.monotonic() - start < 0.1
+
+    def test_deadline_that_covers_the_wait_succeeds(self):
+        @rate_limiter(capacity=1, tokens_per_minute=600.0, block=True, timeout=0.5)
+        def test_func():
+            return "success"
+
+        assert test_func() == "success"
+        assert test_func() == "success"
+
+    def test_failed_call_does_not_take_tokens(self):
+        bucket = TokenBucket(capacity=2, tokens_per_minute=30.0)
+        bucket.acquire()
+        with pytest.raises(TokenBucketTooEarly):
+            bucket.acquire(cost=2)
+        bucket.acquire()
+
+    def test_weighted_cost(self):
+        @rate_limiter(capacity=5, tokens_per_minute=60.0, cost=lambda levels: levels)
+        def test_func(levels):
+            return levels
+
+        assert test_func(3) == 3
+        assert test_func(2) == 2
+        with pytest.raises(TokenBucketTooEarly):
+            test_func(1)
+
+    def test_cost_validation(self):
+        bucket = TokenBucket(capacity=2, tokens_per_minute=60.0)
+        with pytest.raises(ValueError, match="Cost must not exceed capacity"):
+            bucket.acquire(cost=3, block=True)
+        with pytest.raises(ValueError, match="Value must be greater than 0"):
+            bucket.acquire(cost=0)
+
+    def test_many_threads_fail_fast(self):
+        bucket = TokenBucket(capacity=10, tokens_per_minute=1.0)
+        barrier = threading.Barrier(50)
+
+        def worker():
+            barrier.wait()
+            try:
+                bucket.acquire()
+                return True
+            except TokenBucketTooEarly:
+                return False
+
+        with ThreadPoolExecutor(max_workers=50) as executor:
+            results = list(executor.map(lambda _: worker(), range(50)))
+
+        assert results.count(True) == 10
+
+    def test_many_threads_blocking_respect_the_rate(self):
+        capacity, tokens_per_minute = 5, 1200.0  # 20 tokens per second after a burst of 5
+        bucket = TokenBucket(capacity, tokens_per_minute)
+
+        def worker():
+            bucket.acquire(block=True)
+            return time.monotonic()
+
+        start = time.monotonic()
+        with ThreadPoolExecutor(max_workers=25) as executor:
+            grants = list(executor.map(lambda _: worker(), range(25)))
+        elapsed = time.monotonic() - start
+
+        assert len(grants) == 25
+        assert_within_rate(grants, capacity, tokens_per_minute / 60.0)
+        # 20 tokens past the burst at 20 per second, and not much more than that
+        assert 0.95 <= elapsed < 1.5
+
+    def test_async_waits_on_the_event_loop(self):
+        calls = []
+
+        @rate_limiter(capacity=2, tokens_per_minute=1200.0, block=True)
+        async def fetch():
+            calls.append(time.monotonic())
+
+        async def ticker():
+            # keeps running while the fetches wait, so the loop is not blocked
+            ticks = 0
+            while len(calls) < 6:
+                ticks += 1
+                await asyncio.sleep(0.01)
+            return ticks
+
+        async def run():
+            return await asyncio.gather(ticker(), *(fetch() for _ in range(6)))
+
+        ticks = asyncio.run(run())[0]
+
+        assert len(calls) == 6
+        assert_within_rate(calls, 2, 20.0)
+        assert ticks > 5
+
+    def test_async_fail_fast(self):
+        @rate_limiter(capacity=1, tokens_per_minute=30.0)
+        async def fetch():
+            return "success"
+
+        assert asyncio.run(fetch()) == "success"
+        with pytest.raises(TokenBucketTooEarly):
+            asyncio.run(fetch())
+
+
+class TestBatchedGrants:
+
+    def test_batch_never_exceeds_the_budget(self):
+        @rate_limiter(capacity=10, tokens_per_minute=1.0, batch=4)
+        def test_func():
+            return "success"
+
+        results = []
+        for _ in range(20):
+            try:
+                results.append(test_func())
+            except TokenBucketTooEarly:
+                pass
+
+        assert len(results) == 10
+
+    def test_batch_tokens_stay_with_their_thread(self):
+        bucket = TokenBucket(capacity=8, tokens_per_minute=1.0, batch=8)
+        # the first call takes the whole bucket for this thread
+        bucket.acquire()
+
+        def other_thread():
+            try:
+                bucket.acquire()
+                return True
+            except TokenBucketTooEarly:
+                return False
+
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            assert executor.submit(other_thread).result() is False
+
+        for _ in range(7):
+            bucket.acquire()
+        with pytest.raises(TokenBucketTooEarly):
+            bucket.acquire()
+
+    def test_many_threads_with_batches_fail_fast(self):
+        bucket = TokenBucket(capacity=32, tokens_per_minute=1.0, batch=4)
+        granted = []
+        lock = threading.Lock()
+
+        def worker():
+            for _ in range(10):
+                try:
+                    bucket.acquire()
+                    with lock:
+                        granted.append(1)
+                except TokenBucketTooEarly:
+                    pass
+
+        with ThreadPoolExecutor(max_workers=16) as executor:
+            for future in [executor.submit(worker) for _ in range(16)]:
+                future.result()
+
+        assert len(granted) <= 32
+
+    def test_batch_validation(self):
+        with pytest.raises(ValueError, match="Value must be greater than 0"):
+            TokenBucket(capacity=1, tokens_per_minute=1.0, batch=0)
+
+
+class TestSharedBucket:
+
+    def test_decorators_with_the_same_path_share_the_budget(self, tmp_path):
+        path = tmp_path / 'venue.bucket'
+
+        @rate_limiter(capacity=2, tokens_per_minute=30.0, path=path)
+        def func1():
+            return 1
+
+        @rate_limiter(capacity=2, tokens_per_minute=30.0, path=path)
+        def func2():
+            return 2
+
+        assert func1() == 1
+        assert func2() == 2
+        with pytest.raises(TokenBucketTooEarly):
+            func1()
+
+    def test_threads_share_a_file_bucket(self, tmp_path):
+        bucket = FileTokenBucket(tmp_path / 'venue.bucket', capacity=10, tokens_per_minute=1.0)
+
+        def worker():
+            try:
+                bucket.acquire()
+                return True
+            except TokenBucketTooEarly:
+                return False
+
+        with ThreadPoolExecutor(max_workers=20) as executor:
+            results = list(executor.map(lambda _: worker(), range(40)))
+
+        assert results.count(True) == 10
+
+    def test_processes_fail_fast_on_one_budget(self, tmp_path):
+        path = str(tmp_path / 'venue.bucket')
+        with multiprocessing.get_context('spawn').Pool(4) as pool:
+            grants = pool.starmap(acquire_from_file, [(path, 5, False)] * 4)
+
+        # capacity 4 and 20 tokens a second, the 20 calls finish long before many tokens refill
+        granted = sum(len(times) for times in grants)
+        assert 4 <= granted < 20
+
+    def test_processes_blocking_respect_the_rate(self, tmp_path):
+        path = str(tmp_path / 'venue.bucket')
+        with multiprocessing.get_context('spawn').Pool(4) as pool:
+            grants = pool.starmap(acquire_from_file, [(path, 6, True)] * 4)
+
+        grants = [grant_time for times in grants for grant_time in times]
+        assert len(grants) == 24
+        assert_within_rate(grants, 4, 20.0)
+
+
+class TestVenueRateLimiter:
+
+    def test_settings_are_read_on_first_call(self, monkeypatch, tmp_path):
+        from utils.data_loader import venue_rate_limiter
+
+        @venue_rate_limiter('venue')
+        def load():
+            return True
+
+        # set after the loader was decorated, like a .env loaded by the CLI
+        monkeypatch.setenv('RATE_LIMIT_BURST', '3')
+        monkeypatch.setenv('RATE_LIMIT_DIR', str(tmp_path))
+        monkeypatch.delenv('RATE_LIMIT_WAIT', raising=False)
+
+        assert [load(), load(), load()] == [True] * 3
+        with pytest.raises(TokenBucketTooEarly):
+            load()
+        assert (tmp_path / 'venue.bucket').exists()
+
+        # the bucket is kept once built
+        monkeypatch.setenv('RATE_LIMIT_BURST', '10')
+        with pytest.raises(TokenBucketTooEarly):
+            load()
+
+    def test_bucket_is_built_on_first_token(self, monkeypatch):
+        from utils.data_loader import venue_rate_limiter
+
+        @venue_rate_limiter('venue')
+        async def load():
+            return True
+
+        monkeypatch.setenv('RATE_LIMIT_BURST', '2')
+        monkeypatch.delenv('RATE_LIMIT_DIR', raising=False)
+        load.bucket.acquire(block=False)
+        assert load.bucket.capacity == 2
+        assert asyncio.run(load())
+        with pytest.raises(TokenBucketTooEarly):
+            asyncio.run(load())
+
+    def test_importing_the_loaders_does_not_load_dotenv(self):
+        # .env is the CLIs' business, a fresh interpreter shows whether the import pulled it in
+        import subprocess
+        code = "import sys, utils.data_loader, utils.venues; print('dotenv' in sys.modules)"
+        output = subprocess.run([sys.executable, '-c', code], cwd=Path(__file__).parent.parent,
+                                capture_output=True, text=True, check=True)
+        assert output.stdout.strip() == 'False'
+
+
 class TestMultiThreadFunctionalities:
 
     def test_multi_calls_to_system(self):
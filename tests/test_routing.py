@@ -0,0 +1,128 @@
+import pytest
+from decimal import Decimal
+import sys
+from pathlib import Path
+
+# Add parent directory to path to import from utils -
+# Docs: https://docs.pytest.org/en/latest/explanation/pythonpath.html
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from utils.routing import merge_tagged_asks, merge_tagged_bids, plan_fill, route_buy, route_sell, venue_fees, format_plan
+from utils.helper import merge_asks, merge_bids, calculate_buy_price, calculate_sell_price
+from utils.synthetic import generate_levels
+from utils.venues import COINBASE, GEMINI
+
+
+def synthetic_venues(levels=2000, count=3):
+    books = {f'venue{seed}': generate_levels(levels, seed=seed) for seed in range(count)}
+    bids = {name: book[0] for name, book in books.items()}
+    asks = {name: book[1] for name, book in books.items()}
+    return bids, asks
+
+
+def plan_with_fixed_routing(venue_levels, quantity, side, fees):
+    # the fees of a fill routed on the raw prices, what post processing a fee-less plan would give
+    merged = merge_tagged_asks(venue_levels) if side == 'asks' else merge_tagged_bids(venue_levels)
+    plan = plan_fill(merged, quantity, side)
+    fee_total = sum(fill.notional * fees[fill.venue] for fill in plan.fills.values())
+    return plan.notional + fee_total if side == 'asks' else plan.notional - fee_total
+
+
+class TestTaggedMerge:
+    def test_levels_keep_their_venue(self):
+        merged = list(merge_tagged_asks({'a': [('101', '1'), ('103', '1')], 'b': [('102', '2')]}))
+
+        assert [(price, venue) for _, _, venue, price in merged] == [(Decimal('101'), 'a'), (Decimal('102'), 'b'), (Decimal('103'), 'a')]
+
+    def test_same_order_as_the_plain_merge_without_fees(self):
+        bids, asks = synthetic_venues()
+
+        assert [(price, size) for _, size, _, price in merge_tagged_asks(asks)] == list(merge_asks(*asks.values()))
+        assert [(price, size) for _, size, _, price in merge_tagged_bids(bids)] == list(merge_bids(*bids.values()))
+
+    def test_fees_change_the_ranking(self):
+        # a has the better raw ask, but its fee makes b cheaper
+        asks = {'a': [('100.00', '1')], 'b': [('100.50', '1')]}
+        fees = {'a': Decimal('0.01'), 'b': Decimal('0.001')}
+
+        assert [venue for _, _, venue, _ in merge_tagged_asks(asks, fees)] == ['b', 'a']
+
+        # and on the bids a fee lowers what a venue pays
+        bids = {'a': [('100.50', '1')], 'b': [('100.00', '1')]}
+        assert [venue for _, _, venue, _ in merge_tagged_bids(bids, fees)] == ['b', 'a']
+
+
+class TestFillPlan:
+    @pytest.mark.parametrize("quantity", [Decimal('0.001'), Decimal('1'), Decimal('25.5'), Decimal('400')])
+    def test_matches_the_calculators_without_fees(self, quantity):
+        bids, asks = synthetic_venues()
+
+        buy = route_buy(bids, quantity)
+        sell = route_sell(asks, quantity)
+
+        assert buy.notional == buy.total == calculate_buy_price(merge_bids(*bids.values()), quantity)
+        assert sell.notional == sell.total == calculate_sell_price(merge_asks(*asks.values()), quantity)
+        for plan in (buy, sell):
+            assert plan.filled == quantity
+            assert sum(fill.quantity for fill in plan.fills.values()) == quantity
+            assert sum(fill.notional for fill in plan.fills.values()) == plan.notional
+
+    def test_breakdown_on_the_fixtures(self, load_fixture):
+        coinbase_data = load_fixture('coinbase.json')
+        gemini_data = load_fixture('gemini.json')
+        venue_levels = {'coinbase': COINBASE.levels(coinbase_data, 'asks'), 'gemini': GEMINI.levels(gemini_data, 'asks')}
+
+        plan = route_sell(venue_levels, Decimal('1'))
+
+        levels = sum(fill.levels for fill in plan.fills.values())
+        merged = list(merge_asks(COINBASE.levels(coinbase_data, 'asks'), GEMINI.levels(gemini_data, 'asks')))
+        covered = next(n for n in range(1, len(merged) + 1) if sum(size for _, size in merged[:n]) >= 1)
+        assert levels == covered
+        for fill in plan.fills.values():
+            assert fill.vwap == fill.notional / fill.quantity
+
+    @pytest.mark.parametrize("side", ['bids', 'asks'])
+    def test_fees_in_the_ranking_beat_fees_after_the_fact(self, side):
+        bids, asks = synthetic_venues()
+        venue_levels = bids if side == 'bids' else asks
+        fees = {'venue0': Decimal('0.006'), 'venue1': Decimal('0.001'), 'venue2': Decimal('0.0035')}
+        quantity = Decimal('300')
+
+        route = route_buy if side == 'bids' else route_sell
+        plan = route(venue_levels, quantity, fees)
+        naive = plan_with_fixed_routing(venue_levels, quantity, side, fees)
+
+        assert plan.filled == quantity
+        assert plan.fees == sum(fill.notional * fees[fill.venue] for fill in plan.fills.values())
+        if side == 'asks':
+            assert plan.total == plan.notional + plan.fees
+            assert plan.total < naive
+        else:
+            assert plan.total == plan.notional - plan.fees
+            assert plan.total > naive
+
+    def test_short_book(self):
+        plan = route_sell({'a': [('100', '1')], 'b': [('101', '0.5')]}, Decimal('2'))
+
+        assert plan.filled == Decimal('1.5')
+        assert plan.unfilled == Decimal('0.5')
+        assert plan.notional == Decimal('150.5')
+
+    def test_zero_size_levels_are_skipped(self):
+        # a venue whose best level is empty, and one with nothing but an empty level
+        venue_levels = {'a': [('100', '0'), ('101', '1')], 'b': [('99', '0.00')], 'c': [('100.5', '1')]}
+        plan = route_sell(venue_levels, Decimal('1.5'))
+
+        assert list(plan.fills) == ['c', 'a']
+        assert plan.fills['a'].quantity == Decimal('0.5') and plan.fills['a'].levels == 1
+        assert plan.fills['a'].vwap == Decimal('101')
+        assert plan.notional == calculate_sell_price(merge_asks(*venue_levels.values()), Decimal('1.5'))
+        assert 'b' not in format_plan(plan)
+
+
+class TestVenueFees:
+    def test_fees_come_from_the_environment(self, monkeypatch):
+        monkeypatch.setenv('COINBASE_TAKER_FEE', '0.006')
+        monkeypatch.delenv('GEMINI_TAKER_FEE', raising=False)
+
+        assert venue_fees([COINBASE, GEMINI]) == {'coinbase': Decimal('0.006'), 'gemini': Decimal(0)}
@@ -0,0 +1,208 @@
+import pytest
+from decimal import Decimal
+import sys
+from pathlib import Path
+
+# Add parent directory to path to import from utils -
+# Docs: https://docs.pytest.org/en/latest/explanation/pythonpath.html
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from utils.hedging import LastGoodBooks
+from utils.snapshot_store import SnapshotRecorder, SnapshotReader, replay_quotes, latest_books, MAGIC
+from utils.helper import merge_asks, merge_bids, calculate_buy_price, calculate_sell_price
+from utils.synthetic import generate_coinbase_book, generate_gemini_book
+from utils.venues import COINBASE, GEMINI, DEFAULT_PRODUCT
+from utils.quote_service import QuoteService
+from tests.test_quote_service import StaticVenue
+
+
+def live_prices(coinbase_data, gemini_data, quantity):
+    buy = calculate_buy_price(merge_bids(COINBASE.levels(coinbase_data, 'bids'), GEMINI.levels(gemini_data, 'bids')), quantity)
+    sell = calculate_sell_price(merge_asks(COINBASE.levels(coinbase_data, 'asks'), GEMINI.levels(gemini_data, 'asks')), quantity)
+    return buy, sell
+
+
+class TestSnapshotFile:
+    def test_round_trip(self, tmp_path, load_fixture):
+        path = tmp_path / 'books.bin'
+        coinbase_data = load_fixture('coinbase.json')
+        gemini_data = load_fixture('gemini.json')
+
+        with SnapshotRecorder(path) as recorder:
+            recorder.record('coinbase', coinbase_data, 'BTC-USD', timestamp_ns=1000)
+            recorder.record('gemini', gemini_data, 'BTC-USD', timestamp_ns=2000)
+
+        with SnapshotReader(path) as reader:
+            snapshots = list(reader)
+            coinbase, gemini = snapshots
+            assert (coinbase.venue, coinbase.product, coinbase.timestamp_ns) == ('coinbase', 'BTC-USD', 1000)
+            assert coinbase.sequence == coinbase_data['sequence']
+            assert gemini.sequence is None
+            assert len(coinbase.bids) // 2 == len(coinbase_data['bids'])
+            assert len(gemini.asks) // 2 == len(gemini_data['asks'])
+
+            # the scaled ints read back as the exact strings that were recorded
+            price, size = next(coinbase.levels('asks'))
+            best_price, best_size = next(COINBASE.levels(coinbase_data, 'asks'))
+            assert Decimal(price).scaleb(-coinbase.price_decimals) == Decimal(best_price)
+            assert Decimal(size).scaleb(-coinbase.size_decimals) == Decimal(best_size)
+
+    def test_runs_append_to_the_same_file(self, tmp_path, load_fixture):
+        path = tmp_path / 'books.bin'
+        for timestamp in (1, 2):
+            with SnapshotRecorder(path) as recorder:
+                recorder.record('gemini', load_fixture('gemini.json'), timestamp_ns=timestamp)
+
+        assert path.read_bytes().count(MAGIC) == 1
+        with SnapshotReader(path) as reader:
+            assert [snapshot.timestamp_ns for snapshot in reader] == [1, 2]
+
+    def test_truncated_record_is_ignored(self, tmp_path, load_fixture):
+        path = tmp_path / 'books.bin'
+        with SnapshotRecorder(path) as recorder:
+            recorder.record('gemini', load_fixture('gemini.json'), timestamp_ns=1)
+            recorder.record('gemini', load_fixture('gemini.json'), timestamp_ns=2)
+        # a crash in the middle of the second write
+        path.write_bytes(path.read_bytes()[:-10])
+
+        with SnapshotReader(path) as reader:
+            assert [snapshot.timestamp_ns for snapshot in reader] == [1]
+
+    @pytest.mark.parametrize("cut", [10, 'half', 'header'])
+    def test_appends_after_a_torn_record(self, tmp_path, cut, load_fixture):
+        # a run that died mid write, then more runs appending to the same file
+        path = tmp_path / 'books.bin'
+        gemini_data = load_fixture('gemini.json')
+        with SnapshotRecorder(path) as recorder:
+            recorder.record('coinbase', load_fixture('coinbase.json'), timestamp_ns=1)
+        whole = len(path.read_bytes())
+        with SnapshotRecorder(path) as recorder:
+            recorder.record('gemini', gemini_data, timestamp_ns=2)
+        data = path.read_bytes()
+        keep = {10: len(data) - 10, 'half': whole + (len(data) - whole) // 2, 'header': whole + 12}[cut]
+        path.write_bytes(data[:keep])
+
+        for timestamp in range(3, 23):
+            with SnapshotRecorder(path) as recorder:
+                recorder.record('gemini', gemini_data, timestamp_ns=timestamp)
+
+        with SnapshotReader(path) as reader:
+            snapshots = list(reader)
+            assert [snapshot.timestamp_ns for snapshot in snapshots] == [1] + list(range(3, 23))
+            assert all(snapshot.venue == 'gemini' and len(snapshot.bids) == 2 * len(gemini_data['bids']) for snapshot in snapshots[1:])
+            del snapshots
+        rows = list(replay_quotes(path, [Decimal('1')], venues=['gemini']))
+        assert [row['time'] for row in rows] == list(range(3, 23))
+
+    def test_rejects_other_files(self, tmp_path):
+        path = tmp_path / 'books.json'
+        path.write_text('{}')
+
+        with pytest.raises(ValueError, match="not a snapshot file"):
+            SnapshotReader(path)
+        with pytest.raises(ValueError, match="not a snapshot file"):
+            SnapshotRecorder(path)
+
+
+class TestReplay:
+    @pytest.mark.parametrize("quantity", [Decimal('0.01'), Decimal('1'), Decimal('10'), Decimal('123.456789012')])
+    def test_replay_matches_live_pricing(self, tmp_path, quantity):
+        path = tmp_path / 'books.bin'
+        coinbase_data = generate_coinbase_book(2000)
+        gemini_data = generate_gemini_book(100)
+        with SnapshotRecorder(path) as recorder:
+            recorder.record('coinbase', coinbase_data)
+            recorder.record('gemini', gemini_data)
+
+        [row] = replay_quotes(path, [quantity])
+
+        assert (row['buy'], row['sell']) == live_prices(coinbase_data, gemini_data, quantity)
+
+    def test_venues_with_different_scales(self, tmp_path):
+        # prices with more decimals on one venue, the merge brings both to the finer scale
+        path = tmp_path / 'books.bin'
+        coinbase_data = {'bids': [['100.125', '1.5', 1]], 'asks': [['101.5', '2', 1]], 'sequence': 7}
+        gemini_data = {'bids': [{'price': '100.2', 'amount': '0.25'}], 'asks': [{'price': '101.25', 'amount': '0.1'}]}
+        with SnapshotRecorder(path) as recorder:
+            recorder.record('coinbase', coinbase_data)
+            recorder.record('gemini', gemini_data)
+
+        [row] = replay_quotes(path, [Decimal('1')])
+
+        assert (row['buy'], row['sell']) == live_prices(coinbase_data, gemini_data, Decimal('1'))
+
+    def test_as_of_replay(self, tmp_path):
+        # every snapshot after both venues are in re-prices against the latest book of each
+        path = tmp_path / 'books.bin'
+        books = [generate_coinbase_book(500, mid=100000.0 + 100 * step, seed=step) for step in range(3)]
+        gemini_data = generate_gemini_book(50)
+        with SnapshotRecorder(path) as recorder:
+            recorder.record('coinbase', books[0], 'BTC-USD', timestamp_ns=1)
+            recorder.record('gemini', gemini_data, 'BTC-USD', timestamp_ns=2)
+            recorder.record('coinbase', books[1], 'BTC-USD', timestamp_ns=3)
+            recorder.record('coinbase', books[2], 'ETH-USD', timestamp_ns=4)
+
+        rows = list(replay_quotes(path, [Decimal('5')], product='BTC-USD'))
+
+        assert [row['time'] for row in rows] == [2, 3]
+        assert (rows[0]['buy'], rows[0]['sell']) == live_prices(books[0], gemini_data, Decimal('5'))
+        assert (rows[1]['buy'], rows[1]['sell']) == live_prices(books[1], gemini_data, Decimal('5'))
+
+    def test_several_products_need_a_product(self, tmp_path):
+        # an ETH-USD book must never stand in for the BTC-USD one of the same venue
+        path = tmp_path / 'books.bin'
+        btc = generate_coinbase_book(200, seed=1)
+        eth = generate_coinbase_book(200, mid=3000.0, seed=2)
+        gemini_data = generate_gemini_book(20)
+        with SnapshotRecorder(path) as recorder:
+            recorder.record('coinbase', btc, 'BTC-USD', timestamp_ns=1)
+            recorder.record('gemini', gemini_data, 'BTC-USD', timestamp_ns=2)
+            recorder.record('coinbase', eth, 'ETH-USD', timestamp_ns=3)
+
+        with pytest.raises(ValueError, match="several products"):
+            list(replay_quotes(path, [Decimal('1')]))
+        with pytest.raises(ValueError, match="several products"):
+            latest_books(path)
+
+        rows = list(replay_quotes(path, [Decimal('1')], product='BTC-USD'))
+        assert [row['time'] for row in rows] == [2]
+        assert latest_books(path, 'BTC-USD')['coinbase'][1] == 1
+
+    def test_single_venue(self, tmp_path, load_fixture):
+        path = tmp_path / 'books.bin'
+        with SnapshotRecorder(path) as recorder:
+            recorder.record('coinbase', load_fixture('coinbase.json'))
+            recorder.record('gemini', load_fixture('gemini.json'))
+
+        rows = list(replay_quotes(path, [Decimal('1'), Decimal('2')], venues=['gemini']))
+
+        assert [row['quantity'] for row in rows] == [Decimal('1'), Decimal('2')]
+
+
+class TestRecording:
+    def test_quote_service_records_every_refresh(self, tmp_path, load_fixture):
+        path = tmp_path / 'books.bin'
+        venues = [StaticVenue(COINBASE, load_fixture('coinbase.json')), StaticVenue(GEMINI, load_fixture('gemini.json'))]
+        with SnapshotRecorder(path) as recorder:
+            service = QuoteService(venues, {}, recorder=recorder)
+            service.refresh()
+            service.refresh()
+            service.stop()
+
+        with SnapshotReader(path) as reader:
+            assert [snapshot.venue for snapshot in reader] == ['coinbase', 'gemini', 'coinbase', 'gemini']
+
+    def test_quote_service_books_are_a_fallback(self, tmp_path, load_fixture):
+        # the service records its product, so the CLIs find its books with --fallback
+        path = tmp_path / 'books.bin'
+        venues = [StaticVenue(COINBASE, load_fixture('coinbase.json')), StaticVenue(GEMINI, load_fixture('gemini.json'))]
+        with SnapshotRecorder(path) as recorder:
+            service = QuoteService(venues, {}, recorder=recorder)
+            service.refresh()
+            service.stop()
+
+        with SnapshotReader(path) as reader:
+            assert {snapshot.product for snapshot in reader} == {DEFAULT_PRODUCT}
+        last_good = LastGoodBooks.from_snapshot_file(path, DEFAULT_PRODUCT)
+        assert last_good.get('coinbase') is not None
+        assert last_good.get('gemini') is not None
@@ -0,0 +1,74 @@
+import pytest
+import random
+from decimal import Decimal
+import sys
+from pathlib import Path
+
+# Add parent directory to path to import from utils -
+# Docs: https://docs.pytest.org/en/latest/explanation/pythonpath.html
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import utils.sorted_prices
+from utils.sorted_prices import SortedPrices
+
+
+@pytest.fixture
+def small_chunks(monkeypatch):
+    # chunks of 4 to 8 prices, so a few hundred changes split and join them many times
+    monkeypatch.setattr(utils.sorted_prices, 'LOAD', 4)
+
+
+def check(prices, expected):
+    expected = sorted(expected)
+    assert list(prices) == expected
+    assert list(reversed(prices)) == expected[::-1]
+    assert len(prices) == len(expected)
+    if expected:
+        assert prices.first() == expected[0]
+        assert prices.last() == expected[-1]
+
+
+class TestSortedPrices:
+    def test_snapshot_is_sorted(self, small_chunks):
+        levels = [Decimal(price) / 100 for price in random.Random(1).sample(range(10000), 50)]
+        prices = SortedPrices(levels)
+        check(prices, levels)
+        assert all(len(chunk) <= 4 for chunk in prices._chunks)
+
+    def test_empty(self):
+        prices = SortedPrices()
+        check(prices, [])
+        prices.add(Decimal('1.5'))
+        check(prices, [Decimal('1.5')])
+        prices.remove(Decimal('1.5'))
+        check(prices, [])
+
+    def test_random_changes(self, small_chunks):
+        # Test adds and removes against a plain sorted list, including growing from and draining to empty
+        rng = random.Random(2)
+        prices = SortedPrices()
+        expected = set()
+        for step in range(3000):
+            # grows for the first half, then mostly drains
+            grow = 0.8 if step < 1500 else 0.2
+            if expected and rng.random() > grow:
+                price = rng.choice(sorted(expected))
+                prices.remove(price)
+                expected.discard(price)
+            else:
+                price = Decimal(rng.randrange(100000)) / 100
+                if price not in expected:
+                    prices.add(price)
+                    expected.add(price)
+            if step % 50 == 0:
+                check(prices, expected)
+                assert all(chunk and len(chunk) <= 8 for chunk in prices._chunks)
+                assert prices._maxes == [chunk[-1] for chunk in prices._chunks]
+        check(prices, expected)
+
+    def test_new_best_prices(self, small_chunks):
+        # prices past either end land in the first or last chunk
+        prices = SortedPrices(range(10, 20))
+        prices.add(5)
+        prices.add(25)
+        check(prices, [5, *range(10, 20), 25])
@@ -0,0 +1,96 @@
+import pytest
+import json
+from decimal import Decimal
+import sys
+from pathlib import Path
+
+# Add parent directory to path to import from utils -
+# Docs: https://docs.pytest.org/en/latest/explanation/pythonpath.html
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from utils.stream_parser import parse_coinbase_stream, load_coinbase_book, iter_file_chunks
+from utils.helper import merge_sorted_asks, merge_sorted_bids, calculate_buy_price, calculate_sell_price
+from utils.synthetic import generate_coinbase_book, generate_gemini_book
+
+ROOT = Path(__file__).parent.parent
+
+
+@pytest.fixture(scope="module")
+def snapshot_files(tmp_path_factory):
+    # a large snapshot written both pretty printed (like coinbase.json) and compact
+    data = generate_coinbase_book(100000, seed=12, sequence=114629983704)
+    directory = tmp_path_factory.mktemp("snapshots")
+
+    pretty = directory / "coinbase_pretty.json"
+    with open(pretty, 'w') as f:
+        json.dump(data, f, indent=2)
+
+    compact = directory / "coinbase_compact.json"
+    with open(compact, 'w') as f:
+        json.dump(data, f, separators=(',', ':'))
+
+    return data, [pretty, compact]
+
+
+def counting_chunks(path, chunk_size, counter):
+    for chunk in iter_file_chunks(path, chunk_size):
+        counter.append(len(chunk))
+        yield chunk
+
+
+class TestStreamParser:
+    def test_fixture_byte_by_byte(self):
+        # Test that levels and keys split at any point across chunks are still parsed
+        with open(ROOT / 'coinbase.json') as f:
+            expected = json.load(f)
+
+        data = parse_coinbase_stream(iter_file_chunks(ROOT / 'coinbase.json', chunk_size=1))
+
+        assert data['bids'] == expected['bids']
+        assert data['asks'] == expected['asks']
+        assert data['sequence'] == expected['sequence']
+
+    @pytest.mark.parametrize("chunk_size", [61, 4096, 65536])
+    def test_large_snapshot(self, snapshot_files, chunk_size):
+        expected, paths = snapshot_files
+
+        for path in paths:
+            data = parse_coinbase_stream(iter_file_chunks(path, chunk_size))
+            assert data['bids'] == expected['bids']
+            assert data['asks'] == expected['asks']
+            assert data['sequence'] == expected['sequence']
+
+    def test_early_stop(self, snapshot_files):
+        # Test that the stream is abandoned once both sides cover the quantity, with the same prices
+        expected, paths = snapshot_files
+        gemini_data = generate_gemini_book(500, seed=13)
+
+        for quantity in [Decimal("0.5"), Decimal("10"), Decimal("250")]:
+            for path in paths:
+                read = []
+                data = parse_coinbase_stream(counting_chunks(path, 65536, read), max_quantity=quantity)
+
+                assert sum(read) < path.stat().st_size
+                assert len(data['bids']) < len(expected['bids'])
+                assert len(data['asks']) < len(expected['asks'])
+
+                assert calculate_buy_price(merge_sorted_bids(data['bids'], gemini_data['bids']), quantity) == \
+                    calculate_buy_price(merge_sorted_bids(expected['bids'], gemini_data['bids']), quantity)
+                assert calculate_sell_price(merge_sorted_asks(data['asks'], gemini_data['asks']), quantity) == \
+                    calculate_sell_price(merge_sorted_asks(expected['asks'], gemini_data['asks']), quantity)
+
+    def test_quantity_deeper_than_book(self):
+        with open(ROOT / 'coinbase.json') as f:
+            expected = json.load(f)
+
+        data = parse_coinbase_stream(iter_file_chunks(ROOT / 'coinbase.json'), max_quantity=Decimal(1000))
+
+        assert data['bids'] == expected['bids']
+        assert data['asks'] == expected['asks']
+
+    def test_load_book(self):
+        book = load_coinbase_book(iter_file_chunks(ROOT / 'coinbase.json', chunk_size=16))
+
+        assert book.best_bid() == (Decimal("110100.78"), Decimal("0.08297689"))
+        assert book.best_ask() == (Decimal("110100.79"), Decimal("0.00000856"))
+        assert book.sequence == 114629983704
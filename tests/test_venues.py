@@ -0,0 +1,105 @@
+import pytest
+from decimal import Decimal
+import sys
+from pathlib import Path
+
+# Add parent directory to path to import from utils -
+# Docs: https://docs.pytest.org/en/latest/explanation/pythonpath.html
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from utils.venues import VenueAdapter, VENUES, COINBASE, GEMINI, register_venue, get_venue
+from utils.engines import ENGINES
+from utils.helper import merge_asks, merge_bids, merge_sorted_asks, merge_sorted_bids
+from utils.synthetic import generate_levels
+
+
+class BitstampStyleAdapter(VenueAdapter):
+    # {"bids": [["price", "size"], ...], "asks": [...]}
+    name = 'bitstamp_test'
+    display_name = 'Bitstamp'
+    api_env = 'BITSTAMP_API'
+
+    def parse_levels(self, levels):
+        return ((price, size) for price, size in levels)
+
+
+@pytest.fixture
+def bitstamp():
+    adapter = register_venue(BitstampStyleAdapter())
+    yield adapter
+    VENUES.pop(adapter.name)
+
+
+class TestVenueRegistry:
+    def test_default_venues(self):
+        assert get_venue('coinbase') is COINBASE
+        assert get_venue('gemini') is GEMINI
+
+        with pytest.raises(ValueError, match="Unknown venue"):
+            get_venue('kraken')
+
+    def test_register_new_venue(self, bitstamp):
+        assert get_venue('bitstamp_test') is bitstamp
+
+        with pytest.raises(ValueError, match="already registered"):
+            register_venue(BitstampStyleAdapter())
+
+    def test_levels(self, load_fixture):
+        coinbase_data = load_fixture('coinbase.json')
+        gemini_data = load_fixture('gemini.json')
+
+        assert next(COINBASE.levels(coinbase_data, 'bids')) == ("110100.78", "0.08297689")
+        assert next(GEMINI.levels(gemini_data, 'asks')) == ("110025.98", "0.016117")
+
+    def test_validate(self, load_fixture):
+        with pytest.raises(ValueError, match="Failed to fetch data from Gemini"):
+            GEMINI.validate(None)
+
+        with pytest.raises(ValueError, match="No bids or asks found in Coinbase"):
+            COINBASE.validate({'bids': []})
+
+        with pytest.raises(ValueError, match="No bids or asks found in Coinbase"):
+            COINBASE.validate({'bids': [], 'asks': [["1", "1", 1]]})
+
+        COINBASE.validate(load_fixture('coinbase.json'))
+
+
+class TestKWayMerge:
+    def test_two_venue_wrappers(self, load_fixture):
+        # Test that the two venue helpers are the k-way merge over the adapters
+        coinbase_data = load_fixture('coinbase.json')
+        gemini_data = load_fixture('gemini.json')
+
+        assert list(merge_sorted_asks(coinbase_data['asks'], gemini_data['asks'])) == \
+            list(merge_asks(COINBASE.levels(coinbase_data, 'asks'), GEMINI.levels(gemini_data, 'asks')))
+        assert list(merge_sorted_bids(coinbase_data['bids'], gemini_data['bids'])) == \
+            list(merge_bids(COINBASE.levels(coinbase_data, 'bids'), GEMINI.levels(gemini_data, 'bids')))
+
+    @pytest.mark.parametrize("engine_name", sorted(ENGINES))
+    def test_many_venues(self, engine_name):
+        # Test that every engine merges k venues into one fully sorted side
+        engine = ENGINES[engine_name]
+        venues = [generate_levels(200, seed=seed) for seed in range(7)]
+
+        merged_bids = list(engine.merge_bids(*(bids for bids, _ in venues)))
+        merged_asks = list(engine.merge_asks(*(asks for _, asks in venues)))
+
+        assert len(merged_bids) == sum(len(bids) for bids, _ in venues)
+        assert len(merged_asks) == sum(len(asks) for _, asks in venues)
+
+        bid_prices = [price for price, _ in merged_bids]
+        ask_prices = [price for price, _ in merged_asks]
+        assert bid_prices == sorted(bid_prices, reverse=True)
+        assert ask_prices == sorted(ask_prices)
+
+    def test_pricing_with_extra_venue(self, bitstamp, load_fixture):
+        coinbase_data = load_fixture('coinbase.json')
+        bitstamp_data = {'bids': [["110200.00", "0.5"]], 'asks': [["110000.00", "0.5"]]}
+
+        for engine in ENGINES.values():
+            merged_bids = engine.merge_bids(COINBASE.levels(coinbase_data, 'bids'), bitstamp.levels(bitstamp_data, 'bids'))
+            merged_asks = engine.merge_asks(COINBASE.levels(coinbase_data, 'asks'), bitstamp.levels(bitstamp_data, 'asks'))
+
+            # the extra venue has the best price on both sides
+            assert engine.calculate_buy_price(merged_bids, Decimal("0.5")) == Decimal("55100")
+            assert engine.calculate_sell_price(merged_asks, Decimal("0.5")) == Decimal("55000")
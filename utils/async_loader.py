@@ -0,0 +1,72 @@
+import asyncio
+import json
+from typing import Dict, Any, List, Optional
+
+import aiohttp
+
+from utils.data_loader import venue_rate_limiter
+from utils.metrics import METRICS
+
+# Async version of utils/data_loader.py.
+# One aiohttp session is shared by every fetch, so connections to each venue are kept alive
+# and reused instead of paying a new TCP + TLS handshake on every request like bare requests.get does.
+
+# seconds each venue gets before its fetch is abandoned
+DEFAULT_TIMEOUT = 5.0
+DEFAULT_TIMEOUTS = {
+    'coinbase': 5.0,
+    'gemini': 5.0,
+}
+
+
+def create_session(limit_per_host: int = 4) -> aiohttp.ClientSession:
+    connector = aiohttp.TCPConnector(limit_per_host=limit_per_host, ttl_dns_cache=300, keepalive_timeout=60)
+    return aiohttp.ClientSession(connector=connector)
+
+
+async def fetch_json(session: aiohttp.ClientSession, API: str, timeout: float, venue: str = 'unknown') -> Dict[str, Any]:
+    try:
+        with METRICS.span('fetch', venue=venue):
+            async with session.get(API, timeout=aiohttp.ClientTimeout(total=timeout)) as response:
+                response.raise_for_status()
+                body = await response.read()
+        # decoded here instead of response.json(), which would also check the content type
+        # (gemini does not always send application/json) and hide the decode in the fetch
+        with METRICS.span('parse', venue=venue):
+            return json.loads(body)
+    except asyncio.TimeoutError:
+        raise Exception(f"Error: timed out after {timeout} seconds fetching {API}")
+    except Exception as e:
+        raise Exception(f"Error: {e}")
+
+
+# same budget as the sync loaders (the same file with RATE_LIMIT_DIR), the token is taken when awaited
+# and with RATE_LIMIT_WAIT the wait happens on the event loop
+@venue_rate_limiter('coinbase')
+async def fetch_coinbase_data(session: aiohttp.ClientSession, API: str, timeout: float = DEFAULT_TIMEOUTS['coinbase']):
+    return await fetch_json(session, API, timeout, 'coinbase')
+
+
+@venue_rate_limiter('gemini')
+async def fetch_gemini_data(session: aiohttp.ClientSession, API: str, timeout: float = DEFAULT_TIMEOUTS['gemini']):
+    return await fetch_json(session, API, timeout, 'gemini')
+
+
+async def fetch_all(session: aiohttp.ClientSession, venues: List, apis: Dict[str, str],
+                    timeouts: Optional[Dict[str, float]] = None) -> Dict[str, Dict[str, Any]]:
+    # every venue is fetched concurrently, the slowest one bounds the wait.
+    # venues are adapters from utils/venues.py, apis and timeouts are keyed by venue name.
+    timeouts = {**DEFAULT_TIMEOUTS, **(timeouts or {})}
+
+    fetches = [
+        asyncio.ensure_future(venue.fetch_async(session, apis[venue.name], timeouts.get(venue.name, DEFAULT_TIMEOUT)))
+        for venue in venues
+    ]
+    try:
+        results = await asyncio.gather(*fetches)
+    except BaseException:
+        # a venue failed or was rate limited, the others are not waited for
+        for fetch in fetches:
+            fetch.cancel()
+        raise
+    return {venue.name: data for venue, data in zip(venues, results)}
@@ -0,0 +1,105 @@
+import csv
+import io
+import json
+from decimal import Decimal, InvalidOperation
+from typing import Dict, Any, Iterable, Iterator, List, Tuple
+
+# Batch quotes.
+# Many (side, quantity) requests are priced against one fetch and one merge of the books.
+# The quantities of a side are sorted and priced in one sweep of its merged levels: each level is
+# read once, and every quantity it covers is priced from the running totals at that point.
+# The merge is bounded by the largest quantity, so levels past it are never converted.
+
+SIDES = ('buy', 'sell')
+
+
+def parse_requests(lines: Iterable[str], default_sides: Tuple[str, ...] = SIDES) -> List[Tuple[str, Decimal]]:
+    # one request per line: "10", or "buy 10" / "sell,2.5". a bare quantity is priced on default_sides.
+    # blank lines and lines starting with # are skipped.
+    requests = []
+    for number, line in enumerate(lines, 1):
+        fields = line.replace(',', ' ').split()
+        if not fields or fields[0].startswith('#'):
+            continue
+        if len(fields) == 1:
+            sides, text = default_sides, fields[0]
+        elif len(fields) == 2 and fields[0].lower() in SIDES:
+            sides, text = (fields[0].lower(),), fields[1]
+        else:
+            raise ValueError(f"line {number}: expected a quantity or a side and a quantity, got {line.strip()!r}")
+
+        try:
+            quantity = Decimal(text)
+        except InvalidOperation:
+            raise ValueError(f"line {number}: invalid quantity {text!r}")
+        if not quantity.is_finite() or quantity <= 0:
+            raise ValueError(f"line {number}: quantity must be positive, got {text}")
+
+        requests.extend((side, quantity) for side in sides)
+    return requests
+
+
+def sweep(merged: Iterator[Tuple[Decimal, Decimal]], quantities: Iterable[Decimal]) -> Dict[Decimal, Tuple[Decimal, Decimal]]:
+    # {quantity: (cost, filled)} for every quantity, in one pass over the merged levels.
+    # the cost is the same as calculate_buy_price / calculate_sell_price on the same levels:
+    # the same products added in the same order. filled is less than the quantity when the book runs out.
+    results = {}
+    levels = iter(merged)
+    filled = Decimal(0)
+    cost = Decimal(0)
+    # the level the next quantity ends in, None once the book is exhausted
+    level = next(levels, None)
+
+    for quantity in sorted(set(quantities)):
+        # take every level that the quantity goes past whole
+        while level is not None and quantity - filled > level[1]:
+            price, size = level
+            cost += price * size
+            filled += size
+            level = next(levels, None)
+
+        if level is None:
+            results[quantity] = (cost, filled)
+        else:
+            results[quantity] = (cost + level[0] * (quantity - filled), quantity)
+    return results
+
+
+def price_requests(engine, venue_books: List[Tuple[Any, Dict[str, Any]]], requests: List[Tuple[str, Decimal]]) -> List[Dict[str, Any]]:
+    # rows {side, quantity, price, filled} in the order of the requests.
+    # venue_books are (venue adapter, payload) pairs. the engine has to yield (price, size) Decimal levels,
+    # so this is the decimal engine.
+    rows_by_side = {}
+    # same convention as the CLIs, buying is priced off the bids and selling off the asks
+    for side, book_side, merge in (('buy', 'bids', engine.merge_bids), ('sell', 'asks', engine.merge_asks)):
+        quantities = [quantity for request_side, quantity in requests if request_side == side]
+        if not quantities:
+            continue
+        merged = merge(*(venue.levels(data, book_side) for venue, data in venue_books), max_quantity=max(quantities))
+        rows_by_side[side] = sweep(merged, quantities)
+
+    rows = []
+    for side, quantity in requests:
+        price, filled = rows_by_side[side][quantity]
+        rows.append({'side': side, 'quantity': quantity, 'price': price, 'filled': filled})
+    return rows
+
+
+def format_rows(rows: List[Dict[str, Any]], output_format: str) -> str:
+    # csv and json keep the full Decimal precision as strings, the table rounds to cents like the CLIs
+    if output_format == 'json':
+        return json.dumps([{key: str(value) if isinstance(value, Decimal) else value for key, value in row.items()} for row in rows], indent=2)
+
+    if output_format == 'csv':
+        out = io.StringIO()
+        writer = csv.writer(out, lineterminator='\n')
+        writer.writerow(['side', 'quantity', 'price', 'filled'])
+        for row in rows:
+            writer.writerow([row['side'], row['quantity'], row['price'], row['filled']])
+        return out.getvalue().rstrip('\n')
+
+    lines = [f"{'side':<5} {'qty':>14} {'price':>20} {'filled':>14}"]
+    for row in rows:
+        price = f"${row['price']:,.2f}"
+        lines.append(f"{row['side']:<5} {str(row['quantity']):>14} {price:>20} {str(row['filled']):>14}")
+    return "\n".join(lines)
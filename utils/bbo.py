@@ -0,0 +1,128 @@
+import threading
+from decimal import Decimal
+from heapq import heapify, heappop, heappush
+from itertools import count
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+# Consolidated best bid and offer across venues, kept up to date one venue change at a time.
+# Reading the BBO used to mean running the merge over every venue's book and taking its first level.
+# Here every venue's best level sits in a small heap per side, so a venue change costs O(log venues)
+# and most changes, the ones that do not move the venue's own best level, cost a comparison.
+#
+# After each change the consolidated BBO is published as one immutable tuple, like the book
+# snapshots, so reading it (and the spread, or whether the market is crossed) is a single reference
+# read without a lock, and a reader never pairs one update's bid with another one's ask.
+#
+# The heaps drop stale entries lazily: a venue's old best level stays in the heap until it reaches
+# the top, and the heap is rebuilt from the live levels once more than SLACK entries are stale.
+
+# stale heap entries tolerated per side before a rebuild
+SLACK = 16
+
+
+class Top(NamedTuple):
+    price: Decimal
+    size: Decimal
+    venue: str
+
+
+class BBO(NamedTuple):
+    # None for a side no venue has levels on
+    bid: Optional[Top]
+    ask: Optional[Top]
+
+    @property
+    def spread(self) -> Optional[Decimal]:
+        if self.bid is None or self.ask is None:
+            return None
+        return self.ask.price - self.bid.price
+
+    @property
+    def mid(self) -> Optional[Decimal]:
+        if self.bid is None or self.ask is None:
+            return None
+        return (self.bid.price + self.ask.price) / 2
+
+    @property
+    def crossed(self) -> bool:
+        # one venue bids above another one's offer, a stale venue or an arbitrage
+        return self.bid is not None and self.ask is not None and self.bid.price > self.ask.price
+
+    @property
+    def locked(self) -> bool:
+        return self.bid is not None and self.ask is not None and self.bid.price == self.ask.price
+
+
+EMPTY = BBO(None, None)
+
+
+class BBOTracker:
+
+    def __init__(self):
+        # heap entries (price key, -size, stamp, Top), best first: highest bid, lowest ask, then the
+        # larger size, then the level that got there first
+        self._heaps: Dict[str, List[Tuple[Any, ...]]] = {'bids': [], 'asks': []}
+        # venue -> the heap entry of its best level, per side. any other entry of the venue is stale
+        self._best: Dict[str, Dict[str, Tuple[Any, ...]]] = {'bids': {}, 'asks': {}}
+        self._stamps = count()
+        self._bbo = EMPTY
+        # one writer at a time, readers never take it
+        self._write_lock = threading.Lock()
+        self.updates = 0
+        self.changes = 0
+
+    @property
+    def bbo(self) -> BBO:
+        return self._bbo
+
+    def update(self, venue: str, bid: Optional[Tuple[Decimal, Decimal]], ask: Optional[Tuple[Decimal, Decimal]]) -> bool:
+        # the venue's best bid and ask as (price, size), None when that side of its book is empty.
+        # returns True when the consolidated BBO changed
+        with self._write_lock:
+            self.updates += 1
+            old = self._bbo
+            bbo = BBO(self._set('bids', venue, bid), self._set('asks', venue, ask))
+            if bbo == old:
+                return False
+            self._bbo = bbo
+            self.changes += 1
+            return True
+
+    def update_book(self, book) -> bool:
+        # after changes to an OrderBook (utils/orderbook.py), only its best levels are read
+        return self.update(book.venue, book.best_bid(), book.best_ask())
+
+    def update_payload(self, venue, data: Dict[str, Any]) -> bool:
+        # a fetched book in the venue's own shape, its levels are sorted so the best is the first one
+        tops = []
+        for side in ('bids', 'asks'):
+            level = next(iter(venue.levels(data, side)), None)
+            tops.append(None if level is None else (Decimal(level[0]), Decimal(level[1])))
+        return self.update(venue.name, *tops)
+
+    def remove(self, venue: str) -> bool:
+        # a venue that went away, its levels no longer count
+        return self.update(venue, None, None)
+
+    def _set(self, side: str, venue: str, level: Optional[Tuple[Decimal, Decimal]]) -> Optional[Top]:
+        # records the venue's best level and returns the consolidated best of the side
+        best = self._best[side]
+        heap = self._heaps[side]
+        current = best.get(venue)
+
+        if level is None:
+            if current is not None:
+                del best[venue]
+        elif current is None or current[3].price != level[0] or current[3].size != level[1]:
+            price, size = level
+            entry = (-price if side == 'bids' else price, -size, next(self._stamps), Top(price, size, venue))
+            best[venue] = entry
+            heappush(heap, entry)
+
+        # stale entries at the top are dropped, the rest wait
+        while heap and best.get(heap[0][3].venue) is not heap[0]:
+            heappop(heap)
+        if len(heap) > len(best) + SLACK:
+            heap[:] = best.values()
+            heapify(heap)
+        return heap[0][3] if heap else None
@@ -0,0 +1,206 @@
+from typing import Tuple, Iterator, Iterable, List, Optional
+from itertools import chain
+from decimal import Decimal
+
+from utils.venues import COINBASE, GEMINI
+from utils.fixed_point import (PRICE_DECIMALS, SIZE_DECIMALS, from_scaled, decimal_places, decimal_to_scaled,
+                               ScaledMerge, scaled_levels)
+
+# NumPy backed columnar book.
+# Each side is a pair of contiguous int64 arrays (prices in ticks, sizes in base units, same scale as utils/fixed_point.py),
+# so merging two venues and pricing a fill are a handful of array ops instead of a Python loop per level.
+# numpy is optional, the engine is only offered when it is installed.
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - depends on the environment
+    np = None
+
+INT64_MAX = 2**63 - 1
+
+
+def require_numpy():
+    if np is None:
+        raise ImportError("numpy is required for the columnar engine: pip3 install numpy")
+
+
+class ColumnarSide:
+
+    def __init__(self, prices, sizes, descending: bool,
+                 price_decimals: int = PRICE_DECIMALS, size_decimals: int = SIZE_DECIMALS):
+        require_numpy()
+        self.prices = prices
+        self.sizes = sizes
+        # bids are stored best first, so prices go down
+        self.descending = descending
+        self.price_decimals = price_decimals
+        self.size_decimals = size_decimals
+        self._cum_size = None
+
+    @classmethod
+    def from_levels(cls, levels: Iterable[Tuple[str, str]], descending: bool,
+                    price_decimals: int = PRICE_DECIMALS, size_decimals: int = SIZE_DECIMALS,
+                    max_quantity: Optional[Decimal] = None) -> 'ColumnarSide':
+        # levels are (price, size) strings, already in book order.
+        # with max_quantity, reading stops at the level that covers it, a fill never goes deeper on one venue.
+        # the scales are where the side starts, they widen to hold levels with more decimals (ScaledMerge)
+        side = ScaledMerge([levels], descending, price_decimals, size_decimals, max_quantity)
+        scaled = scaled_levels(side)
+        # read as interleaved price, size and split into two contiguous columns
+        flat = np.fromiter(chain.from_iterable(scaled), dtype=np.int64, count=2 * len(scaled)).reshape(-1, 2)
+        prices = np.ascontiguousarray(flat[:, 0])
+        sizes = np.ascontiguousarray(flat[:, 1])
+        return cls(prices, sizes, descending, side.price_decimals, side.size_decimals)
+
+    def __len__(self) -> int:
+        return len(self.prices)
+
+    def __iter__(self) -> Iterator[Tuple[Decimal, Decimal]]:
+        # same (Decimal, Decimal) levels as merge_sorted_asks / merge_sorted_bids
+        for price, size in zip(self.prices.tolist(), self.sizes.tolist()):
+            yield from_scaled(price, self.price_decimals), from_scaled(size, self.size_decimals)
+
+    @property
+    def cum_size(self):
+        # computed once and reused for every quantity priced on this side
+        if self._cum_size is None:
+            self._cum_size = np.cumsum(self.sizes)
+        return self._cum_size
+
+    def merge(self, other: 'ColumnarSide') -> 'ColumnarSide':
+        # vectorized two-way merge of two sorted sides.
+        # every level of the other side goes after the levels of this side with a price that is not worse,
+        # shifted by the number of other levels placed before it.
+        if self.descending != other.descending:
+            raise ValueError("Cannot merge bids with asks")
+        if (self.price_decimals, self.size_decimals) != (other.price_decimals, other.size_decimals):
+            # venues quoting at different scales meet at the finer one
+            price_decimals = max(self.price_decimals, other.price_decimals)
+            size_decimals = max(self.size_decimals, other.size_decimals)
+            return self.rescaled(price_decimals, size_decimals).merge(other.rescaled(price_decimals, size_decimals))
+
+        if self.descending:
+            # searchsorted needs ascending data, negating keeps the order stable
+            positions = np.searchsorted(-self.prices, -other.prices, side='right')
+        else:
+            positions = np.searchsorted(self.prices, other.prices, side='right')
+        positions += np.arange(len(other.prices))
+
+        total = len(self.prices) + len(other.prices)
+        prices = np.empty(total, dtype=np.int64)
+        sizes = np.empty(total, dtype=np.int64)
+
+        mask = np.ones(total, dtype=bool)
+        mask[positions] = False
+
+        prices[positions] = other.prices
+        sizes[positions] = other.sizes
+        prices[mask] = self.prices
+        sizes[mask] = self.sizes
+
+        return ColumnarSide(prices, sizes, self.descending, self.price_decimals, self.size_decimals)
+
+    def rescaled(self, price_decimals: int, size_decimals: int) -> 'ColumnarSide':
+        # the same levels at scales at least as fine as this side's own
+        if (price_decimals, size_decimals) == (self.price_decimals, self.size_decimals):
+            return self
+        price_factor = 10 ** (price_decimals - self.price_decimals)
+        size_factor = 10 ** (size_decimals - self.size_decimals)
+        # int64 wraps silently, so the largest values are checked first
+        for values, factor in ((self.prices, price_factor), (self.sizes, size_factor)):
+            if len(values) and int(np.abs(values).max()) * factor > INT64_MAX:
+                raise OverflowError("Levels do not fit int64 at a common scale")
+        prices = self.prices * price_factor
+        sizes = self.sizes * size_factor
+        return ColumnarSide(prices, sizes, self.descending, price_decimals, size_decimals)
+
+    def cost_to_fill(self, quantity: Decimal) -> Decimal:
+        # same result as calculate_buy_price / calculate_sell_price, including
+        # returning the cost of the whole side when the quantity is deeper than the book.
+        # a quantity finer than the size scale is handled by scaling everything by factor.
+        extra = max(decimal_places(quantity) - self.size_decimals, 0)
+        factor = 10 ** extra
+        remaining_quantity = decimal_to_scaled(quantity, self.size_decimals + extra)
+
+        cum_size = self.cum_size
+        # first level whose cumulative size covers the quantity, in base units
+        k = int(np.searchsorted(cum_size, -(-remaining_quantity // factor), side='left'))
+
+        full_cost = self._dot(k) * factor
+        if k < len(cum_size):
+            filled = int(cum_size[k - 1]) * factor if k > 0 else 0
+            full_cost += int(self.prices[k]) * (remaining_quantity - filled)
+
+        return from_scaled(full_cost, self.price_decimals + self.size_decimals + extra)
+
+    def _dot(self, k: int) -> int:
+        # notional of the first k levels.
+        # int64 is used when the result provably fits, otherwise python ints keep it exact.
+        if k == 0:
+            return 0
+
+        prices = self.prices[:k]
+        sizes = self.sizes[:k]
+        max_price = int(np.abs(prices).max())
+        if max_price * int(self.cum_size[k - 1]) <= INT64_MAX:
+            return int(np.dot(prices, sizes))
+        return int(np.dot(prices.astype(object), sizes.astype(object)))
+
+
+class ColumnarBook:
+
+    def __init__(self, venue: str, bids: ColumnarSide, asks: ColumnarSide):
+        self.venue = venue
+        self.bids = bids
+        self.asks = asks
+
+    @classmethod
+    def from_venue(cls, adapter, data) -> 'ColumnarBook':
+        return cls(adapter.name,
+                   ColumnarSide.from_levels(adapter.levels(data, 'bids'), descending=True),
+                   ColumnarSide.from_levels(adapter.levels(data, 'asks'), descending=False))
+
+    @classmethod
+    def from_coinbase(cls, data) -> 'ColumnarBook':
+        return cls.from_venue(COINBASE, data)
+
+    @classmethod
+    def from_gemini(cls, data) -> 'ColumnarBook':
+        return cls.from_venue(GEMINI, data)
+
+
+def merge_sides(sides: List[ColumnarSide]) -> ColumnarSide:
+    # merges k sides pairwise in a balanced tree, so every level is copied log k times
+    while len(sides) > 1:
+        merged = [sides[i].merge(sides[i + 1]) for i in range(0, len(sides) - 1, 2)]
+        if len(sides) % 2:
+            merged.append(sides[-1])
+        sides = merged
+    return sides[0]
+
+
+# engine functions, same signatures as utils/helper.py
+
+
+def merge_asks_columnar(*venue_asks: Iterable[Tuple[str, str]], max_quantity: Optional[Decimal] = None) -> ColumnarSide:
+    return merge_sides([ColumnarSide.from_levels(asks, descending=False, max_quantity=max_quantity) for asks in venue_asks])
+
+
+def merge_bids_columnar(*venue_bids: Iterable[Tuple[str, str]], max_quantity: Optional[Decimal] = None) -> ColumnarSide:
+    return merge_sides([ColumnarSide.from_levels(bids, descending=True, max_quantity=max_quantity) for bids in venue_bids])
+
+
+def merge_sorted_asks_columnar(coinbase_asks: List, gemini_asks: List) -> ColumnarSide:
+    return merge_asks_columnar(COINBASE.parse_levels(coinbase_asks), GEMINI.parse_levels(gemini_asks))
+
+
+def merge_sorted_bids_columnar(coinbase_bids: List, gemini_bids: List) -> ColumnarSide:
+    return merge_bids_columnar(COINBASE.parse_levels(coinbase_bids), GEMINI.parse_levels(gemini_bids))
+
+
+def calculate_buy_price_columnar(merged_bids: ColumnarSide, quantity: Decimal) -> Decimal:
+    return merged_bids.cost_to_fill(quantity)
+
+
+def calculate_sell_price_columnar(merged_asks: ColumnarSide, quantity: Decimal) -> Decimal:
+    return merged_asks.cost_to_fill(quantity)
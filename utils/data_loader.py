@@ -1,24 +1,109 @@
-import requests
-from typing import Dict, Any
+import inspect
+import os
+import threading
+from functools import wraps
+from typing import Dict, Any, Optional
+from decimal import Decimal
+from utils.metrics import METRICS
 from utils.rate_limiter_dec import rate_limiter
+from utils.stream_parser import parse_coinbase_stream, CHUNK_SIZE
+
+# requests is imported on the first fetch instead of here, it is the bulk of the CLIs' startup time.
+# the settings below come from the environment when they are first needed, not on import, so a .env
+# the CLIs load (or a variable a test sets) after this module is imported still applies.
+
+DEFAULT_FETCH_TIMEOUT = 10.0
+
+
+def fetch_timeout() -> float:
+    # seconds a request may stall (connecting, or between two reads of the body) before it is abandoned.
+    # FETCH_TIMEOUT overrides it, a fetch can also pass its own timeout
+    return float(os.getenv('FETCH_TIMEOUT') or DEFAULT_FETCH_TIMEOUT)
+
+
+def venue_limiter_settings(venue: str) -> Dict[str, Any]:
+    # one call every 2 seconds per venue.
+    # RATE_LIMIT_WAIT: seconds a call may wait for its token, unset (or 0) fails fast with TokenBucketTooEarly.
+    # RATE_LIMIT_DIR: keep each venue's bucket in a file there, so every process on the machine shares the budget.
+    # RATE_LIMIT_BURST: calls a venue may make back to back, 1 by default. hedged requests need at least 2.
+    wait = float(os.getenv('RATE_LIMIT_WAIT') or 0)
+    directory = os.getenv('RATE_LIMIT_DIR')
+    path = os.path.join(directory, f'{venue}.bucket') if directory else None
+    burst = int(os.getenv('RATE_LIMIT_BURST') or 1)
+    return dict(capacity=burst, tokens_per_minute=30.0, block=wait > 0, timeout=wait, path=path, name=venue)
+
+
+class LazyBucket:
+    # stands in for a loader's bucket (call_loader takes tokens from it) until the first use builds it
+
+    def __init__(self, build):
+        self._build = build
+
+    def __getattr__(self, name):
+        return getattr(self._build().bucket, name)
+
+
+def venue_rate_limiter(venue: str):
+    # rate_limiter with venue_limiter_settings, read on the loader's first call (or first token taken
+    # from its bucket) rather than when it is decorated. the loader keeps that bucket afterwards
+    def decorator(func):
+        limited = []
+        lock = threading.Lock()
+
+        def build():
+            with lock:
+                if not limited:
+                    limited.append(rate_limiter(**venue_limiter_settings(venue))(func))
+            return limited[0]
+
+        if inspect.iscoroutinefunction(func):
+            @wraps(func)
+            async def wrapper(*args, **kwargs):
+                return await (limited[0] if limited else build())(*args, **kwargs)
+        else:
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                return (limited[0] if limited else build())(*args, **kwargs)
+
+        wrapper.bucket = LazyBucket(build)
+        return wrapper
+    return decorator
+
 
 # tokens_per_second = 30.0 / 60.0 = 0.5
 # after 1 call (consuming 1 token), the logic makes it wait 2 seconds (1 token / 0.5 tokens_per_second) ~ 2 seconds
-@rate_limiter(capacity=1, tokens_per_minute=30.0)
-def get_coinbase_data(API) -> Dict[str, Any]:
+# with stream=True the book is parsed straight from the response bytes instead of response.json(),
+# and with max_quantity the download stops once both sides cover that quantity.
+@venue_rate_limiter('coinbase')
+def get_coinbase_data(API, stream: bool = False, max_quantity: Optional[Decimal] = None,
+                      timeout: Optional[float] = None) -> Dict[str, Any]:
+    import requests
+    timeout = fetch_timeout() if timeout is None else timeout
     try:
-        response = requests.get(API)
-        response.raise_for_status()
-        return response.json()
+        if stream:
+            # the parse runs while the body downloads, there is no separate parse stage to time
+            with METRICS.span('fetch', venue='coinbase'), requests.get(API, stream=True, timeout=timeout) as response:
+                response.raise_for_status()
+                return parse_coinbase_stream(response.iter_content(chunk_size=CHUNK_SIZE), max_quantity)
+
+        with METRICS.span('fetch', venue='coinbase'):
+            response = requests.get(API, timeout=timeout)
+            response.raise_for_status()
+        with METRICS.span('parse', venue='coinbase'):
+            return response.json()
     except Exception as e:
         raise Exception(f"Error: {e}")
     
-@rate_limiter(capacity=1, tokens_per_minute=30.0)
-def get_gemini_data(API) -> Dict[str, Any]:
+@venue_rate_limiter('gemini')
+def get_gemini_data(API, timeout: Optional[float] = None) -> Dict[str, Any]:
+    import requests
+    timeout = fetch_timeout() if timeout is None else timeout
     try:
-        response = requests.get(API)
-        response.raise_for_status()
-        return response.json()
+        with METRICS.span('fetch', venue='gemini'):
+            response = requests.get(API, timeout=timeout)
+            response.raise_for_status()
+        with METRICS.span('parse', venue='gemini'):
+            return response.json()
     except Exception as e:
         raise Exception(f"Error: {e}")
     
\ No newline at end of file
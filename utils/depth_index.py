@@ -0,0 +1,65 @@
+from typing import Tuple, Iterable, List
+from decimal import Decimal
+from bisect import bisect_left, bisect_right
+
+# Cumulative depth index over one side of a merged book.
+# merge_sorted_* returns a one-shot generator, so quoting many quantities means re-merging each time.
+# Here the merged levels are materialized once into prefix sums of size and notional,
+# and every quantity is answered with a binary search plus one partial level.
+
+
+class DepthIndex:
+
+    def __init__(self, merged_levels: Iterable[Tuple[Decimal, Decimal]]):
+        self.prices: List[Decimal] = []
+        # cumulative size and notional up to and including each level
+        self.cum_size: List[Decimal] = []
+        self.cum_notional: List[Decimal] = []
+
+        total_size = Decimal(0)
+        total_notional = Decimal(0)
+        for price, size in merged_levels:
+            total_size += size
+            total_notional += price * size
+            self.prices.append(price)
+            self.cum_size.append(total_size)
+            self.cum_notional.append(total_notional)
+
+    def __len__(self) -> int:
+        return len(self.prices)
+
+    @property
+    def total_size(self) -> Decimal:
+        return self.cum_size[-1] if self.cum_size else Decimal(0)
+
+    @property
+    def total_notional(self) -> Decimal:
+        return self.cum_notional[-1] if self.cum_notional else Decimal(0)
+
+    def cost_to_fill(self, quantity: Decimal) -> Decimal:
+        # same result as calculate_buy_price / calculate_sell_price on the same levels.
+        # like those, a quantity deeper than the book returns the cost of the whole side.
+        # first level whose cumulative size covers the quantity
+        k = bisect_left(self.cum_size, quantity)
+        if k == len(self.cum_size):
+            return self.total_notional
+
+        if k == 0:
+            return Decimal(0) + self.prices[0] * quantity
+
+        return self.cum_notional[k - 1] + self.prices[k] * (quantity - self.cum_size[k - 1])
+
+    def max_quantity_for_budget(self, budget: Decimal) -> Decimal:
+        # the largest quantity whose fill cost does not exceed the budget.
+        # number of levels that can be taken in full
+        k = bisect_right(self.cum_notional, budget)
+        if k == len(self.cum_notional):
+            return self.total_size
+
+        if k == 0:
+            return budget / self.prices[0]
+
+        return self.cum_size[k - 1] + (budget - self.cum_notional[k - 1]) / self.prices[k]
+
+    def costs_to_fill(self, quantities: Iterable[Decimal]) -> List[Decimal]:
+        return [self.cost_to_fill(quantity) for quantity in quantities]
@@ -0,0 +1,163 @@
+from bisect import bisect_left
+from decimal import Decimal, InvalidOperation, ROUND_CEILING, ROUND_FLOOR
+from itertools import chain
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple, Union
+
+# Price bucketed depth ladder over one side of a merged book.
+# Most consumers want depth at a coarser grain than the tick ($1, or a basis point of the touch),
+# so the merged levels are collapsed into buckets of that width once, with each bucket's exact size
+# and notional and running totals over the buckets. The ladder (a depth chart) is then a slice of
+# the bucket list, and serializing it costs per bucket instead of per tick.
+#
+# Pricing stays exact: whole buckets come from the running notional, and only the bucket a fill
+# ends in is walked level by level, so cost_to_fill gives the same value as calculate_buy_price /
+# calculate_sell_price while touching at most one bucket's levels.
+#
+# A bid bucket holds the prices in [price, price + width), an ask bucket those in (price - width, price].
+# Either way the bucket's price is the worst price in it, every level of the bucket is at least that good.
+
+BASIS_POINT = Decimal('0.0001')
+
+
+class Bucket(NamedTuple):
+    price: Decimal
+    size: Decimal
+    notional: Decimal
+    # size and notional of this bucket and every better one
+    cum_size: Decimal
+    cum_notional: Decimal
+    # tick levels collapsed into the bucket
+    levels: int
+
+
+def parse_width(text: str) -> Tuple[Decimal, bool]:
+    # "1" is a bucket $1 wide, "1bp" (or "1bps") one basis point of the touch price
+    bps = text.endswith(('bp', 'bps'))
+    try:
+        width = Decimal(text[:-3] if text.endswith('bps') else text[:-2] if bps else text)
+    except InvalidOperation:
+        raise ValueError(f"Invalid bucket width: {text}")
+    if not width.is_finite() or not width > 0:
+        raise ValueError(f"Bucket width must be positive, got {text}")
+    return width, bps
+
+
+def resolve_width(width: Union[str, Decimal], touch: Optional[Decimal]) -> Decimal:
+    # the absolute width, a width in basis points is rounded to the touch price's tick (at least one tick)
+    if isinstance(width, Decimal):
+        return width
+    width, bps = parse_width(width)
+    if not bps or touch is None:
+        return width
+    tick = Decimal(1).scaleb(touch.as_tuple().exponent)
+    return max((touch * width * BASIS_POINT).quantize(tick), tick)
+
+
+def bucket_price(price: Decimal, width: Decimal, descending: bool) -> Decimal:
+    rounding = ROUND_FLOOR if descending else ROUND_CEILING
+    return (price / width).to_integral_value(rounding=rounding) * width
+
+
+class DepthLadder:
+
+    def __init__(self, merged_levels: Iterable[Tuple[Decimal, Decimal]], width: Union[str, Decimal],
+                 descending: bool = False):
+        # merged_levels in book order, best first (bids with descending=True).
+        # width is a Decimal, or text for parse_width
+        # every level, for the bucket a fill ends in
+        self.level_prices: List[Decimal] = []
+        self.level_sizes: List[Decimal] = []
+        self.descending = descending
+        # per bucket, and the index of its first level
+        self.prices: List[Decimal] = []
+        self.sizes: List[Decimal] = []
+        self.notionals: List[Decimal] = []
+        self.starts: List[int] = []
+        self.cum_size: List[Decimal] = []
+        self.cum_notional: List[Decimal] = []
+
+        levels = iter(merged_levels)
+        first = next(levels, None)
+        self.width = resolve_width(width, first[0] if first else None)
+        if first is None:
+            return
+
+        edge = bucket_price(first[0], self.width, descending)
+        size = notional = total_size = total_notional = Decimal(0)
+        start = 0
+        for index, (price, level_size) in enumerate(chain([first], levels)):
+            # the levels are sorted, so a new bucket starts exactly when a price leaves the current one
+            if (price < edge) if descending else (price > edge):
+                self._close(edge, size, notional, start, total_size, total_notional)
+                edge = bucket_price(price, self.width, descending)
+                size = notional = Decimal(0)
+                start = index
+            level_notional = price * level_size
+            size += level_size
+            notional += level_notional
+            total_size += level_size
+            total_notional += level_notional
+            self.level_prices.append(price)
+            self.level_sizes.append(level_size)
+        self._close(edge, size, notional, start, total_size, total_notional)
+
+    def _close(self, edge: Decimal, size: Decimal, notional: Decimal, start: int,
+               total_size: Decimal, total_notional: Decimal) -> None:
+        self.prices.append(edge)
+        self.sizes.append(size)
+        self.notionals.append(notional)
+        self.starts.append(start)
+        self.cum_size.append(total_size)
+        self.cum_notional.append(total_notional)
+
+    def _end(self, b: int) -> int:
+        # index past the last level of bucket b
+        return self.starts[b + 1] if b + 1 < len(self.starts) else len(self.level_prices)
+
+    def __len__(self) -> int:
+        # number of buckets
+        return len(self.prices)
+
+    @property
+    def total_size(self) -> Decimal:
+        return self.cum_size[-1] if self.cum_size else Decimal(0)
+
+    @property
+    def total_notional(self) -> Decimal:
+        return self.cum_notional[-1] if self.cum_notional else Decimal(0)
+
+    def cost_to_fill(self, quantity: Decimal) -> Decimal:
+        # same result as calculate_buy_price / calculate_sell_price on the same levels.
+        # like those, a quantity deeper than the book returns the cost of the whole side.
+        # first bucket whose cumulative size covers the quantity
+        b = bisect_left(self.cum_size, quantity)
+        if b == len(self.cum_size):
+            return self.total_notional
+
+        cost = self.cum_notional[b - 1] if b else Decimal(0)
+        remaining = quantity - self.cum_size[b - 1] if b else quantity
+        for index in range(self.starts[b], self._end(b)):
+            size = self.level_sizes[index]
+            if remaining <= size:
+                return cost + self.level_prices[index] * remaining
+            cost += self.level_prices[index] * size
+            remaining -= size
+        return cost
+
+    def costs_to_fill(self, quantities: Iterable[Decimal]) -> List[Decimal]:
+        return [self.cost_to_fill(quantity) for quantity in quantities]
+
+    def buckets(self, depth: Optional[int] = None) -> List[Bucket]:
+        # the best depth buckets (all of them by default), a depth chart
+        count = len(self.prices) if depth is None else min(depth, len(self.prices))
+        return [
+            Bucket(self.prices[b], self.sizes[b], self.notionals[b], self.cum_size[b], self.cum_notional[b],
+                   self._end(b) - self.starts[b])
+            for b in range(count)
+        ]
+
+    def rows(self, depth: Optional[int] = None) -> List[Dict[str, Any]]:
+        # buckets as json ready dicts, amounts as strings like the venues send them
+        return [{'price': str(bucket.price), 'size': str(bucket.size), 'notional': str(bucket.notional),
+                 'cum_size': str(bucket.cum_size), 'cum_notional': str(bucket.cum_notional), 'levels': bucket.levels}
+                for bucket in self.buckets(depth)]
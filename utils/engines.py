@@ -0,0 +1,45 @@
+from importlib.util import find_spec
+from typing import Callable, NamedTuple, Dict
+
+from utils.helper import merge_asks, merge_bids, calculate_buy_price, calculate_sell_price
+from utils.fixed_point import merge_asks_fixed, merge_bids_fixed, calculate_buy_price_fixed, calculate_sell_price_fixed
+
+# The merge and pricing functions the CLIs can switch between with --engine.
+# merge_asks / merge_bids take one iterable of (price, size) strings per venue (see utils/venues.py),
+# and the calculators return the cost as a Decimal.
+
+
+class Engine(NamedTuple):
+    merge_asks: Callable
+    merge_bids: Callable
+    calculate_buy_price: Callable
+    calculate_sell_price: Callable
+
+
+ENGINES: Dict[str, Engine] = {
+    'decimal': Engine(merge_asks, merge_bids, calculate_buy_price, calculate_sell_price),
+    'fixed': Engine(merge_asks_fixed, merge_bids_fixed, calculate_buy_price_fixed, calculate_sell_price_fixed),
+}
+
+
+def columnar_function(name: str) -> Callable:
+    # numpy takes longer to import than everything else the CLIs load,
+    # so utils.columnar is only imported once the numpy engine is actually used
+    def call(*args, **kwargs):
+        from utils import columnar
+        return getattr(columnar, name)(*args, **kwargs)
+
+    call.__name__ = name
+    return call
+
+
+# only offered when numpy is installed
+if find_spec('numpy') is not None:
+    ENGINES['numpy'] = Engine(columnar_function('merge_asks_columnar'), columnar_function('merge_bids_columnar'),
+                              columnar_function('calculate_buy_price_columnar'), columnar_function('calculate_sell_price_columnar'))
+
+
+def get_engine(name: str) -> Engine:
+    if name not in ENGINES:
+        raise ValueError(f"Unknown engine: {name}")
+    return ENGINES[name]
@@ -0,0 +1,206 @@
+from typing import Tuple, Iterator, Iterable, List, Optional
+from decimal import Decimal, ROUND_CEILING
+import heapq
+
+from utils.venues import COINBASE, GEMINI
+from utils.helper import take_depth
+
+# Scaled integer version of the merge and fill hot path.
+# Prices are held in ticks (10^-price_decimals) and sizes in base units (10^-size_decimals, satoshis by default),
+# so the fill loops are plain int multiply/add. Ints never round, so the result converted back
+# to Decimal at the end has the same value as the Decimal path.
+#
+# The engine merges find their own scale: they start at cents and satoshis and widen it when a level
+# has more decimals, a product priced below a cent (ETH-BTC) or sized below a satoshi (see ScaledMerge).
+
+# coinbase and gemini quote BTC-USD in cents and BTC in satoshis, the scales every merge starts at
+PRICE_DECIMALS = 2
+SIZE_DECIMALS = 8
+
+
+POWERS_OF_TEN = [10 ** i for i in range(32)]
+
+
+def to_scaled(text: str, decimals: int) -> int:
+    # "110100.78" -> 11010078 for decimals=2.
+    # raises ValueError if the value has more significant decimals than the scale can hold.
+    # this runs once per level, so the common cases avoid building intermediate strings.
+    point = text.find('.')
+    if point == -1:
+        return int(text) * POWERS_OF_TEN[decimals]
+
+    missing = decimals - (len(text) - point - 1)
+    if missing == 0:
+        return int(text.replace('.', ''))
+    if missing > 0:
+        return int(text.replace('.', '')) * POWERS_OF_TEN[missing]
+
+    if text[missing:].strip('0'):
+        raise ValueError(f"{text} has more than {decimals} decimal places")
+    return int(text[:missing].replace('.', ''))
+
+
+def from_scaled(value: int, decimals: int) -> Decimal:
+    # the string constructor is exact, scaleb would round to the context precision
+    return Decimal(f"{value}e-{decimals}")
+
+
+def decimal_to_scaled(value: Decimal, decimals: int) -> int:
+    scaled = value.scaleb(decimals)
+    if scaled != scaled.to_integral_value():
+        raise ValueError(f"{value} has more than {decimals} decimal places")
+    return int(scaled)
+
+
+def decimals(text: str) -> int:
+    # significant decimals of a number as text, trailing zeros do not count
+    point = text.find('.')
+    return 0 if point == -1 else len(text.rstrip('0')) - point - 1
+
+
+def decimal_places(value: Decimal) -> int:
+    return max(-value.as_tuple().exponent, 0)
+
+
+def to_scaled_levels(levels: Iterable[Tuple[str, str]],
+                     price_decimals: int = PRICE_DECIMALS,
+                     size_decimals: int = SIZE_DECIMALS) -> Iterator[Tuple[int, int]]:
+    return ((to_scaled(price, price_decimals), to_scaled(size, size_decimals)) for price, size in levels)
+
+
+def scaled_depth(max_quantity: Optional[Decimal], size_decimals: int = SIZE_DECIMALS) -> Optional[int]:
+    # max_quantity in base units, rounded up so the covering level is still included
+    if max_quantity is None:
+        return None
+    return int(max_quantity.scaleb(size_decimals).to_integral_value(rounding=ROUND_CEILING))
+
+
+class Rescaled(ValueError):
+    # a level did not fit the merge's scale, which has been widened to hold it
+    pass
+
+
+class ScaledMerge:
+    # same k-way merge as utils.helper.merge_asks / merge_bids, on scaled ints, at a scale found on the way.
+    # the scale is only known once every level has been seen, and scanning a whole book for it costs more
+    # than a depth bounded fill, so the merge starts at price_decimals / size_decimals and a level with
+    # more decimals raises Rescaled after widening them. calculate_fill_fixed (and scaled_levels) then
+    # start over at the new scale, from the levels each venue has given so far, which are kept. the scale
+    # only grows, so that happens at most once per extra decimal, and never for books in cents and satoshis.
+
+    def __init__(self, venue_levels: Iterable[Iterable[Tuple[str, str]]], reverse: bool = False,
+                 price_decimals: int = PRICE_DECIMALS, size_decimals: int = SIZE_DECIMALS,
+                 max_quantity: Optional[Decimal] = None):
+        # per venue, its levels and the ones read from them so far
+        self.venues = [(iter(levels), []) for levels in venue_levels]
+        self.reverse = reverse
+        self.price_decimals = price_decimals
+        self.size_decimals = size_decimals
+        self.max_quantity = max_quantity
+
+    def __iter__(self) -> Iterator[Tuple[int, int]]:
+        # (price, size) at the current scale, raises Rescaled from the first level that does not fit it
+        merged = heapq.merge(*[self._scaled(levels, read) for levels, read in self.venues], reverse=self.reverse)
+        return iter(take_depth(merged, scaled_depth(self.max_quantity, self.size_decimals)))
+
+    def _scaled(self, levels: Iterator[Tuple[str, str]], read: List[Tuple[str, str]]) -> Iterator[Tuple[int, int]]:
+        price_decimals, size_decimals = self.price_decimals, self.size_decimals
+        price = size = None
+        try:
+            for price, size in read:
+                yield to_scaled(price, price_decimals), to_scaled(size, size_decimals)
+            for level in levels:
+                read.append(level)
+                price, size = level
+                yield to_scaled(price, price_decimals), to_scaled(size, size_decimals)
+        except ValueError:
+            wider = max(price_decimals, decimals(price)), max(size_decimals, decimals(size))
+            if wider == (price_decimals, size_decimals):
+                # not a number, the scale can not help
+                raise
+            self.price_decimals, self.size_decimals = wider
+            raise Rescaled(f"rescaled to {wider[0]} price and {wider[1]} size decimals")
+
+
+def scaled_levels(merged: ScaledMerge) -> List[Tuple[int, int]]:
+    # every merged level, at a scale that holds them all (merged.price_decimals / size_decimals after this)
+    while True:
+        try:
+            return list(merged)
+        except Rescaled:
+            pass
+
+
+def merge_asks_fixed(*venue_asks: Iterable[Tuple[str, str]],
+                     price_decimals: int = PRICE_DECIMALS,
+                     size_decimals: int = SIZE_DECIMALS,
+                     max_quantity: Optional[Decimal] = None) -> ScaledMerge:
+    # price_decimals / size_decimals are where the scale starts, it widens for levels with more decimals
+    return ScaledMerge(venue_asks, False, price_decimals, size_decimals, max_quantity)
+
+
+def merge_bids_fixed(*venue_bids: Iterable[Tuple[str, str]],
+                     price_decimals: int = PRICE_DECIMALS,
+                     size_decimals: int = SIZE_DECIMALS,
+                     max_quantity: Optional[Decimal] = None) -> ScaledMerge:
+    return ScaledMerge(venue_bids, True, price_decimals, size_decimals, max_quantity)
+
+
+def merge_sorted_asks_fixed(coinbase_asks: List, gemini_asks: List,
+                            price_decimals: int = PRICE_DECIMALS,
+                            size_decimals: int = SIZE_DECIMALS) -> Iterator[Tuple[int, int]]:
+    return merge_asks_fixed(COINBASE.parse_levels(coinbase_asks), GEMINI.parse_levels(gemini_asks),
+                            price_decimals=price_decimals, size_decimals=size_decimals)
+
+
+def merge_sorted_bids_fixed(coinbase_bids: List, gemini_bids: List,
+                            price_decimals: int = PRICE_DECIMALS,
+                            size_decimals: int = SIZE_DECIMALS) -> Iterator[Tuple[int, int]]:
+    return merge_bids_fixed(COINBASE.parse_levels(coinbase_bids), GEMINI.parse_levels(gemini_bids),
+                            price_decimals=price_decimals, size_decimals=size_decimals)
+
+
+def calculate_fill_fixed(merged: Iterable[Tuple[int, int]], quantity: Decimal,
+                         price_decimals: int = PRICE_DECIMALS,
+                         size_decimals: int = SIZE_DECIMALS) -> Decimal:
+    # merged is a ScaledMerge, which carries its own scale, or scaled levels at the given one
+    if not isinstance(merged, ScaledMerge):
+        return fill_scaled(merged, quantity, price_decimals, size_decimals)
+    while True:
+        try:
+            return fill_scaled(iter(merged), quantity, merged.price_decimals, merged.size_decimals)
+        except Rescaled:
+            pass
+
+
+def fill_scaled(merged: Iterator[Tuple[int, int]], quantity: Decimal, price_decimals: int, size_decimals: int) -> Decimal:
+    # a quantity with more decimals than the sizes is handled by scaling the sizes up on the fly
+    extra = max(decimal_places(quantity) - size_decimals, 0)
+    factor = 10 ** extra
+    remaining_quantity = decimal_to_scaled(quantity, size_decimals + extra)
+    total_cost = 0
+
+    for price, size in merged:
+        if extra:
+            size *= factor
+
+        if remaining_quantity <= size:
+            total_cost += price * remaining_quantity
+            break
+
+        total_cost += price * size
+        remaining_quantity -= size
+
+    return from_scaled(total_cost, price_decimals + size_decimals + extra)
+
+
+def calculate_buy_price_fixed(merged_bids: Iterator[Tuple[int, int]], quantity: Decimal,
+                              price_decimals: int = PRICE_DECIMALS,
+                              size_decimals: int = SIZE_DECIMALS) -> Decimal:
+    return calculate_fill_fixed(merged_bids, quantity, price_decimals, size_decimals)
+
+
+def calculate_sell_price_fixed(merged_asks: Iterator[Tuple[int, int]], quantity: Decimal,
+                               price_decimals: int = PRICE_DECIMALS,
+                               size_decimals: int = SIZE_DECIMALS) -> Decimal:
+    return calculate_fill_fixed(merged_asks, quantity, price_decimals, size_decimals)
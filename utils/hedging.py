@@ -0,0 +1,187 @@
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait, FIRST_COMPLETED
+from contextvars import copy_context
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from utils.metrics import METRICS
+from utils.rate_limiter_dec import TokenBucketTooEarly
+
+# Latency budgets, hedged requests and stale fallback for the venue fetches.
+# One slow venue used to hold up the whole quote, and one failing venue ended it.
+#
+# Every venue gets a latency budget. A venue that has not answered after hedge_after seconds gets a
+# second request, and one whose request failed gets it right away. The first good answer wins.
+# A hedged request only goes out on a rate limit token that is free right now (call_loader hedge=True),
+# so hedging never goes over the venue's budget or delays the next regular call: with the default
+# RATE_LIMIT_BURST of 1 there is never a spare token, and the venue falls through to the next step.
+#
+# A venue that misses its budget or fails is priced from its last good book, with the book's age,
+# when there is one younger than max_age. Otherwise it is left out and the quote uses the others.
+#
+# Requests are not cancelled when the budget runs out, they finish in daemon threads and their
+# result is dropped, so a stalled venue never holds the quote or the exit of the process.
+
+
+class VenueTimeout(Exception):
+    pass
+
+
+class FetchResult(NamedTuple):
+    # None when the venue is left out
+    data: Optional[Dict[str, Any]]
+    # seconds since the book was fetched, 0.0 for a live one
+    age: float
+    # requests sent, hedges included
+    attempts: int
+    # why the live fetch failed, None when it did not
+    error: Optional[str]
+
+    @property
+    def stale(self) -> bool:
+        return self.data is not None and self.error is not None
+
+
+class LastGoodBooks:
+    # the latest good book of every venue and when it was fetched, on the wall clock like the snapshot file
+
+    def __init__(self):
+        self._books: Dict[str, Tuple[Dict[str, Any], int]] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_snapshot_file(cls, path, product: Optional[str] = None) -> 'LastGoodBooks':
+        # the newest book of every venue recorded with --record
+        from utils.snapshot_store import latest_books
+        books = cls()
+        for venue, (data, fetched_ns) in latest_books(path, product).items():
+            books.store(venue, data, fetched_ns)
+        return books
+
+    def store(self, venue: str, data: Dict[str, Any], fetched_ns: Optional[int] = None) -> None:
+        fetched_ns = time.time_ns() if fetched_ns is None else fetched_ns
+        with self._lock:
+            # a late answer never replaces a newer book
+            if venue not in self._books or self._books[venue][1] <= fetched_ns:
+                self._books[venue] = (data, fetched_ns)
+
+    def get(self, venue: str, max_age: Optional[float] = None) -> Optional[Tuple[Dict[str, Any], float]]:
+        # (payload, age in seconds), None when there is none or it is older than max_age
+        with self._lock:
+            book = self._books.get(venue)
+        if book is None:
+            return None
+        data, fetched_ns = book
+        age = max(0.0, (time.time_ns() - fetched_ns) / 1e9)
+        if max_age is not None and age > max_age:
+            return None
+        return data, age
+
+
+def start_attempt(venue, url: str, hints: Dict[str, Any]) -> Future:
+    # one request in a daemon thread, its spans land in the caller's trace
+    future = Future()
+
+    def run():
+        try:
+            data = venue.fetch(url, **hints)
+            venue.validate(data)
+            future.set_result(data)
+        except Exception as e:
+            future.set_exception(e)
+
+    threading.Thread(target=copy_context().run, args=(run,), name=f'fetch-{venue.name}', daemon=True).start()
+    return future
+
+
+def hedged_fetch(venue, url: str, budget: Optional[float] = None, hedge_after: Optional[float] = None,
+                 max_attempts: int = 2, **hints) -> Tuple[Dict[str, Any], int]:
+    # returns the first good payload and the number of requests sent.
+    # raises VenueTimeout once budget seconds are up, or the last error when every request failed.
+    # without a budget it waits as long as the requests do (FETCH_TIMEOUT).
+    start = time.monotonic()
+    deadline = None if budget is None else start + budget
+    if budget is not None:
+        # a request past the budget is of no use, it should not linger longer than that either
+        hints.setdefault('timeout', budget)
+
+    pending = {start_attempt(venue, url, hints)}
+    attempts = 1
+    can_hedge = hedge_after is not None and max_attempts > 1
+    error = None
+
+    while True:
+        hedge_at = start + hedge_after * attempts if can_hedge and attempts < max_attempts else None
+        wake = min((moment for moment in (deadline, hedge_at) if moment is not None), default=None)
+        done, pending = wait(pending, timeout=None if wake is None else max(0.0, wake - time.monotonic()),
+                             return_when=FIRST_COMPLETED)
+
+        for future in done:
+            if future.exception() is None:
+                return future.result(), attempts
+            if not isinstance(future.exception(), TokenBucketTooEarly):
+                error = future.exception()
+                continue
+            # no spare token for this venue, more requests would be refused the same way
+            error = error or future.exception()
+            can_hedge = False
+            if attempts > 1:
+                attempts -= 1
+                METRICS.increment('hedges_refused', venue=venue.name)
+
+        now = time.monotonic()
+        if deadline is not None and now >= deadline:
+            raise VenueTimeout(f"{venue.display_name} did not answer within {budget} seconds")
+
+        # hedge once the wait is over, or at once when every request so far failed
+        if can_hedge and attempts < max_attempts and (not pending or now >= hedge_at):
+            pending.add(start_attempt(venue, url, {**hints, 'hedge': True}))
+            attempts += 1
+            METRICS.increment('hedged_requests', venue=venue.name)
+        elif not pending:
+            raise error
+
+
+def fetch_venue(venue, url: str, budget: Optional[float], hedge_after: Optional[float],
+                last_good: Optional[LastGoodBooks], max_age: Optional[float], hints: Dict[str, Any]) -> FetchResult:
+    try:
+        data, attempts = hedged_fetch(venue, url, budget, hedge_after, **hints)
+    except Exception as e:
+        METRICS.increment('venue_misses', venue=venue.name)
+        stale = last_good.get(venue.name, max_age) if last_good is not None else None
+        if stale is None:
+            return FetchResult(None, 0.0, 0, str(e))
+        METRICS.increment('stale_books', venue=venue.name)
+        return FetchResult(stale[0], stale[1], 0, str(e))
+
+    if last_good is not None:
+        last_good.store(venue.name, data)
+    return FetchResult(data, 0.0, attempts, None)
+
+
+def fetch_books(venues: List, urls: Dict[str, str], budgets: Optional[Dict[str, float]] = None,
+                hedge_after: Optional[float] = None, last_good: Optional[LastGoodBooks] = None,
+                max_age: Optional[float] = None, **hints) -> Dict[Any, FetchResult]:
+    # every venue at once, each within its own budget. urls and budgets are keyed by venue name,
+    # the budget under None applies to the venues without their own.
+    # hints go to every venue.fetch (stream, max_quantity, ...)
+    budgets = budgets or {}
+    with ThreadPoolExecutor(max_workers=len(venues)) as executor:
+        futures = {
+            venue: executor.submit(copy_context().run, fetch_venue, venue, urls[venue.name],
+                                   budgets.get(venue.name, budgets.get(None)), hedge_after, last_good, max_age, dict(hints))
+            for venue in venues
+        }
+        return {venue: future.result() for venue, future in futures.items()}
+
+
+def parse_budgets(values: Optional[List[str]]) -> Dict[Optional[str], float]:
+    # "1.5" for every venue, "gemini=0.4" for one of them
+    budgets = {}
+    for value in values or []:
+        name, _, seconds = value.rpartition('=')
+        budget = float(seconds)
+        if budget <= 0:
+            raise ValueError(f"Latency budget must be positive, got {value}")
+        budgets[name or None] = budget
+    return budgets
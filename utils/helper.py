@@ -1,26 +1,54 @@
-from typing import Tuple, Iterator, List
+from typing import Tuple, Iterator, Iterable, List, Optional
 from decimal import Decimal
 import heapq
 
+from utils.venues import COINBASE, GEMINI
+
+
+def to_decimal_levels(levels: Iterable[Tuple[str, str]]) -> Iterator[Tuple[Decimal, Decimal]]:
+    # converted on demand, levels the merge never reaches are never turned into Decimals
+    return ((Decimal(price), Decimal(size)) for price, size in levels)
+
+
+def take_depth(levels: Iterator[Tuple], max_quantity) -> Iterator[Tuple]:
+    # stops after the level that brings the total size to max_quantity.
+    # that is every level a fill of max_quantity (or less) can touch, so pricing is unchanged.
+    # max_quantity has to be in the same units as the sizes.
+    if max_quantity is None:
+        return levels
+    return _take_depth(levels, max_quantity)
+
+
+def _take_depth(levels: Iterator[Tuple], max_quantity) -> Iterator[Tuple]:
+    total_size = 0
+    for level in levels:
+        yield level
+        total_size += level[1]
+        if total_size >= max_quantity:
+            return
+
+
+def merge_asks(*venue_asks: Iterable[Tuple[str, str]], max_quantity: Optional[Decimal] = None) -> Iterator[Tuple[Decimal, Decimal]]:
+    # k-way merge of any number of venues, each already in the ascending order.
+    # heapq.merge keeps a heap of one level per venue, so this is O(total levels * log k)
+    # and it is lazy, with max_quantity it stops pulling from the venues once the quantity is covered.
+    return take_depth(heapq.merge(*[to_decimal_levels(asks) for asks in venue_asks]), max_quantity)
+
+
+def merge_bids(*venue_bids: Iterable[Tuple[str, str]], max_quantity: Optional[Decimal] = None) -> Iterator[Tuple[Decimal, Decimal]]:
+    # each venue is already in the descending order, reverse=True merges it as is
+    # instead of negating the prices and flipping them back.
+    return take_depth(heapq.merge(*[to_decimal_levels(bids) for bids in venue_bids], reverse=True), max_quantity)
+
+
 def merge_sorted_asks(coinbase_asks: List, gemini_asks: List) -> Iterator[Tuple[Decimal, Decimal]]:
     # data is already in the ascending order. Proceeding with the merge.
-    coinbase_a = [(Decimal(price), Decimal(size)) for price, size, qty in coinbase_asks]
-    gemini_a = [(Decimal(ask['price']), Decimal(ask['amount'])) for ask in gemini_asks]
-    # avoiding re-sorting the data using heapq.merge
-    return heapq.merge(coinbase_a, gemini_a)
+    return merge_asks(COINBASE.parse_levels(coinbase_asks), GEMINI.parse_levels(gemini_asks))
 
-def merge_sorted_bids(coinbase_bids: List, gemini_bids: List) -> Iterator[Tuple[Decimal, Decimal]]:
-    # we need to get this in the descending order. 
-    # idea is to negate the prices and then flip it backwards.
-    coinbase_b = [(-Decimal(price), Decimal(size)) for price, size, qty in coinbase_bids]
-    gemini_b = [(-Decimal(bid['price']), Decimal(bid['amount'])) for bid in gemini_bids]
-
-    # avoiding re-sorting the data using heapq.merge
-    merged_data = heapq.merge(coinbase_b, gemini_b)
 
-    # flipping the data backwards to positive prices
-    flipped_data = ((-price, size) for price, size in merged_data)
-    return flipped_data
+def merge_sorted_bids(coinbase_bids: List, gemini_bids: List) -> Iterator[Tuple[Decimal, Decimal]]:
+    # we need to get this in the descending order.
+    return merge_bids(COINBASE.parse_levels(coinbase_bids), GEMINI.parse_levels(gemini_bids))
 
 
 def calculate_buy_price(merged_bids: Iterator[Tuple[Decimal, Decimal]], quantity: Decimal) -> Decimal:
@@ -59,4 +87,4 @@ def calculate_sell_price(merged_asks: Iterator[Tuple[Decimal, Decimal]], quantit
 
         remaining_quantity -= size
     
-    return total_cost
\ No newline at end of file
+    return total_cost
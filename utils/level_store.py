@@ -0,0 +1,178 @@
+import heapq
+from array import array
+from bisect import bisect_left
+from decimal import Decimal
+from itertools import accumulate, repeat
+from operator import and_, mul, rshift, sub
+from typing import Iterable, Iterator, List, Tuple
+
+from utils.fixed_point import PRICE_DECIMALS, SIZE_DECIMALS, to_scaled, from_scaled, decimal_places, decimal_to_scaled, decimals
+
+# Compact storage for book levels that are kept around.
+# A (Decimal, Decimal) tuple costs about 270 bytes a level, and DepthIndex keeps three Decimals and
+# three list slots a level on top. Here a side is a few flat int64 arrays of scaled values
+# (utils/fixed_point.py), 8 bytes per value and no object per level. The columns are converted and
+# summed with map/accumulate, so there is no Python loop per level either.
+#
+# Cumulative notional does not fit an int64 (price ticks times base units of the whole side), so it
+# is split in two arrays, high << NOTIONAL_BITS | low. Both are exact, cost_to_fill gives the same
+# value as calculate_buy_price / calculate_sell_price.
+
+NOTIONAL_BITS = 62
+NOTIONAL_MASK = (1 << NOTIONAL_BITS) - 1
+
+
+def scaled_column(texts: List[str], decimals: int) -> array:
+    # venues write a column with the same number of decimals on every value, then scaling is dropping
+    # the point, with no Python call per value. anything else goes through to_scaled
+    if texts and all(map(str.__contains__, texts, repeat('.'))):
+        places = set(map(sub, map(len, texts), map(str.find, texts, repeat('.'))))
+        missing = decimals - (places.pop() - 1) if len(places) == 1 else -1
+        if missing >= 0:
+            values = map(int, map(str.replace, texts, repeat('.'), repeat('')))
+            return array('q', map(mul, values, repeat(10 ** missing)) if missing else values)
+    return array('q', map(to_scaled, texts, repeat(decimals)))
+
+
+def column_decimals(texts: List[str]) -> int:
+    # the smallest scale that holds every value exactly
+    return max(map(decimals, texts), default=0)
+
+
+class LevelBuffer:
+    # one side of one venue's book as scaled (price, size) int64 pairs, in book order
+
+    __slots__ = ('prices', 'sizes', 'price_decimals', 'size_decimals')
+
+    def __init__(self, levels: Iterable[Tuple[str, str]] = ()):
+        # (price, size) strings. the usual scales (cents, satoshis) are tried first,
+        # a column with more decimals gets its exact one
+        levels = list(levels)
+        self.price_decimals, self.prices = self._column([price for price, _ in levels], PRICE_DECIMALS)
+        self.size_decimals, self.sizes = self._column([size for _, size in levels], SIZE_DECIMALS)
+
+    @staticmethod
+    def _column(texts: List[str], decimals: int) -> Tuple[int, array]:
+        try:
+            return decimals, scaled_column(texts, decimals)
+        except ValueError:
+            decimals = column_decimals(texts)
+            return decimals, scaled_column(texts, decimals)
+
+    def __len__(self) -> int:
+        return len(self.prices)
+
+    def __getitem__(self, index: int) -> Tuple[Decimal, Decimal]:
+        return from_scaled(self.prices[index], self.price_decimals), from_scaled(self.sizes[index], self.size_decimals)
+
+    def scaled(self, price_decimals: int, size_decimals: int) -> Iterator[Tuple[int, int]]:
+        # (price, size) ints at the given scales, which are at least the buffer's own
+        prices = self.prices
+        sizes = self.sizes
+        if price_decimals != self.price_decimals:
+            prices = map(mul, prices, repeat(10 ** (price_decimals - self.price_decimals)))
+        if size_decimals != self.size_decimals:
+            sizes = map(mul, sizes, repeat(10 ** (size_decimals - self.size_decimals)))
+        return zip(prices, sizes)
+
+    def levels(self) -> Iterator[Tuple[Decimal, Decimal]]:
+        # back to Decimals, for the calculators
+        return (self[index] for index in range(len(self.prices)))
+
+
+class CompactDepth:
+    # same queries as DepthIndex, over a merged side held as int64 columns
+
+    __slots__ = ('prices', 'cum_size', 'notional_high', 'notional_low', 'price_decimals', 'size_decimals', '_count')
+
+    def __init__(self, merged: Iterable[Tuple[int, int]] = (), price_decimals: int = PRICE_DECIMALS,
+                 size_decimals: int = SIZE_DECIMALS):
+        # merged (price, size) scaled ints in book order
+        columns = list(zip(*merged))
+        prices, sizes = columns if columns else ((), ())
+        notional = list(accumulate(map(mul, prices, sizes)))
+
+        self.prices = array('q', prices)
+        # cumulative size and notional up to and including each level
+        self.cum_size = array('q', accumulate(sizes))
+        self.notional_high = array('q', map(rshift, notional, repeat(NOTIONAL_BITS)))
+        self.notional_low = array('q', map(and_, notional, repeat(NOTIONAL_MASK)))
+        self.price_decimals = price_decimals
+        self.size_decimals = size_decimals
+        self._count = len(prices)
+
+    @classmethod
+    def merge(cls, buffers: List[LevelBuffer], reverse: bool = False) -> 'CompactDepth':
+        # k-way merge of venue buffers (bids with reverse=True), brought to a common scale first like merged_side
+        price_decimals = max((buffer.price_decimals for buffer in buffers), default=PRICE_DECIMALS)
+        size_decimals = max((buffer.size_decimals for buffer in buffers), default=SIZE_DECIMALS)
+        merged = heapq.merge(*(buffer.scaled(price_decimals, size_decimals) for buffer in buffers), reverse=reverse)
+        return cls(merged, price_decimals, size_decimals)
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _notional(self, k: int) -> int:
+        # cumulative notional of the first k levels
+        if k == 0:
+            return 0
+        return self.notional_high[k - 1] << NOTIONAL_BITS | self.notional_low[k - 1]
+
+    @property
+    def total_size(self) -> Decimal:
+        return from_scaled(self.cum_size[self._count - 1] if self._count else 0, self.size_decimals)
+
+    @property
+    def total_notional(self) -> Decimal:
+        return from_scaled(self._notional(self._count), self.price_decimals + self.size_decimals)
+
+    def cost_to_fill(self, quantity: Decimal) -> Decimal:
+        # same result as calculate_buy_price / calculate_sell_price on the same levels, and like those,
+        # a quantity deeper than the book returns the cost of the whole side
+        units = quantity.scaleb(self.size_decimals)
+        if units == units.to_integral_value():
+            extra = 0
+            units = needed = int(units)
+        else:
+            # more decimals than the sizes, the fill is priced at the quantity's own scale
+            extra = decimal_places(quantity) - self.size_decimals
+            units = decimal_to_scaled(quantity, self.size_decimals + extra)
+            needed = -(-units // 10 ** extra)
+
+        # first level whose cumulative size covers the quantity
+        k = bisect_left(self.cum_size, needed, 0, self._count)
+        if k == self._count:
+            return self.total_notional
+
+        factor = 10 ** extra
+        filled = self.cum_size[k - 1] * factor if k else 0
+        cost = self._notional(k) * factor + self.prices[k] * (units - filled)
+        return from_scaled(cost, self.price_decimals + self.size_decimals + extra)
+
+    def costs_to_fill(self, quantities: Iterable[Decimal]) -> List[Decimal]:
+        return [self.cost_to_fill(quantity) for quantity in quantities]
+
+    def max_quantity_for_budget(self, budget: Decimal) -> Decimal:
+        # the largest quantity whose fill cost does not exceed the budget, like DepthIndex.
+        # ints and Decimals compare exactly, so the budget is only scaled, never rounded
+        notional_decimals = self.price_decimals + self.size_decimals
+        scaled = budget.scaleb(notional_decimals)
+
+        # number of levels that can be taken in full, bisect_right over the split notional
+        low, high = 0, self._count
+        while low < high:
+            middle = (low + high) // 2
+            if self._notional(middle + 1) <= scaled:
+                low = middle + 1
+            else:
+                high = middle
+        k = low
+        if k == self._count:
+            return self.total_size
+
+        price = from_scaled(self.prices[k], self.price_decimals)
+        if k == 0:
+            return budget / price
+        return from_scaled(self.cum_size[k - 1], self.size_decimals) + \
+            (budget - from_scaled(self._notional(k), notional_decimals)) / price
+
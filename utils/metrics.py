@@ -0,0 +1,276 @@
+import json
+import sys
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Dict, Any, List, Optional, Tuple
+
+# Stage timings for the quote pipeline.
+# Code wraps each stage in METRICS.span(stage, **labels): fetch and parse per venue, merge and fill
+# per side, the rate limit wait. Every span goes into a histogram per (stage, labels), which
+# render_prometheus() prints in the Prometheus text format.
+# Inside METRICS.trace(**fields), the spans are also summed per quote and written as one json line
+# when the trace ends.
+#
+# Metrics are off until enable() is called. A disabled span is a shared no-op object, so the
+# instrumented code pays one attribute check per stage.
+
+# seconds, the Prometheus client defaults
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+PREFIX = 'orderbook'
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+class Histogram:
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        # one count per bucket plus +Inf, not cumulative
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        # first bucket whose upper bound is >= value, Prometheus buckets are "less or equal"
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self) -> List[int]:
+        total = 0
+        result = []
+        for count in self.counts:
+            total += count
+            result.append(total)
+        return result
+
+
+class Trace:
+    # the stages of one quote, summed by stage and labels, plus the fields of its log line
+
+    def __init__(self, fields: Dict[str, Any]):
+        self.fields = fields
+        self.stages: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def add(self, key: str, seconds: float) -> None:
+        # spans of one quote may end in several threads at once
+        with self._lock:
+            self.stages[key] = self.stages.get(key, 0.0) + seconds
+
+    def record(self) -> Dict[str, Any]:
+        return {
+            'event': 'quote',
+            'time': datetime.now(timezone.utc).isoformat(),
+            **self.fields,
+            'stages_ms': {key: round(seconds * 1e3, 3) for key, seconds in self.stages.items()},
+        }
+
+
+_current_trace: ContextVar[Optional[Trace]] = ContextVar('current_trace', default=None)
+
+
+class NullSpan:
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+NULL_SPAN = NullSpan()
+
+
+class Span:
+    __slots__ = ('metrics', 'stage', 'labels', 'start')
+
+    def __init__(self, metrics: 'Metrics', stage: str, labels: Tuple[Tuple[str, str], ...]):
+        self.metrics = metrics
+        self.stage = stage
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.record(self.stage, (time.perf_counter_ns() - self.start) / 1e9, self.labels)
+        return False
+
+
+def trace_key(stage: str, labels: Tuple[Tuple[str, str], ...]) -> str:
+    # fetch.coinbase, merge.asks
+    return '.'.join([stage] + [value for _, value in labels])
+
+
+def label_text(labels: Tuple[Tuple[str, str], ...], extra: str = '') -> str:
+    parts = [f'{key}="{escape(value)}"' for key, value in labels]
+    if extra:
+        parts.append(extra)
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+
+def escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class Metrics:
+
+    def __init__(self, enabled: bool = False, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.enabled = enabled
+        self.buckets = buckets
+        # where the per quote json lines go
+        self.log_stream = sys.stderr
+        self._histograms: Dict[Tuple, Histogram] = {}
+        self._counters: Dict[Tuple, int] = {}
+        self._lock = threading.Lock()
+
+    def enable(self, log_stream=None) -> 'Metrics':
+        self.enabled = True
+        if log_stream is not None:
+            self.log_stream = log_stream
+        return self
+
+    def disable(self) -> None:
+        self.enabled = False
+
+    def reset(self) -> None:
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+    def span(self, stage: str, **labels: str):
+        if not self.enabled:
+            return NULL_SPAN
+        return Span(self, stage, tuple(labels.items()))
+
+    def record(self, stage: str, seconds: float, labels: Tuple[Tuple[str, str], ...] = ()) -> None:
+        # a stage timed by hand, same as a span that took seconds
+        self.observe(stage, seconds, labels)
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.add(trace_key(stage, labels), seconds)
+
+    def observe(self, stage: str, seconds: float, labels: Tuple[Tuple[str, str], ...] = ()) -> None:
+        key = (('stage', stage),) + labels
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(self.buckets)
+            histogram.observe(seconds)
+
+    def increment(self, name: str, **labels: str) -> None:
+        if not self.enabled:
+            return
+        key = (name, tuple(labels.items()))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + 1
+
+    def histogram(self, stage: str, **labels: str) -> Optional[Histogram]:
+        return self._histograms.get((('stage', stage),) + tuple(labels.items()))
+
+    def counter(self, name: str, **labels: str) -> int:
+        return self._counters.get((name, tuple(labels.items())), 0)
+
+    def trace(self, **fields: Any) -> 'TraceContext':
+        return TraceContext(self, fields)
+
+    def annotate(self, **fields: Any) -> None:
+        # adds fields (prices, book sizes) to the log line of the current quote, if one is traced
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.fields.update(fields)
+
+    def render_prometheus(self) -> str:
+        with self._lock:
+            histograms = sorted(self._histograms.items())
+            counters = sorted(self._counters.items())
+
+        lines = []
+        if histograms:
+            name = f'{PREFIX}_stage_seconds'
+            lines.append(f'# HELP {name} Time spent in each stage of the quote pipeline.')
+            lines.append(f'# TYPE {name} histogram')
+            for labels, histogram in histograms:
+                for bound, count in zip(histogram.buckets + (float('inf'),), histogram.cumulative()):
+                    le = '+Inf' if bound == float('inf') else repr(bound)
+                    lines.append(f'{name}_bucket{label_text(labels, "le=" + chr(34) + le + chr(34))} {count}')
+                lines.append(f'{name}_sum{label_text(labels)} {histogram.sum!r}')
+                lines.append(f'{name}_count{label_text(labels)} {histogram.count}')
+
+        names = []
+        for (counter_name, _), _ in counters:
+            if counter_name not in names:
+                names.append(counter_name)
+        for counter_name in names:
+            name = f'{PREFIX}_{counter_name}_total'
+            lines.append(f'# TYPE {name} counter')
+            for (other_name, labels), value in counters:
+                if other_name == counter_name:
+                    lines.append(f'{name}{label_text(labels)} {value}')
+
+        return '\n'.join(lines) + '\n'
+
+
+class TraceContext:
+    # with METRICS.trace(quantity=...) as trace: ... writes one json line for the quote at the end.
+    # threads started inside have to run in a copy of the context (contextvars.copy_context().run)
+    # for their spans to land in this trace.
+
+    def __init__(self, metrics: Metrics, fields: Dict[str, Any]):
+        self.metrics = metrics
+        self.trace = Trace(fields)
+        self._token = None
+
+    def __enter__(self) -> Trace:
+        if self.metrics.enabled:
+            self._token = _current_trace.set(self.trace)
+        return self.trace
+
+    def __exit__(self, exc_type, exc, tb):
+        if self._token is None:
+            return False
+        _current_trace.reset(self._token)
+        record = self.trace.record()
+        # the CLIs exit() on errors after printing them, that is not an error of its own
+        if isinstance(exc, Exception):
+            record['error'] = str(exc)
+        # Decimal quantities and prices are written as strings
+        self.metrics.log_stream.write(json.dumps(record, default=str) + '\n')
+        self.metrics.log_stream.flush()
+        return False
+
+
+# the one registry the loaders, the limiter and the CLIs report to
+METRICS = Metrics()
+
+
+def serve_metrics(port: int, host: str = '127.0.0.1', metrics: Metrics = METRICS):
+    # GET /metrics in the Prometheus text format, served from a daemon thread.
+    # for the long running CLIs, the quote service has /metrics on its own server.
+    # http.server is imported here, the CLIs that never serve do not pay for it at startup
+    from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+    class Handler(BaseHTTPRequestHandler):
+
+        def do_GET(self):
+            if self.path != '/metrics':
+                self.send_error(404)
+                return
+            body = metrics.render_prometheus().encode()
+            self.send_response(200)
+            self.send_header('Content-Type', CONTENT_TYPE)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, name='metrics-server', daemon=True).start()
+    return server
@@ -0,0 +1,114 @@
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from decimal import Decimal
+from typing import Dict, Any, List, Optional
+
+from utils.depth_index import DepthIndex
+from utils.helper import merge_asks, merge_bids
+
+# Multi-symbol aggregation.
+# Every (product, venue) book is fetched by one worker per venue, which goes through the products
+# one after the other at the venue's rate budget, so the venues are fetched side by side and no
+# venue is ever called faster than it allows.
+# A product is merged and priced as soon as all its venues are in, while the other fetches go on.
+
+
+def fetch_venue(venue, products: List[str], apis: Dict[str, str], books: Dict[str, Future]) -> None:
+    # wait=True, the products of one venue share its budget and wait their turn instead of failing
+    for product in products:
+        future = books[product]
+        try:
+            data = venue.fetch(apis[product], wait=True)
+            venue.validate(data)
+            future.set_result(data)
+        except Exception as e:
+            future.set_exception(e)
+
+
+def price_product(product: str, venues: List, books: Dict[str, Dict[str, Any]], quantities: List[Decimal]) -> List[Dict[str, Any]]:
+    # one merge per side, bounded by the largest quantity, and a DepthIndex lookup per quantity
+    max_quantity = max(quantities)
+    bids = DepthIndex(merge_bids(*(venue.levels(books[venue.name], 'bids') for venue in venues), max_quantity=max_quantity))
+    asks = DepthIndex(merge_asks(*(venue.levels(books[venue.name], 'asks') for venue in venues), max_quantity=max_quantity))
+
+    # same convention as the CLIs, buying is priced off the bids and selling off the asks
+    return [
+        {'product': product, 'quantity': quantity, 'buy': bids.cost_to_fill(quantity), 'sell': asks.cost_to_fill(quantity), 'error': None}
+        for quantity in quantities
+    ]
+
+
+def price_product_in_processes(pricer, product: str, books: Dict[str, Dict[str, Any]], quantities: List[Decimal]) -> List[Dict[str, Any]]:
+    # the pricer merges and prices both sides in its worker processes, this thread only waits
+    buys, sells = pricer.price(books, quantities)
+    return [
+        {'product': product, 'quantity': quantity, 'buy': buy, 'sell': sell, 'error': None}
+        for quantity, buy, sell in zip(quantities, buys, sells)
+    ]
+
+
+def error_rows(product: str, quantities: List[Decimal], error: Exception) -> List[Dict[str, Any]]:
+    return [{'product': product, 'quantity': quantity, 'buy': None, 'sell': None, 'error': str(error)} for quantity in quantities]
+
+
+def quote_products(venues: List, products: List[str], quantities: List[Decimal],
+                   apis: Optional[Dict[str, Dict[str, str]]] = None, max_workers: int = 4,
+                   pricer=None) -> List[Dict[str, Any]]:
+    # one row per (product, quantity), in the order given.
+    # apis is {venue name: {product: url}}, by default every venue's url template.
+    # with a ProcessPricer (utils/process_pricer.py) the products are merged and priced in its processes.
+    # a product whose fetch fails gets its error in every row, the other products are still quoted.
+    # a product listed twice is fetched once
+    products = list(dict.fromkeys(products))
+    if apis is None:
+        apis = {venue.name: {product: venue.api_url(product) for product in products} for venue in venues}
+
+    books = {venue.name: {product: Future() for product in products} for venue in venues}
+    fetchers = [
+        threading.Thread(target=fetch_venue, args=(venue, products, apis[venue.name], books[venue.name]),
+                         name=f'fetch-{venue.name}', daemon=True)
+        for venue in venues
+    ]
+    for fetcher in fetchers:
+        fetcher.start()
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        priced = {}
+        # products come in the order the venues fetch them, each is priced while the next is fetched
+        for product in products:
+            try:
+                product_books = {venue.name: books[venue.name][product].result() for venue in venues}
+            except Exception as e:
+                priced[product] = e
+                continue
+            if pricer is not None:
+                priced[product] = executor.submit(price_product_in_processes, pricer, product, product_books, quantities)
+            else:
+                priced[product] = executor.submit(price_product, product, venues, product_books, quantities)
+
+        rows = []
+        for product in products:
+            result = priced[product]
+            if isinstance(result, Exception):
+                rows.extend(error_rows(product, quantities, result))
+                continue
+            try:
+                rows.extend(result.result())
+            except Exception as e:
+                rows.extend(error_rows(product, quantities, e))
+
+    for fetcher in fetchers:
+        fetcher.join()
+    return rows
+
+
+def format_table(rows: List[Dict[str, Any]]) -> str:
+    lines = [f"{'product':<12} {'qty':>12} {'buy':>20} {'sell':>20}"]
+    for row in rows:
+        if row['error'] is not None:
+            lines.append(f"{row['product']:<12} {str(row['quantity']):>12}  Error: {row['error']}")
+            continue
+        buy = f"${row['buy']:,.2f}"
+        sell = f"${row['sell']:,.2f}"
+        lines.append(f"{row['product']:<12} {str(row['quantity']):>12} {buy:>20} {sell:>20}")
+    return "\n".join(lines)
@@ -0,0 +1,136 @@
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from decimal import Decimal
+
+from utils.sorted_prices import SortedPrices
+
+# A long-lived per-venue order book.
+# The snapshot is loaded once and every later change only touches the levels that moved,
+# instead of re-parsing the full book.
+#
+# Cost per change: a size change on an existing price is a dict write, O(1). Adding or removing a
+# price updates the sorted price index in utils/sorted_prices.py, O(log n) to find the slot plus a
+# shift bounded by its chunk size, so it does not grow with the depth of the book.
+
+# coinbase's websocket feed uses buy/sell for the side of a level change
+SIDES = {
+    'bids': 'bids',
+    'buy': 'bids',
+    'asks': 'asks',
+    'sell': 'asks',
+}
+
+
+class OrderBook:
+
+    def __init__(self, venue: str):
+        self.venue = venue
+        self.sequence = None
+
+        # price -> size for each side
+        self._levels = {'bids': {}, 'asks': {}}
+
+        # sorted price index for each side, kept in ascending order.
+        # bids are read backwards so the best bid comes first.
+        self._prices = {'bids': SortedPrices(), 'asks': SortedPrices()}
+
+    @classmethod
+    def from_coinbase(cls, data: Dict, venue: str = 'coinbase') -> 'OrderBook':
+        book = cls(venue)
+        book.load_snapshot(
+            ((price, size) for price, size, _ in data['bids']),
+            ((price, size) for price, size, _ in data['asks']),
+            sequence=data.get('sequence'),
+        )
+        return book
+
+    @classmethod
+    def from_gemini(cls, data: Dict, venue: str = 'gemini') -> 'OrderBook':
+        book = cls(venue)
+        book.load_snapshot(
+            ((bid['price'], bid['amount']) for bid in data['bids']),
+            ((ask['price'], ask['amount']) for ask in data['asks']),
+        )
+        return book
+
+    def load_snapshot(self, bids: Iterable, asks: Iterable, sequence: Optional[int] = None) -> None:
+        # replaces the whole book. levels can come in any order, the index is sorted once here.
+        for side, levels in (('bids', bids), ('asks', asks)):
+            book_side = {}
+            for price, size in levels:
+                size = Decimal(size)
+                if size > 0:
+                    book_side[Decimal(price)] = size
+            self._levels[side] = book_side
+            self._prices[side] = SortedPrices(book_side)
+
+        self.sequence = sequence
+
+    def apply_update(self, side: str, price, size, sequence: Optional[int] = None) -> bool:
+        # sets the size of a single price level. a size of zero removes the level.
+        # returns False when the update is older than the book and was ignored.
+        if sequence is not None and self.sequence is not None and sequence <= self.sequence:
+            return False
+
+        self._set_level(SIDES[side], Decimal(price), Decimal(size))
+
+        if sequence is not None:
+            self.sequence = sequence
+        return True
+
+    def apply_changes(self, changes: Iterable, sequence: Optional[int] = None) -> bool:
+        # applies a batch of [side, price, size] changes, as sent in a coinbase l2update message
+        if sequence is not None and self.sequence is not None and sequence <= self.sequence:
+            return False
+
+        for side, price, size in changes:
+            self._set_level(SIDES[side], Decimal(price), Decimal(size))
+
+        if sequence is not None:
+            self.sequence = sequence
+        return True
+
+    def _set_level(self, side: str, price: Decimal, size: Decimal) -> None:
+        levels = self._levels[side]
+        prices = self._prices[side]
+
+        if size <= 0:
+            if levels.pop(price, None) is not None:
+                prices.remove(price)
+            return
+
+        if price not in levels:
+            prices.add(price)
+        levels[price] = size
+
+    def bids(self) -> Iterator[Tuple[Decimal, Decimal]]:
+        # best (highest) bid first, same order as merge_sorted_bids
+        levels = self._levels['bids']
+        return ((price, levels[price]) for price in reversed(self._prices['bids']))
+
+    def asks(self) -> Iterator[Tuple[Decimal, Decimal]]:
+        # best (lowest) ask first, same order as merge_sorted_asks
+        levels = self._levels['asks']
+        return ((price, levels[price]) for price in self._prices['asks'])
+
+    def best_bid(self) -> Optional[Tuple[Decimal, Decimal]]:
+        prices = self._prices['bids']
+        if not prices:
+            return None
+        price = prices.last()
+        return price, self._levels['bids'][price]
+
+    def best_ask(self) -> Optional[Tuple[Decimal, Decimal]]:
+        prices = self._prices['asks']
+        if not prices:
+            return None
+        price = prices.first()
+        return price, self._levels['asks'][price]
+
+    def size_at(self, side: str, price) -> Decimal:
+        return self._levels[SIDES[side]].get(Decimal(price), Decimal(0))
+
+    def depth(self, side: str) -> int:
+        return len(self._prices[SIDES[side]])
+
+    def levels(self, side: str) -> List[Tuple[Decimal, Decimal]]:
+        return list(self.bids() if SIDES[side] == 'bids' else self.asks())
@@ -0,0 +1,140 @@
+import os
+from bisect import bisect_left
+from concurrent.futures import ProcessPoolExecutor
+from decimal import Decimal
+from itertools import accumulate, islice
+from multiprocessing import get_context, shared_memory
+from typing import Dict, Any, List, Optional, Tuple
+
+from utils.depth_index import DepthIndex
+from utils.helper import merge_asks, merge_bids
+from utils.venues import get_venue
+
+# Process backed merge and pricing.
+# The merge and fill loops are CPU bound, so threads take turns on the GIL.
+# Here every side of every book is merged and priced in its own worker process.
+#
+# The parent only cuts each venue side at the level that covers the largest quantity and writes the
+# price and size strings of what is left as two newline separated columns to one shared memory block.
+# Everything else per level runs in the workers: a worker splits its columns, merges them once, bounded
+# by the largest quantity, into a DepthIndex and prices every quantity from it with a binary search.
+# Only the layout goes to the workers and only the priced totals come back.
+#
+# Venues are looked up by name in the parent, so they have to be registered in utils/venues.py.
+
+SIDES = ('bids', 'asks')
+
+# relative slack on the float cut of the levels, and the levels read before the first check
+MARGIN = 1e-6
+FIRST_CHUNK = 64
+
+# where one venue side is in the block: venue name, first byte of the prices, first byte of the sizes, end
+Entry = Tuple[str, int, int, int]
+
+
+def price_side(shm_name: str, entries: List[Entry], side: str, quantities: List[Decimal]) -> List[Decimal]:
+    # runs in a worker, the same results as calculate_buy_price / calculate_sell_price
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        columns = [(bytes(shm.buf[prices:sizes]), bytes(shm.buf[sizes:end])) for _, prices, sizes, end in entries]
+    finally:
+        shm.close()
+
+    venue_levels = [zip(prices.decode().split('\n'), sizes.decode().split('\n')) for prices, sizes in columns if prices]
+    # same convention as the CLIs, buying is priced off the bids and selling off the asks
+    merge = merge_bids if side == 'bids' else merge_asks
+    return DepthIndex(merge(*venue_levels, max_quantity=max(quantities))).costs_to_fill(quantities)
+
+
+def covering_columns(venue, data: Dict[str, Any], side: str, max_quantity: Optional[Decimal]) -> Tuple[List[str], List[str]]:
+    # the price and size strings of the levels a fill of max_quantity can take from this venue alone.
+    # the levels are read in chunks that double, so a small quantity only touches the top of the book.
+    # the cut is found on float running sums, with a margin well above their rounding error: a level
+    # or two too many changes nothing, the worker's merge stops at the exact level
+    levels = venue.levels(data, side)
+    if max_quantity is None:
+        levels = list(levels)
+        return [price for price, _ in levels], [size for _, size in levels]
+
+    prices, sizes = [], []
+    needed = float(max_quantity) * (1 + MARGIN)
+    covered = 0.0
+    chunk = FIRST_CHUNK
+    while covered < needed:
+        read = list(islice(levels, chunk))
+        if not read:
+            break
+        read_sizes = [size for _, size in read]
+        # totals[i] is the size of everything before the chunk plus its first i levels
+        totals = list(accumulate(map(float, read_sizes), initial=covered))
+        count = min(bisect_left(totals, needed, 1), len(read))
+        del read[count:], read_sizes[count:]
+        prices += [price for price, _ in read]
+        sizes += read_sizes
+        covered = totals[count]
+        chunk *= 2
+    return prices, sizes
+
+
+def pack_books(books: List[Dict[str, Dict[str, Any]]], max_quantity: Optional[Decimal] = None):
+    # books are {venue name: payload}. every side of every venue is written back to back in one block,
+    # and the layout records where each one is: [{side: [Entry]}]
+    chunks = []
+    layout = []
+    offset = 0
+    for venue_books in books:
+        book_layout = {side: [] for side in SIDES}
+        for name, data in venue_books.items():
+            venue = get_venue(name)
+            for side in SIDES:
+                prices, sizes = covering_columns(venue, data, side, max_quantity)
+                prices = '\n'.join(prices).encode()
+                sizes = '\n'.join(sizes).encode()
+                book_layout[side].append((name, offset, offset + len(prices), offset + len(prices) + len(sizes)))
+                chunks += (prices, sizes)
+                offset += len(prices) + len(sizes)
+        layout.append(book_layout)
+
+    shm = shared_memory.SharedMemory(create=True, size=max(offset, 1))
+    shm.buf[:offset] = b''.join(chunks)
+    return shm, layout
+
+
+class ProcessPricer:
+    # keeps the worker processes alive, so only the first call pays for starting them
+
+    def __init__(self, max_workers: int = None):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        # spawn, the callers may have fetch threads running and fork would copy their locks
+        self._executor = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=get_context('spawn'))
+
+    def price_many(self, books: List[Dict[str, Dict[str, Any]]],
+                   quantities: List[Decimal]) -> List[Tuple[List[Decimal], List[Decimal]]]:
+        # (buy prices, sell prices) per book, one price per quantity.
+        # the two sides of every book are separate tasks, all running at once.
+        shm, layout = pack_books(books, max(quantities))
+        try:
+            futures = [
+                {side: self._executor.submit(price_side, shm.name, book_layout[side], side, quantities) for side in SIDES}
+                for book_layout in layout
+            ]
+            return [(book_futures['bids'].result(), book_futures['asks'].result()) for book_futures in futures]
+        finally:
+            shm.close()
+            shm.unlink()
+
+    def price(self, venue_books: Dict[str, Dict[str, Any]], quantities: List[Decimal]) -> Tuple[List[Decimal], List[Decimal]]:
+        return self.price_many([venue_books], quantities)[0]
+
+    def warm_up(self) -> None:
+        # starts every worker now instead of on the first book
+        list(self._executor.map(abs, range(self.max_workers)))
+
+    def shutdown(self) -> None:
+        self._executor.shutdown()
+
+    def __enter__(self) -> 'ProcessPricer':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.shutdown()
@@ -0,0 +1,77 @@
+import threading
+from collections import OrderedDict
+from decimal import Decimal
+from typing import Any, Callable, Dict, Hashable
+
+# LRU cache for quote results.
+# Clients ask for the same few sizes over and over between refreshes, so results are kept
+# per (book version, side, quantity). The owner of the book calls invalidate(new_version)
+# whenever a new snapshot is merged, which drops every entry of the older book.
+# Lookups for any other version (a reader still holding the old book) are computed but not stored.
+
+
+class QuoteCache:
+
+    def __init__(self, maxsize: int = 1024):
+        if maxsize <= 0:
+            raise ValueError("Value must be greater than 0")
+
+        self.maxsize = maxsize
+        self.version = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, version: Hashable, side: str, quantity: Decimal, compute: Callable[[str, Decimal], Any]) -> Any:
+        # Decimal("10") and Decimal("10.0") hash the same, so they share an entry
+        key = (side, quantity)
+
+        with self._lock:
+            if version == self.version and key in self._entries:
+                self.hits += 1
+                self._entries.move_to_end(key)
+                return self._entries[key]
+            self.misses += 1
+
+        # computed outside the lock so one slow quote does not block the others
+        result = compute(side, quantity)
+
+        with self._lock:
+            # the book may have moved on while computing, only results for the current one are kept
+            if version == self.version:
+                self._entries[key] = result
+                self._entries.move_to_end(key)
+                if len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+                    self.evictions += 1
+
+        return result
+
+    def invalidate(self, version: Hashable = None) -> None:
+        with self._lock:
+            self._invalidate(version)
+
+    def _invalidate(self, version: Hashable) -> None:
+        if self._entries:
+            self.invalidations += 1
+        self._entries.clear()
+        self.version = version
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+            }
@@ -0,0 +1,192 @@
+import json
+import socket
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal, InvalidOperation
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import Dict, Any, List, Optional
+from urllib.parse import urlparse, parse_qs
+
+from utils.book_snapshot import BookSnapshot, SnapshotPublisher
+from utils.depth_ladder import parse_width
+from utils.quote_cache import QuoteCache
+from utils.metrics import METRICS, CONTENT_TYPE
+from utils.rate_limiter_dec import TokenBucketTooEarly
+from utils.venues import DEFAULT_PRODUCT
+
+# Resident quote service.
+# The aggregated book is kept in memory and refreshed in the background on a fixed interval,
+# and every quote is answered from the published snapshot (utils/book_snapshot.py) with a DepthIndex lookup,
+# so a query costs a binary search instead of interpreter startup, two fetches and a merge.
+# Quotes never wait for a refresh: the next snapshot is built off to the side and swapped in.
+
+
+class QuoteService:
+
+    def __init__(self, venues: List, apis: Dict[str, str], interval: float = 2.0, cache_size: int = 1024,
+                 recorder=None, compact: bool = False, product: str = DEFAULT_PRODUCT):
+        self.venues = venues
+        self.apis = apis
+        # a SnapshotRecorder (utils/snapshot_store.py) gets every fetched book, under the product the apis serve
+        self.recorder = recorder
+        self.product = product
+        # the venue loaders allow one call every 2 seconds, a shorter interval only skips rounds
+        self.interval = interval
+        # compact keeps the book in int64 arrays, see utils/book_snapshot.py
+        self.publisher = SnapshotPublisher(compact)
+        self.cache = QuoteCache(cache_size)
+        # depth ladders per (side, width), built once per book
+        self.ladders = QuoteCache(16)
+        self.last_error: Optional[str] = None
+        self._stop = threading.Event()
+        self._thread = None
+        self._executor = ThreadPoolExecutor(max_workers=len(venues))
+
+    @property
+    def book(self) -> Optional[BookSnapshot]:
+        return self.publisher.current
+
+    def refresh(self) -> BookSnapshot:
+        # fetches every venue and publishes the next snapshot, only the venues that changed are converted again.
+        # readers either see the old book or the new one, never a mix.
+        futures = {venue: self._executor.submit(venue.fetch, self.apis.get(venue.name)) for venue in self.venues}
+        books = {venue: future.result() for venue, future in futures.items()}
+        for venue, data in books.items():
+            venue.validate(data)
+        if self.recorder is not None:
+            for venue, data in books.items():
+                self.recorder.record(venue.name, data, self.product)
+
+        book = self.publisher.publish(books)
+        if book.cache_version != self.cache.version:
+            self.cache.invalidate(book.cache_version)
+            self.ladders.invalidate(book.cache_version)
+        return book
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.refresh()
+                self.last_error = None
+            except TokenBucketTooEarly as e:
+                # out of budget for this round, the cached book stays in use
+                self.last_error = str(e)
+            except Exception as e:
+                self.last_error = str(e)
+            self._stop.wait(self.interval)
+
+    def start(self) -> 'QuoteService':
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='quote-service-refresh', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self._executor.shutdown(wait=False)
+
+    def quote(self, side: str, quantity: Decimal) -> Dict[str, Any]:
+        book = self.book
+        if book is None:
+            raise LookupError("No book loaded yet")
+        # checked before the span, every side it sees becomes a histogram series
+        if side not in ('buy', 'sell'):
+            raise ValueError(f"Unknown side: {side}")
+
+        with METRICS.span('fill', side=side):
+            price = self.cache.get_or_compute(book.cache_version, side, quantity, book.quote)
+
+        return {
+            'side': side,
+            'quantity': str(quantity),
+            'price': str(price),
+            'version': book.version,
+            'age': book.age(),
+            'sequences': book.sequences,
+        }
+
+    def ladder(self, side: str, width: str, depth: Optional[int] = None) -> Dict[str, Any]:
+        # the best depth price buckets of one book side, width like utils/depth_ladder.parse_width
+        book = self.book
+        if book is None:
+            raise LookupError("No book loaded yet")
+
+        parse_width(width)
+        ladder = self.ladders.get_or_compute(book.cache_version, side, width, book.ladder)
+        return {
+            'side': side,
+            'width': str(ladder.width),
+            'version': book.version,
+            'age': book.age(),
+            'buckets': ladder.rows(depth),
+        }
+
+    def status(self) -> Dict[str, Any]:
+        book = self.book
+        return {
+            'version': book.version if book else None,
+            'age': book.age() if book else None,
+            'bids': len(book.bids) if book else 0,
+            'asks': len(book.asks) if book else 0,
+            'sequences': book.sequences if book else {},
+            'last_error': self.last_error,
+            'cache': self.cache.stats(),
+        }
+
+
+def create_server(service: QuoteService, host: str = '127.0.0.1', port: int = 8080) -> ThreadingHTTPServer:
+    # GET /quote?side=buy&qty=10, GET /ladder?side=bids&width=1&depth=20 and GET /status, json responses.
+    # GET /metrics, the stage histograms in the Prometheus text format (empty until METRICS is enabled)
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def setup(self):
+            super().setup()
+            # headers and body are separate writes, without this nagle + delayed ack adds ~40 ms per quote
+            self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            params = parse_qs(url.query)
+
+            try:
+                if url.path == '/quote':
+                    quantity = Decimal(params.get('qty', ['10'])[0])
+                    if not quantity.is_finite() or quantity <= 0:
+                        raise ValueError("Quantity must be positive")
+                    self.send_json(200, service.quote(params.get('side', ['buy'])[0], quantity))
+                elif url.path == '/ladder':
+                    depth = int(params.get('depth', ['20'])[0])
+                    if depth <= 0:
+                        raise ValueError("Depth must be positive")
+                    self.send_json(200, service.ladder(params.get('side', ['bids'])[0], params.get('width', ['1'])[0], depth))
+                elif url.path == '/status':
+                    self.send_json(200, service.status())
+                elif url.path == '/metrics':
+                    self.send_body(200, CONTENT_TYPE, METRICS.render_prometheus().encode())
+                else:
+                    self.send_json(404, {'error': f"Unknown path: {url.path}"})
+            except (ValueError, InvalidOperation) as e:
+                self.send_json(400, {'error': str(e) or "Invalid quantity"})
+            except LookupError as e:
+                self.send_json(503, {'error': str(e)})
+            except Exception as e:
+                # anything else is a bug, the client still gets an answer and the server keeps going
+                self.send_json(500, {'error': f"{type(e).__name__}: {e}"})
+
+        def send_json(self, status, payload):
+            self.send_body(status, 'application/json', json.dumps(payload).encode())
+
+        def send_body(self, status, content_type, body):
+            self.send_response(status)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return ThreadingHTTPServer((host, port), Handler)
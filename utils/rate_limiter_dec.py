@@ -1,49 +1,245 @@
 from functools import wraps
+import inspect
+import os
 import time
-from decimal import Decimal
 import threading
+from typing import Callable, Optional, Union
+
+from utils.metrics import METRICS
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - windows
+    fcntl = None
 
 class TokenBucketTooEarly(RuntimeError):
     pass
 
-def rate_limiter(capacity: int, tokens_per_minute: float):
 
+def validate(capacity: int, tokens_per_minute: float) -> None:
     if capacity <= 0:
         raise ValueError("Value must be greater than 0")
-    
+
     if tokens_per_minute <= 0.0:
         raise ValueError("Value must be greater than 0")
-    
-    # how many tokens per second to ease calculations
-    tokens_per_second = Decimal(tokens_per_minute / 60.0)
+
+
+class TokenBucket:
+    # tokens refill continuously at tokens_per_minute, up to capacity.
+    # the whole state is one integer, the time (ns) at which the bucket would be back to full.
+    # taking cost tokens pushes it forward by cost * interval, and the call has to wait for
+    # whatever is left past capacity * interval from now. same results as counting tokens,
+    # but a call is a max, an add and a compare on ints instead of Decimal arithmetic.
+    #
+    # a call that is allowed to wait reserves its tokens right away and then sleeps until they are due,
+    # so waiting callers are served in arrival order and nobody wakes up to find the token taken.
+    #
+    # batch > 1 lets a thread take up to batch tokens at once when they are free and spend them
+    # on its next calls without the lock. tokens held by a thread were already taken from the bucket,
+    # so the total never goes over budget, but a thread spending them late can make a burst
+    # up to batch - 1 calls larger than capacity.
+
+    clock = staticmethod(time.monotonic_ns)
+
+    def __init__(self, capacity: int, tokens_per_minute: float, batch: int = 1):
+        validate(capacity, tokens_per_minute)
+        if batch <= 0:
+            raise ValueError("Value must be greater than 0")
+
+        self.capacity = capacity
+        self.tokens_per_minute = tokens_per_minute
+        self.batch = batch
+
+        # ns per token, precomputed once
+        self._interval = max(1, round(60e9 / tokens_per_minute))
+        self._burst = capacity * self._interval
+        self._full_at = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def acquire(self, cost: int = 1, block: bool = False, timeout: Optional[float] = None) -> None:
+        # block=False fails fast, block=True waits up to timeout seconds (None waits as long as needed).
+        # a wait that would run past the timeout raises right away instead of sleeping first.
+        if self.batch > 1 and self._take_local(cost):
+            return
+
+        wait = self._reserve(cost, self._max_wait(block, timeout))
+        if wait > 0:
+            time.sleep(wait / 1e9)
+
+    async def acquire_async(self, cost: int = 1, block: bool = False, timeout: Optional[float] = None) -> None:
+        # same as acquire, but waits on the event loop instead of blocking the thread.
+        # a task cancelled while waiting does not give its tokens back.
+        if self.batch > 1 and self._take_local(cost):
+            return
+
+        wait = self._reserve(cost, self._max_wait(block, timeout))
+        if wait > 0:
+            # only the async callers pay for importing asyncio
+            import asyncio
+            await asyncio.sleep(wait / 1e9)
+
+    def _max_wait(self, block: bool, timeout: Optional[float]) -> Optional[int]:
+        if not block:
+            return 0
+        return None if timeout is None else int(timeout * 1e9)
+
+    def _take_local(self, cost: int) -> bool:
+        local = self._local
+        tokens = getattr(local, 'tokens', 0)
+        if tokens >= cost > 0:
+            local.tokens = tokens - cost
+            return True
+        return False
+
+    def _reserve(self, cost: int, max_wait: Optional[int]) -> int:
+        if cost <= 0:
+            raise ValueError("Value must be greater than 0")
+
+        if cost > self.capacity:
+            raise ValueError("Cost must not exceed capacity")
+
+        wait, spare = self._take_locked(cost, max_wait)
+
+        if spare:
+            self._local.tokens = spare
+        return wait
+
+    def _take_locked(self, cost: int, max_wait: Optional[int]):
+        # the clock is read before the lock to keep the critical section short.
+        # a time a little in the past only makes the wait a little longer.
+        now = self.clock()
+        with self._lock:
+            self._full_at, wait, spare = self._take(self._full_at, cost, max_wait, now)
+        return wait, spare
+
+    def _take(self, full_at: int, cost: int, max_wait: Optional[int], now: int):
+        # returns the new full_at, the ns to wait for the reserved tokens and the spare tokens
+        # taken for this thread's batch. nothing is stored when it raises.
+        full_at = max(full_at, now) + cost * self._interval
+        wait = full_at - now - self._burst
+
+        if max_wait is not None and wait > max_wait:
+            if max_wait == 0:
+                raise TokenBucketTooEarly("Insufficient tokens. Rate limit exceeded.")
+            raise TokenBucketTooEarly(f"Insufficient tokens. Rate limit exceeded, next token in {wait / 1e9:.3f} seconds.")
+
+        spare = 0
+        if self.batch > 1 and wait <= 0:
+            # whatever is free right now, up to the batch size
+            spare = min(self.batch - 1, (now + self._burst - full_at) // self._interval)
+            full_at += spare * self._interval
+
+        return full_at, wait, spare
+
+
+class FileTokenBucket(TokenBucket):
+    # the bucket state lives in a small file guarded by flock, so every process using the same path
+    # (worker pools, several CLI runs) draws from one budget.
+    # the file outlives the process (and reboots), so it uses the wall clock instead of the monotonic one.
+    # a clock stepped back only makes callers wait that much longer, never over-use the budget.
+
+    clock = staticmethod(time.time_ns)
+
+    def __init__(self, path: Union[str, os.PathLike], capacity: int, tokens_per_minute: float, batch: int = 1):
+        if fcntl is None:
+            raise RuntimeError("File backed buckets need fcntl (Linux / macOS)")
+
+        super().__init__(capacity, tokens_per_minute, batch)
+        self.path = os.fspath(path)
+        self._fd = None
+        self._pid = None
+
+    def _file(self) -> int:
+        # a forked child shares the parent's open file and flock would not tell them apart,
+        # so every process opens its own
+        if self._pid != os.getpid():
+            self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            self._pid = os.getpid()
+        return self._fd
+
+    def _take_locked(self, cost: int, max_wait: Optional[int]):
+        # the thread lock keeps threads of this process apart, flock keeps the processes apart
+        now = self.clock()
+        with self._lock:
+            fd = self._file()
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            try:
+                # an empty (new) file is a full bucket
+                full_at = int(os.pread(fd, 32, 0) or 0)
+                full_at, wait, spare = self._take(full_at, cost, max_wait, now)
+                os.ftruncate(fd, 0)
+                os.pwrite(fd, b"%d\n" % full_at, 0)
+            finally:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+        return wait, spare
+
+
+def rate_limiter(capacity: int, tokens_per_minute: float, block: bool = False, timeout: Optional[float] = None,
+                 cost: Union[int, Callable[..., int]] = 1, path: Optional[Union[str, os.PathLike]] = None,
+                 batch: int = 1, name: Optional[str] = None):
+    # block / timeout: wait up to timeout seconds for the tokens instead of raising TokenBucketTooEarly.
+    # cost: tokens taken per call, or a function of the call's arguments returning that count.
+    # path: keep the bucket in this file, every process decorating with the same path shares the budget.
+    # batch: tokens a thread may take at once for its next calls (see TokenBucket), for very hot callers.
+    # name: label of the limiter in the metrics, the function name by default.
+    # coroutine functions wait with asyncio.sleep, so the event loop keeps running.
+    # with METRICS enabled the wait is timed as the rate_limit_wait stage and refusals are counted.
+
+    validate(capacity, tokens_per_minute)
 
     def decorator(func):
-        
-        curr_capacity = Decimal(capacity)
-        # Since no previous request has been made, last_time is None.
-        last_time = None
-
-        lock = threading.Lock()
-
-        @wraps(func)
-        def wrapper(*args, **kwargs):
-            nonlocal last_time, curr_capacity
-            
-            with lock:
-                now = time.monotonic()
-                
-                # if this is not the first-call to the function.
-                if last_time is not None:
-                    time_elapsed = Decimal(now - last_time)
-                    curr_capacity = min(Decimal(capacity), curr_capacity + tokens_per_second * time_elapsed)
-                
-                if curr_capacity < Decimal(1):
-                    raise TokenBucketTooEarly("Insufficient tokens. Rate limit exceeded.")
-                
-                # consume the tokens
-                curr_capacity -= Decimal(1)
-                last_time = now
-
-            return func(*args, **kwargs)
+
+        # every decorated function gets its own bucket
+        if path is not None:
+            bucket = FileTokenBucket(path, capacity, tokens_per_minute, batch)
+        else:
+            bucket = TokenBucket(capacity, tokens_per_minute, batch)
+        # refused calls are counted, not timed, so the wait histogram only holds granted calls
+        labels = (('limiter', name or func.__name__),)
+
+        def acquire(tokens, block, timeout):
+            if not METRICS.enabled:
+                return bucket.acquire(tokens, block, timeout)
+            start = time.perf_counter_ns()
+            try:
+                bucket.acquire(tokens, block, timeout)
+            except TokenBucketTooEarly:
+                METRICS.increment('rate_limit_rejections', **dict(labels))
+                raise
+            METRICS.record('rate_limit_wait', (time.perf_counter_ns() - start) / 1e9, labels)
+
+        async def acquire_async(tokens):
+            if not METRICS.enabled:
+                return await bucket.acquire_async(tokens, block, timeout)
+            start = time.perf_counter_ns()
+            try:
+                await bucket.acquire_async(tokens, block, timeout)
+            except TokenBucketTooEarly:
+                METRICS.increment('rate_limit_rejections', **dict(labels))
+                raise
+            METRICS.record('rate_limit_wait', (time.perf_counter_ns() - start) / 1e9, labels)
+
+        if inspect.iscoroutinefunction(func):
+            @wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                await acquire_async(cost(*args, **kwargs) if callable(cost) else cost)
+                return await func(*args, **kwargs)
+
+            async_wrapper.bucket = bucket
+            return async_wrapper
+
+        if callable(cost):
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                acquire(cost(*args, **kwargs), block, timeout)
+                return func(*args, **kwargs)
+        else:
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                acquire(cost, block, timeout)
+                return func(*args, **kwargs)
+
+        wrapper.bucket = bucket
         return wrapper
-    return decorator
\ No newline at end of file
+    return decorator
@@ -0,0 +1,64 @@
+import json
+from typing import Dict, Any, Iterable, Iterator, List
+
+from utils.orderbook import OrderBook
+
+# A local replay feed so the order book can be driven without a live exchange.
+# The file is json lines in the shape of coinbase's level2 websocket channel:
+#   {"type": "snapshot", "bids": [["price", "size"], ...], "asks": [...], "sequence": 1}
+#   {"type": "l2update", "changes": [["buy", "price", "size"], ...], "sequence": 2}
+
+
+def write_feed(path, messages: Iterable[Dict[str, Any]]) -> None:
+    with open(path, 'w') as f:
+        for message in messages:
+            f.write(json.dumps(message))
+            f.write('\n')
+
+
+class ReplayFeed:
+
+    def __init__(self, path):
+        self.path = path
+
+    def messages(self) -> Iterator[Dict[str, Any]]:
+        with open(self.path) as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    yield json.loads(line)
+
+    def replay(self, book: OrderBook) -> Iterator[OrderBook]:
+        # applies every message to the book, yielding the book after each one
+        # so the caller can re-quote in between updates.
+        for message in self.messages():
+            apply_message(book, message)
+            yield book
+
+    def build(self, venue: str) -> OrderBook:
+        # replays the whole feed and returns the final book
+        book = OrderBook(venue)
+        for _ in self.replay(book):
+            pass
+        return book
+
+
+def apply_message(book: OrderBook, message: Dict[str, Any]) -> bool:
+    message_type = message.get('type')
+
+    if message_type == 'snapshot':
+        book.load_snapshot(message['bids'], message['asks'], sequence=message.get('sequence'))
+        return True
+
+    if message_type == 'l2update':
+        return book.apply_changes(message['changes'], sequence=message.get('sequence'))
+
+    raise ValueError(f"Unknown message type: {message_type}")
+
+
+def snapshot_message(bids: List, asks: List, sequence=None) -> Dict[str, Any]:
+    return {'type': 'snapshot', 'bids': bids, 'asks': asks, 'sequence': sequence}
+
+
+def update_message(changes: List, sequence=None) -> Dict[str, Any]:
+    return {'type': 'l2update', 'changes': changes, 'sequence': sequence}
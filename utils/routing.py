@@ -0,0 +1,160 @@
+import heapq
+from collections import defaultdict
+from decimal import Decimal
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from utils.helper import take_depth
+
+# Venue aware version of the merge and fill.
+# Every merged level keeps the venue it came from, and the calculators return a fill plan:
+# how much of the quantity each venue fills, for what notional, over how many levels.
+#
+# Taker fees are part of the ranking. A level is ordered by its price after the fee of its venue:
+# asks (paying) by price * (1 + fee), bids (receiving) by price * (1 - fee). The k-way merge
+# therefore yields the levels by their effective price, and one walk of the merged book gives
+# the cheapest plan after fees. A fee is the same factor on every level of a venue, so each venue
+# stays in book order and the merge stays a plain heapq.merge.
+#
+# merged levels are (effective price, size, venue, price) tuples, size second so take_depth applies.
+
+
+class VenueFill(NamedTuple):
+    venue: str
+    quantity: Decimal
+    notional: Decimal
+    fee: Decimal
+    levels: int
+
+    @property
+    def vwap(self) -> Decimal:
+        return self.notional / self.quantity
+
+
+class FillPlan(NamedTuple):
+    # side is the book walked, 'bids' or 'asks'.
+    # notional is before fees and equal to calculate_buy_price / calculate_sell_price on the same levels.
+    # total is after fees: notional - fees on the bids, notional + fees on the asks.
+    side: str
+    requested: Decimal
+    filled: Decimal
+    notional: Decimal
+    fees: Decimal
+    total: Decimal
+    # venue name -> its part, in the order the venues were first reached
+    fills: Dict[str, VenueFill]
+
+    @property
+    def unfilled(self) -> Decimal:
+        return self.requested - self.filled
+
+    @property
+    def vwap(self) -> Decimal:
+        return self.notional / self.filled
+
+    @property
+    def effective_vwap(self) -> Decimal:
+        return self.total / self.filled
+
+
+def fee_factor(side: str, fee: Decimal) -> Decimal:
+    return 1 + fee if side == 'asks' else 1 - fee
+
+
+def tagged_levels(levels: Iterable[Tuple[str, str]], venue: str, factor: Decimal) -> Iterator[Tuple[Decimal, Decimal, str, Decimal]]:
+    # converted on demand like to_decimal_levels, the multiply is skipped for a venue without fee
+    if factor == 1:
+        for price, size in levels:
+            price = Decimal(price)
+            yield price, Decimal(size), venue, price
+    else:
+        for price, size in levels:
+            price = Decimal(price)
+            yield price * factor, Decimal(size), venue, price
+
+
+def merge_tagged(side: str, venue_levels: Dict[str, Iterable[Tuple[str, str]]],
+                 fees: Optional[Dict[str, Decimal]], max_quantity: Optional[Decimal]) -> Iterator[Tuple]:
+    fees = fees or {}
+    venues = [tagged_levels(levels, venue, fee_factor(side, fees.get(venue, Decimal(0)))) for venue, levels in venue_levels.items()]
+    return take_depth(heapq.merge(*venues, reverse=side == 'bids'), max_quantity)
+
+
+def merge_tagged_asks(venue_levels: Dict[str, Iterable[Tuple[str, str]]], fees: Optional[Dict[str, Decimal]] = None,
+                      max_quantity: Optional[Decimal] = None) -> Iterator[Tuple]:
+    # venue_levels is {venue name: (price, size) strings in book order}, fees {venue name: taker fee}
+    return merge_tagged('asks', venue_levels, fees, max_quantity)
+
+
+def merge_tagged_bids(venue_levels: Dict[str, Iterable[Tuple[str, str]]], fees: Optional[Dict[str, Decimal]] = None,
+                      max_quantity: Optional[Decimal] = None) -> Iterator[Tuple]:
+    return merge_tagged('bids', venue_levels, fees, max_quantity)
+
+
+def new_part() -> List:
+    # quantity, notional, levels of one venue
+    return [Decimal(0), Decimal(0), 0]
+
+
+def plan_fill(merged: Iterator[Tuple], quantity: Decimal, side: str, fees: Optional[Dict[str, Decimal]] = None) -> FillPlan:
+    # the same walk as calculate_buy_price / calculate_sell_price, adding each level to its venue's part too.
+    # the total is kept apart from the parts so it adds up in the same order as the calculators.
+    fees = fees or {}
+    remaining_quantity = quantity
+    total_cost = Decimal(0)
+    parts: Dict[str, List] = defaultdict(new_part)
+
+    for _, size, venue, price in merged:
+        if not size:
+            # nothing to take, and a venue reached only through empty levels would show a zero quantity part
+            continue
+        part = parts[venue]
+        if remaining_quantity <= size:
+            cost = price * remaining_quantity
+            total_cost += cost
+            part[0] += remaining_quantity
+            part[1] += cost
+            part[2] += 1
+            remaining_quantity = Decimal(0)
+            break
+
+        cost = price * size
+        total_cost += cost
+        part[0] += size
+        part[1] += cost
+        part[2] += 1
+        remaining_quantity -= size
+
+    # a fee is linear in the notional, so a venue's fee is its notional times its rate
+    fills = {
+        venue: VenueFill(venue, filled, notional, notional * fees.get(venue, Decimal(0)), levels)
+        for venue, (filled, notional, levels) in parts.items()
+    }
+    total_fees = sum((fill.fee for fill in fills.values()), Decimal(0))
+    total = total_cost + total_fees if side == 'asks' else total_cost - total_fees
+    return FillPlan(side, quantity, quantity - remaining_quantity, total_cost, total_fees, total, fills)
+
+
+def route_buy(venue_levels: Dict[str, Iterable[Tuple[str, str]]], quantity: Decimal,
+              fees: Optional[Dict[str, Decimal]] = None) -> FillPlan:
+    # same convention as the CLIs, buying is priced off the bids
+    return plan_fill(merge_tagged_bids(venue_levels, fees, max_quantity=quantity), quantity, 'bids', fees)
+
+
+def route_sell(venue_levels: Dict[str, Iterable[Tuple[str, str]]], quantity: Decimal,
+               fees: Optional[Dict[str, Decimal]] = None) -> FillPlan:
+    return plan_fill(merge_tagged_asks(venue_levels, fees, max_quantity=quantity), quantity, 'asks', fees)
+
+
+def venue_fees(venues: List) -> Dict[str, Decimal]:
+    # the taker fee of every venue adapter, from its environment variable
+    return {venue.name: venue.taker_fee() for venue in venues}
+
+
+def format_plan(plan: FillPlan) -> str:
+    lines = [f"  {'venue':<10} {'qty':>14} {'notional':>18} {'vwap':>14} {'fee':>12} {'levels':>7}"]
+    for fill in plan.fills.values():
+        lines.append(f"  {fill.venue:<10} {str(fill.quantity):>14} {f'${fill.notional:,.2f}':>18} "
+                     f"{f'${fill.vwap:,.2f}':>14} {f'${fill.fee:,.2f}':>12} {fill.levels:>7}")
+    if plan.unfilled > 0:
+        lines.append(f"  only {plan.filled} of {plan.requested} available in the books")
+    return "\n".join(lines)
@@ -0,0 +1,299 @@
+import heapq
+import mmap
+import os
+import struct
+import threading
+import time
+from array import array
+from decimal import Decimal
+from typing import Dict, Any, Iterator, List, NamedTuple, Optional, Tuple, Union
+
+from utils.fixed_point import to_scaled, scaled_depth, calculate_fill_fixed, decimals
+from utils.helper import take_depth
+from utils.venues import get_venue
+
+# Binary snapshot file.
+# The recorder appends every fetched book, with its venue, product, fetch time and sequence number.
+# The levels are stored as int64 (price, size) pairs scaled like utils/fixed_point.py, 16 bytes a level
+# instead of ~40 as json text.
+# The reader memory maps the file, and each side is a memoryview over the mapping. Nothing is
+# decoded or copied until a level is read, so replay runs at int merge speed.
+#
+# layout, little endian (the levels are written and read as native int64, x86 and arm are both little endian):
+#   file    MAGIC, then records back to back
+#   record  HEADER, venue utf-8, product utf-8, zero padding to 8 bytes,
+#           bid count (price, size) int64 pairs, best first, then the asks the same way
+# a record cut short by a crash mid write is ignored by the reader, and cut off by the next recorder
+# to open the file, so later records are never appended after it.
+
+MAGIC = b'OBSNAP\x00\x01'
+
+# record size, venue length, product length, price decimals, size decimals,
+# fetch time (ns since the epoch), sequence (-1 when the venue sends none), bid count, ask count
+HEADER = struct.Struct('<IHHBBxxqqII')
+
+NO_SEQUENCE = -1
+LEVEL_SIZE = 16
+
+
+def pad(length: int) -> int:
+    return -length % 8
+
+
+def record_size(header: Tuple) -> int:
+    # what a record with this header has to take up, padding included
+    _, venue_length, product_length, _, _, _, _, bid_count, ask_count = header
+    names = HEADER.size + venue_length + product_length
+    return names + pad(names) + (bid_count + ask_count) * LEVEL_SIZE
+
+
+def complete_length(view: memoryview) -> int:
+    # the length of the file up to the end of its last complete record
+    end = len(view)
+    offset = len(MAGIC)
+    while offset + HEADER.size <= end:
+        header = HEADER.unpack_from(view, offset)
+        size = header[0]
+        if size != record_size(header) or offset + size > end:
+            break
+        offset += size
+    return offset
+
+
+def complete_file_length(path: str) -> int:
+    # complete_length of the file at path, 0 when it is missing or holds part of MAGIC only
+    try:
+        f = open(path, 'rb')
+    except FileNotFoundError:
+        return 0
+    with f:
+        head = f.read(len(MAGIC))
+        if head != MAGIC:
+            if MAGIC.startswith(head):
+                return 0
+            raise ValueError(f"{path} is not a snapshot file")
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapping:
+            with memoryview(mapping) as view:
+                return complete_length(view)
+
+
+def encode_record(venue: str, product: str, timestamp_ns: int, sequence: Optional[int],
+                  bids: List[Tuple[str, str]], asks: List[Tuple[str, str]]) -> bytes:
+    # the smallest scales that hold every level exactly, so replay prices match the live ones
+    levels = bids + asks
+    prices = [price for price, _ in levels]
+    sizes = [size for _, size in levels]
+    price_decimals = max(map(decimals, prices), default=0)
+    size_decimals = max(map(decimals, sizes), default=0)
+
+    values = array('q', bytes(LEVEL_SIZE * len(levels)))
+    values[0::2] = array('q', [to_scaled(price, price_decimals) for price in prices])
+    values[1::2] = array('q', [to_scaled(size, size_decimals) for size in sizes])
+
+    venue_bytes = venue.encode()
+    product_bytes = product.encode()
+    names = venue_bytes + product_bytes
+    names += b'\0' * pad(HEADER.size + len(names))
+    body = names + values.tobytes()
+
+    header = HEADER.pack(HEADER.size + len(body), len(venue_bytes), len(product_bytes), price_decimals, size_decimals,
+                         timestamp_ns, NO_SEQUENCE if sequence is None else sequence, len(bids), len(asks))
+    return header + body
+
+
+class SnapshotRecorder:
+    # appends to the file, several runs can keep adding to the same one.
+    # safe to share between the fetch threads.
+
+    def __init__(self, path: Union[str, os.PathLike]):
+        self.path = os.fspath(path)
+        length = complete_file_length(self.path)
+        self._file = open(self.path, 'ab')
+        # a run that died mid write left part of a record at the end, new records go where it starts
+        if length < self._file.tell():
+            self._file.truncate(length)
+            self._file.seek(length)
+        if length == 0:
+            self._file.write(MAGIC)
+            self._file.flush()
+        self._lock = threading.Lock()
+
+    def record(self, venue_name: str, data: Dict[str, Any], product: Optional[str] = None,
+               timestamp_ns: Optional[int] = None) -> None:
+        # data is the payload the venue's loader returned
+        venue = get_venue(venue_name)
+        record = encode_record(
+            venue_name, product or '', time.time_ns() if timestamp_ns is None else timestamp_ns, data.get('sequence'),
+            list(venue.levels(data, 'bids')), list(venue.levels(data, 'asks')),
+        )
+        # one write per record, a reader never sees half of one unless the process dies mid write
+        with self._lock:
+            self._file.write(record)
+            self._file.flush()
+
+    def close(self) -> None:
+        self._file.close()
+
+    def __enter__(self) -> 'SnapshotRecorder':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class Snapshot(NamedTuple):
+    venue: str
+    product: str
+    timestamp_ns: int
+    sequence: Optional[int]
+    price_decimals: int
+    size_decimals: int
+    # int64 views over the file, price and size interleaved, best level first
+    bids: memoryview
+    asks: memoryview
+
+    def levels(self, side: str) -> Iterator[Tuple[int, int]]:
+        # (price, size) scaled ints, in book order
+        values = self.bids if side == 'bids' else self.asks
+        return zip(values[0::2], values[1::2])
+
+
+class SnapshotReader:
+
+    def __init__(self, path: Union[str, os.PathLike]):
+        self.path = os.fspath(path)
+        with open(self.path, 'rb') as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{self.path} is not a snapshot file")
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._mmap)
+
+    def __iter__(self) -> Iterator[Snapshot]:
+        view = self._view
+        end = len(view)
+        offset = len(MAGIC)
+        while offset + HEADER.size <= end:
+            header = HEADER.unpack_from(view, offset)
+            (size, venue_length, product_length, price_decimals, size_decimals,
+             timestamp_ns, sequence, bid_count, ask_count) = header
+            # a torn record ends the file, whatever was written after it can not be lined up
+            if size != record_size(header) or offset + size > end:
+                break
+
+            names = offset + HEADER.size
+            venue = bytes(view[names:names + venue_length]).decode()
+            product = bytes(view[names + venue_length:names + venue_length + product_length]).decode()
+            start = names + venue_length + product_length
+            start += pad(start - offset)
+            middle = start + bid_count * LEVEL_SIZE
+            stop = middle + ask_count * LEVEL_SIZE
+
+            yield Snapshot(
+                venue, product, timestamp_ns, None if sequence == NO_SEQUENCE else sequence,
+                price_decimals, size_decimals,
+                view[start:middle].cast('q'), view[middle:stop].cast('q'),
+            )
+            offset += size
+
+    def close(self) -> None:
+        self._view.release()
+        try:
+            self._mmap.close()
+        except BufferError:
+            # snapshots still referenced hold views on the mapping, it is unmapped once they are gone
+            pass
+
+    def __enter__(self) -> 'SnapshotReader':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def format_scaled(value: int, decimals: int) -> str:
+    # the exact text of a scaled int, the way the venues send prices and sizes
+    if decimals == 0:
+        return str(value)
+    whole, fraction = divmod(value, 10 ** decimals)
+    return f"{whole}.{fraction:0{decimals}d}"
+
+
+def snapshot_payload(snapshot: Snapshot) -> Dict[str, Any]:
+    # the recorded book as a payload in its venue's shape, so it prices like a fetched one
+    def side(name):
+        return [(format_scaled(price, snapshot.price_decimals), format_scaled(size, snapshot.size_decimals))
+                for price, size in snapshot.levels(name)]
+    return get_venue(snapshot.venue).from_levels(side('bids'), side('asks'), snapshot.sequence)
+
+
+def product_snapshots(reader: SnapshotReader, product: Optional[str]) -> List[Snapshot]:
+    # the snapshots of one product. without a product the file has to hold only one,
+    # books of different products are never priced or kept as each other's
+    snapshots = [snapshot for snapshot in reader if product is None or snapshot.product == product]
+    if product is None:
+        products = sorted(set(snapshot.product for snapshot in snapshots))
+        if len(products) > 1:
+            raise ValueError(f"{reader.path} holds books of several products ({', '.join(map(repr, products))}), pick one")
+    return snapshots
+
+
+def latest_books(path: Union[str, os.PathLike], product: Optional[str] = None) -> Dict[str, Tuple[Dict[str, Any], int]]:
+    # {venue: (payload, fetch time in ns)} for the newest book of every venue in the file
+    with SnapshotReader(path) as reader:
+        latest = {snapshot.venue: snapshot for snapshot in product_snapshots(reader, product)}
+        books = {venue: (snapshot_payload(snapshot), snapshot.timestamp_ns) for venue, snapshot in latest.items()}
+        del latest
+    return books
+
+
+def rescaled(levels: Iterator[Tuple[int, int]], price_factor: int, size_factor: int) -> Iterator[Tuple[int, int]]:
+    if price_factor == 1 and size_factor == 1:
+        return levels
+    return ((price * price_factor, size * size_factor) for price, size in levels)
+
+
+def merged_side(snapshots: List[Snapshot], side: str, max_quantity: Optional[Decimal]):
+    # k-way merge on the scaled ints, the venues brought to a common scale first.
+    # returns the merged levels and the scale they are in
+    price_decimals = max(snapshot.price_decimals for snapshot in snapshots)
+    size_decimals = max(snapshot.size_decimals for snapshot in snapshots)
+    venues = [
+        rescaled(snapshot.levels(side), 10 ** (price_decimals - snapshot.price_decimals), 10 ** (size_decimals - snapshot.size_decimals))
+        for snapshot in snapshots
+    ]
+    merged = heapq.merge(*venues, reverse=side == 'bids')
+    return take_depth(merged, scaled_depth(max_quantity, size_decimals)), price_decimals, size_decimals
+
+
+def price_snapshots(snapshots: List[Snapshot], quantity: Decimal) -> Tuple[Decimal, Decimal]:
+    # same convention as the CLIs, buying is priced off the bids and selling off the asks
+    bids, price_decimals, size_decimals = merged_side(snapshots, 'bids', quantity)
+    buy = calculate_fill_fixed(bids, quantity, price_decimals, size_decimals)
+    asks, price_decimals, size_decimals = merged_side(snapshots, 'asks', quantity)
+    sell = calculate_fill_fixed(asks, quantity, price_decimals, size_decimals)
+    return buy, sell
+
+
+def replay_quotes(path: Union[str, os.PathLike], quantities: List[Decimal],
+                  venues: Optional[List[str]] = None, product: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+    # backtest: walks the file in order and keeps the latest book of every venue. every snapshot that
+    # arrives once all venues have one re-prices the quantities against the books as they were then.
+    # venues defaults to every venue in the file, all of them have to show up before the first quote.
+    # rows are {time, quantity, buy, sell}, time being the fetch time of the newest snapshot in ns.
+    # product can be left out when the file holds a single product.
+    with SnapshotReader(path) as reader:
+        snapshots = product_snapshots(reader, product)
+        if venues is None:
+            venues = list(dict.fromkeys(snapshot.venue for snapshot in snapshots))
+
+        latest: Dict[str, Snapshot] = {}
+        for snapshot in snapshots:
+            if snapshot.venue not in venues:
+                continue
+            latest[snapshot.venue] = snapshot
+            if len(latest) < len(venues):
+                continue
+            books = [latest[venue] for venue in venues]
+            for quantity in quantities:
+                buy, sell = price_snapshots(books, quantity)
+                yield {'time': snapshot.timestamp_ns, 'quantity': quantity, 'buy': buy, 'sell': sell}
@@ -0,0 +1,91 @@
+from typing import Iterable, Iterator, List
+from bisect import bisect_left, insort
+from itertools import chain
+
+# Sorted set of prices for one side of an order book.
+# The prices are kept in chunks of at most 2 * LOAD sorted prices. An add or remove finds the
+# chunk with a binary search over the chunk maxima and the slot with a binary search inside the
+# chunk, O(log n), and only shifts the entries of that one chunk, which is bounded by LOAD and
+# not by the size of the book. Splitting a full chunk or joining a small one into its neighbour
+# shifts the list of chunks, n / LOAD entries, and happens at most once every LOAD / 2 changes.
+
+LOAD = 256
+
+
+class SortedPrices:
+
+    def __init__(self, prices: Iterable = ()):
+        ordered = sorted(prices)
+        self._chunks: List[list] = [ordered[i:i + LOAD] for i in range(0, len(ordered), LOAD)]
+        # the last (highest) price of each chunk
+        self._maxes = [chunk[-1] for chunk in self._chunks]
+        self._len = len(ordered)
+
+    def __len__(self) -> int:
+        return self._len
+
+    def __iter__(self) -> Iterator:
+        # ascending
+        return chain.from_iterable(self._chunks)
+
+    def __reversed__(self) -> Iterator:
+        # descending
+        return chain.from_iterable(map(reversed, reversed(self._chunks)))
+
+    def first(self):
+        return self._chunks[0][0]
+
+    def last(self):
+        return self._maxes[-1]
+
+    def add(self, price) -> None:
+        # the price must not be in the set yet
+        chunks, maxes = self._chunks, self._maxes
+        if not chunks:
+            chunks.append([price])
+            maxes.append(price)
+        else:
+            index = bisect_left(maxes, price)
+            if index == len(maxes):
+                # above every price, goes at the end of the last chunk
+                index -= 1
+                chunks[index].append(price)
+                maxes[index] = price
+            else:
+                insort(chunks[index], price)
+            if len(chunks[index]) > 2 * LOAD:
+                self._split(index)
+        self._len += 1
+
+    def remove(self, price) -> None:
+        # the price must be in the set
+        chunks, maxes = self._chunks, self._maxes
+        index = bisect_left(maxes, price)
+        chunk = chunks[index]
+        del chunk[bisect_left(chunk, price)]
+        self._len -= 1
+        if not chunk:
+            del chunks[index], maxes[index]
+            return
+        maxes[index] = chunk[-1]
+        if len(chunk) < LOAD // 2 and len(chunks) > 1:
+            self._join(index)
+
+    def _split(self, index: int) -> None:
+        chunk = self._chunks[index]
+        upper = chunk[LOAD:]
+        del chunk[LOAD:]
+        self._maxes[index] = chunk[-1]
+        self._chunks.insert(index + 1, upper)
+        self._maxes.insert(index + 1, upper[-1])
+
+    def _join(self, index: int) -> None:
+        # a small chunk goes into its neighbour, which is split again if that makes it too big
+        if index == 0:
+            index = 1
+        lower = self._chunks[index - 1]
+        lower += self._chunks[index]
+        del self._chunks[index], self._maxes[index]
+        self._maxes[index - 1] = lower[-1]
+        if len(lower) > 2 * LOAD:
+            self._split(index - 1)
@@ -0,0 +1,116 @@
+import re
+import codecs
+from typing import Dict, Any, Iterable, Iterator, Optional, Tuple
+from decimal import Decimal
+
+from utils.orderbook import OrderBook
+
+# Streaming parser for the coinbase level 2 snapshot.
+# response.json() holds the whole multi megabyte body and then every level as nested lists.
+# Here levels are pulled out of the byte stream chunk by chunk, and when a max quantity is given
+# a side stops being stored once it covers that quantity. Once both sides are covered the rest
+# of the stream is never read.
+#
+# The payload looks like {"bids": [["price", "size", num_orders], ...], "asks": [...], "sequence": 1, ...}
+
+TOKEN_PATTERN = re.compile(
+    r'\[\s*"([^"]*)"\s*,\s*"([^"]*)"\s*,\s*(\d+)\s*\]'
+    r'|"(bids|asks)"\s*:'
+    # the trailing delimiter makes sure a number split across two chunks is not read half way
+    r'|"sequence"\s*:\s*(\d+)\s*[,}]'
+)
+
+# used to jump over the rest of a side that is already covered
+KEY_PATTERN = re.compile(r'"(bids|asks)"\s*:|"sequence"\s*:\s*(\d+)\s*[,}]')
+
+CHUNK_SIZE = 64 * 1024
+
+
+def iter_file_chunks(path, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+
+
+def iter_coinbase_levels(chunks: Iterable[bytes], max_quantity: Optional[Decimal] = None) -> Iterator[Tuple[str, Any]]:
+    # yields ('bids' | 'asks', [price, size, num_orders]) for every stored level
+    # and ('sequence', int) when the sequence number is seen.
+    # with max_quantity, levels past the one that covers it on each side are skipped.
+    side = None
+    covered = set()
+    filled = {'bids': Decimal(0), 'asks': Decimal(0)}
+    # a multi byte character can be split across two chunks
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    buffer = ''
+
+    for chunk in chunks:
+        buffer += decoder.decode(chunk)
+        position = 0
+
+        while True:
+            if side in covered:
+                match = KEY_PATTERN.search(buffer, position)
+                if match is None:
+                    break
+                position = match.end()
+                if match.group(1) is not None:
+                    side = match.group(1)
+                else:
+                    yield 'sequence', int(match.group(2))
+                continue
+
+            for match in TOKEN_PATTERN.finditer(buffer, position):
+                position = match.end()
+                price, size, orders, key, sequence = match.groups()
+
+                if key is not None:
+                    side = key
+                    if side in covered:
+                        break
+                    continue
+
+                if sequence is not None:
+                    yield 'sequence', int(sequence)
+                    continue
+
+                if side is None:
+                    continue
+
+                yield side, [price, size, int(orders)]
+
+                if max_quantity is not None:
+                    filled[side] += Decimal(size)
+                    if filled[side] >= max_quantity:
+                        covered.add(side)
+                        if len(covered) == 2:
+                            return
+                        break
+            else:
+                break
+
+        if side in covered:
+            # nothing in the skipped part is needed, only keep enough to catch a key split across chunks
+            buffer = buffer[max(position, len(buffer) - 64):]
+        else:
+            buffer = buffer[position:]
+
+
+def parse_coinbase_stream(chunks: Iterable[bytes], max_quantity: Optional[Decimal] = None) -> Dict[str, Any]:
+    # same shape as response.json() for the fields the aggregator uses.
+    # when the stream stops early the sequence (sent after the asks) may be missing.
+    data = {'bids': [], 'asks': [], 'sequence': None}
+
+    for side, value in iter_coinbase_levels(chunks, max_quantity):
+        if side == 'sequence':
+            data['sequence'] = value
+        else:
+            data[side].append(value)
+
+    return data
+
+
+def load_coinbase_book(chunks: Iterable[bytes], max_quantity: Optional[Decimal] = None, venue: str = 'coinbase') -> OrderBook:
+    return OrderBook.from_coinbase(parse_coinbase_stream(chunks, max_quantity), venue=venue)
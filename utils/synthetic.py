@@ -0,0 +1,87 @@
+import random
+from decimal import Decimal
+from typing import Dict, Any, List
+
+# Synthetic order books in the same shape the exchanges return,
+# used by the tests and the benchmarks so nothing has to hit a live api.
+
+# prices are generated in cents and sizes in satoshis, then formatted as strings
+# exactly like coinbase/gemini send them.
+
+
+def format_price(cents: int) -> str:
+    return f"{cents // 100}.{cents % 100:02d}"
+
+
+def format_size(satoshis: int) -> str:
+    return f"{satoshis // 10**8}.{satoshis % 10**8:08d}"
+
+
+def generate_levels(levels: int, mid: float = 110000.0, seed: int = 0, max_gap: int = 5, max_size: float = 2.0):
+    # returns (bids, asks) as lists of (price, size) strings, bids descending and asks ascending
+    rng = random.Random(seed)
+    mid_cents = int(mid * 100)
+    max_satoshis = int(max_size * 10**8)
+
+    bids = []
+    price = mid_cents - 1
+    for _ in range(levels):
+        bids.append((format_price(price), format_size(rng.randint(1, max_satoshis))))
+        price -= rng.randint(1, max_gap)
+        if price <= 0:
+            break
+
+    asks = []
+    price = mid_cents + 1
+    for _ in range(levels):
+        asks.append((format_price(price), format_size(rng.randint(1, max_satoshis))))
+        price += rng.randint(1, max_gap)
+
+    return bids, asks
+
+
+def generate_coinbase_book(levels: int, mid: float = 110000.0, seed: int = 0, sequence: int = 1) -> Dict[str, Any]:
+    bids, asks = generate_levels(levels, mid=mid, seed=seed)
+    return {
+        'bids': [[price, size, 1] for price, size in bids],
+        'asks': [[price, size, 1] for price, size in asks],
+        'sequence': sequence,
+        'auction_mode': False,
+        'auction': None,
+        'time': '2025-11-01T09:27:59.134716933Z',
+    }
+
+
+def generate_gemini_book(levels: int, mid: float = 110000.0, seed: int = 1) -> Dict[str, Any]:
+    bids, asks = generate_levels(levels, mid=mid, seed=seed)
+    return {
+        'bids': [{'price': price, 'amount': size, 'timestamp': '1761996296'} for price, size in bids],
+        'asks': [{'price': price, 'amount': size, 'timestamp': '1761996296'} for price, size in asks],
+    }
+
+
+def random_quantities(count: int, max_quantity: float, seed: int = 2) -> List:
+    # quantities with up to 8 decimals, spread over (0, max_quantity]
+    rng = random.Random(seed)
+    max_satoshis = int(max_quantity * 10**8)
+    return [Decimal(format_size(rng.randint(1, max_satoshis))) for _ in range(count)]
+
+
+def generate_l2_updates(count: int, mid: float = 110000.0, seed: int = 3, sequence: int = 2,
+                        spread: int = 5000, near_touch: float = 0.2, max_size: float = 2.0) -> List[Dict[str, Any]]:
+    # l2update messages of one change each, as the replay feed (utils/replay.py) takes them.
+    # prices are up to spread cents away from mid, near_touch of them within 10 cents so the best
+    # levels keep changing, and about a third of the changes remove their level (size 0)
+    rng = random.Random(seed)
+    mid_cents = int(mid * 100)
+    max_satoshis = int(max_size * 10**8)
+
+    messages = []
+    for number in range(count):
+        side = rng.choice(('buy', 'sell'))
+        offset = rng.randint(1, 10 if rng.random() < near_touch else spread)
+        price = mid_cents - offset if side == 'buy' else mid_cents + offset
+        size = 0 if rng.random() < 0.3 else rng.randint(1, max_satoshis)
+        messages.append({'type': 'l2update', 'changes': [[side, format_price(price), format_size(size)]],
+                         'sequence': sequence + number})
+    return messages
@@ -0,0 +1,173 @@
+import os
+from decimal import Decimal
+from typing import Dict, Any, Iterator, List, Tuple
+
+from utils.data_loader import get_coinbase_data, get_gemini_data
+
+# Venue adapters.
+# Each adapter knows how to fetch one exchange's book and how to read its levels,
+# so the merge and pricing code only ever sees (price, size) string pairs in book order:
+# bids best (highest) first, asks best (lowest) first.
+# Adding an exchange is a new adapter plus register_venue, nothing else changes.
+
+# products are named BASE-QUOTE, every venue maps that to its own symbol
+DEFAULT_PRODUCT = 'BTC-USD'
+
+
+def base_asset(product: str) -> str:
+    return product.split('-', 1)[0]
+
+
+def call_loader(loader, wait: bool, *args, hedge: bool = False, **kwargs):
+    # wait=True blocks until the loader's rate budget has a token instead of failing fast.
+    # hedge=True only goes out on a token that is free right now, whatever RATE_LIMIT_WAIT says,
+    # so a hedged request never waits for the budget (utils/hedging.py).
+    # the token comes out of the loader's own bucket, so every way shares one budget.
+    if hedge:
+        loader.bucket.acquire(block=False)
+        return loader.__wrapped__(*args, **kwargs)
+    if not wait:
+        return loader(*args, **kwargs)
+    loader.bucket.acquire(block=True)
+    return loader.__wrapped__(*args, **kwargs)
+
+
+class VenueAdapter:
+    # registry key, also used on the command line
+    name = None
+    # used in messages
+    display_name = None
+    # environment variable holding the book url
+    api_env = None
+    # book url for any product, {symbol} is replaced by the venue symbol.
+    # the environment variable overrides the default
+    api_template_env = None
+    api_template = None
+    # environment variable holding the taker fee as a fraction of the notional (0.006 for 0.6%)
+    taker_fee_env = None
+
+    def fetch(self, API, **kwargs) -> Dict[str, Any]:
+        # kwargs are hints (like stream / max_quantity / wait / hedge / timeout), a venue ignores the ones it does not support
+        raise NotImplementedError
+
+    def symbol(self, product: str) -> str:
+        return product
+
+    def api_url(self, product: str = None) -> str:
+        # without a product, the single book url the CLIs always used
+        if product is None:
+            return os.getenv(self.api_env)
+        template = os.getenv(self.api_template_env) or self.api_template
+        return template.format(symbol=self.symbol(product))
+
+    def taker_fee(self) -> Decimal:
+        # no fee unless configured, so prices stay comparable with the venues' raw books
+        return Decimal(os.getenv(self.taker_fee_env) or 0) if self.taker_fee_env else Decimal(0)
+
+    def fetch_async(self, session, API, timeout: float):
+        # returns a coroutine resolving to the venue payload
+        raise NotImplementedError
+
+    def parse_levels(self, levels: List) -> Iterator[Tuple[str, str]]:
+        # (price, size) pairs read lazily from one side of the venue payload
+        raise NotImplementedError
+
+    def from_levels(self, bids: List[Tuple[str, str]], asks: List[Tuple[str, str]], sequence=None) -> Dict[str, Any]:
+        # a payload in the venue's shape from (price, size) strings, for books read back from a snapshot file
+        raise NotImplementedError
+
+    def levels(self, data: Dict[str, Any], side: str) -> Iterator[Tuple[str, str]]:
+        return self.parse_levels(data[side])
+
+    def validate(self, data: Dict[str, Any]) -> None:
+        if data is None:
+            raise ValueError(f"Failed to fetch data from {self.display_name}")
+
+        if 'bids' not in data or 'asks' not in data:
+            raise ValueError(f"No bids or asks found in {self.display_name}")
+
+        if len(data['bids']) == 0 or len(data['asks']) == 0:
+            raise ValueError(f"No bids or asks found in {self.display_name}")
+
+
+class CoinbaseAdapter(VenueAdapter):
+    name = 'coinbase'
+    display_name = 'Coinbase'
+    api_env = 'COINBASE_API'
+    api_template_env = 'COINBASE_API_TEMPLATE'
+    api_template = 'https://api.exchange.coinbase.com/products/{symbol}/book?level=2'
+    taker_fee_env = 'COINBASE_TAKER_FEE'
+
+    def fetch(self, API, wait: bool = False, **kwargs) -> Dict[str, Any]:
+        return call_loader(get_coinbase_data, wait, API, **kwargs)
+
+    def symbol(self, product: str) -> str:
+        # BTC-USD
+        return product.upper()
+
+    def fetch_async(self, session, API, timeout: float):
+        # aiohttp is only needed by the async entry point
+        from utils.async_loader import fetch_coinbase_data
+        return fetch_coinbase_data(session, API, timeout)
+
+    def parse_levels(self, levels: List) -> Iterator[Tuple[str, str]]:
+        # [price, size, num_orders]
+        return ((price, size) for price, size, _ in levels)
+
+    def from_levels(self, bids: List[Tuple[str, str]], asks: List[Tuple[str, str]], sequence=None) -> Dict[str, Any]:
+        # the order counts are not recorded
+        return {'bids': [[price, size, 0] for price, size in bids], 'asks': [[price, size, 0] for price, size in asks], 'sequence': sequence}
+
+
+class GeminiAdapter(VenueAdapter):
+    name = 'gemini'
+    display_name = 'Gemini'
+    api_env = 'GEMINI_API'
+    api_template_env = 'GEMINI_API_TEMPLATE'
+    api_template = 'https://api.gemini.com/v1/book/{symbol}'
+    taker_fee_env = 'GEMINI_TAKER_FEE'
+
+    def fetch(self, API, wait: bool = False, hedge: bool = False, timeout=None, **kwargs) -> Dict[str, Any]:
+        return call_loader(get_gemini_data, wait, API, hedge=hedge, timeout=timeout)
+
+    def symbol(self, product: str) -> str:
+        # BTCUSD
+        return product.replace('-', '').upper()
+
+    def fetch_async(self, session, API, timeout: float):
+        from utils.async_loader import fetch_gemini_data
+        return fetch_gemini_data(session, API, timeout)
+
+    def parse_levels(self, levels: List) -> Iterator[Tuple[str, str]]:
+        # {"price": ..., "amount": ..., "timestamp": ...}
+        return ((level['price'], level['amount']) for level in levels)
+
+    def from_levels(self, bids: List[Tuple[str, str]], asks: List[Tuple[str, str]], sequence=None) -> Dict[str, Any]:
+        # gemini sends no sequence
+        return {'bids': [{'price': price, 'amount': size} for price, size in bids], 'asks': [{'price': price, 'amount': size} for price, size in asks]}
+
+
+VENUES: Dict[str, VenueAdapter] = {}
+
+
+def register_venue(adapter: VenueAdapter) -> VenueAdapter:
+    if adapter.name in VENUES:
+        raise ValueError(f"Venue already registered: {adapter.name}")
+    VENUES[adapter.name] = adapter
+    return adapter
+
+
+def get_venue(name: str) -> VenueAdapter:
+    if name not in VENUES:
+        raise ValueError(f"Unknown venue: {name}")
+    return VENUES[name]
+
+
+def get_venues(names: List[str]) -> List[VenueAdapter]:
+    return [get_venue(name) for name in names]
+
+
+COINBASE = register_venue(CoinbaseAdapter())
+GEMINI = register_venue(GeminiAdapter())
+
+DEFAULT_VENUES = [COINBASE.name, GEMINI.name]